@@ -27,6 +27,7 @@ export interface OperationTask {
   unidade?: string;
   completed?: boolean;
   photo?: boolean;
+  updt_time?: string;
 }
 
 export interface CompleteTaskPayload {
@@ -46,6 +47,17 @@ export interface OperationSelfResponse {
   completed: OperationTask[];
   stats: { total_assigned: number; total_completed: number };
   total: number;
+  /** Estado da sincronização incremental (/operacao_self/sync) */
+  sync?: { token: string; fields: string[] };
+}
+
+interface OperationSyncResponse {
+  token: string;
+  full: boolean;
+  fields?: string[];
+  upserts: unknown[][];
+  deleted: number[];
+  stats: { total_assigned: number; total_completed: number };
 }
 
 export interface MetaInstall {
@@ -102,15 +114,57 @@ export const FIXED_PK: Record<string, number> = { REDE: -1, CAIXA: -2 };
 
 // ─── Hooks ───────────────────────────────────────────────────────────────────
 
-export const useOperationTasks = () =>
-  useQuery<OperationSelfResponse>({
+// ─── Sincronização incremental ───────────────────────────────────────────────
+// O servidor devolve só as tarefas alteradas desde o token anterior (valores
+// pela ordem de `fields`) e os pk removidos; 304 quando nada mudou.
+
+const toTask = (fields: string[], values: unknown[]): OperationTask =>
+  Object.fromEntries(fields.map((f, i) => [f, values[i]])) as unknown as OperationTask;
+
+export const mergeOperationSync = (
+  prev: OperationSelfResponse | undefined,
+  res: OperationSyncResponse,
+): OperationSelfResponse => {
+  const fields = res.fields ?? prev?.sync?.fields ?? [];
+  const tasks = new Map<number, OperationTask>();
+  if (!res.full && prev) {
+    [...prev.data, ...prev.completed].forEach((t) => tasks.set(t.pk, t));
+  }
+  res.deleted.forEach((pk) => tasks.delete(pk));
+  res.upserts.forEach((values) => {
+    const task = toTask(fields, values);
+    tasks.set(task.pk, task);
+  });
+
+  const all = [...tasks.values()];
+  const data = all.filter((t) => !t.completed).sort((a, b) => a.pk - b.pk);
+  const completed = all
+    .filter((t) => t.completed)
+    .sort((a, b) => (b.updt_time ?? '').localeCompare(a.updt_time ?? ''));
+  return { data, completed, stats: res.stats, total: data.length, sync: { token: res.token, fields } };
+};
+
+export const useOperationTasks = () => {
+  const qc = useQueryClient();
+  return useQuery<OperationSelfResponse>({
     queryKey: KEYS.tasks,
     queryFn: async () => {
-      const { data } = await apiClient.get('/operacao_self');
-      return data;
+      const prev = qc.getQueryData<OperationSelfResponse>(KEYS.tasks);
+      const since = prev?.sync?.token;
+      const res = await apiClient.get<OperationSyncResponse>('/operacao_self/sync', {
+        params: since ? { since } : undefined,
+        validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+      });
+      if (res.status === 304 && prev) return prev;
+      if (res.status === 304) {
+        const { data } = await apiClient.get<OperationSyncResponse>('/operacao_self/sync');
+        return mergeOperationSync(undefined, data);
+      }
+      return mergeOperationSync(prev, res.data);
     },
     staleTime: 2 * 60 * 1000,
   });
+};
 
 export const useConcluirTask = () => {
   const qc = useQueryClient();
@@ -91,6 +91,9 @@ def create_app(config_class):
 
     # Inicialização das extensões com a app
     db.init_app(app)
+    # Leituras de relatório na réplica, se configurada (app/utils/db_routing.py)
+    from .utils.db_routing import replica_router
+    replica_router.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
     mail.init_app(app)
@@ -103,7 +106,12 @@ def create_app(config_class):
         "http://localhost:3002",  # dev website estático AINTAR
     ]
     CORS(app, resources={r"/*": {"origins": cors_origins}}, supports_credentials=True)
+    # Fila pub/sub partilhada: emits de qualquer processo chegam a todos os clientes
+    from .socketio.scaling import resolve_message_queue
+    app.config['SOCKETIO_MESSAGE_QUEUE_URL'] = resolve_message_queue(app.config)
     socket_io.init_app(app,
+                       message_queue=app.config['SOCKETIO_MESSAGE_QUEUE_URL'],
+                       channel=app.config.get('SOCKETIO_CHANNEL', 'aintar-socketio'),
                        logger=False,
                        engineio_logger=False,
                        cors_allowed_origins=cors_origins,
@@ -116,6 +124,10 @@ def create_app(config_class):
     logging.getLogger('socketio.server').setLevel(logging.WARNING)
     logging.getLogger('engineio').setLevel(logging.WARNING)
 
+    # Trabalho CPU fora do hub do eventlet (tpool + locks nativos no logging)
+    from .utils.compute_offload import init_compute_offload
+    init_compute_offload(app)
+
     # Inicializar o serviço de pagamento
     payment_service.init_app(app)
 
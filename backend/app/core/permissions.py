@@ -1,6 +1,8 @@
 # app/core/permissions.py
 
-from typing import List, Dict, Optional
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Dict, Optional
 from sqlalchemy import text
 from .. import db  # Importar a instância da BD
 from app.utils.logger import get_logger
@@ -8,45 +10,172 @@ from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Máscaras compiladas por token (JTI). O claim `interfaces` de um token
+# nunca muda, por isso a máscara não expira — só sai por LRU.
+TOKEN_MASK_CACHE_SIZE = 4096
+
+
+class PermissionConfigError(ValueError):
+    """Requisito de permissão mal configurado (p.ex. pk negativo num decorator)."""
+
+
+def _valid_pk(pk) -> bool:
+    """Um pk só pode ser bit da máscara se for um inteiro >= 0 (bool não conta)."""
+    return isinstance(pk, int) and not isinstance(pk, bool) and pk >= 0
+
+
+def validate_permission_ids(permission_ids: Iterable) -> tuple:
+    """
+    Valida os requisitos de um decorator quando é aplicado (ao importar as
+    rotas, no arranque): um pk inteiro inválido é erro de configuração, não
+    um 500 em cada pedido. Values (str) só são resolvidos no pedido.
+    """
+    permission_ids = tuple(permission_ids)
+    invalid = [p for p in permission_ids if not isinstance(p, str) and not _valid_pk(p)]
+    if invalid:
+        raise PermissionConfigError(
+            f"Permissões inválidas {invalid!r}: um pk tem de ser um inteiro >= 0")
+    return permission_ids
+
+
+def interfaces_to_mask(interfaces: Optional[Iterable]) -> int:
+    """Compila a lista de PKs de ts_interface do JWT num bitset (bit n ⇔ pk n)."""
+    mask = 0
+    for pk in interfaces or ():
+        if isinstance(pk, int) and pk >= 0:
+            mask |= 1 << pk
+    return mask
+
 
 class PermissionManager:
-    """Gestor centralizado de permissões"""
+    """
+    Gestor centralizado de permissões.
+
+    As interfaces de cada utilizador são compiladas num bitset (int Python,
+    bit n ⇔ pk n de ts_interface) cacheado por JTI; os requisitos de cada
+    decorator também são compilados numa máscara, e a verificação passa a
+    ser uma intersecção de bits em vez de uma pesquisa linear na lista.
+    Como o bit é o próprio pk, recarregar o mapa value→pk não invalida as
+    máscaras dos tokens — só as dos requisitos.
+    """
 
     def __init__(self):
         self._permission_map: Dict[str, int] = {}   # value → pk
         self._pk_map: Dict[int, str] = {}            # pk → value
+        self._fingerprint: Optional[str] = None
+        self._required_masks: Dict[tuple, int] = {}
+        self._token_masks: "OrderedDict[str, int]" = OrderedDict()
+        self._unknown_warned: set = set()
+        self._lock = threading.Lock()
         logger.info("🔐 Gestor de Permissões a inicializar...")
 
     def load_permissions_from_db(self, app):
         """Carrega o mapa de permissões da base de dados."""
         with app.app_context():
-            results = db.session.execute(text("SELECT pk, value FROM ts_interface")).fetchall()
+            self._load(db.session)
+
+    def _load(self, session):
+        results = session.execute(text("SELECT pk, value FROM ts_interface")).fetchall()
+        invalid = [row.value for row in results if not _valid_pk(row.pk)]
+        if invalid:
+            # Antes de trocar o mapa: num reload fica o anterior
+            raise PermissionConfigError(f"ts_interface com pk inválido para: {', '.join(map(str, invalid))}")
+        fingerprint = self._read_fingerprint(session)
+        with self._lock:
             self._permission_map = {row.value: row.pk for row in results}
             self._pk_map = {row.pk: row.value for row in results}
-            logger.info(f"🔐 Gestor de Permissões carregou {len(self._permission_map)} permissões da BD.")
+            self._required_masks = {}
+            self._unknown_warned = set()
+            self._fingerprint = fingerprint
+        logger.info(f"🔐 Gestor de Permissões carregou {len(self._permission_map)} permissões da BD.")
+
+    @staticmethod
+    def _read_fingerprint(session) -> Optional[str]:
+        return session.execute(text(
+            "SELECT md5(string_agg(pk || ':' || value, ',' ORDER BY pk)) FROM ts_interface"
+        )).scalar()
+
+    def reload_if_changed(self, app) -> bool:
+        """
+        Recarrega o mapa se ts_interface mudou (novas permissões via SQL de
+        migração, renomeações). Uma query de fingerprint por chamada — é o
+        job do scheduler que a invoca, nunca o caminho de um pedido.
+        """
+        with app.app_context():
+            if self._read_fingerprint(db.session) == self._fingerprint:
+                return False
+            self._load(db.session)
+            return True
 
     def pks_to_permissions(self, pks: List[int]) -> List[str]:
         """Converte lista de PKs para lista de value strings (ex: 'portal.access')."""
         return [self._pk_map[pk] for pk in (pks or []) if pk in self._pk_map]
 
+    # ── Bitsets ────────────────────────────────────────────────────────
+
+    def required_mask(self, permission_ids: Iterable) -> int:
+        """
+        Máscara dos requisitos (values de ts_interface ou pks inteiros).
+        Values desconhecidos não contribuem bits — um requisito só com
+        permissões desconhecidas dá 0, que nunca é satisfeito. O mesmo para
+        um pk que não pode ser bit (negativo, bool): os decorators e o mapa
+        já os recusam no arranque (validate_permission_ids, _load), aqui
+        nunca dão erro num pedido.
+        """
+        key = tuple(permission_ids)
+        mask = self._required_masks.get(key)
+        if mask is not None:
+            return mask
+
+        mask = 0
+        for permission_id in key:
+            pk = permission_id if isinstance(permission_id, int) else self._permission_map.get(permission_id)
+            if not _valid_pk(pk):
+                if permission_id not in self._unknown_warned:
+                    self._unknown_warned.add(permission_id)
+                    logger.warning(f"Permissão '{permission_id}' não encontrada no mapa de permissões.")
+                continue
+            mask |= 1 << pk
+        self._required_masks[key] = mask
+        return mask
+
+    def token_mask(self, jti: Optional[str], user_interfaces: Optional[Iterable]) -> int:
+        """Bitset das interfaces do token, cacheado por JTI (LRU)."""
+        if not jti:
+            return interfaces_to_mask(user_interfaces)
+        with self._lock:
+            mask = self._token_masks.get(jti)
+            if mask is not None:
+                self._token_masks.move_to_end(jti)
+                return mask
+        mask = interfaces_to_mask(user_interfaces)
+        with self._lock:
+            self._token_masks[jti] = mask
+            if len(self._token_masks) > TOKEN_MASK_CACHE_SIZE:
+                self._token_masks.popitem(last=False)
+        return mask
+
+    def has_any(self, user_mask: int, permission_ids: Iterable) -> bool:
+        return bool(user_mask & self.required_mask(permission_ids))
+
+    def has_all(self, user_mask: int, permission_ids: Iterable) -> bool:
+        permission_ids = tuple(permission_ids)
+        # Requisito com permissões desconhecidas (sem bit) nunca é satisfeito
+        if any(isinstance(p, str) and p not in self._permission_map for p in permission_ids):
+            self.required_mask(permission_ids)  # regista o aviso
+            return False
+        required = self.required_mask(permission_ids)
+        return user_mask & required == required
+
     def check_permission(self, permission_id: str, user_profile: str,
-                         user_interfaces: List[int]) -> bool:
+                         user_interfaces: List[int], jti: Optional[str] = None) -> bool:
         """Verifica se o utilizador tem uma permissão, baseando-se no seu array de interfaces."""
 
         # Super admin (perfil '0') sempre tem acesso
         if user_profile == "0":
             return True
 
-        # Obter o ID da interface correspondente à permissão
-        required_interface_id = self._permission_map.get(permission_id)
-        if required_interface_id is None:
-            logger.warning(f"Permissão '{permission_id}' não encontrada no mapa de permissões.")
-            return False
-
-        # Verificar se o ID necessário está na lista de interfaces do utilizador
-        has_perm = required_interface_id in (user_interfaces or [])
-        logger.debug(f"Verificação para '{permission_id}' (req: {required_interface_id}): {has_perm}")
-        return has_perm
+        return self.has_any(self.token_mask(jti, user_interfaces), (permission_id,))
 
 
 # Instância global do gestor
@@ -101,7 +101,8 @@ class OperationsRepository(BaseRepository):
                     SELECT * FROM vbl_operacao
                     WHERE pk_operador1 = :user_id
                     AND updt_client IS NOT NULL
-                    AND updt_time::date = CURRENT_DATE
+                    AND updt_time >= CURRENT_DATE
+                    AND updt_time <  CURRENT_DATE + 1
                     ORDER BY updt_time DESC
                 """)
                 completed_result = session.execute(completed_query, {'user_id': user_id})
@@ -140,40 +141,10 @@ class OperationsRepository(BaseRepository):
             }
 
     def get_analytics_data(self, current_user: str, filters: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Buscar dados para analytics - USA vbl_operacaometa"""
+        """Analytics das execuções com filtros e buckets — ver app/services/operations/analytics.py"""
+        from ..services.operations.analytics import get_operations_analytics
         try:
-            with db_session_manager(current_user) as session:
-                base_query = text("""
-                    SELECT
-                        COUNT(*) as total_operations,
-                        COUNT(DISTINCT ts_operador1) as active_operators,
-                        COUNT(DISTINCT tb_instalacao) as total_installations,
-                        COUNT(DISTINCT tt_operacaoaccao) as total_action_types
-                    FROM vbl_operacaometa
-                """)
-
-                result = session.execute(base_query).fetchone()
-
-                operator_query = text("""
-                    SELECT
-                        ts_operador1 as operator_name,
-                        COUNT(*) as total_tasks
-                    FROM vbl_operacaometa
-                    WHERE ts_operador1 IS NOT NULL
-                    GROUP BY ts_operador1
-                    ORDER BY total_tasks DESC
-                """)
-
-                operator_stats = session.execute(operator_query).fetchall()
-
-                return {
-                    'success': True,
-                    'data': {
-                        'overview': dict(result._mapping) if result else {},
-                        'operator_stats': [dict(row._mapping) for row in operator_stats]
-                    }
-                }
-
+            return {'success': True, 'data': get_operations_analytics(current_user, filters)}
         except SQLAlchemyError as e:
             current_app.logger.error(f"Erro ao buscar analytics: {str(e)}")
             return {'success': False, 'error': 'Erro ao calcular estatísticas'}
@@ -19,6 +19,9 @@ from app.services.admin_service import (
     get_session_logs,
     kill_sessions,
 )
+from app.services.email_outbox_service import get_outbox_status, retry_outbox_email
+from app.services.storage_accounting_service import get_storage_summary
+from app.services.job_run_service import get_job_runs, get_scheduler_overview
 
 bp = Blueprint('admin', __name__)
 
@@ -56,6 +59,70 @@ def reload_config():
     return reload_system_config(get_jwt_identity())
 
 
+# ── Email (outbox) ────────────────────────────────────────────────────────────
+
+@bp.route('/email/outbox', methods=['GET'])
+@jwt_required()
+@require_permission('admin.users')
+@set_session
+@api_error_handler
+def email_outbox():
+    """Estado de entrega dos emails: contagens por estado + mais recentes."""
+    status = request.args.get('status') or None
+    limit = min(request.args.get('limit', 100, type=int) or 100, 500)
+    return get_outbox_status(status=status, limit=limit)
+
+
+@bp.route('/email/outbox/<int:pk>/retry', methods=['POST'])
+@jwt_required()
+@require_permission('admin.users')
+@set_session
+@api_error_handler
+def email_outbox_retry(pk):
+    """Repõe na fila um email que falhou definitivamente."""
+    return retry_outbox_email(pk)
+
+
+# ── Armazenamento ─────────────────────────────────────────────────────────────
+
+@bp.route('/storage/stats', methods=['GET'])
+@jwt_required()
+@require_permission('admin.users')
+@set_session
+@api_error_handler
+def storage_stats():
+    """Estatísticas de armazenamento pré-calculadas (sem varrer o disco)."""
+    return get_storage_summary(get_jwt_identity())
+
+
+# ── Scheduler ─────────────────────────────────────────────────────────────────
+
+@bp.route('/scheduler/jobs', methods=['GET'])
+@jwt_required()
+@require_permission('admin.users')
+@set_session
+@api_error_handler
+def scheduler_jobs():
+    """Jobs registados, liderança deste processo e última execução de cada job."""
+    return get_scheduler_overview(get_jwt_identity())
+
+
+@bp.route('/scheduler/runs', methods=['GET'])
+@jwt_required()
+@require_permission('admin.users')
+@set_session
+@api_error_handler
+def scheduler_runs():
+    """Histórico de execuções (filtros: job_id, status)."""
+    limit = min(request.args.get('limit', 50, type=int) or 50, 500)
+    return get_job_runs(
+        get_jwt_identity(),
+        job_id=request.args.get('job_id') or None,
+        status=request.args.get('status') or None,
+        limit=limit,
+    )
+
+
 # ── Cache ─────────────────────────────────────────────────────────────────────
 
 @bp.route('/cache/clear', methods=['POST'])
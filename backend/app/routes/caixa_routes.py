@@ -96,6 +96,16 @@ def get_movements():
         type: string
         format: date
         required: false
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Tamanho da página (máx. 500); sem limit/cursor devolve o período inteiro.
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: next_cursor da página anterior.
     responses:
       200:
         description: Lista de movimentos e resumo retornados com sucesso.
@@ -103,7 +113,10 @@ def get_movements():
     current_user = get_jwt_identity()
     date_from = request.args.get('date_from')
     date_to = request.args.get('date_to')
-    return list_movements(current_user, date_from=date_from, date_to=date_to)
+    return list_movements(
+        current_user, date_from=date_from, date_to=date_to,
+        limit=request.args.get('limit'), cursor=request.args.get('cursor'),
+    )
 
 
 @bp.route('/caixa', methods=['POST'])
@@ -12,6 +12,7 @@ from ..services.documents import (
     document_owner,
     add_document_annex,
     download_file,
+    export_dossier,
     check_vacation_status,
     get_entity_count_types,
     check_ramal_coercivo,
@@ -20,6 +21,7 @@ from ..services.documents import (
     buscar_dados_pedido,
     gerar_comprovativo_pdf,
     preencher_pdf,
+    preencher_pdfs,
     get_document_type_param,
     update_document_params,
     update_document_fields,
@@ -39,7 +41,7 @@ from ..services.documents import (
 import jwt
 from .. import limiter
 from ..utils.utils import token_required, set_session, db_session_manager
-from app.utils.error_handler import api_error_handler
+from app.utils.error_handler import api_error_handler, APIError
 
 
 bp = Blueprint('documents_routes', __name__)
@@ -393,6 +395,18 @@ def download_file_route(regnumber, filename):
         return download_file(regnumber, filename, current_user)
 
 
+@bp.route('/documents/<int:pk>/dossier', methods=['GET'])
+@jwt_required()
+@require_any_permission('docs.view.all', 'docs.view.owner', 'docs.view.assigned')
+@token_required
+@set_session
+@api_error_handler
+def export_dossier_route(pk):
+    """Dossier completo do pedido (pasta, ofícios emitidos e formulário) num ZIP em streaming."""
+    current_user = get_jwt_identity()
+    return export_dossier(pk, current_user)
+
+
 @bp.route('/add_document_annex', methods=['POST'])
 @jwt_required()
 @require_permission('docs.create')  # docs.create
@@ -488,6 +502,32 @@ def extrair_comprovativo(pk):
     )
 
 
+@bp.route('/extrair_comprovativos', methods=['POST'])
+@jwt_required()
+@require_permission('docs.view.all')
+@token_required
+@set_session
+@api_error_handler
+def extrair_comprovativos():
+    """Formulários de vários pedidos num só PDF (body: {"pks": [...]}, máx. 500)."""
+    current_user = get_jwt_identity()
+    pks = (request.get_json(silent=True) or {}).get('pks') or []
+    if not isinstance(pks, list) or not pks:
+        raise APIError("Lista de pedidos (pks) em falta", 400, "ERR_INVALID_INPUT")
+    if len(pks) > 500:
+        raise APIError("Máximo de 500 pedidos por PDF", 400, "ERR_INVALID_INPUT")
+
+    pdf_buffer, total = preencher_pdfs(pks, current_user)
+    logger.info(f"PDF com {total} formulários gerado por {current_user}")
+
+    return send_file(
+        pdf_buffer,
+        as_attachment=True,
+        download_name="comprovativos_pedidos.pdf",
+        mimetype='application/pdf'
+    )
+
+
 @bp.route('/create_etar_document/<int:etar_pk>', methods=['POST'])
 @jwt_required()
 @token_required
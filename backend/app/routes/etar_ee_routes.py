@@ -84,6 +84,8 @@ from ..services.etar_ee_service import (
 )
 from ..services.pdf_extraction_service import (
     extract_lab_report,
+    extract_lab_reports_batch,
+    ler_upload,
     sugerir_instalacao,
     confirmar_mapeamento_instalacao,
 )
@@ -1544,6 +1546,29 @@ def extract_pdf_boletim():
     return jsonify({'boletim': dados, 'instalacao': sugestao}), 200
 
 
+@bp.route('/instalacao_autocontrolo/extract_pdf_batch', methods=['POST'])
+@jwt_required()
+@token_required
+@require_permission('operation.access')  # operation.access
+@set_session
+@api_error_handler
+def extract_pdf_boletins_lote():
+    """Extrai vários boletins de uma vez (vários PDFs no campo 'files' e/ou
+    ZIPs com PDFs) e devolve-os como lote para revisão, com a instalação
+    sugerida para cada um. Não escreve nada na BD."""
+    current_user = get_jwt_identity()
+    files = request.files.getlist('files') or request.files.getlist('file')
+    if not files:
+        return jsonify({'error': 'Nenhum ficheiro foi enviado'}), 400
+
+    nomes = [f.filename or 'boletim.pdf' for f in files]
+    ficheiros = [(nome, ler_upload(nome, f)) for nome, f in zip(nomes, files)]
+    if not any(nome.lower().endswith(('.pdf', '.zip')) for nome, _ in ficheiros):
+        return jsonify({'error': 'Os ficheiros têm de ser PDFs ou ZIPs com PDFs'}), 400
+
+    return jsonify(extract_lab_reports_batch(current_user, ficheiros)), 200
+
+
 @bp.route('/instalacao_autocontrolo/importar_boletim', methods=['POST'])
 @jwt_required()
 @token_required
@@ -36,6 +36,10 @@ from ..services.operations_service import (
     update_operacao_param,
     get_operacao_param_reference_options,
 )
+from ..services.operations.task_sync import sync_today_tasks
+from ..services.operations.batch_completion import complete_tasks_batch
+from ..services.operations.report_views import get_report_view_page
+from ..services.operations.analytics import get_operations_analytics
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from ..utils.utils import token_required, db_session_manager, set_session
 from app.utils.error_handler import api_error_handler
@@ -71,6 +75,12 @@ def get_operations():
     summary: Retorna os dados agregados para o dashboard base de Operações.
     security:
       - BearerAuth: []
+    parameters:
+      - name: summary
+        in: query
+        type: boolean
+        required: false
+        description: Só nome, total e colunas de cada view (sem linhas). As linhas vêm de /operations/views/<view>.
     responses:
       200:
         description: Coleção de dados estatísticos diários (Views com dados).
@@ -78,12 +88,12 @@ def get_operations():
         description: A sessão atual expirou.
     """
     current_user = get_jwt_identity()
+    summary = request.args.get('summary', '').lower() in ('1', 'true', 'yes')
     try:
-        with db_session_manager(current_user):
-            data = get_operations_data(current_user)
-            # Filtre apenas as views que têm dados
-            data = {k: v for k, v in data.items() if v.get('data')}
-            return jsonify(data), 200
+        data = get_operations_data(current_user, summary=summary)
+        # Filtre apenas as views que têm dados
+        data = {k: v for k, v in data.items() if v.get('total')}
+        return jsonify(data), 200
     except SQLAlchemyError as e:
         logger.error(
             f"Erro de banco de dados ao buscar dados de operações: {str(e)}", exc_info=True)
@@ -99,6 +109,56 @@ def get_operations():
             return jsonify({"error": "Erro interno do servidor", "message": "Ocorreu um erro inesperado ao buscar dados de operações"}), 500
 
 
+@bp.route('/operations/views/<string:view_name>', methods=['GET'])
+@jwt_required()
+@token_required
+@require_permission('operation.access')  # operation.access
+@set_session
+@api_error_handler
+def get_operations_view(view_name):
+    """
+    Página de uma view do quadro de Operações
+    ---
+    tags:
+      - Operações
+    summary: Linhas de uma view vbr_document_* com paginação, ordenação e projecção de colunas no servidor.
+    security:
+      - BearerAuth: []
+    parameters:
+      - name: view_name
+        in: path
+        type: string
+        required: true
+      - name: page
+        in: query
+        type: integer
+      - name: page_size
+        in: query
+        type: integer
+        description: Máximo 200 (por omissão 25).
+      - name: sort
+        in: query
+        type: string
+      - name: order
+        in: query
+        type: string
+        enum: [asc, desc]
+      - name: fields
+        in: query
+        type: string
+        description: Colunas separadas por vírgula.
+    responses:
+      200:
+        description: Página da view (data, total, pages, columns).
+      400:
+        description: Parâmetros ou colunas inválidos.
+      404:
+        description: View desconhecida.
+    """
+    current_user = get_jwt_identity()
+    return jsonify(get_report_view_page(current_user, view_name, request.args)), 200
+
+
 @bp.route('/internal_document', methods=['POST'])
 @jwt_required()
 @token_required
@@ -403,6 +463,47 @@ def get_operacao_self():
         return jsonify({"error": "Erro interno do servidor", "message": "Ocorreu um erro inesperado"}), 500
 
 
+@bp.route('/operacao_self/sync', methods=['GET'])
+@jwt_required()
+@token_required
+@require_permission('operation.access')  # operation.access
+@set_session
+@api_error_handler
+def sync_operacao_self():
+    """
+    Sincronização Incremental das Minhas Tarefas (Mobile)
+    ---
+    tags:
+      - Operações
+    summary: Devolve só as tarefas do dia novas, alteradas ou concluídas desde o token dado, e os pk das que saíram da lista. Suporta ETag / If-None-Match.
+    security:
+      - BearerAuth: []
+    parameters:
+      - name: since
+        in: query
+        type: string
+        required: false
+        description: Token devolvido pela sincronização anterior (omitir na primeira).
+    responses:
+      200:
+        description: Alterações (upserts em lista de valores pela ordem de fields, deleted, token, stats). full=true quando o token não é conhecido.
+      304:
+        description: Sem alterações desde o token / ETag enviado.
+    """
+    current_user = get_jwt_identity()  # Session ID (para db_session_manager)
+    user_id = get_jwt()["user_id"]     # PK do utilizador (para filtrar tarefas)
+
+    payload, token = sync_today_tasks(
+        user_id, current_user,
+        since=request.args.get('since') or None,
+        if_none_match=request.if_none_match,
+    )
+    response = current_app.response_class(status=304) if payload is None else jsonify(payload)
+    response.set_etag(token)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 @bp.route('/operacao_complete/<int:task_id>', methods=['POST'])
 @jwt_required()
 @token_required
@@ -471,6 +572,46 @@ def complete_task(task_id):
             return jsonify({"error": "Erro interno do servidor", "message": "Ocorreu um erro inesperado"}), 500
 
 
+@bp.route('/operacao_complete/batch', methods=['POST'])
+@jwt_required()
+@token_required
+@require_permission('operation.access')  # operation.access
+@set_session
+@api_error_handler
+def complete_tasks_batch_route():
+    """
+    Conclusão de tarefas em lote (Mobile, sincronização offline)
+    ---
+    tags:
+      - Operações
+    summary: Conclui várias tarefas numa transacção, com resultado por item. Idempotente pela chave gerada no cliente.
+    security:
+      - BearerAuth: []
+    consumes:
+      - multipart/form-data
+    parameters:
+      - name: bundle
+        in: formData
+        type: string
+        required: true
+        description: 'JSON {"items": [{key, task_id, valuetext, valuememo, params, photo}]}; photo = nome da parte com o ficheiro'
+    responses:
+      200:
+        description: Resultados por item (completed | duplicate | error) e resumo.
+      400:
+        description: Lote mal formado.
+    """
+    current_user = get_jwt_identity()
+    user_id = get_jwt()["user_id"]
+    raw_bundle = request.form.get('bundle')
+    if raw_bundle is None and request.is_json:
+        raw_bundle = request.get_json(silent=True)
+    if not raw_bundle:
+        return jsonify({"error": "Campo 'bundle' em falta"}), 400
+    body, status = complete_tasks_batch(user_id, current_user, raw_bundle, request.files)
+    return jsonify(body), status
+
+
 @bp.route('/operacao_analysis/<int:operation_id>', methods=['GET'])
 @jwt_required()
 @token_required
@@ -699,6 +840,30 @@ def download_operation_photo_route(photo_path):
         return jsonify({"error": "Erro ao fazer download da foto"}), 500
 
 
+# ---------------------------------------------------------------------------
+# Analytics do supervisor (rollups de tb_operacao)
+# ---------------------------------------------------------------------------
+
+@bp.route('/operacao_supervisor_analytics', methods=['GET'])
+@jwt_required()
+@token_required
+@require_permission('operation.supervise')  # operation.supervise
+@set_session
+@api_error_handler
+def operacao_supervisor_analytics_route():
+    """
+    Analytics das execuções com filtros e buckets.
+
+    Ver: app/services/operations/analytics.py
+
+    Query string:
+      - from_date, to_date (ISO, inclusivos; por omissão os últimos 12 meses)
+      - bucket: day | week | month (por omissão conforme o período)
+      - instalacao, modo, operador: pks separados por vírgulas (modo=pontual para as pontuais)
+    """
+    return jsonify(get_operations_analytics(get_jwt_identity(), request.args)), 200
+
+
 # ---------------------------------------------------------------------------
 # Inicialização de tarefas mensais (fbf_operacao$init)
 # ---------------------------------------------------------------------------
@@ -712,13 +877,14 @@ def operacao_init_route():
     """
     Gerar tarefas operacionais para um mês futuro.
 
-    Chama fbf_operacao$init(modo, mês, ano) que materializa os templates
-    (tb_operacaometa) em registos reais (tb_operacao).
+    Materializa os templates (tb_operacaometa) em registos reais
+    (tb_operacao), substituindo os do mês/modo.
 
     Body JSON:
       - tt_operacaomodo (int): modo de operação
       - month (int): mês 1-12
       - year  (int): ano >= 2024
+      - dry_run (bool, opcional): só devolve o plano (carga por operador/instalação/dia)
 
     Apenas meses FUTUROS são permitidos.
     """
@@ -736,11 +902,12 @@ def operacao_init_remaining_route():
     """
     Gerar tarefas para os dias RESTANTES do mês corrente.
 
-    Chama fbf_operacao$init_remaining(modo) — aditivo, não apaga existentes.
-    Ver: backend/sql/fbf_operacao_init_remaining.sql
+    Aditivo, não apaga existentes (regra de fbf_operacao$init_remaining).
+    Ver: app/services/operations/month_generation.py
 
     Body JSON:
       - tt_operacaomodo (int): modo de operação
+      - dry_run (bool, opcional): só devolve o plano
     """
     data = request.get_json()
     result, status = init_operacao_remaining(data, get_jwt_identity())
@@ -623,12 +623,18 @@ def check_payment_status(transaction_id):
         in: path
         type: string
         required: true
+      - name: max_age
+        in: query
+        type: integer
+        required: false
+        description: Aceitar o estado reconciliado se consultado na SIBS há menos destes segundos.
     responses:
       200:
         description: Info (Status Concluído = 2/Paid).
     """
     user = get_jwt_identity()
-    result = payment_service.check_payment_status(transaction_id, user)
+    max_age = request.args.get('max_age', type=int)
+    result = payment_service.check_payment_status(transaction_id, user, max_age=max_age)
     return jsonify(result), 200
 
 
@@ -183,6 +183,75 @@ def sign_internal():
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
+@signature_bp.route('/internal/batch', methods=['POST'])
+@jwt_required()
+@require_permission('letters.manage')
+def sign_internal_batch():
+    """
+    Assina vários documentos com o certificado interno (p.ex. os ofícios do dia).
+    POST /signature/internal/batch
+    Body: {document_type, document_ids: [...], reason?}
+    Resposta com o resultado de cada documento — uma falha não trava o lote.
+    """
+    try:
+        current_user = get_jwt_identity()
+        data = request.get_json() or {}
+        document_type = data.get('document_type')
+        document_ids = data.get('document_ids') or []
+
+        if not document_type or not isinstance(document_ids, list) or not document_ids:
+            return jsonify({'success': False, 'message': 'Campos obrigatórios: document_type, document_ids'}), 400
+        if len(document_ids) > 200:
+            return jsonify({'success': False, 'message': 'Máximo de 200 documentos por lote'}), 400
+
+        with db_session_manager(current_user):
+            results = {}
+            paths = {}
+            for document_id in document_ids:
+                file_path, error = _get_pdf_path(document_type, document_id, current_user)
+                if error:
+                    results[document_id] = {'document_id': document_id, 'success': False, 'message': error}
+                else:
+                    paths[file_path] = document_id
+
+            from app.services.digital_signature_service import sign_pdfs_internal
+            for signed in sign_pdfs_internal(
+                list(paths),
+                signer_name=current_user,
+                reason=data.get('reason', 'Assinatura de Documento Oficial')
+            ):
+                document_id = paths[signed['pdf_path']]
+                if not signed['success']:
+                    results[document_id] = {'document_id': document_id, 'success': False, 'message': signed['error']}
+                    continue
+                signed_filename = os.path.basename(signed['signed_path'])
+                _mark_as_signed(
+                    document_type=document_type,
+                    document_id=document_id,
+                    current_user=current_user,
+                    method='INTERNAL',
+                    extra_data={'batch': True},
+                    signed_filename=signed_filename
+                )
+                results[document_id] = {'document_id': document_id, 'success': True, 'signed_filename': signed_filename}
+
+            ordered = [results[d] for d in document_ids if d in results]
+            signed_count = sum(1 for r in ordered if r['success'])
+            logger.info(f'[SIGNATURE] Lote {document_type}: {signed_count}/{len(ordered)} assinados por {current_user}')
+
+            return jsonify({
+                'success': signed_count == len(ordered),
+                'message': f'{signed_count} de {len(ordered)} documentos assinados',
+                'data': ordered
+            }), 200
+
+    except InvalidSessionError as e:
+        return jsonify({'success': False, 'message': str(e)}), 401
+    except Exception as e:
+        logger.error(f'[SIGNATURE] Erro na assinatura interna em lote: {str(e)}')
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
 # =============================================================================
 # VALIDAÇÃO DE ASSINATURA
 # =============================================================================
@@ -7,6 +7,9 @@ Endpoints:
     GET  /api/v1/telemetry/dados     - Listar dados de sensores (JWT)
     PUT  /api/v1/telemetry/dados/<pk>/processed - Marcar como processado (JWT)
     GET  /api/v1/telemetry/stats     - Estatísticas de dados não processados (JWT)
+    POST /api/v1/telemetry/query/series - Série agregada/downsampled por sensor (JWT)
+    GET  /api/v1/telemetry/alerts    - Episódios de alerta (JWT)
+    POST /api/v1/telemetry/alerts/rules/reload - Recarregar regras de alerta (JWT)
 
 Autenticação:
     - POST: Requer header X-API-Key com chave válida
@@ -29,10 +32,12 @@ from app.services.telemetry_service import (
     get_teleparams,
     get_sensor_types,
     query_sensor_data,
+    query_sensor_series,
     query_stations,
     mark_as_processed,
     get_unprocessed_count
 )
+from app.services.telemetry_alert_engine import list_alerts, reload_alert_rules
 
 logger = get_logger(__name__)
 
@@ -412,3 +417,80 @@ def query_data():
     except Exception as e:
         logger.error(f"Erro ao consultar dados de telemetria: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@bp.route('/query/series', methods=['POST'])
+@jwt_required()
+@token_required
+@require_permission('telemetry.view')  # ts_interface: telemetry.view (query é read-only)
+@limiter.limit("2000 per hour")
+@api_error_handler
+def query_series():
+    """
+    Série temporal agregada no servidor, em formato colunar (para gráficos).
+
+    Body JSON:
+        sensor_pks: [int, ...]     — PKs dos sensores
+        teleparam: int             — PK do parâmetro de telemetria
+        date_from: str|null        — Data início (YYYY-MM-DD)
+        date_to: str|null          — Data fim (YYYY-MM-DD)
+        method: "avg"|"lttb"       — média por bucket (default) ou downsampling LTTB
+        bucket_seconds: int|null   — largura do bucket (só "avg", mínimo 60)
+        max_points: int|null       — pontos alvo por sensor (default 1000)
+
+    Returns:
+        {"status": "ok", "method": "...", "bucket_seconds": N|null, "count": N,
+         "series": [{"pk": N, "timestamps": [...], "values": [...],
+                     "min": [...], "max": [...], "count": [...]}]}
+        (min/max/count só no método "avg")
+    """
+    body = request.get_json(force=True, silent=True) or {}
+    sensor_pks = body.get("sensor_pks", [])
+    teleparam = body.get("teleparam")
+
+    if not sensor_pks or teleparam is None:
+        return jsonify({"status": "error", "message": "sensor_pks e teleparam são obrigatórios"}), 400
+
+    try:
+        teleparam_pk = int(teleparam)
+        bucket_seconds = int(body["bucket_seconds"]) if body.get("bucket_seconds") else None
+        max_points = int(body["max_points"]) if body.get("max_points") else None
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "teleparam, bucket_seconds e max_points devem ser inteiros"}), 400
+
+    return query_sensor_series(
+        sensor_pks, teleparam_pk,
+        body.get("date_from") or None, body.get("date_to") or None,
+        bucket_seconds=bucket_seconds,
+        max_points=max_points,
+        method=body.get("method") or 'avg',
+    )
+
+
+@bp.route('/alerts', methods=['GET'])
+@jwt_required()
+@token_required
+@require_permission('telemetry.view')  # ts_interface: telemetry.view
+@api_error_handler
+def get_alerts():
+    """
+    Episódios de alerta do motor de regras (abertura/fecho), mais recentes primeiro.
+    Os alertas novos chegam por Socket.IO ('telemetry_alert') — isto é só o histórico.
+
+    Query params:
+        active: 1 para só os abertos
+        limit:  máximo de registos (default 100, entre 1 e 500)
+    """
+    active_only = request.args.get('active', '0') in ('1', 'true')
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 500)
+    return list_alerts(active_only=active_only, limit=limit)
+
+
+@bp.route('/alerts/rules/reload', methods=['POST'])
+@jwt_required()
+@token_required
+@require_permission('telemetry.edit')  # ts_interface: telemetry.edit
+@api_error_handler
+def reload_rules():
+    """Aplica já as alterações a tb_telemetry_alert_rule (senão em até 60 s)."""
+    return reload_alert_rules()
@@ -1,15 +1,46 @@
 """
 scheduler.py — Jobs automáticos do servidor AINTAR
 
-Jobs registados:
+Jobs registados (JOBS, abaixo):
   1. Geração mensal de tarefas operacionais (dia 25 às 10:00)
+  2. Rollup horário e retenção diária de telemetria
+  3. Verificação por minuto de sensores sem dados (alertas de telemetria)
+  4. Recarregamento do mapa de permissões quando ts_interface muda
+  5. Entrega de recurso da outbox de emails
+  6. Alertas diários (licenças de ETAR, viaturas, RH), purgas e contabilidade
+     de armazenamento
+
+Cada processo web arranca o seu BackgroundScheduler, mas:
+- jobs de âmbito 'leader' só correm no líder eleito entre todos os workers e
+  servidores (advisory lock do Postgres — app/services/scheduler_leader_service.py);
+  o heartbeat scheduler_leader confirma/obtém a liderança a cada 15 s;
+- jobs de âmbito 'process' (buffers e caches em memória do próprio processo)
+  correm em todos;
+- cada execução de um job 'leader' fica em tb_scheduler_job_run (duração,
+  linhas, erro) e é serializada no cluster por um advisory lock por job;
+- jobs marcados pooled correm num ProcessPool (spawn) fora do processo web —
+  com o eventlet, um varrimento longo numa thread do scheduler bloquearia o hub;
+- run_job_now() corre qualquer job a pedido (acção de administração run-job:<id>).
 """
 
+import multiprocessing
 import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from typing import Any, Callable, NamedTuple
+
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from sqlalchemy import text
-from datetime import date
+
+from app.services import job_run_service
+from app.services import scheduler_leader_service as leader
+from app.utils.error_handler import APIError
+from app.utils.utils import db_system_session
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -22,6 +53,9 @@ _MONTH_PT = {
     9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro',
 }
 
+SCOPE_LEADER = 'leader'
+SCOPE_PROCESS = 'process'
+
 
 def _next_month(today=None):
     """Devolve (month, year) do mês seguinte ao fornecido (ou ao dia de hoje)."""
@@ -31,82 +65,46 @@ def _next_month(today=None):
     return today.month + 1, today.year
 
 
+# ── Jobs ──────────────────────────────────────────────────────────────────────
+# Cada job recebe a app e devolve o resultado (int de linhas ou dict com
+# 'rows') que fica registado em tb_scheduler_job_run. Exceções propagam para
+# o runner, que as regista e faz log.
+
 def _job_init_operacao_month(app):
     """
-    Job principal: gera tarefas para o mês seguinte e notifica operadores.
-    Executa dentro do contexto Flask para ter acesso à BD e ao Socket.IO.
+    Job principal: gera tarefas para o mês seguinte (todos os modos, numa
+    transacção) e notifica os operadores do plano.
+    Ver app/services/operations/month_generation.py.
     """
-    with app.app_context():
-        from app import db
+    from app.services.operations.month_generation import generate_month
 
+    with app.app_context():
         next_month, next_year = _next_month()
         month_label = f"{_MONTH_PT[next_month]} {next_year}"
         logger.info(f"[Scheduler] ▶ Iniciando geração automática de tarefas para {month_label}")
 
-        try:
-            with db.engine.connect() as conn:
-                # 1. Obter todos os modos com templates definidos
-                modes = [
-                    row[0] for row in conn.execute(
-                        text("SELECT DISTINCT tt_operacaomodo FROM tb_operacaometa")
-                    ).fetchall()
-                ]
-
-                if not modes:
-                    logger.warning("[Scheduler] Nenhum modo de operação encontrado em tb_operacaometa — abortando")
-                    return
-
-                total_tasks = 0
-                operator_ids = set()
-
-                for mode in modes:
-                    try:
-                        # 2a. Gerar tarefas para este modo
-                        conn.execute(
-                            text('CALL "fbf_operacao$init"(:mode, :month, :year)'),
-                            {'mode': mode, 'month': next_month, 'year': next_year},
-                        )
-
-                        # 2b. Contar tarefas geradas
-                        count = conn.execute(
-                            text("""
-                                SELECT COUNT(*) FROM tb_operacao
-                                WHERE EXTRACT(MONTH FROM data) = :month
-                                  AND EXTRACT(YEAR  FROM data) = :year
-                                  AND tt_operacaomodo = :mode
-                            """),
-                            {'month': next_month, 'year': next_year, 'mode': mode},
-                        ).scalar() or 0
-
-                        total_tasks += count
-                        logger.info(f"[Scheduler] Modo {mode}: {count} tarefas geradas para {month_label}")
-
-                        # 2c. Recolher operadores para notificação
-                        for op in conn.execute(
-                            text("""
-                                SELECT DISTINCT ts_operador1, ts_operador2
-                                FROM tb_operacaometa
-                                WHERE tt_operacaomodo = :mode
-                            """),
-                            {'mode': mode},
-                        ).fetchall():
-                            if op[0]:
-                                operator_ids.add(op[0])
-                            if op[1]:
-                                operator_ids.add(op[1])
-
-                    except Exception as mode_err:
-                        logger.error(f"[Scheduler] Erro no modo {mode}: {mode_err}")
-
-                conn.commit()
-                logger.info(f"[Scheduler] ✅ Concluído: {total_tasks} tarefas geradas para {month_label}")
-
-            # 3. Notificar operadores (fora do with conn para não bloquear a ligação)
-            if operator_ids:
-                _notify_operators(app, list(operator_ids), next_month, next_year)
+        with db_system_session() as session:
+            plan = generate_month(session, next_month, next_year)
 
-        except Exception as e:
-            logger.error(f"[Scheduler] ❌ Erro crítico na geração mensal: {e}", exc_info=True)
+        if not plan['modes']:
+            logger.warning("[Scheduler] Nenhum modo de operação encontrado em tb_operacaometa — abortando")
+            return {'rows': 0, 'month': month_label, 'modes': 0}
+        logger.info(f"[Scheduler] ✅ Concluído: {plan['total']} tarefas geradas para {month_label} "
+                    f"(por modo: {plan['by_mode']})")
+
+        # Operadores vêm do plano — sem nova consulta por modo
+        operator_ids = [op['pk'] for op in plan['by_operator']]
+        if operator_ids:
+            _notify_operators(app, operator_ids, next_month, next_year)
+
+        return {
+            'rows': plan['total'],
+            'month': month_label,
+            'modes': len(plan['modes']),
+            'by_mode': plan['by_mode'],
+            'replaced': plan.get('replaced', 0),
+            'operators': len(operator_ids),
+        }
 
 
 def _notify_operators(app, operator_ids, month, year):
@@ -145,13 +143,11 @@ def _job_purge_old_notifications(app):
     """
     with app.app_context():
         from app import db
-        try:
-            with db.engine.connect() as conn:
-                result = conn.execute(text("SELECT fbf_notification$purge()")).scalar()
-                conn.commit()
-                logger.info(f"[Scheduler] Purga de notificações: {result} registos eliminados")
-        except Exception as e:
-            logger.warning(f"[Scheduler] Falha na purga de notificações: {e}")
+        with db.engine.connect() as conn:
+            result = conn.execute(text("SELECT fbf_notification$purge()")).scalar()
+            conn.commit()
+        logger.info(f"[Scheduler] Purga de notificações: {result} registos eliminados")
+        return result
 
 
 def _job_check_licencas_etar(app):
@@ -160,10 +156,7 @@ def _job_check_licencas_etar(app):
     (notificação in-app + email). Ver app/services/licenca_service.py.
     """
     from app.services.licenca_service import check_licencas_expirando
-    try:
-        check_licencas_expirando(app)
-    except Exception as e:
-        logger.error(f"[Scheduler] ❌ Erro ao verificar licenças de ETAR: {e}", exc_info=True)
+    return check_licencas_expirando(app)
 
 
 def _job_check_vehicle_documents(app):
@@ -173,10 +166,7 @@ def _job_check_vehicle_documents(app):
     app/services/vehicle_alert_service.py.
     """
     from app.services.vehicle_alert_service import check_vehicle_documents_expirando
-    try:
-        check_vehicle_documents_expirando(app)
-    except Exception as e:
-        logger.error(f"[Scheduler] ❌ Erro ao verificar documentos de viaturas: {e}", exc_info=True)
+    return check_vehicle_documents_expirando(app)
 
 
 def _job_check_vehicle_maintenance(app):
@@ -186,10 +176,7 @@ def _job_check_vehicle_maintenance(app):
     app/services/vehicle_alert_service.py::check_vehicle_maintenance_expirando.
     """
     from app.services.vehicle_alert_service import check_vehicle_maintenance_expirando
-    try:
-        check_vehicle_maintenance_expirando(app)
-    except Exception as e:
-        logger.error(f"[Scheduler] ❌ Erro ao verificar manutenção de viaturas: {e}", exc_info=True)
+    return check_vehicle_maintenance_expirando(app)
 
 
 def _job_check_rh_alertas(app):
@@ -198,34 +185,364 @@ def _job_check_rh_alertas(app):
     a terminar, férias transitadas a expirar (prazo legal 30 Abr), documentos
     com validade a vencer (ex: exame de medicina no trabalho). Notificação
     in-app apenas. Ver app/services/rh_alert_service.py.
+
+    Cada verificação é independente: uma falha não impede as seguintes, mas
+    a execução fica registada como erro.
     """
     from app.services.rh_alert_service import (
         check_rh_contratos_expirando,
         check_rh_ferias_transitadas_expirando,
         check_rh_documentos_expirando,
     )
-    try:
-        check_rh_contratos_expirando(app)
-    except Exception as e:
-        logger.error(f"[Scheduler] ❌ Erro ao verificar contratos a terminar: {e}", exc_info=True)
-    try:
-        check_rh_ferias_transitadas_expirando(app)
-    except Exception as e:
-        logger.error(f"[Scheduler] ❌ Erro ao verificar férias transitadas: {e}", exc_info=True)
-    try:
-        check_rh_documentos_expirando(app)
-    except Exception as e:
-        logger.error(f"[Scheduler] ❌ Erro ao verificar documentos de RH a vencer: {e}", exc_info=True)
+    errors = []
+    for label, check in (
+        ('contratos a terminar', check_rh_contratos_expirando),
+        ('férias transitadas', check_rh_ferias_transitadas_expirando),
+        ('documentos de RH a vencer', check_rh_documentos_expirando),
+    ):
+        try:
+            check(app)
+        except Exception as e:
+            logger.error(f"[Scheduler] ❌ Erro ao verificar {label}: {e}", exc_info=True)
+            errors.append(f"{label}: {e}")
+    if errors:
+        raise RuntimeError('; '.join(errors))
+
+
+def _job_telemetry_rollup(app):
+    """
+    Job horário: agrega as leituras de telemetria recebidas desde a última
+    execução nos rollups hora/dia. Ver app/services/telemetry_rollup_service.py.
+    """
+    from app.services.telemetry_rollup_service import refresh_telemetry_rollups
+    return refresh_telemetry_rollups(app)
+
+
+def _job_telemetry_retention(app):
+    """
+    Job diário: arquiva leituras raw de telemetria fora da retenção (já
+    agregadas) e compacta o tier horário. Ver
+    app/services/telemetry_rollup_service.py::apply_telemetry_retention.
+    """
+    from app.services.telemetry_rollup_service import apply_telemetry_retention
+    result = apply_telemetry_retention(app)
+    if isinstance(result, dict):
+        return {'rows': sum(v for v in result.values() if isinstance(v, int)), **result}
+    return result
+
+
+def _job_telemetry_missing_data(app):
+    """
+    Job por minuto: abre alertas de "falta de dados" para sensores em
+    silêncio, com a última leitura de cada sensor lida da BD (as leituras
+    chegam a qualquer worker). Os restantes alertas de telemetria são
+    avaliados à entrada das leituras. Ver app/services/telemetry_alert_engine.py.
+    """
+    from app.services.telemetry_alert_engine import check_telemetry_missing_data
+    return check_telemetry_missing_data(app)
+
+
+def _job_reload_permissions(app):
+    """
+    Job por minuto: recarrega o mapa value→pk de ts_interface se mudou
+    (permissões novas entram por SQL de migração), sem reiniciar o servidor.
+    Ver app/core/permissions.py::PermissionManager.reload_if_changed.
+    """
+    from app.core.permissions import permission_manager
+    if permission_manager.reload_if_changed(app):
+        logger.info("[Scheduler] Mapa de permissões recarregado (ts_interface alterada)")
+
+
+def _job_email_outbox(app):
+    """
+    Job de recurso: entrega emails pendentes da outbox que o worker em
+    background não apanhou (restart, novas tentativas com backoff).
+    Ver app/services/email_outbox_service.py.
+    """
+    from app.services.email_outbox_service import deliver_email_outbox
+    return deliver_email_outbox(app)
+
+
+def _job_reconcile_payments(app):
+    """
+    Job a cada 5 min: reconcilia com a SIBS os pagamentos MB WAY/Multibanco
+    pendentes perto ou depois de expirar (webhook em falta).
+    Ver app/services/payment_reconciliation_service.py.
+    """
+    from app.services.payment_reconciliation_service import reconcile_pending_payments
+    result = reconcile_pending_payments(app)
+    return {'rows': result.get('changed', 0), **result} if isinstance(result, dict) else result
+
+
+def _job_storage_flush(app):
+    """
+    Job a cada minuto: aplica em tb_storage_usage os deltas de armazenamento
+    (uploads/remoções) acumulados neste processo.
+    Ver app/services/storage_accounting_service.py.
+    """
+    from app.services.storage_accounting_service import flush_pending
+    return flush_pending(app)
+
+
+def _job_storage_reconcile(app):
+    """
+    Job diário (02:45): reconcilia os contadores de armazenamento com um
+    varrimento os.scandir das áreas monitorizadas.
+    """
+    from app.services.storage_accounting_service import reconcile_storage
+    result = reconcile_storage(app)
+    if result:
+        logger.info(f"[Scheduler] Armazenamento reconciliado: {result}")
+        return {'rows': sum(a['directories'] for a in result.values()), **result}
+    return result
+
+
+def _job_operacao_photo_queue(app):
+    """
+    Job de recurso: processa as fotos dos lotes de conclusão que o worker em
+    background não apanhou. Ver app/services/operations/photo_queue.py.
+    """
+    from app.services.operations.photo_queue import process_photo_queue
+    return process_photo_queue(app)
+
+
+def _job_operacao_analytics_rollup(app):
+    """
+    Job de minuto a minuto: recalcula os rollups diários das operações dos
+    dias marcados pelos triggers de tb_operacao (e, na primeira vez, o
+    histórico). Ver app/services/operations/analytics.py.
+    """
+    from app.services.operations.analytics import refresh_operations_rollups
+    return refresh_operations_rollups(app)
+
+
+def _job_purge_job_runs(app):
+    """Job diário: apaga execuções antigas de tb_scheduler_job_run."""
+    with app.app_context():
+        return job_run_service.purge_runs(app.config.get('SCHEDULER_RUN_RETENTION_DAYS', 30))
+
+
+def _job_leader_heartbeat(app):
+    """Heartbeat da eleição: mantém (ou obtém) a liderança deste processo."""
+    leader.refresh_leadership()
+
+
+# ── Registo ───────────────────────────────────────────────────────────────────
+
+class JobSpec(NamedTuple):
+    id: str
+    name: str
+    func: Callable[[Any], Any]
+    trigger: Any
+    scope: str = SCOPE_LEADER
+    pooled: bool = False                # corre no ProcessPool, fora do processo web
+    misfire_grace_time: int = 3600
+    coalesce: bool = True
+
+
+def _cron(**fields):
+    return CronTrigger(timezone='Europe/Lisbon', **fields)
+
+
+JOBS = {spec.id: spec for spec in (
+    JobSpec('init_operacao_month_auto', 'Geração automática de tarefas operacionais mensais',
+            _job_init_operacao_month, _cron(day=25, hour=10, minute=0)),
+    JobSpec('purge_old_notifications', 'Purga diária de notificações lidas com mais de 90 dias',
+            _job_purge_old_notifications, _cron(hour=4, minute=0)),
+    JobSpec('check_licencas_etar', 'Alerta diário de renovação de licenças de ETAR',
+            _job_check_licencas_etar, _cron(hour=8, minute=0)),
+    JobSpec('check_vehicle_documents', 'Alerta diário de documentos de viatura (seguro/inspeção/IUC)',
+            _job_check_vehicle_documents, _cron(hour=8, minute=15)),
+    JobSpec('check_vehicle_maintenance', 'Alerta diário de revisão/manutenção de viatura por km/meses',
+            _job_check_vehicle_maintenance, _cron(hour=8, minute=30)),
+    JobSpec('check_rh_alertas',
+            'Alerta diário de RH (contrato a terminar, férias transitadas, documentos a vencer)',
+            _job_check_rh_alertas, _cron(hour=8, minute=45)),
+    JobSpec('telemetry_rollup', 'Rollup horário de telemetria (agregados hora/dia)',
+            _job_telemetry_rollup, _cron(minute=5), pooled=True, misfire_grace_time=1800),
+    JobSpec('telemetry_retention', 'Retenção diária de telemetria (arquivo do raw antigo)',
+            _job_telemetry_retention, _cron(hour=3, minute=30), pooled=True),
+    JobSpec('telemetry_missing_data', 'Alertas de telemetria — sensores sem dados',
+            _job_telemetry_missing_data, _cron(minute='*'), misfire_grace_time=60),
+    JobSpec('email_outbox', 'Entrega de recurso da outbox de emails',
+            _job_email_outbox, _cron(minute='*'), misfire_grace_time=60),
+    JobSpec('operacao_photo_queue', 'Processamento de recurso da fila de fotos das operações',
+            _job_operacao_photo_queue, _cron(minute='*'), misfire_grace_time=60),
+    JobSpec('operacao_analytics_rollup', 'Rollups diários dos analytics das operações',
+            _job_operacao_analytics_rollup, _cron(minute='*'), misfire_grace_time=60),
+    JobSpec('reconcile_payments', 'Reconciliação em lote de pagamentos SIBS pendentes',
+            _job_reconcile_payments, _cron(minute='*/5'), misfire_grace_time=300),
+    JobSpec('storage_reconcile', 'Contabilidade de armazenamento — reconciliação (os.scandir)',
+            _job_storage_reconcile, _cron(hour=2, minute=45), pooled=True),
+    JobSpec('scheduler_runs_purge', 'Purga diária do histórico de execuções do scheduler',
+            _job_purge_job_runs, _cron(hour=4, minute=15)),
+    # Âmbito 'process': estado em memória de cada processo
+    JobSpec('scheduler_leader', 'Eleição de líder do scheduler (heartbeat)',
+            _job_leader_heartbeat, IntervalTrigger(seconds=leader.HEARTBEAT_SECONDS),
+            scope=SCOPE_PROCESS, misfire_grace_time=leader.HEARTBEAT_SECONDS),
+    JobSpec('reload_permissions', 'Recarregamento do mapa de permissões (ts_interface)',
+            _job_reload_permissions, _cron(minute='*'), scope=SCOPE_PROCESS, misfire_grace_time=60),
+    JobSpec('storage_flush', 'Contabilidade de armazenamento — aplicar deltas',
+            _job_storage_flush, _cron(minute='*'), scope=SCOPE_PROCESS, misfire_grace_time=60),
+)}
+
+
+# ── Pool de processos (jobs longos) ───────────────────────────────────────────
+
+_pool = None
+_pool_lock = threading.Lock()
+_worker_app = None
+
+
+def _get_pool(workers):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: os workers não herdam o estado do eventlet/Flask do processo web
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _run_in_worker(job_id):
+    """Corre no processo do pool: cria (uma vez) uma app sem scheduler e executa o job."""
+    global _worker_app
+    if _worker_app is None:
+        from app import create_app
+        from config import get_config
+        # A config já foi lida do ambiente ao importar este módulo (e create_app
+        # volta a aplicar get_config()): desliga-se na própria classe, só neste
+        # processo, para o worker não arrancar um scheduler com eleição e jobs.
+        config = get_config()
+        config.SCHEDULER_ENABLED = False
+        _worker_app = create_app(config)
+    return JOBS[job_id].func(_worker_app)
+
+
+def _execute(app, spec):
+    workers = app.config.get('SCHEDULER_POOL_WORKERS', 1)
+    if spec.pooled and workers > 0:
+        try:
+            return _get_pool(workers).submit(_run_in_worker, spec.id).result()
+        except BrokenProcessPool:
+            logger.error(f"[Scheduler] Pool de jobs avariado — {spec.id} corre no processo web",
+                         exc_info=True)
+            _reset_pool()
+    return spec.func(app)
+
+
+# ── Runner ────────────────────────────────────────────────────────────────────
+
+def _run_job(app, job_id, trigger='cron', requested_by=None):
+    """
+    Executa um job com as regras do cluster. Agendado, um job 'leader' só
+    corre no líder; a pedido corre neste processo. Jobs 'leader' são
+    serializados no cluster e registados em tb_scheduler_job_run.
+    """
+    spec = JOBS[job_id]
+    if spec.scope == SCOPE_PROCESS:
+        try:
+            return spec.func(app)
+        except Exception as e:
+            logger.error(f"[Scheduler] ❌ Erro no job {job_id}: {e}", exc_info=True)
+            return None
+
+    with app.app_context():
+        if trigger == 'cron' and not leader.refresh_leadership():
+            return None
+
+        run_pk = job_run_service.start_run(job_id, leader.HOST_ID, trigger, requested_by)
+        started = time.monotonic()
+        status, result, error = 'success', None, None
+        try:
+            with leader.job_lock(job_id) as acquired:
+                if acquired:
+                    result = _execute(app, spec)
+                else:
+                    status = 'skipped'
+                    logger.info(f"[Scheduler] {job_id} já em execução noutra instância — ignorado")
+        except Exception as e:
+            status, error = 'error', f"{type(e).__name__}: {e}"
+            logger.error(f"[Scheduler] ❌ Erro no job {job_id}: {e}", exc_info=True)
+
+        duration_ms = int((time.monotonic() - started) * 1000)
+        job_run_service.finish_run(run_pk, status, duration_ms, result, error)
+        if trigger == 'manual' or duration_ms > 10_000:
+            logger.info(f"[Scheduler] {job_id} ({trigger}): {status} em {duration_ms} ms")
+        return result
+
+
+def run_job_now(job_id, current_user):
+    """
+    Corre um job a pedido (acção de administração run-job:<id>) numa thread
+    deste processo; a resposta não espera pelo fim. 409 se já está a correr.
+    """
+    from flask import current_app
+    from app.utils.utils import db_session_manager
+
+    spec = JOBS.get(job_id)
+    if spec is None:
+        raise APIError(f"Job desconhecido: {job_id}", 404, "ERR_NOT_FOUND")
+    if spec.scope == SCOPE_PROCESS:
+        raise APIError(f"O job {job_id} corre em cada processo e não pode ser pedido",
+                       400, "ERR_INVALID_INPUT")
+
+    with db_session_manager(current_user) as session:
+        if job_run_service.is_running(session, job_id):
+            return {'message': f'{spec.name}: já em execução', 'job_id': job_id}, 409
+
+    app = current_app._get_current_object()
+    threading.Thread(
+        target=_run_job, args=(app, job_id, 'manual', current_user),
+        daemon=True, name=f'job-{job_id}',
+    ).start()
+    logger.info(f"[Scheduler] {job_id} pedido manualmente por {current_user}")
+    return {'message': f'{spec.name}: iniciado', 'job_id': job_id}, 202
+
+
+def get_scheduler_state():
+    """Estado deste processo: scheduler, liderança e jobs registados."""
+    jobs = []
+    for spec in JOBS.values():
+        job = _scheduler.get_job(spec.id) if _scheduler.running else None
+        next_run = job.next_run_time if job else None
+        jobs.append({
+            'id': spec.id,
+            'name': spec.name,
+            'scope': spec.scope,
+            'pooled': spec.pooled,
+            'next_run_time': next_run.isoformat() if next_run else None,
+        })
+    return {
+        'running': _scheduler.running,
+        'leader': leader.leader_info(),
+        'jobs': jobs,
+    }
 
 
 def init_scheduler(app):
     """
-    Regista o job mensal e arranca o APScheduler.
+    Regista os jobs e arranca o APScheduler.
     Deve ser chamado no final de create_app(), depois de registar os blueprints e Socket.IO.
 
     Guarda contra dupla inicialização: não corre se WERKZEUG_RUN_MAIN não estiver
     definido (processo pai do reloader) — em produção (waitress) corre sempre.
+    SCHEDULER_ENABLED=false desliga-o (ex.: processos do pool de jobs).
     """
+    if not app.config.get('SCHEDULER_ENABLED', True):
+        logger.info("[Scheduler] Desativado (SCHEDULER_ENABLED=false)")
+        return
+
     # Só bloquear no processo pai do Werkzeug reloader (flask run).
     # Com waitress (python run_waitress.py) FLASK_RUN_FROM_CLI não está definido → arranca sempre.
     using_werkzeug_cli = bool(os.environ.get('FLASK_RUN_FROM_CLI'))
@@ -233,73 +550,42 @@ def init_scheduler(app):
         logger.info("[Scheduler] Werkzeug reloader (processo pai) — scheduler aguarda processo filho")
         return
 
-    _scheduler.add_job(
-        func=_job_init_operacao_month,
-        args=[app],
-        trigger=CronTrigger(day=25, hour=10, minute=0, timezone='Europe/Lisbon'),
-        id='init_operacao_month_auto',
-        name='Geração automática de tarefas operacionais mensais',
-        replace_existing=True,
-        misfire_grace_time=3600,
-    )
-
-    _scheduler.add_job(
-        func=_job_purge_old_notifications,
-        args=[app],
-        trigger=CronTrigger(hour=4, minute=0, timezone='Europe/Lisbon'),
-        id='purge_old_notifications',
-        name='Purga diária de notificações lidas com mais de 90 dias',
-        replace_existing=True,
-        misfire_grace_time=3600,
-    )
-
-    _scheduler.add_job(
-        func=_job_check_licencas_etar,
-        args=[app],
-        trigger=CronTrigger(hour=8, minute=0, timezone='Europe/Lisbon'),
-        id='check_licencas_etar',
-        name='Alerta diário de renovação de licenças de ETAR',
-        replace_existing=True,
-        misfire_grace_time=3600,
-    )
-
-    _scheduler.add_job(
-        func=_job_check_vehicle_documents,
-        args=[app],
-        trigger=CronTrigger(hour=8, minute=15, timezone='Europe/Lisbon'),
-        id='check_vehicle_documents',
-        name='Alerta diário de documentos de viatura (seguro/inspeção/IUC)',
-        replace_existing=True,
-        misfire_grace_time=3600,
-    )
-
-    _scheduler.add_job(
-        func=_job_check_vehicle_maintenance,
-        args=[app],
-        trigger=CronTrigger(hour=8, minute=30, timezone='Europe/Lisbon'),
-        id='check_vehicle_maintenance',
-        name='Alerta diário de revisão/manutenção de viatura por km/meses',
-        replace_existing=True,
-        misfire_grace_time=3600,
-    )
-
-    _scheduler.add_job(
-        func=_job_check_rh_alertas,
-        args=[app],
-        trigger=CronTrigger(hour=8, minute=45, timezone='Europe/Lisbon'),
-        id='check_rh_alertas',
-        name='Alerta diário de RH (contrato a terminar, férias transitadas, documentos a vencer)',
-        replace_existing=True,
-        misfire_grace_time=3600,
-    )
+    with app.app_context():
+        leader.init_leader_election(app)
+        leader.refresh_leadership()
+
+    for spec in JOBS.values():
+        _scheduler.add_job(
+            func=_run_job,
+            args=[app, spec.id],
+            trigger=spec.trigger,
+            id=spec.id,
+            name=spec.name,
+            replace_existing=True,
+            misfire_grace_time=spec.misfire_grace_time,
+            coalesce=spec.coalesce,
+            max_instances=1,
+        )
 
     _scheduler.start()
+    info = leader.leader_info()
     logger.info(
-        "[Scheduler] ✅ Iniciado — tarefas mensais (dia 25 às 10:00) + purga diária de "
+        f"[Scheduler] ✅ Iniciado ({info['backend']}, {'líder' if info['is_leader'] else 'em espera'}) — "
+        "tarefas mensais (dia 25 às 10:00) + purga diária de "
         "notificações (04:00) + alerta diário de licenças de ETAR (08:00) + alerta "
         "diário de documentos de viatura (08:15) + alerta diário de manutenção de "
-        "viatura (08:30)"
+        "viatura (08:30) + rollup horário de telemetria (hh:05) + retenção de "
+        "telemetria (03:30) + sensores sem dados, mapa de permissões e outbox de "
+        "emails (cada minuto) + reconciliação de pagamentos SIBS (cada 5 min) + "
+        "contabilidade de armazenamento (deltas cada minuto, reconciliação 02:45) + "
+        "purga do histórico de execuções (04:15)"
     )
 
     import atexit
-    atexit.register(lambda: _scheduler.shutdown(wait=False))
+
+    def _shutdown():
+        _scheduler.shutdown(wait=False)
+        _reset_pool()
+        leader.release_leadership()
+
+    atexit.register(_shutdown)
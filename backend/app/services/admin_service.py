@@ -5,6 +5,7 @@ para o módulo de administração.
 """
 
 from datetime import datetime, timezone
+from flask import current_app
 from sqlalchemy import text
 from app import db, cache
 from app.utils.logger import get_logger
@@ -40,9 +41,15 @@ def get_system_status(current_user: str):
         services['cache'] = 'error'
 
     # Socket.IO
+    socket_detail = 'Socket.IO / Eventlet'
     try:
-        from app import socketio
-        services['socket'] = 'ok' if socketio else 'unavailable'
+        from app import socket_io
+        services['socket'] = 'ok' if socket_io.server else 'unavailable'
+        socket_events = current_app.extensions.get('socketio_events')
+        queue = 'Redis pub/sub' if current_app.config.get('SOCKETIO_MESSAGE_QUEUE_URL') else 'sem fila (1 processo)'
+        if socket_events:
+            socket_detail = (f"Socket.IO / Eventlet — {queue}, presença {socket_events.presence.backend}, "
+                             f"{len(socket_events.connected_users)} utilizadores ligados")
     except Exception:
         services['socket'] = 'unavailable'
 
@@ -56,11 +63,13 @@ def get_system_status(current_user: str):
     except Exception:
         services['email'] = 'unavailable'
 
-    # Scheduler
+    # Scheduler (estado deste processo; só o líder corre os jobs agendados)
+    scheduler_leader = None
     try:
-        from app import scheduler
-        running = scheduler and scheduler.running
-        services['scheduler'] = 'ok' if running else 'stopped'
+        from app.scheduler import get_scheduler_state
+        state = get_scheduler_state()
+        services['scheduler'] = 'ok' if state['running'] else 'stopped'
+        scheduler_leader = state['leader']
     except Exception:
         services['scheduler'] = 'unavailable'
 
@@ -81,7 +90,7 @@ def get_system_status(current_user: str):
             'key': 'socket',
             'label': 'WebSockets',
             'status': services.get('socket', 'unknown'),
-            'detail': 'Socket.IO / Eventlet',
+            'detail': socket_detail,
         },
         {
             'key': 'auth',
@@ -99,14 +108,33 @@ def get_system_status(current_user: str):
             'key': 'scheduler',
             'label': 'Scheduler',
             'status': services.get('scheduler', 'unknown'),
-            'detail': 'APScheduler',
+            'detail': (
+                f"APScheduler — {'líder' if scheduler_leader['is_leader'] else 'em espera'} "
+                f"({scheduler_leader['backend']}, {scheduler_leader['host']})"
+                if scheduler_leader else 'APScheduler'
+            ),
         },
     ]
 
+    # Integrações externas (pool/breaker/latência — app/utils/http_client.py)
+    from app.utils.http_client import integration_metrics
+    integrations = integration_metrics()
+
+    # Trabalho CPU fora do hub (fila/espera por função — app/utils/compute_offload.py)
+    from app.utils.compute_offload import offload_metrics
+    compute = offload_metrics()
+
+    # Réplica de leitura (atraso, sessões encaminhadas — app/utils/db_routing.py)
+    from app.utils.db_routing import replica_router
+    replica = replica_router.metrics()
+
     return {
         'status': {
             **services,
             'services': service_list,
+            'integrations': integrations,
+            'compute': compute,
+            'replica': replica,
             'timestamp': datetime.now(timezone.utc).isoformat(),
         }
     }, 200
@@ -166,10 +194,10 @@ def run_admin_action(key: str, current_user: str):
 
     elif key == 'send-test-notification':
         try:
-            from app import socketio
+            from app import socket_io
             with db_session_manager(current_user) as session:
                 admin_id = session.execute(text("SELECT fs_client()")).scalar()
-            socketio.emit('new_notification', {
+            socket_io.emit('new_notification', {
                 'type': 'system',
                 'title': 'Notificação de Teste',
                 'message': (
@@ -224,6 +252,15 @@ def run_admin_action(key: str, current_user: str):
             logger.error(f"Failed to lock users: {e}")
             return {'message': f'Erro ao bloquear sessões: {e}'}, 500
 
+    elif key == 'reconcile-storage':
+        from app.scheduler import run_job_now
+        return run_job_now('storage_reconcile', current_user)
+
+    elif key.startswith('run-job:'):
+        # Execução manual de um job do scheduler (registada em tb_scheduler_job_run)
+        from app.scheduler import run_job_now
+        return run_job_now(key.split(':', 1)[1], current_user)
+
     elif key == 'backup-db':
         logger.info(
             f"Pedido de backup por {current_user} (não implementado)"
@@ -289,7 +326,7 @@ def get_activity_logs(filters: dict, current_user: str):
          LIMIT :limit OFFSET :offset
     """)
 
-    with db_session_manager(current_user) as session:
+    with db_session_manager(current_user, readonly=True) as session:
         total = session.execute(count_sql, params).scalar()
         rows  = session.execute(data_sql,  params).mappings().all()
 
@@ -350,7 +387,7 @@ def get_session_logs(current_user: str, filters: dict):
          LIMIT :limit OFFSET :offset
     """)
 
-    with db_session_manager(current_user) as session:
+    with db_session_manager(current_user, readonly=True) as session:
         total = session.execute(count_sql, params).scalar()
         rows  = session.execute(data_sql,  params).fetchall()
 
@@ -2,9 +2,12 @@
 """
 Serviço de alertas via WhatsApp (Twilio)
 Lê o alerta mais recente de tb_sensordataraw e envia via WhatsApp
+
+Envio manual/pontual. Os alertas por regra (limites, variação, falta de
+dados) são avaliados à entrada das leituras e enviados sem polling por
+app/services/telemetry_alert_engine.py.
 """
 
-import requests
 from twilio.rest import Client as TwilioClient
 from twilio.base.exceptions import TwilioRestException
 from sqlalchemy import text
@@ -12,6 +12,7 @@ from ..utils.utils import format_message, parse_xml_response, fs_setsession, add
 from ..utils.error_handler import APIError, InvalidCredentialsError, TokenExpiredError
 from app.utils.logger import get_logger
 from app.core.permissions import permission_manager
+from app.services.operations.report_views import invalidate_operations_reports
 
 logger = get_logger(__name__)
 
@@ -440,6 +441,7 @@ def insert_new_movement(who, what, pk_result, tb_document):
                 {'pk_result': pk_result, 'tb_document': tb_document,
                     'what': what, 'who': who}
             )
+        invalidate_operations_reports()
     except Exception as e:
         logger.error(f"Erro ao inserir novo movimento: {str(e)}")
         raise
@@ -27,7 +27,7 @@ class SubmitAvalModel(BaseModel):
 @api_error_handler
 def get_analytics_enriched(current_user: str):
     """Dados enriquecidos: global + rankings por utilizador + nome atual."""
-    with db_session_manager(current_user) as session:
+    with db_session_manager(current_user, readonly=True) as session:
 
         global_rows = session.execute(text("""
             SELECT
@@ -82,7 +82,7 @@ def get_analytics_enriched(current_user: str):
 @api_error_handler
 def get_analytics(current_user: str):
     """Dados de evolução — todos os períodos e colaboradores."""
-    with db_session_manager(current_user) as session:
+    with db_session_manager(current_user, readonly=True) as session:
         result = session.execute(text("""
             SELECT
                 u.period_pk, u.periodo_data, u.periodo, u.colaborador,
@@ -318,7 +318,7 @@ def admin_generate_assignments(period_pk: int, data: dict, current_user: str):
 @api_error_handler
 def admin_get_results(period_pk: int, current_user: str):
     """Resultados agregados por colaborador para um período."""
-    with db_session_manager(current_user) as session:
+    with db_session_manager(current_user, readonly=True) as session:
         result = session.execute(
             text("""
                 SELECT
@@ -0,0 +1,231 @@
+"""
+Livro da caixa — saldos diários consolidados e listagem paginada.
+
+A listagem da caixa juntava vbl_caixa, tb_caixa e tb_document para todos os
+movimentos do período, somava tb_caixa outra vez para o saldo e as
+entradas/saídas em Python; não havia paginação.
+
+- tb_caixa_checkpoint (app/sql/caixa_ledger.sql) guarda, por dia, o saldo no
+  fim do dia e as entradas/saídas/nº de movimentos. É consolidado quando um
+  fecho de caixa é validado (finalize_checkpoints), até à véspera do fecho —
+  o próprio dia do fecho ainda pode receber movimentos;
+- saldo numa data = último checkpoint até essa data + movimentos seguintes
+  (balance_at); os totais de um período somam os checkpoints e só percorrem
+  tb_caixa nos dias ainda não consolidados (range_totals);
+- um movimento num dia consolidado apaga, por trigger, os checkpoints desse
+  dia em diante; até ao próximo fecho os saldos continuam certos, só
+  percorrem mais movimentos;
+- a listagem pagina por keyset em (SORT_TIME_SQL DESC, pk DESC) com um
+  cursor opaco (encode_cursor/decode_cursor) — sem OFFSET, cada página custa
+  o mesmo em qualquer ponto do histórico. Movimentos antigos sem hist_time
+  ordenam pela data (a chave nunca é NULL, que partiria a comparação).
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime, timedelta
+
+from sqlalchemy.sql import text
+
+from app.utils.error_handler import APIError
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Chave de ordenação da listagem; igual à expressão do índice ix_tb_caixa_sort
+SORT_TIME_SQL = "COALESCE(b.hist_time, b.data, TIMESTAMP '-infinity')"
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+_FINALIZE_SQL = text("""
+    WITH cp AS (
+        SELECT dia, saldo FROM tb_caixa_checkpoint ORDER BY dia DESC LIMIT 1
+    ),
+    dias AS (
+        SELECT data::date                                          AS dia,
+               COALESCE(SUM(valor), 0)                             AS liquido,
+               COALESCE(SUM(valor) FILTER (WHERE valor > 0), 0)    AS entradas,
+               COALESCE(-SUM(valor) FILTER (WHERE valor < 0), 0)   AS saidas,
+               COUNT(*)                                            AS movimentos
+        FROM tb_caixa
+        WHERE data IS NOT NULL
+          AND (NOT EXISTS (SELECT 1 FROM cp) OR data >= (SELECT dia FROM cp) + 1)
+          AND data < CAST(:ate AS date) + 1
+        GROUP BY 1
+    )
+    INSERT INTO tb_caixa_checkpoint
+        (dia, saldo, entradas, saidas, movimentos, tb_caixa_fecho, finalized_by)
+    SELECT dia,
+           COALESCE((SELECT saldo FROM cp), 0) + SUM(liquido) OVER (ORDER BY dia),
+           entradas, saidas, movimentos, :fecho, :utilizador
+    FROM dias
+    ON CONFLICT (dia) DO NOTHING
+    RETURNING dia, saldo
+""")
+
+# Saldo no fim de :dia (NULL = todos os movimentos)
+_BALANCE_SQL = text("""
+    WITH cp AS (
+        SELECT dia, saldo FROM tb_caixa_checkpoint
+        WHERE CAST(:dia AS date) IS NULL OR dia <= CAST(:dia AS date)
+        ORDER BY dia DESC LIMIT 1
+    )
+    SELECT COALESCE((SELECT saldo FROM cp), 0)
+         + COALESCE((
+               SELECT SUM(valor) FROM tb_caixa
+               WHERE (NOT EXISTS (SELECT 1 FROM cp) OR data >= (SELECT dia FROM cp) + 1)
+                 AND (CAST(:dia AS date) IS NULL OR data < CAST(:dia AS date) + 1)
+           ), 0)
+""")
+
+# Dias consolidados vêm dos checkpoints; os restantes de tb_caixa
+_TOTALS_SQL = text("""
+    WITH lim AS (SELECT MAX(dia) AS ate FROM tb_caixa_checkpoint)
+    SELECT COALESCE(SUM(entradas), 0)   AS total_entrada,
+           COALESCE(SUM(saidas), 0)     AS total_saida,
+           COALESCE(SUM(movimentos), 0) AS count
+    FROM (
+        SELECT c.entradas, c.saidas, c.movimentos
+        FROM tb_caixa_checkpoint c
+        WHERE (CAST(:date_from AS date) IS NULL OR c.dia >= CAST(:date_from AS date))
+          AND (CAST(:date_to AS date) IS NULL OR c.dia <= CAST(:date_to AS date))
+        UNION ALL
+        SELECT COALESCE(SUM(b.valor) FILTER (WHERE b.valor > 0), 0),
+               COALESCE(-SUM(b.valor) FILTER (WHERE b.valor < 0), 0),
+               COUNT(*)
+        FROM tb_caixa b, lim
+        WHERE (lim.ate IS NULL OR b.data >= lim.ate + 1)
+          AND (CAST(:date_from AS date) IS NULL OR b.data >= CAST(:date_from AS date))
+          AND (CAST(:date_to AS date) IS NULL OR b.data < CAST(:date_to AS date) + 1)
+    ) s
+""")
+
+# Saldo após cada movimento (ordem cronológica data, pk), só para os da página
+_RUNNING_SQL = text("""
+    WITH cp AS (
+        SELECT dia, saldo FROM tb_caixa_checkpoint
+        WHERE dia < CAST(:de AS date)
+        ORDER BY dia DESC LIMIT 1
+    )
+    SELECT pk, saldo FROM (
+        SELECT pk,
+               COALESCE((SELECT saldo FROM cp), 0)
+                   + SUM(valor) OVER (ORDER BY data, pk) AS saldo
+        FROM tb_caixa
+        WHERE data IS NOT NULL
+          AND (NOT EXISTS (SELECT 1 FROM cp) OR data >= (SELECT dia FROM cp) + 1)
+          AND data < CAST(:ate AS date) + 1
+    ) s
+    WHERE pk = ANY(:pks)
+""")
+
+
+def parse_day(value, field):
+    """'YYYY-MM-DD' (ou ISO com hora) → date; None se vazio."""
+    if value in (None, ''):
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        raise APIError(f"Data inválida em '{field}': {value}", 400)
+
+
+def parse_limit(value):
+    """Tamanho de página pedido; None = sem paginação."""
+    if value in (None, ''):
+        return None
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise APIError("Parâmetro 'limit' inválido.", 400)
+    if limit < 1:
+        raise APIError("Parâmetro 'limit' inválido.", 400)
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def encode_cursor(sort_time, pk):
+    """Cursor opaco com a chave (SORT_TIME_SQL, pk) da última linha da página."""
+    if isinstance(sort_time, (datetime, date)):
+        sort_time = sort_time.isoformat()
+    if not sort_time:
+        raise ValueError("Chave de ordenação vazia")
+    raw = json.dumps([sort_time, int(pk)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverso de encode_cursor; APIError 400 se o cursor não for válido."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_time, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(sort_time, str) or not sort_time:
+            raise ValueError(sort_time)
+        return sort_time, int(pk)
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError):
+        raise APIError("Cursor de paginação inválido.", 400)
+
+
+def finalize_checkpoints(session, until_day, fecho_pk=None, user_pk=None):
+    """
+    Consolida os dias desde o último checkpoint até until_day (inclusive).
+
+    Corre na transacção da validação do fecho; devolve o último checkpoint
+    gravado ({'dia', 'saldo'}) ou None se não havia dias novos.
+    """
+    if until_day is None:
+        return None
+    rows = session.execute(_FINALIZE_SQL, {
+        'ate': until_day,
+        'fecho': fecho_pk,
+        'utilizador': user_pk,
+    }).fetchall()
+    if not rows:
+        return None
+    dia, saldo = max(rows, key=lambda r: r[0])
+    logger.info(f"[Caixa] {len(rows)} dia(s) consolidado(s) até {dia} — saldo {saldo}")
+    return {'dia': dia.isoformat(), 'saldo': float(saldo)}
+
+
+def balance_at(session, day=None):
+    """Saldo no fim de day (None = saldo actual com todos os movimentos)."""
+    return float(session.execute(_BALANCE_SQL, {'dia': day}).scalar() or 0)
+
+
+def range_summary(session, date_from=None, date_to=None):
+    """
+    Totais do período, calculados em SQL. saldo é o líquido do período (o
+    que o ecrã da caixa sempre mostrou); saldo_inicial/saldo_final os saldos
+    antes e no fim do período.
+    """
+    totals = session.execute(_TOTALS_SQL, {
+        'date_from': date_from,
+        'date_to': date_to,
+    }).mappings().one()
+    saldo_inicial = balance_at(session, date_from - timedelta(days=1)) if date_from else 0.0
+    saldo_final = balance_at(session, date_to)
+    return {
+        'saldo':         round(saldo_final - saldo_inicial, 2),
+        'saldo_inicial': saldo_inicial,
+        'saldo_final':   saldo_final,
+        'total_entrada': float(totals['total_entrada']),
+        'total_saida':   float(totals['total_saida']),
+        'count':         int(totals['count']),
+    }
+
+
+def running_balances(session, rows):
+    """{pk: saldo após o movimento} para as linhas dadas (cada uma com pk e data)."""
+    dias = [parse_day(r['data'], 'data') for r in rows if r['data']]
+    if not dias:
+        return {}
+    result = session.execute(_RUNNING_SQL, {
+        'de': min(dias),
+        'ate': max(dias),
+        'pks': [r['pk'] for r in rows],
+    }).fetchall()
+    return {pk: float(saldo) for pk, saldo in result if saldo is not None}
@@ -1,7 +1,8 @@
 from sqlalchemy.sql import text
 from sqlalchemy.exc import IntegrityError
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from ..utils.utils import db_session_manager
+from . import caixa_ledger
 from app.utils.error_handler import api_error_handler, ResourceNotFoundError, APIError
 from app.utils.logger import get_logger
 
@@ -140,60 +141,88 @@ def _build_tipo_state(last) -> dict:
 
 
 @api_error_handler
-def list_movements(current_user: str, date_from=None, date_to=None):
+def list_movements(current_user: str, date_from=None, date_to=None, limit=None, cursor=None):
+    """
+    Movimentos do período, mais recentes primeiro, com o resumo calculado em SQL.
+
+    Com limit/cursor devolve uma página (keyset em hist_time, pk; sem
+    hist_time conta a data do movimento) e next_cursor; sem eles devolve o
+    período inteiro. summary.saldo é o líquido do período (como antes);
+    summary.saldo_final o saldo no fim do período (checkpoint + delta — ver
+    caixa_ledger).
+    """
+    day_from = caixa_ledger.parse_day(date_from, 'date_from')
+    day_to   = caixa_ledger.parse_day(date_to, 'date_to')
+    page_size = caixa_ledger.parse_limit(limit)
+    if cursor and page_size is None:
+        page_size = caixa_ledger.DEFAULT_PAGE_SIZE
+
     with db_session_manager(current_user) as session:
-        params = {}
-        view_where_parts  = []  # com prefixo v. para a query com JOIN
-        table_where_parts = []  # sem prefixo para a query directa em tb_caixa
-        if date_from:
-            view_where_parts.append("v.data >= :date_from")
-            table_where_parts.append("data >= :date_from")
-            params['date_from'] = date_from
-        if date_to:
-            view_where_parts.append("v.data <= :date_to")
-            table_where_parts.append("data <= :date_to")
-            params['date_to'] = date_to
-
-        where_clause       = f"WHERE {' AND '.join(view_where_parts)}"  if view_where_parts  else ""
-        saldo_where_clause = f"WHERE {' AND '.join(table_where_parts)}" if table_where_parts else ""
+        params = {'two_person_tipos': list(TIPOS_TWO_PERSON)}
+        where_parts = []
+        if day_from:
+            where_parts.append("b.data >= :date_from")
+            params['date_from'] = day_from
+        if day_to:
+            where_parts.append("b.data < CAST(:date_to AS date) + 1")
+            params['date_to'] = day_to
+        if cursor:
+            params['cursor_time'], params['cursor_pk'] = caixa_ledger.decode_cursor(cursor)
+            where_parts.append(f"({caixa_ledger.SORT_TIME_SQL}, b.pk) < (:cursor_time, :cursor_pk)")
+
+        where_clause = f"WHERE {' AND '.join(where_parts)}" if where_parts else ""
+        limit_clause = ""
+        if page_size:
+            limit_clause = "LIMIT :limit"
+            params['limit'] = page_size + 1
 
         rows = session.execute(text(f"""
-            SELECT v.pk, v.tt_caixamovimento,
-                   v.data::text      AS data,
-                   v.valor, v.saldo,
-                   v.tb_document, v.ordempagamento,
-                   v.ts_client1, v.ts_client2,
-                   v.hist_client,
-                   v.hist_time::text AS hist_time,
-                   b.tt_caixamovimento                         AS tt_caixamovimento_raw,
-                   b.ts_client1                                AS ts_client1_pk,
-                   b.ts_client2                                AS ts_client2_pk,
+            SELECT b.pk,
+                   t.value                            AS tt_caixamovimento,
+                   b.data::text                       AS data,
+                   b.valor,
+                   d.regnumber                        AS tb_document,
+                   b.ordempagamento,
+                   COALESCE(c1.name, c1.username)     AS ts_client1,
+                   COALESCE(c2.name, c2.username)     AS ts_client2,
+                   COALESCE(ch.name, ch.username)     AS hist_client,
+                   b.hist_time::text                  AS hist_time,
+                   {caixa_ledger.SORT_TIME_SQL}::text AS sort_time,
+                   b.tt_caixamovimento                AS tt_caixamovimento_raw,
+                   b.ts_client1                       AS ts_client1_pk,
+                   b.ts_client2                       AS ts_client2_pk,
                    (b.tt_caixamovimento = ANY(:two_person_tipos) AND b.ts_client2 IS NULL) AS is_pending_validation,
-                   d.regnumber                                 AS document_regnumber
-            FROM vbl_caixa v
-            JOIN tb_caixa b ON b.pk = v.pk
+                   d.regnumber                        AS document_regnumber
+            FROM tb_caixa b
+            LEFT JOIN vbl_caixamovimento t ON t.pk = b.tt_caixamovimento
+            LEFT JOIN ts_client c1 ON c1.pk = b.ts_client1
+            LEFT JOIN ts_client c2 ON c2.pk = b.ts_client2
+            LEFT JOIN ts_client ch ON ch.pk = b.hist_client
             LEFT JOIN tb_document d ON d.pk = b.tb_document
             {where_clause}
-            ORDER BY b.hist_time DESC, v.pk DESC
-        """), {**params, 'two_person_tipos': list(TIPOS_TWO_PERSON)}).mappings().all()
-
-        # Saldo calculado directamente para evitar dependência da ordenação da view
-        saldo_atual = session.execute(text(f"""
-            SELECT COALESCE(SUM(valor), 0) FROM tb_caixa {saldo_where_clause}
-        """), params).scalar()
-        saldo_atual   = float(saldo_atual)
-        total_entrada = sum(float(r['valor'] or 0) for r in rows if (r['valor'] or 0) > 0)
-        total_saida   = abs(sum(float(r['valor'] or 0) for r in rows if (r['valor'] or 0) < 0))
-
-        return {
-            'movements': [_serialize(r) for r in rows],
-            'summary': {
-                'saldo':         saldo_atual,
-                'total_entrada': total_entrada,
-                'total_saida':   total_saida,
-                'count':         len(rows),
-            }
-        }, 200
+            ORDER BY {caixa_ledger.SORT_TIME_SQL} DESC, b.pk DESC
+            {limit_clause}
+        """), params).mappings().all()
+
+        next_cursor = None
+        if page_size and len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = caixa_ledger.encode_cursor(rows[-1]['sort_time'], rows[-1]['pk'])
+
+        saldos = caixa_ledger.running_balances(session, rows)
+        movements = []
+        for r in rows:
+            row = {**r, 'saldo': saldos.get(r['pk'])}
+            row.pop('sort_time')
+            movements.append(_serialize(row))
+
+        result = {
+            'movements': movements,
+            'summary':   caixa_ledger.range_summary(session, day_from, day_to),
+        }
+        if page_size:
+            result['next_cursor'] = next_cursor
+        return result, 200
 
 
 @api_error_handler
@@ -355,6 +384,14 @@ def validate_fecho(pk: int, user_client_pk: int, current_user: str):
                 raise APIError(f"Não pode validar o seu próprio {TIPO_LABELS[tipo]}.", 422)
             raise
 
+        # Fecho validado: consolida os saldos diários até à véspera do fecho
+        if tipo == TIPO_FECHO:
+            fecho_dia = caixa_ledger.parse_day(record['data'], 'data')
+            if fecho_dia:
+                caixa_ledger.finalize_checkpoints(
+                    session, fecho_dia - timedelta(days=1), fecho_pk=pk, user_pk=user_client_pk
+                )
+
         logger.info(
             f"{TIPO_LABELS[tipo].capitalize()} {pk} validado por {current_user} (pk={user_client_pk})"
         )
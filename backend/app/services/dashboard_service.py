@@ -183,7 +183,7 @@ def get_dashboard_view_data(current_user, view_name, filters=None):
             category = cat
             break
 
-    with db_session_manager(current_user) as session:
+    with db_session_manager(current_user, readonly=True) as session:
         try:
             # Construir query base
             # NOTA: f-string é aceitável porque os nomes das views são validados contra DASHBOARD_VIEWS
@@ -306,7 +306,7 @@ def get_landing_data(current_user):
     # Lookup pk → nome do município (feito uma vez, partilhado por todas as views)
     mun_map = {}
     try:
-        with db_session_manager(current_user) as session:
+        with db_session_manager(current_user, readonly=True) as session:
             rows = session.execute(
                 text("SELECT DISTINCT pk, value FROM aintar_server.vbl_instalacao_municipio ORDER BY value")
             ).fetchall()
@@ -324,7 +324,7 @@ def get_landing_data(current_user):
     def fetch_view(view_name):
         with app.app_context():
             try:
-                with db_session_manager(current_user) as session:
+                with db_session_manager(current_user, readonly=True) as session:
                     res = session.execute(text(f"SELECT * FROM aintar_server.{view_name}"))
                     rows = [dict(r) for r in res.mappings().all()]
 
@@ -11,9 +11,10 @@ import json
 import hashlib
 import base64
 import shutil
-import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 from cryptography import x509
 from cryptography.x509.oid import NameOID
@@ -22,10 +23,17 @@ from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.hazmat.backends import default_backend
 
 from app.utils.error_handler import api_error_handler, APIError
+from app.utils.compute_offload import offload, run_offloaded
 from app.utils.logger import get_logger
+from app.utils.http_client import get_client
 
 logger = get_logger(__name__)
 
+
+def _cmd_http():
+    """Cliente com pool/breaker para a API da Chave Móvel Digital (AMA)."""
+    return get_client('cmd', pool_size=4, max_concurrency=4, timeout=(5, 30))
+
 # Pasta onde fica o certificado da organização
 _CERT_DIR = os.path.join(os.path.dirname(__file__), '..', 'certs')
 _KEY_PATH = os.path.join(_CERT_DIR, 'aintar_sign.key')
@@ -82,63 +90,153 @@ def _ensure_org_cert():
 
 # ─── Assinatura interna (certificado AINTAR) ───────────────────────────────
 
-def sign_pdf_internal(pdf_path: str, signer_name: str, reason: str = "Assinatura de Documento Oficial") -> str:
+class SigningContext:
     """
-    Assina um PDF com o certificado interno da AINTAR.
-    Produz PDF com assinatura PAdES válida e carimbo visual.
+    Signer e ValidationContext do certificado interno, carregados uma vez
+    por processo e partilhados por todas as assinaturas (a chave era lida do
+    disco e o signer reconstruído a cada documento).
 
-    Returns:
-        str: Caminho do PDF assinado
+    Rotação do certificado: basta substituir aintar_sign.key/.crt — a mtime
+    dos ficheiros é verificada a cada assinatura e o contexto recarrega
+    sozinho; refresh() força o recarregamento.
     """
-    _ensure_org_cert()
-
-    try:
-        from pyhanko.sign import signers, fields
-        from pyhanko.sign.signers.pdf_signer import PdfSignatureMetadata
-        from pyhanko.pdf_utils.incremental_writer import IncrementalPdfFileWriter
-        from pyhanko.pdf_utils.reader import PdfFileReader
-        from pyhanko.sign.fields import SigFieldSpec
-        import pyhanko.stamp as stamp_mod
-        from pyhanko_certvalidator import CertificateValidator
 
+    def __init__(self, key_path: str = _KEY_PATH, cert_path: str = _CERT_PATH):
+        self.key_path = key_path
+        self.cert_path = cert_path
+        self._lock = threading.Lock()
+        self._signer = None
+        self._validation_context = None
+        self._fingerprint = None
+
+    def _files_fingerprint(self):
+        return (os.path.getmtime(self.key_path), os.path.getmtime(self.cert_path))
+
+    def refresh(self, force: bool = True):
+        """(Re)carrega signer e ValidationContext; sem `force`, só se os ficheiros mudaram."""
+        with self._lock:
+            if (self.key_path, self.cert_path) == (_KEY_PATH, _CERT_PATH):
+                _ensure_org_cert()
+            fingerprint = self._files_fingerprint()
+            if not force and self._signer is not None and fingerprint == self._fingerprint:
+                return
+            from pyhanko.sign import signers
+            from pyhanko_certvalidator import ValidationContext
+
+            signer = signers.SimpleSigner.load(
+                key_file=self.key_path,
+                cert_file=self.cert_path,
+                key_passphrase=None
+            )
+            if signer is None:
+                raise APIError("Não foi possível carregar o certificado de assinatura", 500, "ERR_SIGN_CERT")
+            self._signer = signer
+            self._validation_context = ValidationContext(
+                trust_roots=[signer.signing_cert], allow_fetching=False
+            )
+            self._fingerprint = fingerprint
+            logger.info(f"Certificado de assinatura carregado: {signer.signing_cert.subject.human_friendly}")
+
+    @property
+    def signer(self):
+        self.refresh(force=False)
+        return self._signer
+
+    @property
+    def validation_context(self):
+        self.refresh(force=False)
+        return self._validation_context
+
+    def sign(self, pdf_path: str, signer_name: str, reason: str) -> str:
+        """Assina um PDF (PAdES) e devolve o caminho do ficheiro assinado."""
+        # O signer resolve-se aqui (lock do contexto); a assinatura corre fora do hub
         output_path = pdf_path.replace('.pdf', '_signed.pdf')
+        _sign_pdf_file(pdf_path, output_path, self.signer, signer_name, reason)
+        return output_path
+
 
-        # Carregar chave e certificado
-        with open(_KEY_PATH, 'rb') as f:
-            key_data = f.read()
-        with open(_CERT_PATH, 'rb') as f:
-            cert_data = f.read()
+@offload(name='signature.sign_internal')
+def _sign_pdf_file(pdf_path: str, output_path: str, signer, signer_name: str, reason: str) -> None:
+    from pyhanko.sign import signers, fields
+    from pyhanko.sign.signers.pdf_signer import PdfSignatureMetadata
+    from pyhanko.pdf_utils.incremental_writer import IncrementalPdfFileWriter
+    from pyhanko.sign.fields import SigFieldSpec
 
-        signer = signers.SimpleSigner.load(
-            key_file=_KEY_PATH,
-            cert_file=_CERT_PATH,
-            key_passphrase=None
+    with open(pdf_path, 'rb') as inf:
+        w = IncrementalPdfFileWriter(inf)
+
+        # Adicionar campo de assinatura se não existir
+        fields.append_signature_field(w, SigFieldSpec('Signature', on_page=0))
+
+        meta = PdfSignatureMetadata(
+            field_name='Signature',
+            reason=reason,
+            location='AINTAR',
+            name=signer_name,
         )
 
-        with open(pdf_path, 'rb') as inf:
-            w = IncrementalPdfFileWriter(inf)
+        with open(output_path, 'wb') as outf:
+            signers.sign_pdf(w, signature_meta=meta, signer=signer, output=outf)
 
-            # Adicionar campo de assinatura se não existir
-            fields.append_signature_field(w, SigFieldSpec('Signature', on_page=0))
 
-            meta = PdfSignatureMetadata(
-                field_name='Signature',
-                reason=reason,
-                location='AINTAR',
-                name=signer_name,
-            )
+signing_context = SigningContext()
 
-            with open(output_path, 'wb') as outf:
-                signers.sign_pdf(w, signature_meta=meta, signer=signer, output=outf)
+SIGN_BATCH_WORKERS = 4
 
+
+def sign_pdf_internal(pdf_path: str, signer_name: str, reason: str = "Assinatura de Documento Oficial") -> str:
+    """
+    Assina um PDF com o certificado interno da AINTAR.
+    Produz PDF com assinatura PAdES válida e carimbo visual.
+
+    Returns:
+        str: Caminho do PDF assinado
+    """
+    try:
+        output_path = signing_context.sign(pdf_path, signer_name, reason)
         logger.info(f"PDF assinado internamente: {output_path}")
         return output_path
 
+    except APIError:
+        raise
     except Exception as e:
         logger.error(f"Erro ao assinar PDF internamente: {e}")
         raise APIError(f"Erro ao assinar documento: {str(e)}", 500, "ERR_SIGN")
 
 
+def sign_pdfs_internal(pdf_paths: List[str], signer_name: str,
+                       reason: str = "Assinatura de Documento Oficial",
+                       max_workers: int = SIGN_BATCH_WORKERS) -> List[Dict]:
+    """
+    Assina vários PDFs com o mesmo contexto (chave carregada uma só vez),
+    num pool de workers — cada assinatura corre numa thread do compute
+    offload. Uma falha não interrompe o lote.
+
+    Returns:
+        list: por ficheiro, pela ordem recebida —
+              {'pdf_path', 'success', 'signed_path' | 'error'}
+    """
+    if not pdf_paths:
+        return []
+    # Carregar (ou recarregar) antes do pool — um erro de certificado falha o lote todo
+    signing_context.refresh(force=False)
+
+    def sign_one(pdf_path):
+        try:
+            return {'pdf_path': pdf_path, 'success': True,
+                    'signed_path': signing_context.sign(pdf_path, signer_name, reason)}
+        except Exception as e:
+            logger.error(f"Erro ao assinar {pdf_path} (lote): {e}")
+            return {'pdf_path': pdf_path, 'success': False, 'error': str(e)}
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(pdf_paths))) as executor:
+        results = list(executor.map(sign_one, pdf_paths))
+
+    ok = sum(1 for r in results if r['success'])
+    logger.info(f"Lote de assinatura interna: {ok}/{len(results)} PDFs assinados")
+    return results
+
+
 # ─── Assinatura externa (Cartão de Cidadão) ────────────────────────────────
 
 def sign_pdf_external(pdf_path: str, certificate_pem: str, signature_b64: str, reason: str = "Assinatura de Documento Oficial") -> str:
@@ -217,10 +315,16 @@ def validate_pdf_signature(pdf_path: str) -> Dict:
             return {'is_valid': False, 'message': 'Nenhuma assinatura encontrada', 'signatures': []}
 
         results = []
+        # O certificado interno é raiz de confiança — as assinaturas da própria
+        # AINTAR validam; as restantes continuam sem cadeia conhecida
+        try:
+            vc = signing_context.validation_context
+        except Exception:
+            vc = ValidationContext(allow_fetching=False, trust_roots=[])
+
         for sig in sigs:
             try:
-                vc = ValidationContext(allow_fetching=False, trust_roots=[])
-                status = pyhanko_validate(sig, vc)
+                status = run_offloaded(pyhanko_validate, sig, vc, _name='signature.validate')
                 results.append({
                     'signer': sig.signer_cert.subject.human_friendly if sig.signer_cert else '—',
                     'valid': status.bottom_line,
@@ -293,13 +397,13 @@ class DigitalSignatureService:
 
     def _cmd_authenticate(self):
         url = f"{self.cmd_api_base}/oauth/v2/token"
-        r = requests.post(url, data={'grant_type': 'client_credentials', 'client_id': self.cmd_client_id, 'client_secret': self.cmd_client_secret}, timeout=30)
+        r = _cmd_http().post(url, data={'grant_type': 'client_credentials', 'client_id': self.cmd_client_id, 'client_secret': self.cmd_client_secret})
         r.raise_for_status()
         return r.json()['access_token']
 
     def _cmd_init_signature(self, access_token, user_phone, user_nif, doc_hash, reason):
         url = f"{self.cmd_api_base}/sign/init"
-        r = requests.post(url, headers={'Authorization': f'Bearer {access_token}'}, json={'mobileNumber': user_phone, 'nif': user_nif, 'documentHash': doc_hash, 'hashAlgorithm': 'SHA256', 'signatureReason': reason, 'applicationId': 'AINTAR_OFICIOS'}, timeout=30)
+        r = _cmd_http().post(url, headers={'Authorization': f'Bearer {access_token}'}, json={'mobileNumber': user_phone, 'nif': user_nif, 'documentHash': doc_hash, 'hashAlgorithm': 'SHA256', 'signatureReason': reason, 'applicationId': 'AINTAR_OFICIOS'})
         r.raise_for_status()
         return r.json()['requestId']
 
@@ -309,7 +413,7 @@ class DigitalSignatureService:
             return {'status': 'error', 'error': 'Credenciais não configuradas'}
         try:
             access_token = self._cmd_authenticate()
-            r = requests.get(f"{self.cmd_api_base}/sign/status/{request_id}", headers={'Authorization': f'Bearer {access_token}'}, timeout=30)
+            r = _cmd_http().get(f"{self.cmd_api_base}/sign/status/{request_id}", headers={'Authorization': f'Bearer {access_token}'})
             r.raise_for_status()
             return r.json()
         except Exception as e:
@@ -320,7 +424,7 @@ class DigitalSignatureService:
         if not self._check_cmd_credentials():
             raise ValueError("Credenciais CMD não configuradas")
         access_token = self._cmd_authenticate()
-        r = requests.post(f"{self.cmd_api_base}/sign/complete", headers={'Authorization': f'Bearer {access_token}'}, json={'requestId': request_id}, timeout=30)
+        r = _cmd_http().post(f"{self.cmd_api_base}/sign/complete", headers={'Authorization': f'Bearer {access_token}'}, json={'requestId': request_id})
         r.raise_for_status()
         sig_data = r.json()
         signed_path = sign_pdf_external(pdf_path, sig_data['certificate'], sig_data['signature'])
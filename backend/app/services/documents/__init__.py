@@ -31,11 +31,15 @@ from .attachments import (
     download_file,
 )
 
+# Dossier (ZIP em streaming)
+from .dossier import export_dossier
+
 # Relatórios
 from .reports import (
     buscar_dados_pedido,
     gerar_comprovativo_pdf,
     preencher_pdf,
+    preencher_pdfs,
 )
 
 # Operações especializadas (incluindo as novas funções de ramais)
@@ -71,8 +75,11 @@ __all__ = [
     # Anexos
     'get_document_anex_steps', 'add_document_annex', 'download_file',
 
+    # Dossier
+    'export_dossier',
+
     # Relatórios
-    'buscar_dados_pedido', 'gerar_comprovativo_pdf', 'preencher_pdf',
+    'buscar_dados_pedido', 'gerar_comprovativo_pdf', 'preencher_pdf', 'preencher_pdfs',
 
     # Especializadas (incluindo as novas funções)
     'create_etar_document_direct', 'create_ee_document_direct',
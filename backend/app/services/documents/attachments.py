@@ -9,6 +9,7 @@ from functools import wraps
 from app import cache
 from .utils import ensure_directories, sanitize_input
 from app.utils.file_processing import process_uploaded_file
+from app.services.storage_accounting_service import remove_file
 from app.utils.logger import get_logger
 
 # Mapeamento MIME → extensão (usado quando filename não tem extensão)
@@ -189,7 +190,7 @@ def add_document_annex(data, current_user):
                     else:
                         error_files.append(file.filename)
                         try:
-                            os.remove(file_path)
+                            remove_file(file_path)
                         except:
                             pass
 
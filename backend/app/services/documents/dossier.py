@@ -0,0 +1,233 @@
+"""
+Exportação do dossier completo de um pedido num ZIP em streaming.
+
+O ZIP inclui:
+- a pasta do pedido em FILES_DIR/<regnumber> (raiz, Anexos, Oficios e subpastas);
+- os ofícios emitidos para o pedido (vbl_letter → app/generated_pdfs, incluindo
+  a versão assinada quando existe);
+- o formulário do pedido preenchido (mesmo PDF de /extrair_comprovativo).
+
+O arquivo é gerado à medida que é enviado: zipfile escreve para um destino
+não pesquisável (data descriptors), cada ficheiro é lido em blocos de
+CHUNK_SIZE e os bytes produzidos seguem logo para o cliente — sem ficheiros
+temporários nem o ZIP inteiro em memória. Ficheiros já comprimidos (PDF,
+imagens, Office, ZIP) vão em ZIP_STORED; os restantes em ZIP_DEFLATED.
+"""
+import io
+import os
+import time
+import zipfile
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+
+from flask import Response, current_app, request, stream_with_context
+from sqlalchemy.sql import text
+
+from app.services import audit_service
+from app.utils.error_handler import APIError, ResourceNotFoundError
+from app.utils.logger import get_logger
+from app.utils.utils import db_session_manager
+
+logger = get_logger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+GENERATED_PDFS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'generated_pdfs'
+)
+# Formatos já comprimidos: deflate gasta CPU sem ganhar espaço
+STORED_EXTENSIONS = {
+    '.pdf', '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic',
+    '.zip', '.rar', '.7z', '.gz', '.mp4', '.mov', '.mp3',
+    '.docx', '.xlsx', '.pptx', '.odt', '.ods',
+}
+_ZIP_EPOCH = time.mktime((1980, 1, 1, 0, 0, 0, 0, 0, -1))
+
+
+class DossierEntry(NamedTuple):
+    arcname: str
+    path: Optional[str] = None      # ficheiro no disco...
+    data: Optional[bytes] = None    # ...ou conteúdo gerado em memória
+    mtime: Optional[float] = None
+    size: int = 0
+
+
+# ── Recolha ──────────────────────────────────────────────────────────────────
+
+def _safe_folder(regnumber: str) -> str:
+    """Pasta do pedido dentro de FILES_DIR (mesmas regras de download_file)."""
+    if not regnumber or '..' in regnumber or '/' in regnumber or '\\' in regnumber:
+        raise APIError("Registo inválido", 400, "ERR_INVALID_INPUT")
+    base = os.path.abspath(current_app.config.get('FILES_DIR', '/var/www/html/files'))
+    folder = os.path.abspath(os.path.join(base, regnumber))
+    if not folder.startswith(base + os.sep):
+        raise APIError("Registo inválido", 400, "ERR_INVALID_INPUT")
+    return folder
+
+
+def _folder_entries(folder: str, prefix: str) -> List[DossierEntry]:
+    """Ficheiros da pasta do pedido (recursivo, os.scandir, stat reutilizado)."""
+    entries = []
+    stack = [(folder, prefix)]
+    while stack:
+        path, arc_dir = stack.pop()
+        try:
+            with os.scandir(path) as it:
+                for entry in sorted(it, key=lambda e: e.name):
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append((entry.path, f"{arc_dir}/{entry.name}"))
+                    elif entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        entries.append(DossierEntry(
+                            f"{arc_dir}/{entry.name}", path=entry.path,
+                            mtime=st.st_mtime, size=st.st_size,
+                        ))
+        except FileNotFoundError:
+            continue
+    return entries
+
+
+def _letter_entries(letters, prefix: str) -> List[DossierEntry]:
+    """Ofícios emitidos (original e assinado, se existirem)."""
+    entries = []
+    for letter in letters:
+        base, ext = os.path.splitext(letter.filename)
+        for name in (letter.filename, f"{base}_signed{ext}"):
+            if os.path.basename(name) != name:
+                continue
+            path = os.path.join(GENERATED_PDFS_DIR, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append(DossierEntry(
+                f"{prefix}/Emissoes/{name}", path=path, mtime=st.st_mtime, size=st.st_size,
+            ))
+    return entries
+
+
+def _form_entry(pk: int, regnumber: str, current_user: str, prefix: str) -> Optional[DossierEntry]:
+    """Formulário do pedido preenchido; o dossier segue sem ele se o template falhar."""
+    # Sem o @api_error_handler de generate_filled_pdfs: um erro chega aqui como
+    # excepção, em vez de um (Response, status) que esconderia a causa
+    from app.services.pdf_filler_service import fetch_documents_data, fill_documents
+    try:
+        dados = fetch_documents_data([pk], current_user)
+        if not dados:
+            logger.warning(f"Dossier {regnumber}: formulário não gerado (pedido {pk} sem dados)")
+            return None
+        data = fill_documents(dados).getvalue()
+    except Exception as e:
+        logger.warning(f"Dossier {regnumber}: formulário não gerado ({e})")
+        return None
+    return DossierEntry(f"{prefix}/Comprovativo_{regnumber}.pdf", data=data,
+                        mtime=time.time(), size=len(data))
+
+
+def collect_dossier(pk: int, current_user: str):
+    """
+    (regnumber, entradas) do dossier. Toda a BD é consultada aqui, antes do
+    streaming começar — a resposta só lê ficheiros.
+    """
+    with db_session_manager(current_user) as session:
+        # vbl_document aplica a visibilidade do utilizador (RLS por sessão)
+        regnumber = session.execute(
+            text("SELECT regnumber FROM vbl_document WHERE pk = :pk"), {'pk': pk}
+        ).scalar()
+        if not regnumber:
+            raise ResourceNotFoundError('Pedido', pk)
+        letters = session.execute(text("""
+            SELECT filename FROM vbl_letter
+            WHERE tb_document = :pk AND filename IS NOT NULL
+            ORDER BY emission_date, pk
+        """), {'pk': pk}).fetchall()
+
+        prefix = regnumber
+        entries = _folder_entries(_safe_folder(regnumber), prefix)
+        entries += _letter_entries(letters, prefix)
+
+        user_fk = session.execute(text("SELECT fs_client()")).scalar()
+        audit_service.record(
+            session, hist_client=user_fk,
+            action='docs.dossier.export', resource='document', resource_id=pk,
+            meta={'files': len(entries), 'bytes': sum(e.size for e in entries)},
+            ip=request.remote_addr if request else None,
+        )
+
+    form = _form_entry(pk, regnumber, current_user, prefix)
+    if form:
+        entries.append(form)
+    return regnumber, entries
+
+
+# ── Streaming ────────────────────────────────────────────────────────────────
+
+class _ChunkSink(io.RawIOBase):
+    """Destino não pesquisável do zipfile: acumula os bytes até serem drenados."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _zipinfo(entry: DossierEntry) -> zipfile.ZipInfo:
+    mtime = max(entry.mtime or time.time(), _ZIP_EPOCH)
+    zinfo = zipfile.ZipInfo(entry.arcname, time.localtime(mtime)[:6])
+    ext = os.path.splitext(entry.arcname)[1].lower()
+    zinfo.compress_type = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+    zinfo.external_attr = 0o644 << 16
+    # Tamanho previsto: decide o ZIP64 do cabeçalho local antes de escrever
+    zinfo.file_size = entry.size
+    return zinfo
+
+
+def iter_zip(entries: Iterable[DossierEntry], chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Gera o ZIP em blocos. Ficheiros que desapareceram entretanto são ignorados."""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', allowZip64=True) as zf:
+        for entry in entries:
+            try:
+                source = open(entry.path, 'rb') if entry.path else io.BytesIO(entry.data)
+            except OSError as e:
+                logger.warning(f"Dossier: {entry.arcname} ignorado ({e})")
+                continue
+            with source, zf.open(_zipinfo(entry), 'w') as dest:
+                for chunk in iter(lambda: source.read(chunk_size), b''):
+                    dest.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()      # diretório central
+
+
+def export_dossier(pk: int, current_user: str) -> Response:
+    """Resposta HTTP com o ZIP do dossier em streaming (chunked)."""
+    regnumber, entries = collect_dossier(pk, current_user)
+    logger.info(
+        f"Dossier {regnumber}: {len(entries)} ficheiros "
+        f"({sum(e.size for e in entries) / (1024 * 1024):.1f} MB) para {current_user}"
+    )
+    safe_name = regnumber.replace('"', '')
+    response = Response(
+        stream_with_context(iter_zip(entries)),
+        mimetype='application/zip',
+        headers={
+            'Content-Disposition': f'attachment; filename="Dossier_{safe_name}.zip"',
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',      # nginx: não acumular a resposta
+        },
+    )
+    return response
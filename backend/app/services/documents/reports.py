@@ -1,14 +1,12 @@
 from flask import current_app
 from app.utils.error_handler import APIError, ResourceNotFoundError
-from app.utils.utils import db_session_manager
-from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from io import BytesIO
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
-from pdfrw import PdfReader, PdfWriter, PdfDict, PdfName
 import os
 from .utils import debug_pdf_fields, sanitize_input
+from app.services.pdf_filler_service import fill_documents, fetch_documents_data
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -33,35 +31,6 @@ def get_formulario_path():
                        500, "ERR_TEMPLATE_ACCESS")
 
 
-# Mapeamento de campos do PDF
-campo_mapping = {
-    'Registo': 'pedido.regnumber',
-    'Data_Registo': 'pedido.submission',
-    'Rua/praça_pedido': 'pedido.address',
-    'Observações': 'pedido.memo',
-    'Tipo de Pedido': 'pedido.tt_type',
-    'Nº Porta': 'pedido.door',
-    'Andar/Lote_pedido': 'pedido.floor',
-    'Codigo Postal_pedido': 'pedido.postal',
-    'Freguesia_pedido': 'pedido.nut3',
-    'Concelho_pedido': 'pedido.nut2',
-    'Funcionario': 'pedido.creator',
-    'Nome/Denominação': 'entidade.name',
-    'Domicílio/Sede': 'entidade.address',
-    'Código Postal': 'entidade.postal',
-    'Localidade': 'entidade.nut4',
-    'NIF/NIPC': 'entidade.nipc',
-    'Contacto': 'entidade.phone',
-    'Email': 'entidade.email',
-    'Nome/Denominação_representante': 'requerente.name',
-    'Domicílio/Sede_representante': 'requerente.address',
-    'Código Postal_representante': 'requerente.postal',
-    'Localidade_representante': 'requerente.nut4',
-    'NIF/NIPC_representante': 'requerente.nipc',
-    'Contacto_representante': 'requerente.phone',
-}
-
-
 def gerar_comprovativo_pdf(dados_pedido):
     """Gera um PDF com os dados do pedido"""
     try:
@@ -123,73 +92,15 @@ def gerar_comprovativo_pdf(dados_pedido):
 
 
 def preencher_pdf(dados_estruturados):
-    """Preenche um formulário PDF com os dados do pedido"""
+    """
+    Preenche um formulário PDF com os dados do pedido.
+    Usa o template indexado de app/services/pdf_filler_service.py (lido uma
+    vez por processo) com o mapeamento CAMPO_MAPPING.
+    """
     try:
         formulario_path = get_formulario_path()
         logger.debug("Iniciando preenchimento do PDF")
-
-        # Ler template
-        template_pdf = PdfReader(formulario_path)
-        output_pdf = PdfWriter()
-
-        # Adicionar páginas
-        for page in template_pdf.pages:
-            output_pdf.addpage(page)
-
-        # Processar campos
-        for i, page in enumerate(template_pdf.pages):
-            logger.debug(f"Processando página {i+1}")
-            if '/Annots' in page:
-                for annotation in page['/Annots']:
-                    if annotation.get('/Subtype') == '/Widget':
-                        if '/T' in annotation:
-                            pdf_field_name = annotation['/T'][1:-1]
-
-                            # Procurar o campo no mapeamento
-                            if pdf_field_name in campo_mapping:
-                                campo_estruturado = campo_mapping[pdf_field_name].split(
-                                    '.')
-
-                                # Verificar se os dados contêm o campo
-                                if (campo_estruturado[0] in dados_estruturados and
-                                        campo_estruturado[1] in dados_estruturados[campo_estruturado[0]]):
-
-                                    # Obter o valor
-                                    valor = dados_estruturados[campo_estruturado[0]
-                                                               ][campo_estruturado[1]]
-
-                                    if valor is not None:
-                                        valor = str(valor)
-                                        field_type = annotation.get('/FT')
-
-                                        # Tratar diferentes tipos de campo
-                                        if field_type == '/Tx':  # Campo de texto
-                                            annotation.update(
-                                                PdfDict(V=valor, AP=''))
-                                        elif field_type == '/Btn':  # Botão/Checkbox
-                                            if valor.lower() in ['true', '1', 'yes', 'on']:
-                                                annotation.update(
-                                                    PdfDict(AS=PdfName('Yes'), V=PdfName('Yes')))
-                                            else:
-                                                annotation.update(
-                                                    PdfDict(AS=PdfName('Off'), V=PdfName('Off')))
-                                    else:
-                                        logger.debug(
-                                            f"Campo {pdf_field_name}: valor nulo")
-                                else:
-                                    logger.debug(
-                                        f"Campo {campo_mapping[pdf_field_name]} não encontrado nos dados")
-                            else:
-                                logger.debug(
-                                    f"Campo {pdf_field_name} não encontrado no mapeamento")
-
-        # Escrever para buffer
-        buffer = BytesIO()
-        output_pdf.write(buffer)
-        buffer.seek(0)
-
-        logger.info("PDF preenchido com sucesso")
-        return buffer
+        return fill_documents([dados_estruturados], formulario_path)
 
     except APIError:
         raise
@@ -200,58 +111,51 @@ def preencher_pdf(dados_estruturados):
             f"Erro ao preencher o PDF: {str(e)}", 500, "ERR_PDF_FILLING")
 
 
-def buscar_dados_pedido(pk, current_user):
-    """Busca os dados do pedido para preencher o PDF"""
+def preencher_pdfs(pks, current_user):
+    """
+    Formulários de vários pedidos num só PDF, pela ordem de `pks` (p.ex.
+    imprimir os pedidos do dia). Dados numa só query; pedidos sem entidade
+    saem só com os campos do pedido.
+    """
     try:
-        with db_session_manager(current_user) as session:
-            pk = sanitize_input(pk, 'int')
-
-            logger.debug(
-                f"Iniciando busca de dados para o pedido {pk}")
-
-            # Buscar dados do pedido
-            query_pedido = text("SELECT * FROM vbl_document WHERE pk = :pk")
-            result_pedido = session.execute(
-                query_pedido, {'pk': pk}).fetchone()
-
-            if not result_pedido:
-                raise ResourceNotFoundError("Pedido", pk)
-
-            # Buscar a entidade
-            query_entidade = text(
-                "SELECT * FROM vbf_entity WHERE nipc = :nipc")
-            result_entidade = session.execute(
-                query_entidade, {'nipc': result_pedido.nipc}).fetchone()
-
-            if not result_entidade:
-                logger.warning(
-                    f"Entidade com NIPC {result_pedido.nipc} não encontrada")
-                raise APIError(
-                    f"Entidade com NIPC {result_pedido.nipc} não encontrada", 404, "ERR_ENTITY_NOT_FOUND")
+        pks = [sanitize_input(pk, 'int') for pk in pks]
+        formulario_path = get_formulario_path()
+        dados = fetch_documents_data(pks, current_user)
+        if not dados:
+            raise ResourceNotFoundError("Pedidos", ', '.join(map(str, pks)))
+        return fill_documents(dados, formulario_path), len(dados)
 
-            # Buscar o representante (se existir)
-            result_requerente = None
-            if result_pedido.tb_representative:
-                query_requerente = text(
-                    "SELECT * FROM vbf_entity WHERE pk = :pk")
-                result_requerente = session.execute(
-                    query_requerente, {'pk': result_pedido.tb_representative}).fetchone()
-                logger.debug(
-                    f"Representante encontrado: {result_requerente.name if result_requerente else 'Não encontrado'}")
+    except APIError:
+        raise
+    except SQLAlchemyError as e:
+        logger.error(f"Erro de BD ao buscar dados dos pedidos: {str(e)}")
+        raise APIError(
+            f"Erro ao consultar dados dos pedidos: {str(e)}", 500, "ERR_DATABASE")
+    except Exception as e:
+        logger.error(f"Erro ao preencher os PDFs: {str(e)}", exc_info=True)
+        raise APIError(
+            f"Erro ao preencher o PDF: {str(e)}", 500, "ERR_PDF_FILLING")
 
-            # Converter resultado SQL para dicionário
-            def result_to_dict(result):
-                if not result:
-                    return {}
-                return {key: getattr(result, key) for key in result._fields}
 
-            dados_estruturados = {
-                'pedido': result_to_dict(result_pedido),
-                'entidade': result_to_dict(result_entidade),
-                'requerente': result_to_dict(result_requerente) if result_requerente else {}
-            }
+def buscar_dados_pedido(pk, current_user):
+    """Busca os dados do pedido para preencher o PDF (pedido, entidade e representante numa só query)"""
+    try:
+        pk = sanitize_input(pk, 'int')
+        logger.debug(
+            f"Iniciando busca de dados para o pedido {pk}")
+
+        found = fetch_documents_data([pk], current_user)
+        if not found:
+            raise ResourceNotFoundError("Pedido", pk)
+
+        dados_estruturados = found[0]
+        if not dados_estruturados['has_entity']:
+            logger.warning(
+                f"Entidade com NIPC {dados_estruturados['nipc']} não encontrada")
+            raise APIError(
+                f"Entidade com NIPC {dados_estruturados['nipc']} não encontrada", 404, "ERR_ENTITY_NOT_FOUND")
 
-            return dados_estruturados
+        return dados_estruturados
 
     except ResourceNotFoundError as e:
         logger.warning(f"Recurso não encontrado: {str(e)}")
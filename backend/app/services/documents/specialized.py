@@ -6,6 +6,7 @@ from sqlalchemy.exc import SQLAlchemyError
 from functools import wraps
 from app import cache
 from .utils import sanitize_input
+from app.services.operations.report_views import invalidate_operations_reports
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -209,6 +210,7 @@ def update_document_pavenext(pk, current_user):
             # Limpar cache relevante - usar delete ao invés de delete_memoized
             cache.delete(f"get_document_ramais_{(current_user,)}_{{}}")
             cache.delete(f"get_document_ramais_executed_{(current_user,)}_{{}}")
+            invalidate_operations_reports()
 
             return {"message": "Ramal marcado como executado", "result": formatted_result}, 200
 
@@ -245,6 +247,7 @@ def update_document_pavpaid(pk, current_user):
             # Limpar cache relevante - usar delete ao invés de delete_memoized
             cache.delete(f"get_document_ramais_executed_{(current_user,)}_{{}}")
             cache.delete(f"get_document_ramais_concluded_{(current_user,)}_{{}}")
+            invalidate_operations_reports()
 
             return {"message": "Ramal marcado como pago e concluído", "result": formatted_result}, 200
 
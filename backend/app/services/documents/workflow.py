@@ -10,6 +10,7 @@ from app import cache
 from .utils import emit_socket_notification, sanitize_input
 from app.utils.logger import get_logger
 from app.services.notification_service import central_notification_service
+from app.services.operations.report_views import invalidate_operations_reports
 
 logger = get_logger(__name__)
 
@@ -148,8 +149,9 @@ def add_document_step(data, pk, current_user):
 
                 session.commit()
 
-                # Limpar cache de passos
+                # Limpar cache de passos e dos relatórios de operações
                 cache.delete_memoized(get_document_steps)
+                invalidate_operations_reports()
 
                 # Emitir notificação com dados completos
                 import time
@@ -541,6 +543,7 @@ def update_document_pavenext(pk, current_user):
                 cache.delete_memoized(list_documents, current_user)
                 cache.delete_memoized(document_self, current_user)
                 cache.delete_memoized(document_owner, current_user)
+                invalidate_operations_reports()
             except Exception as cache_error:
                 logger.warning(
                     f"Erro ao limpar cache: {cache_error}")
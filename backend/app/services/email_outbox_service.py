@@ -0,0 +1,319 @@
+"""
+Outbox de emails transaccionais. DDL em app/sql/email_outbox.sql.
+
+enqueue_email() só insere a linha e acorda o worker — o pedido HTTP que
+originou o email responde logo, sem esperar pelo Graph/SMTP. A entrega é
+feita em lotes por um worker em background deste processo (e por um job de
+recurso no scheduler, que apanha o que ficou pendente após um restart):
+
+- Graph: JSON batching ($batch), até GRAPH_BATCH_SIZE mensagens por pedido,
+  com o token OAuth cacheado até expirar (utils.get_access_token);
+- SMTP (Flask-Mail): todas as mensagens do lote numa só ligação.
+
+Cada linha é reclamada com FOR UPDATE SKIP LOCKED, por isso vários
+processos podem entregar em paralelo sem enviar o mesmo email duas vezes.
+Falhas temporárias (rede, 429, 5xx) voltam a 'pending' com backoff
+exponencial; ao fim de MAX_ATTEMPTS, ou num erro definitivo (4xx), a linha
+fica 'failed' com o último erro.
+"""
+import threading
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app import db
+from app.utils.error_handler import api_error_handler, APIError
+from app.utils.utils import db_system_session
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+TRANSPORT_GRAPH = 'graph'
+TRANSPORT_SMTP = 'smtp'
+
+GRAPH_BATCH_URL = 'https://graph.microsoft.com/v1.0/$batch'
+GRAPH_BATCH_SIZE = 20          # limite do Graph por pedido $batch
+CLAIM_SIZE = 100
+MAX_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+# Linha em 'sending' há mais do que isto = processo morreu a meio; volta à fila
+STALE_CLAIM_MINUTES = 10
+WORKER_IDLE_SECONDS = 30
+
+OUTBOX_STATUSES = ('pending', 'sending', 'sent', 'failed')
+
+
+def backoff_seconds(attempts):
+    """Espera antes da tentativa seguinte: 30 s, 60 s, 120 s, ... até 1 h."""
+    return min(BACKOFF_BASE_SECONDS * 2 ** max(attempts - 1, 0), BACKOFF_MAX_SECONDS)
+
+
+def enqueue_email(recipient, subject, body, sender_email=None, transport=TRANSPORT_GRAPH,
+                  content_type='Text', source=None):
+    """
+    Põe um email na outbox e devolve o pk. Usa uma ligação própria (não a
+    db.session do pedido, que o chamador pode ter a meio de uma transacção),
+    para que o email fique registado mesmo que a transacção do chamador faça
+    rollback depois (o mesmo critério do envio síncrono que substitui).
+    """
+    with Session(bind=db.engine) as session:
+        search_path = current_app.config.get('SEARCH_PATH', 'public')
+        session.execute(text(f"SET LOCAL search_path TO {search_path}"))
+        pk = session.execute(text("""
+            INSERT INTO tb_email_outbox
+                (transport, recipient, sender_email, subject, body, content_type, source)
+            VALUES (:transport, :recipient, :sender_email, :subject, :body, :content_type, :source)
+            RETURNING pk
+        """), {
+            'transport': transport, 'recipient': recipient, 'sender_email': sender_email,
+            'subject': subject, 'body': body, 'content_type': content_type, 'source': source,
+        }).scalar()
+        session.commit()
+    _worker.wake(current_app._get_current_object())
+    return pk
+
+
+# ── Entrega ─────────────────────────────────────────────────────────────
+
+def _claim(session, limit=CLAIM_SIZE):
+    rows = session.execute(text("""
+        UPDATE tb_email_outbox o
+        SET status = 'sending', attempts = o.attempts + 1, claimed_at = current_timestamp
+        WHERE o.pk IN (
+            SELECT pk FROM tb_email_outbox
+            WHERE (status = 'pending' AND next_attempt_at <= current_timestamp)
+               OR (status = 'sending'
+                   AND claimed_at < current_timestamp - make_interval(mins => :stale))
+            ORDER BY next_attempt_at, pk
+            LIMIT :limit
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING o.pk, o.transport, o.recipient, o.sender_email, o.subject, o.body,
+                  o.content_type, o.attempts
+    """), {'limit': limit, 'stale': STALE_CLAIM_MINUTES}).mappings().all()
+    session.commit()
+    return [dict(r) for r in rows]
+
+
+def _mark_sent(session, pks):
+    if pks:
+        session.execute(text("""
+            UPDATE tb_email_outbox
+            SET status = 'sent', sent_at = current_timestamp, last_error = NULL
+            WHERE pk = ANY(:pks)
+        """), {'pks': list(pks)})
+
+
+def _mark_failed(session, row, error, permanent=False):
+    """Volta a 'pending' com backoff, ou 'failed' se definitivo/esgotado."""
+    give_up = permanent or row['attempts'] >= MAX_ATTEMPTS
+    session.execute(text("""
+        UPDATE tb_email_outbox
+        SET status = :status,
+            last_error = :error,
+            next_attempt_at = current_timestamp + make_interval(secs => :delay)
+        WHERE pk = :pk
+    """), {
+        'pk': row['pk'],
+        'status': 'failed' if give_up else 'pending',
+        'error': str(error)[:2000],
+        'delay': 0 if give_up else backoff_seconds(row['attempts']),
+    })
+    if give_up:
+        logger.error(f"[Outbox] Email {row['pk']} para {row['recipient']} falhou definitivamente: {error}")
+
+
+def _graph_message(row):
+    return {
+        'message': {
+            'subject': row['subject'],
+            'body': {'contentType': row['content_type'], 'content': row['body']},
+            'toRecipients': [{'emailAddress': {'address': row['recipient']}}],
+        }
+    }
+
+
+def _deliver_graph(session, rows):
+    from app.utils.utils import get_access_token, invalidate_access_token
+    from app.utils.http_client import get_client
+
+    for start in range(0, len(rows), GRAPH_BATCH_SIZE):
+        chunk = rows[start:start + GRAPH_BATCH_SIZE]
+        by_id = {str(r['pk']): r for r in chunk}
+        payload = {'requests': [
+            {
+                'id': str(r['pk']),
+                'method': 'POST',
+                'url': f"/users/{r['sender_email']}/sendMail",
+                'headers': {'Content-Type': 'application/json'},
+                'body': _graph_message(r),
+            }
+            for r in chunk
+        ]}
+        try:
+            resp = get_client('msgraph').post(GRAPH_BATCH_URL, json=payload, headers={
+                'Authorization': f'Bearer {get_access_token()}',
+                'Content-Type': 'application/json',
+            })
+            if resp.status_code == 401:
+                invalidate_access_token()
+            resp.raise_for_status()
+            responses = resp.json().get('responses', [])
+        except Exception as e:
+            for r in chunk:
+                _mark_failed(session, r, e)
+            continue
+
+        sent = []
+        for item in responses:
+            row = by_id.pop(str(item.get('id')), None)
+            if row is None:
+                continue
+            status = int(item.get('status', 0))
+            if 200 <= status < 300:
+                sent.append(row['pk'])
+            else:
+                error = (item.get('body') or {}).get('error', {}).get('message') or f'HTTP {status}'
+                if status == 401:
+                    invalidate_access_token()
+                # 429/5xx (e 401, token expirou a meio) são temporários
+                _mark_failed(session, row, f'HTTP {status}: {error}',
+                             permanent=400 <= status < 500 and status not in (401, 408, 429))
+        for row in by_id.values():
+            _mark_failed(session, row, 'Sem resposta no $batch')
+        _mark_sent(session, sent)
+
+
+def _deliver_smtp(session, rows):
+    from flask_mail import Message
+    from app import mail
+
+    default_sender = current_app.config.get('MAIL_DEFAULT_SENDER')
+    sent, handled = [], set()
+    try:
+        with mail.connect() as conn:
+            for r in rows:
+                handled.add(r['pk'])
+                try:
+                    msg = Message(r['subject'], sender=r['sender_email'] or default_sender,
+                                  recipients=[r['recipient']])
+                    if r['content_type'] == 'HTML':
+                        msg.html = r['body']
+                    else:
+                        msg.body = r['body']
+                    conn.send(msg)
+                    sent.append(r['pk'])
+                except Exception as e:
+                    _mark_failed(session, r, e)
+    except Exception as e:
+        # Falhou a própria ligação — todo o lote por enviar volta à fila
+        for r in rows:
+            if r['pk'] not in handled:
+                _mark_failed(session, r, e)
+    _mark_sent(session, sent)
+
+
+def deliver_pending(session):
+    """Entrega tudo o que está pronto na outbox. Devolve quantas linhas processou."""
+    total = 0
+    while True:
+        rows = _claim(session)
+        if not rows:
+            return total
+        graph = [r for r in rows if r['transport'] == TRANSPORT_GRAPH]
+        smtp = [r for r in rows if r['transport'] == TRANSPORT_SMTP]
+        if graph:
+            _deliver_graph(session, graph)
+        if smtp:
+            _deliver_smtp(session, smtp)
+        session.commit()
+        total += len(rows)
+        logger.info(f"[Outbox] Lote entregue: {len(graph)} Graph + {len(smtp)} SMTP")
+
+
+class _OutboxWorker:
+    """Thread em background (uma por processo) acordada a cada enqueue."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def wake(self, app):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, args=(app,), name='email-outbox', daemon=True,
+                )
+                self._thread.start()
+        self._event.set()
+
+    def _run(self, app):
+        while True:
+            self._event.wait(WORKER_IDLE_SECONDS)
+            self._event.clear()
+            try:
+                with app.app_context():
+                    with db_system_session() as session:
+                        deliver_pending(session)
+            except Exception as e:
+                logger.error(f"[Outbox] Erro no worker de entrega: {e}", exc_info=True)
+
+
+_worker = _OutboxWorker()
+
+
+def deliver_email_outbox(app):
+    """Job de recurso: entrega o que ficou pendente (restart, worker parado)."""
+    with app.app_context():
+        with db_system_session() as session:
+            return deliver_pending(session)
+
+
+# ── Estado de entrega (admin) ───────────────────────────────────────────
+
+@api_error_handler
+def get_outbox_status(status=None, limit=100):
+    """Contagens por estado e as linhas mais recentes (opcionalmente de um estado)."""
+    if status and status not in OUTBOX_STATUSES:
+        raise APIError(f"Estado inválido: {status}", 400, "ERR_INVALID_STATUS")
+
+    counts = {
+        r.status: r.n for r in db.session.execute(text(
+            "SELECT status, COUNT(*) AS n FROM tb_email_outbox GROUP BY status"
+        )).fetchall()
+    }
+    rows = db.session.execute(text(f"""
+        SELECT pk, transport, recipient, subject, source, status, attempts,
+               next_attempt_at, last_error, created_at, sent_at
+        FROM tb_email_outbox
+        {"WHERE status = :status" if status else ""}
+        ORDER BY created_at DESC
+        LIMIT :limit
+    """), {'status': status, 'limit': limit}).mappings().all()
+
+    return {
+        'counts': {s: counts.get(s, 0) for s in OUTBOX_STATUSES},
+        'emails': [
+            {k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in r.items()}
+            for r in rows
+        ],
+    }, 200
+
+
+@api_error_handler
+def retry_outbox_email(pk):
+    """Repõe na fila um email 'failed' (nova série de tentativas)."""
+    updated = db.session.execute(text("""
+        UPDATE tb_email_outbox
+        SET status = 'pending', attempts = 0, next_attempt_at = current_timestamp
+        WHERE pk = :pk AND status = 'failed'
+    """), {'pk': pk}).rowcount
+    db.session.commit()
+    if not updated:
+        raise APIError("Email não encontrado ou não está em estado 'failed'", 404, "ERR_NOT_FOUND")
+    _worker.wake(current_app._get_current_object())
+    return {'message': 'Email reposto na fila'}, 200
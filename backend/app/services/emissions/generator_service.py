@@ -12,6 +12,7 @@ from reportlab.pdfbase.ttfonts import TTFont
 from datetime import datetime
 import os
 from typing import Dict, Optional
+from app.utils.compute_offload import run_offloaded
 from app.utils.logger import get_logger
 from app.services.template_service import TemplateService
 from app.models.emission import DocumentType, EmissionTemplate, Emission
@@ -89,9 +90,8 @@ class EmissionPDFGenerator:
         if footer_template:
             rendered_footer = TemplateService.render_template(footer_template, context)
 
-        # Guardar logo_path e rendered_footer para usar em _draw_fixed_elements
+        # Guardar logo_path para usar no header
         self.current_logo_path = logo_path
-        self.current_rendered_footer = rendered_footer
 
         # Criar PDF com margem bottom maior se tiver footer fixo
         bottom_margin = 4*cm if rendered_footer else 2*cm
@@ -122,12 +122,13 @@ class EmissionPDFGenerator:
         # Footer será desenhado como fixo em todas as páginas
         # Não adicionar ao story
 
-        # Build PDF com elementos fixos (logo, footer)
-        doc.build(
-            story,
-            onFirstPage=lambda canvas, doc: self._draw_fixed_elements(canvas, doc, emission),
-            onLaterPages=lambda canvas, doc: self._draw_fixed_elements(canvas, doc, emission)
-        )
+        # Build PDF com elementos fixos (logo, footer), fora do hub do eventlet.
+        # O footer segue por parâmetro: o gerador é partilhado por pedidos em simultâneo
+        def draw_fixed(canvas, doc):
+            self._draw_fixed_elements(canvas, doc, emission, rendered_footer)
+
+        run_offloaded(doc.build, story, onFirstPage=draw_fixed, onLaterPages=draw_fixed,
+                      _name='emissions.reportlab')
 
         logger.info(f"PDF gerado: {output_path}")
         return output_path
@@ -382,7 +383,7 @@ class EmissionPDFGenerator:
 
         return elements
 
-    def _draw_fixed_elements(self, canvas_obj, doc, emission: Emission):
+    def _draw_fixed_elements(self, canvas_obj, doc, emission: Emission, rendered_footer: Optional[str] = None):
         """Desenha elementos fixos em todas as páginas (footer apenas - logo está no header do story)"""
         canvas_obj.saveState()
 
@@ -390,7 +391,7 @@ class EmissionPDFGenerator:
         # Isso permite que o logo seja parte do fluxo de conteúdo e alinhado com os dados do destinatário
 
         # Footer fixo (se existe template)
-        if hasattr(self, 'current_rendered_footer') and self.current_rendered_footer:
+        if rendered_footer:
             # Linha separadora do footer
             canvas_obj.setStrokeColor(colors.black)
             canvas_obj.setLineWidth(0.5)
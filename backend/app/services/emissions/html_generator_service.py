@@ -5,6 +5,7 @@ from datetime import datetime
 import os
 from typing import Dict, Optional
 from flask import current_app
+from app.utils.compute_offload import run_offloaded
 from app.utils.logger import get_logger
 from app.services.template_service import TemplateService
 from app.models.emission import Emission
@@ -63,12 +64,14 @@ class HTMLPDFGenerator:
             logo_full_path
         )
 
-        # Gerar PDF com xhtml2pdf
+        # Gerar PDF com xhtml2pdf (fora do hub do eventlet)
         try:
             with open(output_path, "wb") as pdf_file:
-                pisa_status = pisa.CreatePDF(
+                pisa_status = run_offloaded(
+                    pisa.CreatePDF,
                     html_content,
-                    dest=pdf_file
+                    dest=pdf_file,
+                    _name='emissions.xhtml2pdf'
                 )
 
             if pisa_status.err:
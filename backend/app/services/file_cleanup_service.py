@@ -7,14 +7,39 @@ import os
 import shutil
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Dict
+from typing import Dict, Iterator, List
 from flask import current_app
 from app.utils.logger import get_logger
+from app.services.storage_accounting_service import (
+    get_storage_summary,
+    record_file_moved,
+    remove_file,
+)
 
 
 logger = get_logger(__name__)
 
 
+def _scan_files(directory: str, recursive: bool = False, skip=()) -> Iterator:
+    """
+    (DirEntry, stat) dos ficheiros de um diretório via os.scandir — um só
+    stat por ficheiro, reutilizado para data e tamanho (sem isfile/getmtime/getsize).
+    """
+    skip = {os.path.abspath(d) for d in skip}
+    stack = [directory]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                try:
+                    if entry.is_file(follow_symlinks=False):
+                        yield entry, entry.stat(follow_symlinks=False)
+                    elif recursive and entry.is_dir(follow_symlinks=False) \
+                            and os.path.abspath(entry.path) not in skip:
+                        stack.append(entry.path)
+                except OSError:
+                    continue
+
+
 class FileCleanupService:
     """Serviço de limpeza e organização de ficheiros"""
 
@@ -46,30 +71,23 @@ class FileCleanupService:
                 'files': []
             }
 
-        cutoff_date = datetime.now() - timedelta(days=days_old)
+        cutoff = (datetime.now() - timedelta(days=days_old)).timestamp()
         files_removed = []
         total_size = 0
         scanned = 0
 
         try:
-            for filename in os.listdir(temp_dir):
-                file_path = os.path.join(temp_dir, filename)
-
-                # Apenas ficheiros (não diretórios)
-                if not os.path.isfile(file_path):
-                    continue
-
+            for entry, st in _scan_files(temp_dir):
+                filename = entry.name
                 scanned += 1
 
                 # Verificar data de modificação
-                file_mtime = datetime.fromtimestamp(os.path.getmtime(file_path))
-
-                if file_mtime < cutoff_date:
-                    file_size = os.path.getsize(file_path)
+                if st.st_mtime < cutoff:
+                    file_size = st.st_size
 
                     if not dry_run:
                         try:
-                            os.remove(file_path)
+                            remove_file(entry.path, file_size)
                             files_removed.append(filename)
                             total_size += file_size
                             logger.info(f"Removed old temp file: {filename}")
@@ -135,11 +153,12 @@ class FileCleanupService:
         error_count = 0
 
         try:
-            for filename in os.listdir(source_dir):
-                file_path = os.path.join(source_dir, filename)
+            for entry, st in _scan_files(source_dir):
+                filename = entry.name
+                file_path = entry.path
 
                 # Apenas ficheiros PDF
-                if not (os.path.isfile(file_path) and filename.endswith('.pdf')):
+                if not filename.endswith('.pdf'):
                     continue
 
                 # Extrair ano do nome do ficheiro (OF-2025.S.OFI.000001.pdf)
@@ -148,7 +167,7 @@ class FileCleanupService:
                     year = parts[0][:4]  # Primeiros 4 dígitos do ano
 
                     # Obter mês da data de modificação
-                    file_mtime = datetime.fromtimestamp(os.path.getmtime(file_path))
+                    file_mtime = datetime.fromtimestamp(st.st_mtime)
                     month = f"{file_mtime.month:02d}"
 
                     # Criar estrutura de pastas
@@ -160,6 +179,7 @@ class FileCleanupService:
 
                     if not os.path.exists(dest_path):
                         shutil.move(file_path, dest_path)
+                        record_file_moved(file_path, dest_path, st.st_size)
                         organized_count += 1
                         logger.info(f"Organized: {filename} -> {year}/{month}/")
                     else:
@@ -183,7 +203,8 @@ class FileCleanupService:
     @staticmethod
     def get_storage_statistics() -> Dict:
         """
-        Retorna estatísticas de armazenamento
+        Retorna estatísticas de armazenamento (pré-calculadas — ver
+        storage_accounting_service; não percorre o disco)
 
         Returns:
             dict com:
@@ -192,45 +213,13 @@ class FileCleanupService:
                 'temp_size_mb': 120.5,
                 'letters_count': 350,
                 'letters_size_mb': 850.2,
-                'total_size_mb': 970.7
+                'files_count': 12000,
+                'files_size_mb': 9120.4,
+                'total_size_mb': 9240.9,
+                'areas': {...}
             }
         """
-        temp_dir = current_app.config.get('TEMP_DIR', 'temp')
-        letters_dir = os.path.join(current_app.config['FILES_DIR'], 'letters')
-
-        def get_dir_stats(directory):
-            """Auxiliar para obter stats de um diretório"""
-            if not os.path.exists(directory):
-                return {'count': 0, 'size_mb': 0}
-
-            count = 0
-            total_size = 0
-
-            for root, dirs, files in os.walk(directory):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    if os.path.isfile(file_path):
-                        count += 1
-                        total_size += os.path.getsize(file_path)
-
-            return {
-                'count': count,
-                'size_mb': round(total_size / (1024 * 1024), 2)
-            }
-
-        temp_stats = get_dir_stats(temp_dir)
-        letters_stats = get_dir_stats(letters_dir)
-
-        return {
-            'temp_files': temp_stats['count'],
-            'temp_size_mb': temp_stats['size_mb'],
-            'letters_count': letters_stats['count'],
-            'letters_size_mb': letters_stats['size_mb'],
-            'total_size_mb': round(
-                temp_stats['size_mb'] + letters_stats['size_mb'],
-                2
-            )
-        }
+        return get_storage_summary()
 
     @staticmethod
     def cleanup_preview_files() -> int:
@@ -248,13 +237,12 @@ class FileCleanupService:
         removed = 0
 
         try:
-            for filename in os.listdir(temp_dir):
+            for entry, st in _scan_files(temp_dir):
+                filename = entry.name
                 # Apenas ficheiros de preview
                 if filename.startswith('preview_') and filename.endswith('.pdf'):
-                    file_path = os.path.join(temp_dir, filename)
-
                     try:
-                        os.remove(file_path)
+                        remove_file(entry.path, st.st_size)
                         removed += 1
                         logger.debug(f"Removed preview file: {filename}")
                     except Exception as e:
@@ -286,38 +274,33 @@ class FileCleanupService:
 
         os.makedirs(archive_dir, exist_ok=True)
 
-        cutoff_date = datetime.now() - timedelta(days=years_old * 365)
+        cutoff = (datetime.now() - timedelta(days=years_old * 365)).timestamp()
         archived_count = 0
         error_count = 0
 
         try:
-            for root, dirs, files in os.walk(letters_dir):
-                # Não processar a própria pasta de arquivo
-                if 'archive' in root:
+            # Não processar a própria pasta de arquivo
+            for entry, st in _scan_files(letters_dir, recursive=True, skip=(archive_dir,)):
+                filename = entry.name
+                if not filename.endswith('.pdf'):
                     continue
 
-                for filename in files:
-                    if not filename.endswith('.pdf'):
-                        continue
-
-                    file_path = os.path.join(root, filename)
-                    file_mtime = datetime.fromtimestamp(os.path.getmtime(file_path))
-
-                    if file_mtime < cutoff_date:
-                        try:
-                            # Manter estrutura de ano/mês no arquivo
-                            relative_path = os.path.relpath(root, letters_dir)
-                            dest_dir = os.path.join(archive_dir, relative_path)
-                            os.makedirs(dest_dir, exist_ok=True)
+                if st.st_mtime < cutoff:
+                    try:
+                        # Manter estrutura de ano/mês no arquivo
+                        relative_path = os.path.relpath(os.path.dirname(entry.path), letters_dir)
+                        dest_dir = os.path.join(archive_dir, relative_path)
+                        os.makedirs(dest_dir, exist_ok=True)
 
-                            dest_path = os.path.join(dest_dir, filename)
-                            shutil.move(file_path, dest_path)
-                            archived_count += 1
-                            logger.info(f"Archived: {filename}")
+                        dest_path = os.path.join(dest_dir, filename)
+                        shutil.move(entry.path, dest_path)
+                        record_file_moved(entry.path, dest_path, st.st_size)
+                        archived_count += 1
+                        logger.info(f"Archived: {filename}")
 
-                        except Exception as e:
-                            logger.error(f"Error archiving {filename}: {str(e)}")
-                            error_count += 1
+                    except Exception as e:
+                        logger.error(f"Error archiving {filename}: {str(e)}")
+                        error_count += 1
 
             logger.info(f"Archival completed: {archived_count} files archived")
 
@@ -0,0 +1,154 @@
+"""
+Registo das execuções dos jobs do scheduler (tb_scheduler_job_run).
+DDL em app/sql/scheduler_job_runs.sql.
+
+start_run/finish_run são chamados pelo runner de app/scheduler.py, fora de
+qualquer pedido HTTP (sessão de sistema própria). Uma falha a gravar o
+registo nunca impede o job de correr — fica só no log.
+"""
+import json
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app.utils.error_handler import APIError
+from app.utils.utils import db_session_manager, db_system_session
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+RUN_STATUSES = ('running', 'success', 'error', 'skipped')
+ERROR_MAX_LENGTH = 4000
+# Uma execução 'running' mais antiga do que isto é de um processo que morreu
+STALE_RUN_HOURS = 6
+
+
+def _json_default(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def rows_from_result(result):
+    """Linhas afectadas a partir do retorno do job: int, ou dict com 'rows'."""
+    if isinstance(result, bool):
+        return None
+    if isinstance(result, int):
+        return result
+    if isinstance(result, dict) and isinstance(result.get('rows'), int):
+        return result['rows']
+    return None
+
+
+def start_run(job_id, host, trigger='cron', requested_by=None):
+    """Insere a execução em curso; devolve o pk (ou None se não foi possível gravar)."""
+    try:
+        with db_system_session() as session:
+            return session.execute(text("""
+                INSERT INTO tb_scheduler_job_run (job_id, trigger, requested_by, status, host)
+                VALUES (:job_id, :trigger, :requested_by, 'running', :host)
+                RETURNING pk
+            """), {'job_id': job_id, 'trigger': trigger,
+                   'requested_by': requested_by, 'host': host}).scalar()
+    except Exception as e:
+        logger.warning(f"[Scheduler] Execução de {job_id} não registada: {e}")
+        return None
+
+
+def finish_run(run_pk, status, duration_ms, result=None, error=None):
+    if run_pk is None:
+        return
+    detail = result if isinstance(result, (dict, list)) else None
+    try:
+        with db_system_session() as session:
+            session.execute(text("""
+                UPDATE tb_scheduler_job_run SET
+                    status        = :status,
+                    finished_at   = current_timestamp,
+                    duration_ms   = :duration_ms,
+                    rows_affected = :rows,
+                    detail        = CAST(:detail AS jsonb),
+                    error         = :error
+                WHERE pk = :pk
+            """), {
+                'pk': run_pk,
+                'status': status,
+                'duration_ms': duration_ms,
+                'rows': rows_from_result(result),
+                'detail': json.dumps(detail, default=_json_default) if detail is not None else None,
+                'error': error[:ERROR_MAX_LENGTH] if error else None,
+            })
+    except Exception as e:
+        logger.warning(f"[Scheduler] Fim da execução {run_pk} não registado: {e}")
+
+
+def purge_runs(days):
+    """Apaga execuções antigas e fecha as 'running' órfãs (processo morreu a meio)."""
+    with db_system_session() as session:
+        session.execute(text("""
+            UPDATE tb_scheduler_job_run
+            SET status = 'error', finished_at = current_timestamp,
+                error = 'Execução interrompida (processo terminou)'
+            WHERE status = 'running'
+              AND started_at < current_timestamp - make_interval(hours => :hours)
+        """), {'hours': STALE_RUN_HOURS})
+        deleted = session.execute(text("""
+            DELETE FROM tb_scheduler_job_run
+            WHERE started_at < current_timestamp - make_interval(days => :days)
+        """), {'days': days}).rowcount
+    return deleted
+
+
+def is_running(session, job_id):
+    return bool(session.execute(text("""
+        SELECT 1 FROM tb_scheduler_job_run
+        WHERE job_id = :job_id AND status = 'running'
+          AND started_at > current_timestamp - make_interval(hours => :hours)
+        LIMIT 1
+    """), {'job_id': job_id, 'hours': STALE_RUN_HOURS}).scalar())
+
+
+def _serialize(row):
+    return {k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in row.items()}
+
+
+def get_job_runs(current_user, job_id=None, status=None, limit=50):
+    """Execuções mais recentes (opcionalmente de um job / estado)."""
+    if status and status not in RUN_STATUSES:
+        raise APIError(f"Estado inválido: {status}", 400, "ERR_INVALID_STATUS")
+    conditions, params = [], {'limit': limit}
+    if job_id:
+        conditions.append("job_id = :job_id")
+        params['job_id'] = job_id
+    if status:
+        conditions.append("status = :status")
+        params['status'] = status
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    with db_session_manager(current_user) as session:
+        rows = session.execute(text(f"""
+            SELECT pk, job_id, trigger, requested_by, status, host, started_at,
+                   finished_at, duration_ms, rows_affected, detail, error
+            FROM tb_scheduler_job_run
+            {where}
+            ORDER BY started_at DESC
+            LIMIT :limit
+        """), params).mappings().all()
+    return {'runs': [_serialize(r) for r in rows]}, 200
+
+
+def get_scheduler_overview(current_user):
+    """Jobs registados, liderança deste processo e a última execução de cada job."""
+    from app.scheduler import get_scheduler_state
+
+    state = get_scheduler_state()
+    with db_session_manager(current_user) as session:
+        rows = session.execute(text("""
+            SELECT DISTINCT ON (job_id)
+                   job_id, trigger, status, host, started_at, finished_at,
+                   duration_ms, rows_affected, error
+            FROM tb_scheduler_job_run
+            ORDER BY job_id, started_at DESC
+        """)).mappings().all()
+    last = {r['job_id']: _serialize(r) for r in rows}
+    for job in state['jobs']:
+        job['last_run'] = last.get(job['id'])
+    return state, 200
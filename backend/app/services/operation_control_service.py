@@ -4,6 +4,7 @@ from sqlalchemy.exc import SQLAlchemyError
 from ..utils.utils import db_session_manager
 from ..utils.error_handler import api_error_handler
 from ..utils.file_processing import process_uploaded_file
+from .storage_accounting_service import remove_file
 from pydantic import BaseModel
 from typing import Optional
 import os
@@ -327,7 +328,7 @@ def delete_operation_annex(annex_pk: int, current_user: str):
             # Eliminar ficheiro do disco
             if os.path.exists(file_path):
                 if os.path.abspath(file_path).startswith(os.path.abspath(base_path)):
-                    os.remove(file_path)
+                    remove_file(file_path)
                     logger.info(f"Ficheiro eliminado: {file_path}")
 
             # Eliminar registo
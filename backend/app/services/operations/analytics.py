@@ -0,0 +1,300 @@
+"""
+Analytics das operações para o supervisor, servidos a partir de rollups.
+
+Substitui OperationsRepository.get_analytics_data, que ignorava os filtros e
+refazia COUNT(DISTINCT ...) e um GROUP BY por operador sobre toda a
+vbl_operacaometa (os templates, não as execuções) em cada pedido.
+
+- a base são as execuções (tb_operacao): total, concluídas, concluídas no
+  dia previsto e atraso até à conclusão (updt_time − dia previsto);
+- tb_operacao_rollup_dia guarda estes agregados por dia/instalação/modo/
+  operador (DDL e triggers em app/sql/operacao_analytics.sql); os dias
+  alterados ficam marcados em tb_operacao_rollup_dirty, o job
+  operacao_analytics_rollup recalcula-os e, até lá, a leitura agrega esses
+  dias directamente de tb_operacao — o resultado é sempre exacto;
+- filtros: período, instalação, modo (0/'pontual' = tarefas pontuais) e
+  operador; buckets dia/semana/mês;
+- série, totais e repartições por operador/instalação/modo saem de uma só
+  consulta (GROUPING SETS) sobre os rollups — milissegundos mesmo com
+  vários anos de histórico; lida na réplica, se existir.
+"""
+from datetime import date, timedelta
+
+from sqlalchemy.sql import text
+
+from app.utils.error_handler import APIError
+from app.utils.logger import get_logger
+from app.utils.utils import db_session_manager, db_system_session
+
+logger = get_logger(__name__)
+
+BUCKETS = ('day', 'week', 'month')
+MAX_RANGE_DAYS = 3660
+REFRESH_BATCH_DAYS = 400
+
+# Agregados de tb_operacao no formato do rollup; {where} escolhe os dias
+_FACTS_SQL = """
+    SELECT o.data AS dia,
+           COALESCE(o.tb_instalacao, 0) AS tb_instalacao,
+           COALESCE(o.tt_operacaomodo, 0) AS tt_operacaomodo,
+           COALESCE(o.ts_operador1, 0) AS ts_operador,
+           count(*) AS total,
+           count(o.updt_time) AS concluidas,
+           count(*) FILTER (WHERE o.updt_time < o.data + 1) AS no_dia,
+           COALESCE(sum(GREATEST(EXTRACT(EPOCH FROM o.updt_time - o.data), 0)), 0)::bigint AS atraso_soma,
+           max(GREATEST(EXTRACT(EPOCH FROM o.updt_time - o.data), 0))::bigint AS atraso_max
+    FROM tb_operacao o
+    WHERE {where}
+    GROUP BY 1, 2, 3, 4
+"""
+
+_CLAIM_DIRTY_SQL = text("""
+    DELETE FROM tb_operacao_rollup_dirty
+    WHERE dia IN (
+        SELECT dia FROM tb_operacao_rollup_dirty
+        ORDER BY dia
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING dia
+""")
+
+_DELETE_ROLLUP_SQL = text("DELETE FROM tb_operacao_rollup_dia WHERE dia = ANY(:days)")
+
+_INSERT_ROLLUP_SQL = text(f"""
+    INSERT INTO tb_operacao_rollup_dia (
+        dia, tb_instalacao, tt_operacaomodo, ts_operador,
+        total, concluidas, no_dia, atraso_soma, atraso_max
+    )
+    {_FACTS_SQL.format(where='o.data = ANY(:days)')}
+""")
+
+_PENDING_SQL = text("""
+    SELECT count(*) FROM tb_operacao_rollup_dirty
+    WHERE dia >= :start AND dia < :end
+""")
+
+_ANALYTICS_SQL = """
+    WITH pendentes AS (
+        SELECT dia FROM tb_operacao_rollup_dirty
+        WHERE dia >= :start AND dia < :end
+    ), facts AS (
+        SELECT dia, tb_instalacao, tt_operacaomodo, ts_operador,
+               total, concluidas, no_dia, atraso_soma, atraso_max
+        FROM tb_operacao_rollup_dia
+        WHERE dia >= :start AND dia < :end
+          AND dia NOT IN (SELECT dia FROM pendentes)
+        UNION ALL
+        {live}
+    )
+    SELECT CASE
+               WHEN GROUPING(periodo) = 0 THEN 'series'
+               WHEN GROUPING(ts_operador) = 0 THEN 'operator'
+               WHEN GROUPING(tb_instalacao) = 0 THEN 'installation'
+               WHEN GROUPING(tt_operacaomodo) = 0 THEN 'mode'
+               ELSE 'overview'
+           END AS dimensao,
+           periodo, ts_operador, tb_instalacao, tt_operacaomodo,
+           sum(total) AS total, sum(concluidas) AS concluidas, sum(no_dia) AS no_dia,
+           sum(atraso_soma) AS atraso_soma, max(atraso_max) AS atraso_max
+    FROM (
+        SELECT date_trunc('{bucket}', dia)::date AS periodo, facts.*
+        FROM facts
+        {filters}
+    ) f
+    GROUP BY GROUPING SETS ((periodo), (ts_operador), (tb_instalacao), (tt_operacaomodo), ())
+"""
+
+
+# ── Manutenção dos rollups ────────────────────────────────────────────────────
+
+def refresh_rollups(session, limit=REFRESH_BATCH_DAYS):
+    """
+    Recalcula até `limit` dias marcados (DELETE + INSERT do dia inteiro) na
+    transacção do chamador. Devolve o número de dias recalculados.
+    SKIP LOCKED: duas execuções em simultâneo repartem os dias.
+    """
+    days = [r[0] for r in session.execute(_CLAIM_DIRTY_SQL, {'limit': limit}).fetchall()]
+    if not days:
+        return 0
+    session.execute(_DELETE_ROLLUP_SQL, {'days': days})
+    session.execute(_INSERT_ROLLUP_SQL, {'days': days})
+    logger.info(f"[Analytics operações] Rollup de {len(days)} dia(s): {min(days)} → {max(days)}")
+    return len(days)
+
+
+def refresh_operations_rollups(app, max_batches=10):
+    """Job: recalcula os dias pendentes, um lote por transacção."""
+    total = 0
+    with app.app_context():
+        for _ in range(max_batches):
+            with db_system_session() as session:
+                done = refresh_rollups(session)
+            total += done
+            if done < REFRESH_BATCH_DAYS:
+                break
+    return total
+
+
+# ── Filtros ───────────────────────────────────────────────────────────────────
+
+def _parse_date(value, field):
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        raise APIError(f"Data inválida em {field}: {value}", 400, "ERR_INVALID_INPUT")
+
+
+def _parse_ids(value, field, aliases=None):
+    if value in (None, ''):
+        return None
+    items = value if isinstance(value, (list, tuple)) else str(value).split(',')
+    ids = []
+    for item in (str(i).strip().lower() for i in items):
+        if not item:
+            continue
+        if aliases and item in aliases:
+            ids.append(aliases[item])
+        elif item.isdigit():
+            ids.append(int(item))
+        else:
+            raise APIError(f"Valor inválido em {field}: {item}", 400, "ERR_INVALID_INPUT")
+    return ids or None
+
+
+def _default_bucket(days):
+    if days <= 62:
+        return 'day'
+    return 'week' if days <= 366 else 'month'
+
+
+def parse_filters(args, today=None):
+    """
+    from_date/to_date (inclusivos, ISO; por omissão os últimos 12 meses),
+    bucket (day|week|month; por omissão conforme o período), instalacao,
+    modo ('pontual' = 0) e operador (listas separadas por vírgulas).
+    """
+    args = args or {}
+    today = today or date.today()
+    end = _parse_date(args['to_date'], 'to_date') if args.get('to_date') else today
+    if args.get('from_date'):
+        start = _parse_date(args['from_date'], 'from_date')
+    else:
+        # Início do 11.º mês anterior: 12 meses completos até ao mês de to_date
+        months = end.year * 12 + end.month - 1 - 11
+        start = date(months // 12, months % 12 + 1, 1)
+    if start > end:
+        raise APIError("from_date não pode ser posterior a to_date", 400, "ERR_INVALID_INPUT")
+    days = (end - start).days + 1
+    if days > MAX_RANGE_DAYS:
+        raise APIError(f"Período máximo de {MAX_RANGE_DAYS} dias", 400, "ERR_INVALID_INPUT")
+
+    bucket = (args.get('bucket') or _default_bucket(days)).lower()
+    if bucket not in BUCKETS:
+        raise APIError(f"bucket deve ser um de: {', '.join(BUCKETS)}", 400, "ERR_INVALID_INPUT")
+
+    return {
+        'start': start,
+        'end': end + timedelta(days=1),
+        'bucket': bucket,
+        'instalacoes': _parse_ids(args.get('instalacao'), 'instalacao'),
+        'modos': _parse_ids(args.get('modo'), 'modo', aliases={'pontual': 0}),
+        'operadores': _parse_ids(args.get('operador'), 'operador'),
+    }
+
+
+def _filters_sql(filters):
+    conditions = []
+    for column, key in (('tb_instalacao', 'instalacoes'), ('tt_operacaomodo', 'modos'),
+                        ('ts_operador', 'operadores')):
+        if filters[key] is not None:
+            conditions.append(f"{column} = ANY(:{key})")
+    return ("WHERE " + " AND ".join(conditions)) if conditions else ""
+
+
+def build_query(filters):
+    # bucket vem da lista BUCKETS (parse_filters) e as colunas são fixas
+    live = _FACTS_SQL.format(where='o.data IN (SELECT dia FROM pendentes)')
+    return text(_ANALYTICS_SQL.format(live=live, bucket=filters['bucket'],
+                                      filters=_filters_sql(filters)))
+
+
+# ── Leitura ───────────────────────────────────────────────────────────────────
+
+def _metrics(row):
+    total, concluidas = int(row['total'] or 0), int(row['concluidas'] or 0)
+    return {
+        'total': total,
+        'completed': concluidas,
+        'pending': total - concluidas,
+        'completion_rate': round(100 * concluidas / total, 1) if total else 0,
+        'on_time_rate': round(100 * int(row['no_dia'] or 0) / concluidas, 1) if concluidas else None,
+        'avg_delay_hours': round(int(row['atraso_soma'] or 0) / concluidas / 3600, 1) if concluidas else None,
+        'max_delay_hours': round(int(row['atraso_max']) / 3600, 1) if row['atraso_max'] is not None else None,
+    }
+
+
+def _names(session, table, name_column, pks):
+    pks = [pk for pk in pks if pk]
+    if not pks:
+        return {}
+    rows = session.execute(text(f"SELECT pk, {name_column} FROM {table} WHERE pk = ANY(:pks)"),
+                           {'pks': pks}).fetchall()
+    return {r[0]: r[1] for r in rows}
+
+
+def summarize(rows, operator_names=None, installation_names=None):
+    """Separa as linhas dos GROUPING SETS em overview, série e repartições."""
+    operator_names = operator_names or {}
+    installation_names = installation_names or {}
+    result = {'overview': _metrics({'total': 0, 'concluidas': 0, 'no_dia': 0,
+                                    'atraso_soma': 0, 'atraso_max': None}),
+              'series': [], 'by_operator': [], 'by_installation': [], 'by_mode': []}
+    for row in rows:
+        dim = row['dimensao']
+        if dim == 'overview':
+            result['overview'] = _metrics(row)
+        elif dim == 'series':
+            result['series'].append({'period': row['periodo'].isoformat(), **_metrics(row)})
+        elif dim == 'operator':
+            pk = row['ts_operador'] or None
+            result['by_operator'].append({'pk': pk, 'name': operator_names.get(pk), **_metrics(row)})
+        elif dim == 'installation':
+            pk = row['tb_instalacao'] or None
+            result['by_installation'].append({'pk': pk, 'name': installation_names.get(pk), **_metrics(row)})
+        else:
+            mode = row['tt_operacaomodo']
+            result['by_mode'].append({'mode': mode or None, 'punctual': mode == 0, **_metrics(row)})
+
+    result['series'].sort(key=lambda s: s['period'])
+    for key in ('by_operator', 'by_installation', 'by_mode'):
+        result[key].sort(key=lambda r: -r['total'])
+    result['overview']['active_operators'] = sum(1 for o in result['by_operator'] if o['pk'] and o['total'])
+    result['overview']['total_installations'] = sum(1 for i in result['by_installation'] if i['pk'])
+    return result
+
+
+def get_operations_analytics(current_user, args=None):
+    """Analytics filtrados e por bucket: {filters, overview, series, by_operator, by_installation, by_mode}."""
+    filters = parse_filters(args)
+    params = {k: v for k, v in filters.items() if k != 'bucket' and v is not None}
+    with db_session_manager(current_user, readonly=True) as session:
+        rows = session.execute(build_query(filters), params).mappings().all()
+        operator_names = _names(session, 'ts_client', 'name',
+                                [r['ts_operador'] for r in rows if r['dimensao'] == 'operator'])
+        installation_names = _names(session, 'tb_instalacao', 'nome',
+                                    [r['tb_instalacao'] for r in rows if r['dimensao'] == 'installation'])
+        pending_days = session.execute(_PENDING_SQL, {'start': filters['start'], 'end': filters['end']}).scalar()
+
+    result = summarize(rows, operator_names, installation_names)
+    result['filters'] = {
+        'from_date': filters['start'].isoformat(),
+        'to_date': (filters['end'] - timedelta(days=1)).isoformat(),
+        'bucket': filters['bucket'],
+        'instalacao': filters['instalacoes'],
+        'modo': filters['modos'],
+        'operador': filters['operadores'],
+    }
+    # Dias ainda por agregar (lidos de tb_operacao neste pedido)
+    result['pending_days'] = pending_days or 0
+    return result
@@ -5,6 +5,8 @@ from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
 import os
+import shutil
+import uuid
 from functools import wraps
 from app import cache
 from app.utils.logger import get_logger
@@ -174,6 +176,47 @@ def save_operation_photo(photo_file, operation_pk, instalacao_nome, current_user
         raise APIError(f"Erro ao guardar foto: {str(e)}", 500, "ERR_SAVE_FILE")
 
 
+STAGING_DIR = '_staging'
+
+
+def stage_operation_photo(photo_file):
+    """
+    Guarda a foto tal como chegou em TarefasOperação/_staging, sem compressão
+    — o processamento fica para a fila (operations/photo_queue.py), fora do
+    pedido. Devolve o caminho absoluto do ficheiro em espera.
+    """
+    base_path = current_app.config.get('FILES_DIR', '/var/www/html/files')
+    staging = os.path.join(base_path, 'TarefasOperação', STAGING_DIR)
+    os.makedirs(staging, exist_ok=True)
+
+    ext = os.path.splitext(photo_file.filename or '')[1].lower() or '.jpg'
+    file_path = os.path.join(staging, f"{uuid.uuid4().hex}{ext}")
+    photo_file.save(file_path)
+    return file_path
+
+
+def finalize_staged_photo(staged_path, operation_pk, instalacao_nome, when=None):
+    """
+    Move uma foto em espera para a pasta da instalação, comprime-a e devolve
+    o caminho relativo — o mesmo formato de save_operation_photo.
+    """
+    when = when or datetime.now()
+    ano = when.strftime('%Y')
+    mes = when.strftime('%m')
+    operations_base, full_path = ensure_operation_directories(instalacao_nome, ano, mes)
+
+    ext = os.path.splitext(staged_path)[1].lower() or '.jpg'
+    filename = f"operacao_{operation_pk}_{when.strftime('%Y%m%d_%H%M%S')}{ext}"
+    file_path = os.path.join(full_path, filename)
+    shutil.move(staged_path, file_path)
+
+    file_path, _, _ = process_uploaded_file(file_path, filename)
+    os.chmod(file_path, 0o644)
+
+    safe_instalacao = "".join(c for c in instalacao_nome if c.isalnum() or c in (' ', '-', '_', '(', ')')).strip()
+    return f"TarefasOperação/{safe_instalacao}/{ano}/{mes}/{os.path.basename(file_path)}"
+
+
 def download_operation_photo(instalacao_nome, ano, mes, filename):
     """
     Download da foto de uma operação com normalização robusta
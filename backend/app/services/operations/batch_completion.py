@@ -0,0 +1,264 @@
+"""
+Conclusão de tarefas em lote (app Android, modo offline).
+
+Depois de um dia sem rede o operador tinha de reenviar, uma a uma, cada
+conclusão (/operacao_complete) e cada foto — dezenas de pedidos em série,
+cada um com a sua sessão. POST /operacao_complete/batch recebe tudo num
+multipart:
+
+    bundle = {"items": [{"key": "<uuid do cliente>", "task_id": 123,
+                         "valuetext": "7.2", "valuememo": null,
+                         "params": [{"pk": 55, "value": "7.1"}],
+                         "photo": "photo_0"}]}
+    photo_0 = <ficheiro>          (parte multipart referida pelo item)
+
+- o lote é validado antes de tocar na BD (pydantic, limites, fotos);
+- tudo numa transacção, com um SAVEPOINT por item: um item inválido fica com
+  status 'error' e os restantes seguem — resultados por item;
+- idempotente: cada item traz uma chave gerada no cliente, registada em
+  tb_operacao_sync na mesma transacção. Um reenvio devolve 'duplicate' com
+  o resultado original, sem concluir a tarefa duas vezes;
+- as fotos são só guardadas tal como chegaram e postas na fila
+  (operations/photo_queue.py) — compressão e photo_path fora do pedido;
+- o supervisor recebe uma notificação por lote, não uma por tarefa.
+"""
+import json
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import List, Optional
+
+from flask import current_app
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy.sql import text
+
+from app.utils.error_handler import APIError
+from app.utils.utils import db_session_manager
+from app.utils.logger import get_logger
+from .attachments import stage_operation_photo
+from .photo_queue import enqueue_photo, wake_photo_worker
+
+logger = get_logger(__name__)
+
+MAX_ITEMS = 200
+MAX_PHOTO_BYTES = 20 * 1024 * 1024
+PHOTO_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.heic'}
+
+
+class BatchParam(BaseModel):
+    pk: int
+    value: Optional[str] = None
+    memo: Optional[str] = None
+
+
+class BatchCompletion(BaseModel):
+    key: str = Field(..., min_length=8, max_length=64)
+    task_id: int
+    valuetext: Optional[str] = ''
+    valuememo: Optional[str] = None
+    params: List[BatchParam] = []
+    photo: Optional[str] = None       # nome da parte multipart com a foto
+
+
+class CompletionBundle(BaseModel):
+    items: List[BatchCompletion] = Field(..., min_length=1, max_length=MAX_ITEMS)
+
+
+def parse_bundle(raw):
+    """Valida o JSON do lote. Chaves repetidas no mesmo lote são um erro do cliente."""
+    try:
+        bundle = CompletionBundle.model_validate(json.loads(raw) if isinstance(raw, (str, bytes)) else raw)
+    except (ValueError, ValidationError) as e:
+        logger.warning(f"Lote de conclusões inválido: {e}")
+        raise APIError("Lote de conclusões inválido", 400, "ERR_VALIDATION")
+    keys = [item.key for item in bundle.items]
+    if len(keys) != len(set(keys)):
+        raise APIError("Chaves repetidas no lote", 400, "ERR_VALIDATION")
+    return bundle
+
+
+def _photo_size(photo):
+    stream = photo.stream
+    pos = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(pos)
+    return size
+
+
+def _check_photo(item, files):
+    """Mensagem de erro da foto do item, ou None se estiver em condições."""
+    if not item.photo:
+        return None
+    photo = files.get(item.photo)
+    if photo is None or not photo.filename:
+        return f"Foto '{item.photo}' em falta no pedido"
+    if os.path.splitext(photo.filename)[1].lower() not in PHOTO_EXTENSIONS:
+        return "Formato de foto não suportado"
+    if _photo_size(photo) > MAX_PHOTO_BYTES:
+        return "Foto demasiado grande"
+    return None
+
+
+def _claim_key(session, user_id, item):
+    """Regista a chave; devolve o resultado guardado se a chave já existia."""
+    inserted = session.execute(text("""
+        INSERT INTO tb_operacao_sync (ts_client, client_key, tb_operacao)
+        VALUES (:user_id, :key, :task_id)
+        ON CONFLICT (ts_client, client_key) DO NOTHING
+        RETURNING 1
+    """), {'user_id': user_id, 'key': item.key, 'task_id': item.task_id}).scalar()
+    if inserted:
+        return None
+    return session.execute(text("""
+        SELECT result FROM tb_operacao_sync WHERE ts_client = :user_id AND client_key = :key
+    """), {'user_id': user_id, 'key': item.key}).scalar() or {}
+
+
+def _complete_item(session, user_id, item, task, param_owner, instalacoes, photo):
+    stored = _claim_key(session, user_id, item)
+    if stored is not None:
+        return {**stored, 'key': item.key, 'task_id': item.task_id, 'status': 'duplicate'}
+    if task is None:
+        raise APIError("Tarefa não encontrada ou sem permissão", 404, "ERR_NOT_FOUND")
+    for p in item.params:
+        if param_owner.get(p.pk) != item.task_id:
+            raise APIError(f"Parâmetro {p.pk} não pertence à tarefa", 400, "ERR_INVALID_INPUT")
+
+    session.execute(text("""
+        SELECT fbf_operacao(
+            1, :pk, NULL, NULL, :tb_instalacao, NULL, NULL, NULL,
+            :tt_operacaoaccao, :valuetext, :valuememo, NULL, NULL
+        )
+    """), {
+        'pk': item.task_id,
+        'tb_instalacao': task['pk_instalacao'],
+        'tt_operacaoaccao': task['pk_operacaoaccao'],
+        'valuetext': item.valuetext or '',
+        'valuememo': item.valuememo or None,
+    })
+    for p in item.params:
+        session.execute(text("SELECT fbf_operacao_param(1, :pk, :value, :memo)"),
+                        {'pk': p.pk, 'value': p.value, 'memo': p.memo})
+
+    photo_status = None
+    if photo is not None:
+        staged = stage_operation_photo(photo)
+        try:
+            enqueue_photo(session, item.task_id, staged,
+                          instalacoes.get(task['pk_instalacao']) or str(task['pk_instalacao']))
+        except Exception:
+            os.remove(staged)
+            raise
+        photo_status = 'queued'
+
+    result = {
+        'status': 'completed',
+        'completed_at': datetime.now().isoformat(),
+        'params': len(item.params),
+        'photo': photo_status,
+    }
+    session.execute(text("""
+        UPDATE tb_operacao_sync SET result = CAST(:result AS jsonb)
+        WHERE ts_client = :user_id AND client_key = :key
+    """), {'result': json.dumps(result), 'user_id': user_id, 'key': item.key})
+    return {**result, 'key': item.key, 'task_id': item.task_id}
+
+
+def _error_result(item, message):
+    return {'key': item.key, 'task_id': item.task_id, 'status': 'error', 'error': message}
+
+
+def _notify_supervisors(session, task_ids, instalacoes, tasks):
+    """Uma notificação por supervisor com as tarefas do lote que lhe dizem respeito."""
+    from app.services.operations_service import _emit_operacao_notif
+
+    rows = session.execute(text("""
+        SELECT o.pk, o.tb_operacaometa, m.ins_client
+        FROM tb_operacao o
+        JOIN tb_operacaometa m ON m.pk = o.tb_operacaometa
+        WHERE o.pk = ANY(:pks) AND m.ins_client IS NOT NULL
+    """), {'pks': task_ids}).mappings().all()
+    by_supervisor = defaultdict(list)
+    for r in rows:
+        by_supervisor[r['ins_client']].append(r)
+
+    for supervisor_pk, items in by_supervisor.items():
+        if len(items) == 1:
+            r = items[0]
+            nome = instalacoes.get(tasks[r['pk']]['pk_instalacao']) or 'instalação'
+            message = f'Tarefa em {nome} foi concluída pelo operador.'
+            meta_pk, operacao_pk = r['tb_operacaometa'], r['pk']
+        else:
+            message = f'{len(items)} tarefas foram concluídas pelo operador (sincronização).'
+            meta_pk, operacao_pk = None, None
+        _emit_operacao_notif(
+            notification_type='tarefa_executada',
+            title='Tarefa executada' if len(items) == 1 else 'Tarefas executadas',
+            message=message,
+            user_ids=[supervisor_pk],
+            meta_pk=meta_pk,
+            operacao_pk=operacao_pk,
+        )
+
+
+def complete_tasks_batch(user_id, current_user, raw_bundle, files):
+    """
+    Processa um lote de conclusões. Devolve ({results, summary}, 200) — os
+    erros por item vão nos resultados; só um lote mal formado dá 400.
+    """
+    bundle = parse_bundle(raw_bundle)
+    task_ids = sorted({item.task_id for item in bundle.items})
+    param_pks = sorted({p.pk for item in bundle.items for p in item.params})
+
+    results = []
+    completed_ids = []
+    with db_session_manager(current_user) as session:
+        # vbl_operacao$self aplica a visibilidade do operador (e o updatedelay)
+        tasks = {r['pk']: dict(r) for r in session.execute(text("""
+            SELECT pk, pk_instalacao, pk_operacaoaccao
+            FROM "vbl_operacao$self"
+            WHERE pk = ANY(:pks)
+        """), {'pks': task_ids}).mappings().all()}
+        param_owner = dict(session.execute(text("""
+            SELECT pk, tb_operacao FROM tb_operacao_param WHERE pk = ANY(:pks)
+        """), {'pks': param_pks}).fetchall()) if param_pks else {}
+        instalacoes = dict(session.execute(text("""
+            SELECT pk, nome FROM tb_instalacao WHERE pk = ANY(:pks)
+        """), {'pks': sorted({t['pk_instalacao'] for t in tasks.values()})}).fetchall()) if tasks else {}
+
+        for item in bundle.items:
+            photo_error = _check_photo(item, files)
+            if photo_error:
+                results.append(_error_result(item, photo_error))
+                continue
+            try:
+                with session.begin_nested():
+                    result = _complete_item(
+                        session, user_id, item, tasks.get(item.task_id), param_owner,
+                        instalacoes, files.get(item.photo) if item.photo else None,
+                    )
+            except APIError as e:
+                results.append(_error_result(item, e.message))
+                continue
+            except Exception as e:
+                logger.error(f"Lote: erro ao concluir tarefa {item.task_id}: {e}", exc_info=True)
+                results.append(_error_result(item, 'Erro ao concluir tarefa'))
+                continue
+            results.append(result)
+            if result['status'] == 'completed':
+                completed_ids.append(item.task_id)
+
+    summary = {s: sum(1 for r in results if r['status'] == s) for s in ('completed', 'duplicate', 'error')}
+    logger.info(f"Lote de conclusões do utilizador {user_id}: {summary}")
+
+    if any(r.get('photo') == 'queued' and r['status'] == 'completed' for r in results):
+        wake_photo_worker(current_app._get_current_object())
+    if completed_ids:
+        try:
+            with db_session_manager(current_user) as session:
+                _notify_supervisors(session, completed_ids, instalacoes, tasks)
+        except Exception as e:
+            logger.warning(f"Lote: notificação dos supervisores falhou: {e}")
+
+    return {'results': results, 'summary': summary}, 200
@@ -0,0 +1,267 @@
+"""
+Geração das tarefas operacionais do mês (tb_operacao) a partir dos templates
+(tb_operacaometa).
+
+Substitui as chamadas, modo a modo, a fbf_operacao$init / $init_remaining
+seguidas de um COUNT com EXTRACT(MONTH/YEAR FROM data) (não usa o índice de
+data) e de nova consulta aos operadores de cada modo:
+
+- o plano do período inteiro, para todos os modos, é calculado em memória
+  a partir de uma única leitura de tb_operacaometa — a mesma regra da
+  procedure: semana = ceil(dia/7) (a 5.ª semana conta como 1.ª) e dia da
+  semana → tt_operacaodia;
+- dry_run devolve só o plano: totais por modo, carga por operador, por
+  instalação e por dia — para o supervisor rever antes de gerar;
+- a gravação é um único INSERT ... SELECT FROM unnest(...) (com as análises
+  das acções tipo 5 na mesma instrução) e os totais por modo vêm do
+  RETURNING, sem voltar a contar;
+- todos os filtros de período são intervalos sobre data (>= início, < fim).
+
+Mês futuro: substitui as tarefas do mês/modos (como fbf_operacao$init).
+Dias restantes do mês corrente: aditivo, salta o que já existe.
+"""
+import math
+from collections import Counter
+from datetime import date, timedelta
+
+from sqlalchemy.sql import text
+
+from app.utils.error_handler import APIError
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_TEMPLATES_SQL = """
+    SELECT m.tt_operacaomodo, m.tb_instalacao, m.ts_operador1, m.ts_operador2,
+           m.tt_operacaoaccao, d.week, d.dayn,
+           i.nome AS instalacao_nome, c1.name AS operador1_nome, c2.name AS operador2_nome
+    FROM tb_operacaometa m
+    JOIN tt_operacaodia d ON d.pk = m.tt_operacaodia
+    LEFT JOIN tb_instalacao i ON i.pk = m.tb_instalacao
+    LEFT JOIN ts_client c1 ON c1.pk = m.ts_operador1
+    LEFT JOIN ts_client c2 ON c2.pk = m.ts_operador2
+"""
+
+_EXISTING_SQL = text("""
+    SELECT data, tb_instalacao, tt_operacaoaccao, tt_operacaomodo
+    FROM tb_operacao
+    WHERE data >= :start AND data < :end
+      AND tt_operacaomodo = ANY(:modes)
+""")
+
+_DELETE_ANALISE_SQL = text("""
+    DELETE FROM tb_instalacao_analise
+    WHERE tb_operacao IN (
+        SELECT pk FROM tb_operacao
+        WHERE data >= :start AND data < :end AND tt_operacaomodo = ANY(:modes)
+    )
+""")
+
+_DELETE_SQL = text("""
+    DELETE FROM tb_operacao
+    WHERE data >= :start AND data < :end AND tt_operacaomodo = ANY(:modes)
+""")
+
+# Atributos da acção copiados para a tarefa, como na procedure
+_INSERT_SQL = text("""
+    WITH plan AS (
+        -- Uma tarefa por (data, instalação, acção, modo), como a procedure linha a linha:
+        -- templates repetidos no mesmo dia ficam só com o primeiro
+        SELECT DISTINCT ON (data, tb_instalacao, tt_operacaoaccao, tt_operacaomodo) *
+        FROM unnest(CAST(:datas AS date[]), CAST(:modos AS int[]), CAST(:instalacoes AS int[]),
+                    CAST(:operadores1 AS int[]), CAST(:operadores2 AS int[]), CAST(:accoes AS int[]))
+             WITH ORDINALITY
+             AS p(data, tt_operacaomodo, tb_instalacao, ts_operador1, ts_operador2, tt_operacaoaccao, ord)
+        ORDER BY data, tb_instalacao, tt_operacaoaccao, tt_operacaomodo, ord
+    ), ins AS (
+        INSERT INTO tb_operacao (
+            pk, data, photo, tt_operacaomodo, tb_instalacao,
+            ts_operador1, ts_operador2, tt_operacaoaccao,
+            tt_operacaoaccao_type, tt_operacaoaccao_refobj, tt_operacaoaccao_refpk,
+            tt_operacaoaccao_refvalue, tt_operacaoaccao_updatedelay,
+            tt_operacaoaccao_analiseparam, tt_operacaoaccao_analiseponto,
+            tt_operacaoaccao_analiseforma
+        )
+        SELECT nextval('sq_codes'), p.data, a.photo, p.tt_operacaomodo, p.tb_instalacao,
+               p.ts_operador1, p.ts_operador2, p.tt_operacaoaccao,
+               a.type, a.refobj, a.refpk, a.refvalue, a.updatedelay,
+               a.tt_analiseparam, a.tt_analiseponto, a.tt_analiseforma
+        FROM plan p
+        LEFT JOIN tt_operacaoaccao a ON a.pk = p.tt_operacaoaccao
+        WHERE NOT EXISTS (
+            SELECT 1 FROM tb_operacao o
+            WHERE o.data = p.data
+              AND o.tb_instalacao = p.tb_instalacao
+              AND o.tt_operacaoaccao = p.tt_operacaoaccao
+              AND o.tt_operacaomodo = p.tt_operacaomodo
+        )
+        RETURNING pk, data, tb_instalacao, ts_operador1, ts_operador2, tt_operacaomodo,
+                  tt_operacaoaccao_type, tt_operacaoaccao_analiseparam,
+                  tt_operacaoaccao_analiseponto, tt_operacaoaccao_analiseforma
+    ), analise AS (
+        INSERT INTO tb_instalacao_analise (
+            pk, data, tb_instalacao, tt_analiseponto, tt_analiseparam,
+            tt_analiseforma, operador1, operador2, tb_operacao
+        )
+        SELECT nextval('sq_codes'), data, tb_instalacao, tt_operacaoaccao_analiseponto,
+               tt_operacaoaccao_analiseparam, tt_operacaoaccao_analiseforma,
+               ts_operador1, ts_operador2, pk
+        FROM ins
+        WHERE tt_operacaoaccao_type = 5
+        RETURNING 1
+    )
+    SELECT tt_operacaomodo, count(*) AS tasks, (SELECT count(*) FROM analise) AS analises
+    FROM ins
+    GROUP BY tt_operacaomodo
+""")
+
+
+def month_range(month, year):
+    """(primeiro dia, primeiro dia do mês seguinte) — intervalo semiaberto."""
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+
+def operacao_week(day):
+    """Semana do mês na regra de tt_operacaodia: 1-4; os dias 29-31 voltam à 1."""
+    week = math.ceil(day.day / 7)
+    return 1 if week > 4 else week
+
+
+def load_templates(session, modes=None):
+    sql = _TEMPLATES_SQL
+    params = {}
+    if modes:
+        sql += " WHERE m.tt_operacaomodo = ANY(:modes)"
+        params['modes'] = list(modes)
+    return [dict(r) for r in session.execute(text(sql), params).mappings().all()]
+
+
+def build_plan(templates, start, end, existing=frozenset()):
+    """
+    Tarefas do intervalo [start, end): lista de (data, template).
+    existing: chaves (data, instalação, acção, modo) que já existem e são saltadas;
+    templates repetidos para a mesma chave geram uma só tarefa.
+    """
+    seen = set(existing)
+    by_slot = {}
+    for t in templates:
+        by_slot.setdefault((t['week'], t['dayn']), []).append(t)
+
+    plan = []
+    day = start
+    while day < end:
+        # isoweekday() % 7 = extract(dow): domingo 0 … sábado 6
+        for t in by_slot.get((operacao_week(day), day.isoweekday() % 7), ()):
+            key = (day, t['tb_instalacao'], t['tt_operacaoaccao'], t['tt_operacaomodo'])
+            if key not in seen:
+                seen.add(key)
+                plan.append((day, t))
+        day += timedelta(days=1)
+    return plan
+
+
+def summarize_plan(plan):
+    """Carga do plano por modo, operador, instalação e dia."""
+    by_mode = Counter()
+    by_day = Counter()
+    operators = {}
+    installations = {}
+    for day, t in plan:
+        by_mode[t['tt_operacaomodo']] += 1
+        by_day[day.isoformat()] += 1
+        inst = installations.setdefault(
+            t['tb_instalacao'], {'pk': t['tb_instalacao'], 'name': t['instalacao_nome'], 'tasks': 0})
+        inst['tasks'] += 1
+        for pk, name in ((t['ts_operador1'], t['operador1_nome']), (t['ts_operador2'], t['operador2_nome'])):
+            if pk:
+                op = operators.setdefault(pk, {'pk': pk, 'name': name, 'tasks': 0, 'per_day': Counter()})
+                op['tasks'] += 1
+                op['per_day'][day] += 1
+
+    by_operator = sorted(
+        ({'pk': op['pk'], 'name': op['name'], 'tasks': op['tasks'],
+          'days': len(op['per_day']), 'max_per_day': max(op['per_day'].values())}
+         for op in operators.values()),
+        key=lambda o: -o['tasks'],
+    )
+    return {
+        'total': len(plan),
+        'by_mode': dict(by_mode),
+        'by_operator': by_operator,
+        'by_installation': sorted(installations.values(), key=lambda i: -i['tasks']),
+        'by_day': dict(sorted(by_day.items())),
+    }
+
+
+def _existing_keys(session, start, end, modes):
+    rows = session.execute(_EXISTING_SQL, {'start': start, 'end': end, 'modes': modes}).fetchall()
+    return {tuple(r) for r in rows}
+
+
+def _insert_plan(session, plan):
+    """INSERT único do plano. Devolve ({modo: tarefas}, análises criadas)."""
+    if not plan:
+        return {}, 0
+    rows = session.execute(_INSERT_SQL, {
+        'datas': [d for d, _ in plan],
+        'modos': [t['tt_operacaomodo'] for _, t in plan],
+        'instalacoes': [t['tb_instalacao'] for _, t in plan],
+        'operadores1': [t['ts_operador1'] for _, t in plan],
+        'operadores2': [t['ts_operador2'] for _, t in plan],
+        'accoes': [t['tt_operacaoaccao'] for _, t in plan],
+    }).fetchall()
+    return {r.tt_operacaomodo: r.tasks for r in rows}, (rows[0].analises if rows else 0)
+
+
+def _generate(session, start, end, modes, replace, dry_run):
+    templates = load_templates(session, modes)
+    modes = sorted(set(modes or (t['tt_operacaomodo'] for t in templates)))
+    # Substituição: o que existe vai ser apagado, por isso não conta como existente
+    existing = frozenset() if replace or not modes else _existing_keys(session, start, end, modes)
+    plan = build_plan(templates, start, end, existing)
+
+    result = {
+        'start': start.isoformat(),
+        'end': (end - timedelta(days=1)).isoformat(),
+        'modes': modes,
+        'dry_run': dry_run,
+        **summarize_plan(plan),
+    }
+    if dry_run or not modes:
+        return result
+
+    if replace:
+        params = {'start': start, 'end': end, 'modes': modes}
+        session.execute(_DELETE_ANALISE_SQL, params)
+        result['replaced'] = session.execute(_DELETE_SQL, params).rowcount
+    by_mode, analises = _insert_plan(session, plan)
+    result.update(by_mode=by_mode, total=sum(by_mode.values()), analises=analises)
+    return result
+
+
+def generate_month(session, month, year, modes=None, dry_run=False, today=None):
+    """
+    Gera (ou pré-visualiza) as tarefas de um mês futuro para os modos dados
+    (todos, se None), substituindo as que já existam nesse mês/modos.
+    Corre na transacção do chamador.
+    """
+    today = today or date.today()
+    if (year, month) <= (today.year, today.month):
+        raise APIError('Só é possível gerar tarefas para meses futuros.', 409, 'ERR_INVALID_PERIOD')
+    start, end = month_range(month, year)
+    result = _generate(session, start, end, modes, replace=True, dry_run=dry_run)
+    logger.info(f"Geração mensal {month:02d}/{year} (modos={result['modes']}, dry_run={dry_run}): "
+                f"{result['total']} tarefas {result['by_mode']}")
+    return result
+
+
+def generate_remaining(session, modes=None, dry_run=False, today=None):
+    """Tarefas de hoje até ao fim do mês corrente; aditivo (salta as que já existem)."""
+    today = today or date.today()
+    _, end = month_range(today.month, today.year)
+    result = _generate(session, today, end, modes, replace=False, dry_run=dry_run)
+    logger.info(f"Geração dos dias restantes (modos={result['modes']}, dry_run={dry_run}): "
+                f"{result['total']} tarefas {result['by_mode']}")
+    return result
@@ -0,0 +1,149 @@
+"""
+Fila de processamento das fotos recebidas nos lotes de conclusão de tarefas.
+DDL em app/sql/operacao_batch.sql (tb_operacao_photo_queue).
+
+O pedido do lote só guarda o ficheiro tal como chegou (stage_operation_photo)
+e insere a linha na fila, na mesma transacção da conclusão. Depois do commit
+um worker em background deste processo — e o job de recurso do scheduler,
+que apanha o que ficou pendente após um restart — move cada foto para a
+pasta da instalação, comprime-a e grava tb_operacao.photo_path.
+
+As linhas são reclamadas com FOR UPDATE SKIP LOCKED (como a outbox de
+emails), por isso vários processos podem trabalhar a fila em paralelo.
+"""
+import os
+import threading
+
+from sqlalchemy import text
+
+from app.utils.utils import db_system_session
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CLAIM_SIZE = 20
+MAX_ATTEMPTS = 5
+# Linha em 'processing' há mais do que isto = processo morreu a meio; volta à fila
+STALE_CLAIM_MINUTES = 10
+WORKER_IDLE_SECONDS = 60
+
+
+def enqueue_photo(session, tb_operacao, staged_path, instalacao_nome):
+    """Insere a foto na fila usando a transacção do chamador (a do lote)."""
+    return session.execute(text("""
+        INSERT INTO tb_operacao_photo_queue (tb_operacao, staged_path, instalacao_nome)
+        VALUES (:tb_operacao, :staged_path, :instalacao_nome)
+        RETURNING pk
+    """), {
+        'tb_operacao': tb_operacao,
+        'staged_path': staged_path,
+        'instalacao_nome': instalacao_nome,
+    }).scalar()
+
+
+def _claim(session, limit=CLAIM_SIZE):
+    rows = session.execute(text("""
+        UPDATE tb_operacao_photo_queue q
+        SET status = 'processing', attempts = q.attempts + 1, claimed_at = current_timestamp
+        WHERE q.pk IN (
+            SELECT pk FROM tb_operacao_photo_queue
+            WHERE status = 'pending'
+               OR (status = 'processing'
+                   AND claimed_at < current_timestamp - make_interval(mins => :stale))
+            ORDER BY pk
+            LIMIT :limit
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING q.pk, q.tb_operacao, q.staged_path, q.instalacao_nome, q.attempts, q.created_at
+    """), {'limit': limit, 'stale': STALE_CLAIM_MINUTES}).mappings().all()
+    session.commit()
+    return [dict(r) for r in rows]
+
+
+def _process_one(session, row):
+    from .attachments import finalize_staged_photo
+
+    photo_path = finalize_staged_photo(
+        row['staged_path'], row['tb_operacao'], row['instalacao_nome'], row['created_at'],
+    )
+    session.execute(text("""
+        UPDATE tb_operacao SET photo_path = :photo_path WHERE pk = :pk
+    """), {'photo_path': photo_path, 'pk': row['tb_operacao']})
+    session.execute(text("""
+        UPDATE tb_operacao_photo_queue
+        SET status = 'done', photo_path = :photo_path, processed_at = current_timestamp,
+            last_error = NULL
+        WHERE pk = :pk
+    """), {'photo_path': photo_path, 'pk': row['pk']})
+
+
+def _mark_failed(session, row, error):
+    # Sem o ficheiro em espera não há nada a repetir
+    give_up = row['attempts'] >= MAX_ATTEMPTS or not os.path.exists(row['staged_path'])
+    session.execute(text("""
+        UPDATE tb_operacao_photo_queue
+        SET status = :status, last_error = :error
+        WHERE pk = :pk
+    """), {'pk': row['pk'], 'status': 'failed' if give_up else 'pending', 'error': str(error)[:2000]})
+    if give_up:
+        logger.error(f"[Fotos] Foto da tarefa {row['tb_operacao']} falhou definitivamente: {error}")
+
+
+def process_pending_photos(session):
+    """Processa tudo o que está na fila. Devolve quantas fotos ficaram gravadas."""
+    done = 0
+    while True:
+        rows = _claim(session)
+        if not rows:
+            return done
+        for row in rows:
+            try:
+                _process_one(session, row)
+                session.commit()
+                done += 1
+            except Exception as e:
+                session.rollback()
+                logger.warning(f"[Fotos] Falha ao processar foto da tarefa {row['tb_operacao']}: {e}")
+                _mark_failed(session, row, e)
+                session.commit()
+
+
+def process_photo_queue(app):
+    """Job de recurso: processa as fotos que o worker em background não apanhou."""
+    with app.app_context():
+        with db_system_session() as session:
+            return process_pending_photos(session)
+
+
+class _PhotoWorker:
+    """Thread em background (uma por processo) acordada depois de cada lote."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def wake(self, app):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, args=(app,), name='operacao-photos', daemon=True,
+                )
+                self._thread.start()
+        self._event.set()
+
+    def _run(self, app):
+        while True:
+            self._event.wait(WORKER_IDLE_SECONDS)
+            self._event.clear()
+            try:
+                process_photo_queue(app)
+            except Exception as e:
+                logger.error(f"[Fotos] Erro no worker da fila de fotos: {e}", exc_info=True)
+
+
+_worker = _PhotoWorker()
+
+
+def wake_photo_worker(app):
+    _worker.wake(app)
@@ -0,0 +1,227 @@
+"""
+Views de relatório das operações (vbr_document_*) — quadro de pedidos.
+
+Antes: GET /operations fazia SELECT * às 12 views, uma a seguir à outra, e
+devolvia todas as linhas de todas num único JSON, sem cache nem paginação.
+
+- as views são lidas em paralelo (uma sessão por thread, como o dashboard);
+- as leituras pedem readonly=True: vão à réplica quando existe e está
+  dentro do orçamento de atraso (app/utils/db_routing.py);
+- cada resultado fica em cache REPORT_CACHE_TTL segundos. As chaves levam a
+  "geração" actual; invalidate_operations_reports() muda-a, e é chamada
+  sempre que um passo de documento muda (add_document_step, pavenext) — os
+  pedidos mudam de estado/vista e o quadro não pode ficar atrás;
+- GET /operations?summary=1 devolve só nome, total e colunas de cada view;
+- GET /operations/views/<view> devolve uma página de uma view, com ordenação
+  e projecção de colunas feitas na BD (LIMIT/OFFSET + count). A ordem é
+  sempre total: pk da view (ou a primeira coluna) por omissão e como
+  desempate de sort.
+
+As vbr_document_* não dependem do utilizador da sessão, por isso a cache é
+partilhada; o acesso continua a ser verificado na rota (operation.access).
+"""
+import hashlib
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.sql import text
+
+from app import cache
+from app.utils.error_handler import APIError
+from app.utils.utils import db_session_manager
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+REPORT_VIEWS = {
+    'vbr_document_fossa01': 'Limpezas de fossa global',
+    'vbr_document_fossa02': 'Limpeza de fossa Carregal do Sal',
+    'vbr_document_fossa03': 'Limpeza de fossa Santa Comba Dão',
+    'vbr_document_fossa04': 'Limpeza de fossa Tábua',
+    'vbr_document_fossa05': 'Limpeza de fossa Tondela',
+    'vbr_document_ramais01': 'Ramais',
+    'vbr_document_caixas01': 'Caixas',
+    'vbr_document_desobstrucao01': 'Desobstrução',
+    'vbr_document_pavimentacao01': 'Pavimentações',
+    'vbr_document_ramais02': 'Repavimentações',
+    'vbr_document_rede01': 'Rede',
+    'vbr_document_reparacao': 'Reparações',
+}
+
+REPORT_CACHE_TTL = 60
+# Ligações do pool ocupadas ao mesmo tempo por um pedido
+MAX_PARALLEL = 6
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 200
+CACHE_PREFIX = 'operations_report'
+_GENERATION_KEY = f'{CACHE_PREFIX}:gen'
+
+
+# ── Cache ─────────────────────────────────────────────────────────────────────
+
+def _generation():
+    try:
+        gen = cache.get(_GENERATION_KEY)
+        if gen is None:
+            gen = uuid.uuid4().hex[:12]
+            cache.set(_GENERATION_KEY, gen, timeout=0)
+        return gen
+    except Exception as e:
+        logger.warning(f"Cache dos relatórios indisponível: {e}")
+        return None
+
+
+def invalidate_operations_reports():
+    """Descarta todos os resultados em cache (muda a geração das chaves)."""
+    try:
+        cache.set(_GENERATION_KEY, uuid.uuid4().hex[:12], timeout=0)
+    except Exception as e:
+        logger.warning(f"Não foi possível invalidar a cache dos relatórios: {e}")
+
+
+def _cached(key, loader):
+    gen = _generation()
+    if gen is None:
+        return loader()
+    full_key = f"{CACHE_PREFIX}:{gen}:{key}"
+    try:
+        value = cache.get(full_key)
+    except Exception:
+        value = None
+    if value is not None:
+        return value
+    value = loader()
+    if value is not None:
+        try:
+            cache.set(full_key, value, timeout=REPORT_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Resultado de {key} não guardado em cache: {e}")
+    return value
+
+
+# ── Leitura ───────────────────────────────────────────────────────────────────
+
+def _read_view(current_user, view_name, summary):
+    """{'columns', 'total'[, 'data']} da view, ou None se a view falhar."""
+    try:
+        with db_session_manager(current_user, readonly=True) as session:
+            if summary:
+                columns = list(session.execute(text(f"SELECT * FROM {view_name} LIMIT 0")).keys())
+                total = session.execute(text(f"SELECT count(*) FROM {view_name}")).scalar()
+                return {'columns': columns, 'total': total}
+            result = session.execute(text(f"SELECT * FROM {view_name}"))
+            data = [dict(row) for row in result.mappings().all()]
+            return {'columns': list(result.keys()), 'total': len(data), 'data': data}
+    except (ProgrammingError, OperationalError) as e:
+        logger.warning(f"A view {REPORT_VIEWS[view_name]} ({view_name}) não foi encontrada ou gerou um erro: {e}")
+        return None
+
+
+def get_report_views(current_user, summary=False):
+    """
+    Todas as views do quadro: {view: {name, total, columns[, data]}}.
+    As views que falham não aparecem no resultado.
+    """
+    app = current_app._get_current_object()
+    kind = 'summary' if summary else 'full'
+
+    def fetch(view_name):
+        with app.app_context():
+            return view_name, _cached(f"{kind}:{view_name}",
+                                      lambda: _read_view(current_user, view_name, summary))
+
+    with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL, len(REPORT_VIEWS))) as executor:
+        results = dict(executor.map(fetch, REPORT_VIEWS))
+
+    # Mantém a ordem de REPORT_VIEWS
+    return {
+        view_name: {'name': REPORT_VIEWS[view_name], **results[view_name]}
+        for view_name in REPORT_VIEWS if results.get(view_name) is not None
+    }
+
+
+def _view_columns(current_user, view_name):
+    def load():
+        with db_session_manager(current_user, readonly=True) as session:
+            return list(session.execute(text(f"SELECT * FROM {view_name} LIMIT 0")).keys())
+    return _cached(f"columns:{view_name}", load)
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def parse_page_args(args, columns):
+    """Valida page/page_size/sort/order/fields contra as colunas da view."""
+    try:
+        page = max(int(args.get('page', 1)), 1)
+        page_size = min(max(int(args.get('page_size', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        raise APIError("Parâmetros de paginação inválidos", 400, "ERR_INVALID_INPUT")
+
+    fields = [f.strip() for f in (args.get('fields') or '').split(',') if f.strip()]
+    unknown = [f for f in fields if f not in columns]
+    sort = args.get('sort') or None
+    if sort is not None and sort not in columns:
+        unknown.append(sort)
+    if unknown:
+        raise APIError(f"Colunas desconhecidas: {', '.join(unknown)}", 400, "ERR_INVALID_INPUT")
+
+    order = (args.get('order') or 'asc').lower()
+    if order not in ('asc', 'desc'):
+        raise APIError("order deve ser 'asc' ou 'desc'", 400, "ERR_INVALID_INPUT")
+    # Chave de desempate: sem ordem total, LIMIT/OFFSET repete ou salta linhas entre páginas
+    key = 'pk' if 'pk' in columns else columns[0]
+    return {'page': page, 'page_size': page_size, 'sort': sort, 'order': order,
+            'fields': fields or list(columns), 'key': key}
+
+
+def _page_query(view_name, params):
+    # Só nomes de colunas que existem na view chegam aqui (parse_page_args)
+    select = ', '.join(_quote(c) for c in params['fields'])
+    order = params['order'].upper()
+    order_by = [f"{_quote(params['key'])} {order}"]
+    if params['sort'] and params['sort'] != params['key']:
+        order_by.insert(0, f"{_quote(params['sort'])} {order} NULLS LAST")
+    return text(f"SELECT {select} FROM {view_name} ORDER BY {', '.join(order_by)} "
+                "LIMIT :limit OFFSET :offset")
+
+
+def get_report_view_page(current_user, view_name, args):
+    """Uma página de uma view: {view, name, columns, total, page, page_size, pages, data}."""
+    if view_name not in REPORT_VIEWS:
+        raise APIError(f"View de relatório desconhecida: {view_name}", 404, "ERR_NOT_FOUND")
+
+    try:
+        columns = _view_columns(current_user, view_name)
+    except (ProgrammingError, OperationalError) as e:
+        logger.warning(f"A view {view_name} não está disponível: {e}")
+        raise APIError(f"View de relatório indisponível: {view_name}", 503, "ERR_UNAVAILABLE")
+    params = parse_page_args(args, columns)
+
+    def load():
+        with db_session_manager(current_user, readonly=True) as session:
+            total = session.execute(text(f"SELECT count(*) FROM {view_name}")).scalar()
+            rows = session.execute(_page_query(view_name, params), {
+                'limit': params['page_size'],
+                'offset': (params['page'] - 1) * params['page_size'],
+            }).mappings().all()
+            return {'total': total, 'data': [dict(r) for r in rows]}
+
+    digest = hashlib.blake2b(json.dumps(params, sort_keys=True).encode(), digest_size=8).hexdigest()
+    page = _cached(f"page:{view_name}:{digest}", load)
+    return {
+        'view': view_name,
+        'name': REPORT_VIEWS[view_name],
+        'columns': params['fields'],
+        'total': page['total'],
+        'page': params['page'],
+        'page_size': params['page_size'],
+        'pages': -(-page['total'] // params['page_size']),
+        'sort': params['sort'],
+        'order': params['order'],
+        'data': page['data'],
+    }
@@ -0,0 +1,155 @@
+"""
+Sincronização incremental das tarefas do dia do operador (app Android).
+
+/operacao_self devolve sempre a lista inteira (SELECT * nas duas views) — em
+cada refresh, numa rede móvel fraca. /operacao_self/sync devolve só o que
+mudou desde o token que o cliente já tem:
+
+- cada tarefa é projectada em SYNC_FIELDS (lista de valores, sem nomes) e
+  tem uma versão = hash dos valores;
+- o estado {pk: versão} tem um token (hash do estado), que é também o ETag;
+- o estado de cada token fica em cache (Redis em produção) durante
+  SNAPSHOT_TTL; com o token anterior o servidor devolve apenas as tarefas
+  novas/alteradas/concluídas (upserts) e as que saíram da lista (deleted —
+  reatribuídas, apagadas, fora da janela do dia);
+- sem mudanças (since ou If-None-Match igual ao estado actual) → 304 sem corpo;
+- token desconhecido/expirado ou de outra versão do esquema → lista completa
+  (full=true, com os nomes dos campos).
+
+A lista "do dia" continua a ser a de vbl_operacao$self (a view aplica o
+updatedelay), por isso o diff é feito sobre o resultado e não sobre
+timestamps de alteração: uma tarefa que entra na janela à meia-noite sem
+mudar na tabela também chega ao cliente.
+"""
+import hashlib
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy.sql import text
+
+from app import cache
+from app.utils.utils import db_session_manager
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Campos que a app lê; colunas ausentes na view vão a null
+SYNC_FIELDS = (
+    'pk', 'pk_instalacao', 'pk_operacaoaccao', 'tb_instalacao',
+    'tt_instalacaolicenciamento', 'tt_operacaoaccao', 'tt_operacaoaccao_type',
+    'tt_operacaoaccao_refobj', 'dia_operacao', 'data', 'descr',
+    'ts_operador1', 'ts_operador2', 'opcoes', 'unidade', 'photo',
+    'valuetext', 'valuememo', 'updt_time',
+)
+# Sobe quando SYNC_FIELDS (ou a sua codificação) muda: invalida os tokens antigos
+SYNC_SCHEMA = 'v1'
+SNAPSHOT_TTL = 24 * 3600
+CACHE_PREFIX = 'operacao_sync'
+
+_PENDING_SQL = text("""
+    SELECT * FROM "vbl_operacao$self"
+    WHERE updt_client IS NULL
+    ORDER BY pk
+""")
+# Intervalo em vez de updt_time::date = CURRENT_DATE: usa o índice de updt_time
+_COMPLETED_SQL = text("""
+    SELECT * FROM vbl_operacao
+    WHERE pk_operador1 = :user_id
+      AND updt_client IS NOT NULL
+      AND updt_time >= CURRENT_DATE
+      AND updt_time <  CURRENT_DATE + 1
+    ORDER BY updt_time DESC
+""")
+
+
+def _value(v):
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return float(v)
+    return v
+
+
+def project(row, completed):
+    """Valores da tarefa pela ordem de SYNC_FIELDS, mais o indicador completed."""
+    return [_value(row.get(f)) for f in SYNC_FIELDS] + [completed]
+
+
+def row_version(values):
+    raw = json.dumps(values, separators=(',', ':'), default=str, ensure_ascii=False)
+    return hashlib.blake2b(raw.encode(), digest_size=6).hexdigest()
+
+
+def state_token(versions):
+    """Token do estado {pk: versão} — igual para o mesmo conjunto, em qualquer ordem."""
+    h = hashlib.blake2b(digest_size=12)
+    for pk in sorted(versions):
+        h.update(f"{pk}:{versions[pk]};".encode())
+    return f"{SYNC_SCHEMA}.{h.hexdigest()}"
+
+
+def diff_state(previous, rows, versions):
+    """(upserts, deleted) entre o estado anterior {pk: versão} e as linhas actuais."""
+    upserts = [rows[pk] for pk in rows if previous.get(pk) != versions[pk]]
+    deleted = sorted(pk for pk in previous if pk not in rows)
+    return upserts, deleted
+
+
+def _cache_key(user_id, token):
+    return f"{CACHE_PREFIX}:{user_id}:{token}"
+
+
+def _load_snapshot(user_id, token):
+    if not token or not token.startswith(f"{SYNC_SCHEMA}."):
+        return None
+    try:
+        return cache.get(_cache_key(user_id, token))
+    except Exception as e:
+        logger.warning(f"Snapshot de sincronização indisponível: {e}")
+        return None
+
+
+def _store_snapshot(user_id, token, versions):
+    try:
+        cache.set(_cache_key(user_id, token), versions, timeout=SNAPSHOT_TTL)
+    except Exception as e:
+        logger.warning(f"Snapshot de sincronização não guardado: {e}")
+
+
+def load_today_rows(user_id, current_user):
+    """{pk: valores projectados} das tarefas pendentes e concluídas hoje."""
+    with db_session_manager(current_user) as session:
+        pending = session.execute(_PENDING_SQL).mappings().all()
+        completed = session.execute(_COMPLETED_SQL, {'user_id': user_id}).mappings().all()
+    rows = {r['pk']: project(r, False) for r in pending}
+    rows.update((r['pk'], project(r, True)) for r in completed)
+    return rows
+
+
+def sync_today_tasks(user_id, current_user, since=None, if_none_match=None):
+    """
+    Devolve (payload, token). payload é None quando o cliente já tem o estado
+    actual (resposta 304). if_none_match: ETags do pedido (ou qualquer contentor).
+    """
+    rows = load_today_rows(user_id, current_user)
+    versions = {pk: row_version(values) for pk, values in rows.items()}
+    token = state_token(versions)
+
+    if token == since or (if_none_match and token in if_none_match):
+        return None, token
+
+    _store_snapshot(user_id, token, versions)
+    previous = _load_snapshot(user_id, since)
+    completed = sum(1 for values in rows.values() if values[-1])
+    payload = {
+        'token': token,
+        'stats': {'total_assigned': len(rows), 'total_completed': completed},
+    }
+    if previous is None:
+        payload.update(full=True, fields=list(SYNC_FIELDS) + ['completed'],
+                       upserts=list(rows.values()), deleted=[])
+    else:
+        upserts, deleted = diff_state(previous, rows, versions)
+        payload.update(full=False, upserts=upserts, deleted=deleted)
+    return payload, token
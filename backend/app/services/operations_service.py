@@ -2,10 +2,10 @@ import re
 import re
 from .. import db
 from sqlalchemy.sql import text
-from sqlalchemy.exc import ProgrammingError, OperationalError, SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError
 from flask import current_app
 from ..utils.utils import db_session_manager
-from app.utils.error_handler import api_error_handler, ResourceNotFoundError
+from app.utils.error_handler import api_error_handler, ResourceNotFoundError, APIError
 from pydantic import BaseModel, Field, validator
 from typing import Optional, Dict, Any
 from datetime import date
@@ -24,8 +24,8 @@ def _emit_operacao_notif(notification_type: str, title: str, message: str,
             logger.warning(f"[OperaçãoNotif] socketio_events não encontrado em extensions")
             return
         clean_ids = [uid for uid in user_ids if uid]
-        logger.info(f"[OperaçãoNotif] type={notification_type} | destinatários={clean_ids} | "
-                    f"conectados={list(socketio_events.connected_users.keys())}")
+        # Só os destinatários: connected_users lê a presença partilhada (1+N idas ao Redis)
+        logger.info(f"[OperaçãoNotif] type={notification_type} | destinatários={clean_ids}")
         socketio_events.emit_operacao_notification(
             user_ids=clean_ids,
             notification_type=notification_type,
@@ -107,10 +107,11 @@ class OperationResponse(BaseModel):
 
 
 class OperacaoInitData(BaseModel):
-    """Dados para inicializar tarefas de um mês via fbf_operacao$init"""
+    """Dados para gerar as tarefas de um mês (tb_operacaometa → tb_operacao)"""
     tt_operacaomodo: int = Field(..., gt=0, description="ID do modo de operação")
     month: int = Field(..., ge=1, le=12, description="Mês (1-12)")
     year: int = Field(..., ge=2024, description="Ano (≥ 2024)")
+    dry_run: bool = Field(False, description="Só devolve o plano, sem gravar")
 
 
 class OperacaoCreate(BaseModel):
@@ -162,43 +163,13 @@ class OperacaoDirect(BaseModel):
     clong: Optional[float] = Field(None, description="Longitude GPS")
 
 @api_error_handler
-def get_operations_data(current_user):
+def get_operations_data(current_user, summary=False):
     """
-    Obtém dados de operações a partir de views específicas
+    Obtém dados de operações a partir das views vbr_document_* (em paralelo,
+    com cache). Ver app/services/operations/report_views.py.
     """
-    views = {
-        'vbr_document_fossa01': 'Limpezas de fossa global',
-        'vbr_document_fossa02': 'Limpeza de fossa Carregal do Sal',
-        'vbr_document_fossa03': 'Limpeza de fossa Santa Comba Dão',
-        'vbr_document_fossa04': 'Limpeza de fossa Tábua',
-        'vbr_document_fossa05': 'Limpeza de fossa Tondela',
-        'vbr_document_ramais01': 'Ramais',
-        'vbr_document_caixas01': 'Caixas',
-        'vbr_document_desobstrucao01': 'Desobstrução',
-        'vbr_document_pavimentacao01': 'Pavimentações',
-        'vbr_document_ramais02': 'Repavimentações',
-        'vbr_document_rede01': 'Rede',
-        'vbr_document_reparacao': 'Reparações',
-    }
-
-    operations_data = {}
-
-    with db_session_manager(current_user) as session:
-        for view_name, friendly_name in views.items():
-            try:
-                query = text(f"SELECT * FROM {view_name}")
-                result = session.execute(query)
-                data = [dict(row) for row in result.mappings().all()]
-                operations_data[view_name] = {
-                    'name': friendly_name,
-                    'total': len(data),
-                    'data': data,
-                    'columns': list(result.keys()) if result.returns_rows else []
-                }
-            except (ProgrammingError, OperationalError) as e:
-                logger.warning(f"A view {friendly_name} ({view_name}) não foi encontrada ou gerou um erro: {str(e)}")
-                # Não adiciona a view ao resultado se ela falhar
-    return operations_data
+    from app.services.operations.report_views import get_report_views
+    return get_report_views(current_user, summary=summary)
 
 
 @api_error_handler
@@ -756,62 +727,42 @@ def create_operacao_direct(data: dict, current_user: str):
 
 def init_operacao_month(data: dict, current_user: str):
     """
-    Gerar tarefas operacionais para um mês futuro via fbf_operacao$init.
+    Gerar (ou pré-visualizar, com dry_run) as tarefas operacionais de um mês
+    futuro a partir dos templates em tb_operacaometa.
 
-    Chama o procedimento PostgreSQL que:
-      1. Apaga registos existentes em tb_operacao para o mês/modo indicado
-      2. Recria as tarefas com base nos templates em tb_operacaometa
-
-    Só é permitido para meses FUTUROS (a procedure levanta exceção para
-    o mês atual ou passado).
+    Substitui as tarefas existentes do mês/modo (como fbf_operacao$init).
+    Só é permitido para meses FUTUROS.
+    Ver app/services/operations/month_generation.py.
     """
+    from app.services.operations.month_generation import generate_month
+
     try:
         init_data = OperacaoInitData.model_validate(data)
 
         with db_session_manager(current_user) as session:
-            session.execute(
-                text('CALL "fbf_operacao$init"(:mode, :month, :year)'),
-                {
-                    'mode': init_data.tt_operacaomodo,
-                    'month': init_data.month,
-                    'year': init_data.year,
-                }
+            plan = generate_month(
+                session, init_data.month, init_data.year,
+                modes=[init_data.tt_operacaomodo], dry_run=init_data.dry_run,
             )
 
-            # Contar tarefas geradas
-            total = session.execute(
-                text("""
-                    SELECT COUNT(*) FROM tb_operacao
-                    WHERE EXTRACT(MONTH FROM data) = :month
-                      AND EXTRACT(YEAR  FROM data) = :year
-                      AND tt_operacaomodo = :mode
-                """),
-                {'month': init_data.month, 'year': init_data.year, 'mode': init_data.tt_operacaomodo}
-            ).scalar() or 0
-
-            logger.info(
-                f"Mês inicializado: modo={init_data.tt_operacaomodo}, "
-                f"período={init_data.month}/{init_data.year}, tarefas={total}"
-            )
-            return {
-                'success': True,
-                'message': f'{total} tarefas geradas para {init_data.month:02d}/{init_data.year}.',
-                'total': total,
-            }, 200
+        total = plan['total']
+        verb = 'a gerar' if init_data.dry_run else 'geradas'
+        return {
+            'success': True,
+            'message': f'{total} tarefas {verb} para {init_data.month:02d}/{init_data.year}.',
+            'total': total,
+            'plan': plan,
+        }, 200
 
     except ValueError as e:
         logger.error(f"Validação OperacaoInit: {str(e)}")
         return {'success': False, 'error': f'Dados inválidos: {str(e)}'}, 400
+    except APIError as e:
+        return {'success': False, 'error': e.message}, e.status_code
     except SQLAlchemyError as e:
         import re
-        msg_raw = str(e)
-        match = re.search(r'<error>(.*?)</error>', msg_raw)
-        if match:
-            msg = match.group(1)
-        elif 'operação inválida' in msg_raw.lower() or 'invalida' in msg_raw.lower():
-            msg = 'Só é possível gerar tarefas para meses futuros.'
-        else:
-            msg = 'Erro ao gerar tarefas.'
+        match = re.search(r'<error>(.*?)</error>', str(e))
+        msg = match.group(1) if match else 'Erro ao gerar tarefas.'
         logger.warning(f"Regra de negócio OperacaoInit: {msg}")
         return {'success': False, 'error': msg}, 409
     except Exception as e:
@@ -821,56 +772,40 @@ def init_operacao_month(data: dict, current_user: str):
 
 def init_operacao_remaining(data: dict, current_user: str):
     """
-    Gerar tarefas para os dias RESTANTES do mês corrente via fbf_operacao$init_remaining.
+    Gerar (ou pré-visualizar, com dry_run) as tarefas dos dias RESTANTES do
+    mês corrente, de hoje até ao fim do mês.
 
     Diferente do init_operacao_month:
       - Não apaga registos existentes (aditivo)
-      - Começa a partir de amanhã (current_date + 1)
       - Salta dias que já têm tarefa para a mesma instalação+ação+modo
       - Funciona apenas para o mês corrente
 
-    Ver: backend/sql/fbf_operacao_init_remaining.sql
+    Mesma regra de fbf_operacao$init_remaining (backend/sql/fbf_operacao_init_remaining.sql).
     """
+    from app.services.operations.month_generation import generate_remaining
+
     try:
         tt_operacaomodo = data.get('tt_operacaomodo')
         if not tt_operacaomodo or int(tt_operacaomodo) <= 0:
             return {'success': False, 'error': 'Modo de operação inválido'}, 400
+        dry_run = bool(data.get('dry_run'))
 
         with db_session_manager(current_user) as session:
-            session.execute(
-                text('CALL "fbf_operacao$init_remaining"(:mode)'),
-                {'mode': int(tt_operacaomodo)}
-            )
+            plan = generate_remaining(session, modes=[int(tt_operacaomodo)], dry_run=dry_run)
 
-            # Contar tarefas geradas (datas > hoje no mês corrente)
-            total = session.execute(
-                text("""
-                    SELECT COUNT(*) FROM tb_operacao
-                    WHERE data > current_date
-                      AND EXTRACT(MONTH FROM data) = EXTRACT(MONTH FROM current_date)
-                      AND EXTRACT(YEAR  FROM data) = EXTRACT(YEAR  FROM current_date)
-                      AND tt_operacaomodo = :mode
-                """),
-                {'mode': int(tt_operacaomodo)}
-            ).scalar() or 0
-
-            logger.info(f"Dias restantes inicializados: modo={tt_operacaomodo}, tarefas={total}")
-            return {
-                'success': True,
-                'message': f'{total} tarefas geradas para os dias restantes do mês.',
-                'total': total,
-            }, 200
+        total = plan['total']
+        verb = 'a gerar' if dry_run else 'geradas'
+        return {
+            'success': True,
+            'message': f'{total} tarefas {verb} para os dias restantes do mês.',
+            'total': total,
+            'plan': plan,
+        }, 200
 
     except SQLAlchemyError as e:
         import re
-        msg_raw = str(e)
-        match = re.search(r'<error>(.*?)</error>', msg_raw)
-        if match:
-            msg = match.group(1)
-        elif 'sem dias restantes' in msg_raw.lower():
-            msg = 'Não há dias restantes no mês corrente.'
-        else:
-            msg = 'Erro ao gerar tarefas para os dias restantes.'
+        match = re.search(r'<error>(.*?)</error>', str(e))
+        msg = match.group(1) if match else 'Erro ao gerar tarefas para os dias restantes.'
         logger.warning(f"Regra de negócio OperacaoRemaining: {msg}")
         return {'success': False, 'error': msg}, 409
     except Exception as e:
@@ -0,0 +1,261 @@
+"""
+Reconciliação em lote dos pagamentos SIBS (MB WAY e Multibanco).
+
+Os pagamentos pendentes dependem do webhook da SIBS; quando este não chega
+(falha de rede, SIBS sem retry) o registo ficava PENDING até alguém carregar
+em "verificar estado". O job reconcile_pending_payments (cada 5 min) fecha
+essa janela:
+
+1. selecciona de vbl_sibs as transacções não-finais perto ou depois da
+   expiração — MB WAY com mais de MBWAY_GRACE_MINUTES (o webhook normal já
+   devia ter chegado), Multibanco a expirar nas próximas
+   MULTIBANCO_LOOKAHEAD_HOURS — que não foram consultadas há menos de
+   RECHECK_MINUTES (tb_sibs_reconciliation, DDL em app/sql/sibs_reconciliation.sql);
+2. consulta a SIBS em paralelo, no máximo MAX_PARALLEL pedidos de cada vez
+   (o cliente 'sibs' aceita 8 — fica margem para os pedidos interactivos);
+3. aplica todas as alterações numa só transacção: fbo_sibs_status em lote
+   via unnest, ligação à fatura e parâmetro "Método de pagamento" para os
+   SUCCESS, e o registo da consulta em tb_sibs_reconciliation;
+4. depois do commit, emite payment_status_update e notify_payment_received
+   uma vez por alteração (o mesmo que o webhook faria).
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import text
+
+from app.services.payment_service import payment_service, PaymentStatus, _sibs_http
+from app.utils.utils import db_system_session
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SIBS_METHODS = ('MBWAY', 'MULTIBANCO')
+NON_FINAL_STATUSES = (
+    PaymentStatus.CREATED, PaymentStatus.PENDING, PaymentStatus.PENDING_VALIDATION,
+)
+MBWAY_GRACE_MINUTES = 5
+MULTIBANCO_LOOKAHEAD_HOURS = 24
+RECHECK_MINUTES = 15
+MAX_AGE_DAYS = 60           # mais antigo do que isto já não se reconcilia
+BATCH_LIMIT = 200
+MAX_PARALLEL = 4
+
+# Mesmo mapeamento de force_sync_with_sibs. Estados SIBS desconhecidos não
+# alteram o registo local (evita, p.ex., passar PENDING_VALIDATION a PENDING).
+SIBS_STATUS_MAP = {
+    "Success": PaymentStatus.SUCCESS,
+    "Pending": PaymentStatus.PENDING,
+    "Declined": PaymentStatus.DECLINED,
+    "Expired": PaymentStatus.EXPIRED,
+    "Refunded": PaymentStatus.REFUNDED,
+    "Annulled": PaymentStatus.REFUNDED,
+}
+
+
+def map_sibs_status(sibs_status):
+    return SIBS_STATUS_MAP.get(sibs_status)
+
+
+def compute_changes(candidates, results):
+    """
+    Cruza as transacções seleccionadas com as respostas da SIBS.
+
+    candidates: dicts de vbl_sibs (transaction_id, payment_status, ...)
+    results: {transaction_id: (sibs_data | None, erro | None)}
+    Devolve só as transacções cujo estado interno muda, com new_status,
+    sibs_status e sibs_data acrescentados.
+    """
+    changes = []
+    for row in candidates:
+        sibs_data, error = results.get(row['transaction_id'], (None, 'sem resposta'))
+        if error or not sibs_data:
+            continue
+        new_status = map_sibs_status(sibs_data.get('paymentStatus'))
+        if new_status and new_status != row['payment_status']:
+            changes.append({
+                **row,
+                'new_status': new_status,
+                'sibs_status': sibs_data.get('paymentStatus'),
+                'sibs_data': sibs_data,
+            })
+    return changes
+
+
+# ── Selecção e consulta ─────────────────────────────────────────────────
+
+def select_candidates(session, now=None, limit=BATCH_LIMIT):
+    # created_at/expiry_date de tb_sibs são gravados em UTC (datetime.utcnow)
+    now = now or datetime.utcnow()
+    rows = session.execute(text("""
+        SELECT s.transaction_id, s.payment_status, s.payment_method,
+               s.tb_document, s.regnumber, s.amount
+        FROM vbl_sibs s
+        LEFT JOIN tb_sibs_reconciliation r ON r.transaction_id = s.transaction_id
+        WHERE s.payment_status = ANY(:statuses)
+          AND s.payment_method = ANY(:methods)
+          AND s.created_at > :min_created
+          AND (r.checked_at IS NULL
+               OR r.checked_at < current_timestamp - make_interval(mins => :recheck))
+          AND (
+                (s.payment_method = 'MBWAY' AND s.created_at < :mbway_before)
+             OR (s.payment_method = 'MULTIBANCO'
+                 AND (s.expiry_date IS NULL OR s.expiry_date < :expiry_before))
+          )
+        ORDER BY s.expiry_date NULLS FIRST, s.created_at
+        LIMIT :limit
+    """), {
+        'statuses': list(NON_FINAL_STATUSES),
+        'methods': list(SIBS_METHODS),
+        'min_created': now - timedelta(days=MAX_AGE_DAYS),
+        'recheck': RECHECK_MINUTES,
+        'mbway_before': now - timedelta(minutes=MBWAY_GRACE_MINUTES),
+        'expiry_before': now + timedelta(hours=MULTIBANCO_LOOKAHEAD_HOURS),
+        'limit': limit,
+    }).mappings().all()
+    return [dict(r) for r in rows]
+
+
+def _fetch_status(transaction_id):
+    try:
+        resp = _sibs_http().get(
+            f"{payment_service.base_url}/payments/{transaction_id}/status",
+            headers=payment_service._get_headers(), timeout=30,
+        )
+        resp.raise_for_status()
+        return transaction_id, (resp.json(), None)
+    except Exception as e:
+        return transaction_id, (None, str(e))
+
+
+def fetch_statuses(transaction_ids, max_parallel=MAX_PARALLEL):
+    """Consulta a SIBS em paralelo. Devolve {transaction_id: (sibs_data, erro)}."""
+    if not transaction_ids:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_parallel, len(transaction_ids))) as executor:
+        return dict(executor.map(_fetch_status, transaction_ids))
+
+
+# ── Aplicação em lote ───────────────────────────────────────────────────
+
+def record_checks(session, results, changes=()):
+    """Regista em tb_sibs_reconciliation o resultado de cada consulta à SIBS."""
+    if not results:
+        return
+    applied = {c['transaction_id']: c['new_status'] for c in changes}
+    tids = list(results)
+    session.execute(text("""
+        INSERT INTO tb_sibs_reconciliation
+            (transaction_id, sibs_status, applied_status, checked_at, changed_at, last_error)
+        SELECT u.tid, u.sibs_status, u.applied, current_timestamp,
+               CASE WHEN u.applied IS NOT NULL THEN current_timestamp END, u.error
+        FROM unnest(CAST(:tids AS varchar[]), CAST(:sibs AS text[]),
+                    CAST(:applied AS text[]), CAST(:errors AS text[]))
+             AS u(tid, sibs_status, applied, error)
+        ON CONFLICT (transaction_id) DO UPDATE SET
+            sibs_status    = COALESCE(EXCLUDED.sibs_status, tb_sibs_reconciliation.sibs_status),
+            applied_status = COALESCE(EXCLUDED.applied_status, tb_sibs_reconciliation.applied_status),
+            changed_at     = COALESCE(EXCLUDED.changed_at, tb_sibs_reconciliation.changed_at),
+            last_error     = EXCLUDED.last_error,
+            checked_at     = EXCLUDED.checked_at,
+            checks         = tb_sibs_reconciliation.checks + 1
+    """), {
+        'tids': tids,
+        'sibs': [(results[t][0] or {}).get('paymentStatus') for t in tids],
+        'applied': [applied.get(t) for t in tids],
+        'errors': [results[t][1] for t in tids],
+    })
+
+
+def apply_changes(session, changes):
+    """fbo_sibs_status em lote + efeitos de SUCCESS (fatura e método de pagamento)."""
+    if not changes:
+        return
+    session.execute(text("""
+        SELECT fbo_sibs_status(u.tid, u.status, u.pref)
+        FROM unnest(CAST(:tids AS varchar[]), CAST(:statuses AS varchar[]),
+                    CAST(:prefs AS text[])) AS u(tid, status, pref)
+    """), {
+        'tids': [c['transaction_id'] for c in changes],
+        'statuses': [c['new_status'] for c in changes],
+        'prefs': [json.dumps(c['sibs_data']) for c in changes],
+    })
+
+    paid = [c for c in changes if c['new_status'] == PaymentStatus.SUCCESS and c['tb_document']]
+    if not paid:
+        return
+    session.execute(text("""
+        SELECT "fbo_document_invoice$link"(s.tb_document, s.pk)
+        FROM vbl_sibs s
+        WHERE s.transaction_id = ANY(:tids) AND s.tb_document IS NOT NULL
+    """), {'tids': [c['transaction_id'] for c in paid]})
+
+    params = [(c['tb_document'], payment_service._map_payment_method_to_param(c['payment_method']))
+              for c in paid]
+    params = [(doc, value) for doc, value in params if value]
+    if params:
+        session.execute(text("""
+            UPDATE vbf_document_param dp
+            SET value = m.value
+            FROM tb_param p,
+                 unnest(CAST(:docs AS integer[]), CAST(:values AS text[])) AS m(doc, value)
+            WHERE dp.tb_param = p.pk
+              AND dp.tb_document = m.doc
+              AND p.name = 'Método de pagamento'
+        """), {'docs': [d for d, _ in params], 'values': [v for _, v in params]})
+
+
+def _notify(changes):
+    socketio_events = current_app.extensions.get('socketio_events')
+    for c in changes:
+        if socketio_events:
+            try:
+                socketio_events.emit_payment_status_update(
+                    transaction_id=c['transaction_id'],
+                    payment_status=c['new_status'],
+                    payment_method=c['payment_method'],
+                    webhook_data={
+                        'transaction_id': c['transaction_id'],
+                        'payment_status': c['new_status'],
+                        'payment_method': c['payment_method'],
+                        'document_id': c['tb_document'],
+                        'source': 'reconciliation',
+                    },
+                )
+            except Exception as e:
+                logger.error(f"[Reconciliação] Erro SocketIO para {c['transaction_id']}: {e}")
+        payment_service.notify_payment_received({
+            'transaction_id': c['transaction_id'],
+            'status': c['new_status'],
+            'regnumber': c['regnumber'],
+            'document_id': c['tb_document'],
+            'amount': c['amount'],
+        }, c['payment_method'])
+
+
+def reconcile_pending_payments(app):
+    """Job: reconcilia com a SIBS os pagamentos pendentes perto/depois de expirar."""
+    with app.app_context():
+        with db_system_session() as session:
+            candidates = select_candidates(session)
+        if not candidates:
+            return {'checked': 0, 'changed': 0, 'errors': 0}
+
+        results = fetch_statuses([c['transaction_id'] for c in candidates])
+        changes = compute_changes(candidates, results)
+
+        with db_system_session() as session:
+            apply_changes(session, changes)
+            record_checks(session, results, changes)
+
+        _notify(changes)
+
+        errors = sum(1 for _, error in results.values() if error)
+        for c in changes:
+            logger.info(f"[Reconciliação] {c['transaction_id']}: {c['payment_status']} → {c['new_status']}")
+        logger.info(
+            f"[Reconciliação] {len(candidates)} consultadas, {len(changes)} alteradas, {errors} erros"
+        )
+        return {'checked': len(candidates), 'changed': len(changes), 'errors': errors}
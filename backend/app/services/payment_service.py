@@ -1,4 +1,3 @@
-import requests
 import uuid
 from datetime import datetime, timedelta
 from app.utils.utils import db_session_manager, db_system_session
@@ -10,11 +9,17 @@ from pydantic import BaseModel, Field, conint, constr, condecimal
 from typing import Optional
 from app.utils.error_handler import api_error_handler, ResourceNotFoundError, APIError
 from app.utils.logger import get_logger
+from app.utils.http_client import get_client
 
 
 logger = get_logger(__name__)
 
 
+def _sibs_http():
+    """Cliente com pool/breaker para a API SIBS (ver app/utils/http_client.py)."""
+    return get_client('sibs', pool_size=10, max_concurrency=8, timeout=(5, 30))
+
+
 
 class PaymentStatus:
     CREATED = 'CREATED'
@@ -312,8 +317,8 @@ class PaymentService:
                 }
             }
 
-            resp = requests.post(f"{self.base_url}/payments",
-                                 json=payload, headers=self._get_headers())
+            resp = _sibs_http().post(f"{self.base_url}/payments",
+                                     json=payload, headers=self._get_headers())
             resp.raise_for_status()
             data = resp.json()
 
@@ -386,7 +391,7 @@ class PaymentService:
             headers = self._get_headers(
                 "Digest", checkout_data["transaction_signature"])
 
-            resp = requests.post(
+            resp = _sibs_http().post(
                 url, json={"customerPhone": formatted_phone}, headers=headers, timeout=30)
 
             # Tratar erros HTTP da SIBS com mensagens claras
@@ -532,7 +537,7 @@ class PaymentService:
             headers = self._get_headers(
                 "Digest", checkout_data["transaction_signature"])
 
-            resp = requests.post(url, json={}, headers=headers, timeout=30)
+            resp = _sibs_http().post(url, json={}, headers=headers, timeout=30)
             resp.raise_for_status()
 
             data = resp.json()
@@ -726,7 +731,7 @@ class PaymentService:
         data = {'document_id': document_id, 'amount': amount, 'payment_type': payment_type, 'reference_info': payment_details}
         return self.register_manual_payment_direct(data, current_user)
 
-    def check_payment_status(self, transaction_id: str, current_user: str):
+    def check_payment_status(self, transaction_id: str, current_user: str, max_age: int = None):
         """
         Verificar estado do pagamento.
 
@@ -738,16 +743,24 @@ class PaymentService:
         expiração, pensado para poupar chamadas de um polling automático que
         nunca chegou a existir no frontend — na prática só impedia o botão de
         verificação manual do admin de mostrar o estado real.)
+
+        Com `max_age` (segundos), se o job de reconciliação consultou esta
+        transacção há menos do que isso devolve-se o estado reconciliado sem
+        nova chamada à SIBS (ver payment_reconciliation_service).
         """
         try:
             # Estado local primeiro
             with db_session_manager(current_user) as db:
                 local_data = db.execute(text("""
-                    SELECT payment_status, order_id, payment_method,
-                           expiry_date, tb_document, invoice_pk
-                    FROM vbl_sibs
-                    WHERE transaction_id = :transaction_id
-                """), {"transaction_id": transaction_id}).fetchone()
+                    SELECT s.payment_status, s.order_id, s.payment_method,
+                           s.expiry_date, s.tb_document, s.invoice_pk,
+                           r.sibs_status, r.checked_at AS reconciled_at,
+                           r.checked_at > current_timestamp - make_interval(secs => :max_age)
+                               AS reconciled_fresh
+                    FROM vbl_sibs s
+                    LEFT JOIN tb_sibs_reconciliation r ON r.transaction_id = s.transaction_id
+                    WHERE s.transaction_id = :transaction_id
+                """), {"transaction_id": transaction_id, "max_age": max_age or 0}).fetchone()
 
                 if not local_data:
                     raise ResourceNotFoundError(
@@ -767,9 +780,20 @@ class PaymentService:
                     "updated": False
                 }
 
+            if max_age and local_data.reconciled_fresh:
+                return {
+                    "success": True,
+                    "payment_status": local_data.payment_status,
+                    "payment_method": local_data.payment_method,
+                    "document_id": local_data.tb_document,
+                    "sibs_status": local_data.sibs_status,
+                    "reconciled_at": local_data.reconciled_at.isoformat(),
+                    "updated": False
+                }
+
             # Consultar SIBS API
             url = f"{self.base_url}/payments/{transaction_id}/status"
-            resp = requests.get(
+            resp = _sibs_http().get(
                 url, headers=self._get_headers(), timeout=30
             )
             resp.raise_for_status()
@@ -778,6 +802,15 @@ class PaymentService:
             payment_status = sibs_data.get("paymentStatus")
             logger.info(f"SIBS GetStatus response: {sibs_data}")
 
+            # Consulta em directo também conta como reconciliação (best-effort:
+            # uma falha aqui não pode falhar a consulta de estado)
+            try:
+                from app.services.payment_reconciliation_service import record_checks
+                with db_system_session() as db:
+                    record_checks(db, {transaction_id: (sibs_data, None)})
+            except Exception as e:
+                logger.warning(f"Registo da verificação de {transaction_id} falhou: {e}")
+
             # Mapear e actualizar se mudou
             status_map = {
                 "Success": PaymentStatus.SUCCESS,
@@ -862,7 +895,7 @@ class PaymentService:
 
             # Consultar SIBS sem restrições
             url = f"{self.base_url}/payments/{transaction_id}/status"
-            resp = requests.get(url, headers=self._get_headers(), timeout=30)
+            resp = _sibs_http().get(url, headers=self._get_headers(), timeout=30)
             resp.raise_for_status()
 
             sibs_data = resp.json()
@@ -1034,18 +1067,20 @@ class PaymentService:
             raise
 
     def get_pending_payments(self, current_user: str):
-        """Obter pagamentos pendentes de validação"""
+        """Obter pagamentos pendentes de validação (com o último estado SIBS reconciliado)"""
         try:
             with db_session_manager(current_user) as session:
                 query = text("""
-                    SELECT pk, order_id, transaction_id, amount,
-                           payment_method, payment_status, payment_reference,
-                           created_at, entity, tb_document,
-                           regnumber, document_descr
-                    FROM vbl_sibs
-                    WHERE payment_status = 'PENDING_VALIDATION'
-                      AND payment_method != 'ISENCAO'
-                    ORDER BY created_at DESC
+                    SELECT s.pk, s.order_id, s.transaction_id, s.amount,
+                           s.payment_method, s.payment_status, s.payment_reference,
+                           s.created_at, s.entity, s.tb_document,
+                           s.regnumber, s.document_descr,
+                           r.sibs_status, r.checked_at AS reconciled_at
+                    FROM vbl_sibs s
+                    LEFT JOIN tb_sibs_reconciliation r ON r.transaction_id = s.transaction_id
+                    WHERE s.payment_status = 'PENDING_VALIDATION'
+                      AND s.payment_method != 'ISENCAO'
+                    ORDER BY s.created_at DESC
                 """)
 
                 results = session.execute(query).fetchall()
@@ -1377,7 +1412,7 @@ class PaymentService:
     def notify_payment_received(self, result: dict, payment_method: str = None):
         """
         Notifica a contabilidade (permissão payments.alerts) de que um pagamento
-        confirmado por webhook deu entrada. Best-effort: nunca falha o webhook.
+        confirmado por webhook (ou pela reconciliação) deu entrada. Best-effort: nunca falha o webhook.
 
         Dedup por transaction_id contra o histórico da tabela central — a SIBS
         pode reenviar o mesmo webhook várias vezes.
@@ -1412,7 +1447,7 @@ class PaymentService:
             )
             valor = result.get('amount')
             valor_txt = f"{float(valor):.2f}".replace('.', ',') + ' €' if valor is not None else None
-            metodo_txt = {'MBWAY': 'MB WAY', 'REFERENCE': 'Multibanco'}.get(payment_method, payment_method)
+            metodo_txt = {'MBWAY': 'MB WAY', 'REFERENCE': 'Multibanco', 'MULTIBANCO': 'Multibanco'}.get(payment_method, payment_method)
             detalhes = ' — '.join(p for p in (valor_txt, metodo_txt) if p)
             mensagem = f"O pagamento do pedido {pedido} deu entrada" + (f" ({detalhes})." if detalhes else ".")
 
@@ -1736,7 +1771,7 @@ class PaymentService:
                     }
                 }
                 logger.info(f"[Refund] A processar devolução para transação {payment.transaction_id}")
-                resp = requests.post(url, json=payload, headers=self._get_headers(), timeout=30)
+                resp = _sibs_http().post(url, json=payload, headers=self._get_headers(), timeout=30)
 
                 if not resp.ok:
                     sibs_error = {}
@@ -1,12 +1,21 @@
+import io
+import os
 import re
+import threading
 import unicodedata
 import difflib
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import date
 
 import pdfplumber
 from sqlalchemy.sql import text
 
 from ..utils.utils import db_session_manager
+from app.utils.compute_offload import offload
+from app.utils.error_handler import APIError
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -30,6 +39,25 @@ PARAMETROS_PDF = {
 
 RIGHT_LABELS = r'(?:Colheita|Rece[cç][aã]o|In[ií]cio An[aá]lise|Fim An[aá]lise|Emiss[aã]o)\s*:'
 
+# Expressões compiladas uma vez por processo. A linha de resultado de todos
+# os parâmetros conhecidos é apanhada por uma só alternância (nomes mais
+# longos primeiro) — uma passagem pela secção em vez de um re.search por nome.
+_PARAMETRO_RE = re.compile(
+    r'^\s*(?P<nome>' + '|'.join(
+        re.escape(nome) for nome in sorted(PARAMETROS_PDF, key=len, reverse=True)
+    ) + r')\b(?P<resto>.*)$'
+)
+_PARAMETRO_DESCONHECIDO_RE = re.compile(r'^\s*([A-Za-zÀ-ÿ][A-Za-zÀ-ÿ\s.]*?)\s+[\d,.<-]+\s')
+_HEADER_RES = {
+    'numero_boletim': re.compile(r'Relat[óo]rio de Ensaio N\.?[ºo]\s*(\S+)'),
+    'area': re.compile(r'[ÁA]rea:\s*(.+?)\s*(?:' + RIGHT_LABELS + r'|$)'),
+    'local_colheita': re.compile(r'Local de Colheita:\s*(.+?)\s*(?:' + RIGHT_LABELS + r'|$)'),
+    'controlo': re.compile(r'Controlo:\s*(\w+)'),
+    'data_colheita': re.compile(r'\bColheita:\s*(\d{2}/\d{2}/\d{4}|\d{4}-\d{2}-\d{2})'),
+    'data_emissao': re.compile(r'Emiss[ãa]o:\s*(\d{2}/\d{2}/\d{4}|\d{4}-\d{2}-\d{2})'),
+}
+_VL_RANGE_RE = re.compile(r'^([\d,]+)-([\d,]+)$')
+
 
 def _normalize(value):
     if not value:
@@ -70,24 +98,14 @@ def _parse_numero(token):
 
 def _extract_header(texto):
     header = {}
-
-    m = re.search(r'Relat[óo]rio de Ensaio N\.?[ºo]\s*(\S+)', texto)
-    header['numero_boletim'] = m.group(1) if m else None
-
-    m = re.search(r'[ÁA]rea:\s*(.+?)\s*(?:' + RIGHT_LABELS + r'|$)', texto)
-    header['area'] = m.group(1).strip() if m else None
-
-    m = re.search(r'Local de Colheita:\s*(.+?)\s*(?:' + RIGHT_LABELS + r'|$)', texto)
-    header['local_colheita'] = m.group(1).strip() if m else None
-
-    m = re.search(r'Controlo:\s*(\w+)', texto)
-    header['controlo'] = m.group(1) if m else None
-
-    m = re.search(r'\bColheita:\s*(\d{2}/\d{2}/\d{4}|\d{4}-\d{2}-\d{2})', texto)
-    header['data_colheita'] = _parse_data_pt(m.group(1)) if m else None
-
-    m = re.search(r'Emiss[ãa]o:\s*(\d{2}/\d{2}/\d{4}|\d{4}-\d{2}-\d{2})', texto)
-    header['data_emissao'] = _parse_data_pt(m.group(1)) if m else None
+    for campo, regex in _HEADER_RES.items():
+        m = regex.search(texto)
+        valor = m.group(1) if m else None
+        if valor and campo in ('area', 'local_colheita'):
+            valor = valor.strip()
+        elif campo.startswith('data_'):
+            valor = _parse_data_pt(valor)
+        header[campo] = valor
 
     local_norm = _normalize(header.get('local_colheita'))
     if 'entrada' in local_norm:
@@ -114,12 +132,25 @@ def _extract_parametros(texto):
     fim = texto.find('Este relatório')
     secao = texto[inicio:fim] if inicio != -1 else texto
 
+    # Uma só passagem: cada linha é testada contra o matcher de todos os
+    # parâmetros; as que não casam e parecem linhas de resultado são os
+    # parâmetros desconhecidos. Fica a 1.ª ocorrência de cada nome.
+    encontrados = {}
+    desconhecidos = set()
+    for linha in secao.splitlines():
+        m = _PARAMETRO_RE.match(linha)
+        if m:
+            encontrados.setdefault(m.group('nome'), m.group('resto'))
+            continue
+        m = _PARAMETRO_DESCONHECIDO_RE.match(linha)
+        if m and m.group(1).strip():
+            desconhecidos.add(m.group(1).strip())
+
     parametros = []
     for nome, pk in PARAMETROS_PDF.items():
-        m = re.search(r'^\s*' + re.escape(nome) + r'\b(.*)$', secao, re.MULTILINE)
-        if not m:
+        if nome not in encontrados:
             continue
-        tokens = m.group(1).split()
+        tokens = encontrados[nome].split()
         if len(tokens) < 7:
             continue  # linha incompleta/inesperada — ignorar em vez de adivinhar
 
@@ -142,23 +173,14 @@ def _extract_parametros(texto):
             'conforme': conforme,
         })
 
-    _log_parametros_desconhecidos(secao, PARAMETROS_PDF.keys())
+    _log_parametros_desconhecidos(desconhecidos)
     return parametros
 
 
-def _log_parametros_desconhecidos(secao, nomes_conhecidos):
+def _log_parametros_desconhecidos(desconhecidos):
     """Regista os parâmetros do boletim que não têm correspondência em
     PARAMETROS_PDF. Sem isto, um parâmetro novo introduzido pela CESAB seria
     ignorado silenciosamente em vez de aparecer como uma lacuna a preencher."""
-    conhecidos = set(nomes_conhecidos)
-    desconhecidos = set()
-    for linha in secao.splitlines():
-        m = re.match(r'^\s*([A-Za-zÀ-ÿ][A-Za-zÀ-ÿ\s.]*?)\s+[\d,.<-]+\s', linha)
-        if not m:
-            continue
-        nome = m.group(1).strip()
-        if nome and nome not in conhecidos:
-            desconhecidos.add(nome)
     if desconhecidos:
         logger.info(f"Boletim PDF: parâmetros não reconhecidos (ignorados): {sorted(desconhecidos)}")
 
@@ -170,7 +192,7 @@ def _avaliar_conformidade(resultado_tok, resultado_num, vl):
     if vl in ('-', '---', ''):
         return None, None, True  # sem limite definido
 
-    range_match = re.match(r'^([\d,]+)-([\d,]+)$', vl)
+    range_match = _VL_RANGE_RE.match(vl)
     if range_match:
         limitemin = _parse_numero(range_match.group(1))
         limite = _parse_numero(range_match.group(2))
@@ -191,6 +213,7 @@ def _avaliar_conformidade(resultado_tok, resultado_num, vl):
     return limite, None, resultado_num <= limite
 
 
+@offload(name='pdf.extract_boletim')
 def extract_lab_report(file_stream):
     """Extrai os dados estruturados de um boletim de ensaio (PDF) da CESAB.
 
@@ -198,6 +221,7 @@ def extract_lab_report(file_stream):
     colheita, datas, controlo) e a lista de parâmetros ensaiados, cada um já
     avaliado quanto à conformidade face ao VL. Não escreve nada na BD —
     a confirmação e gravação são sempre feitas explicitamente pelo utilizador.
+    No processo web corre fora do hub do eventlet (compute offload).
     """
     with pdfplumber.open(file_stream) as pdf:
         texto = '\n'.join(page.extract_text() or '' for page in pdf.pages)
@@ -224,41 +248,201 @@ def extract_lab_report(file_stream):
     }
 
 
-def sugerir_instalacao(current_user, local_colheita):
-    """Sugere uma instalação (ETAR) para o 'Local de Colheita' do boletim.
+# ── Extracção em lote ───────────────────────────────────────────────────
 
-    Prioridade: 1) mapeamento já confirmado anteriormente para este texto
-    exato; 2) correspondência aproximada (fuzzy) pelo nome da instalação.
+BATCH_MAX_FILES = 100
+BATCH_MAX_FILE_BYTES = 20 * 1024 * 1024
+# 0/1 = sem pool (extracção sequencial no próprio processo)
+EXTRACTION_WORKERS = int(os.getenv('LAB_EXTRACTION_WORKERS', min(4, os.cpu_count() or 1)))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: os workers não herdam o estado do eventlet/Flask do processo web
+            _pool = ProcessPoolExecutor(
+                max_workers=EXTRACTION_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _extract_one(ficheiro, conteudo):
+    """Corre nos workers do pool — um erro num PDF não derruba o lote."""
+    try:
+        return {'ficheiro': ficheiro, 'boletim': extract_lab_report(io.BytesIO(conteudo))}
+    except Exception as e:
+        return {'ficheiro': ficheiro, 'erro': f'PDF ilegível ou em formato inesperado: {e}'}
+
+
+def ler_upload(nome, ficheiro):
     """
-    if not local_colheita:
-        return {'sugestao': None, 'candidatos': [], 'origem': None}
+    Lê um ficheiro do upload (FileStorage). Um PDF acima de
+    BATCH_MAX_FILE_BYTES é recusado sem ser lido todo para memória — o
+    mesmo limite que se aplica aos PDFs dentro dos ZIP.
+    """
+    if not nome.lower().endswith('.pdf'):
+        return ficheiro.read()
+    if (getattr(ficheiro, 'content_length', 0) or 0) > BATCH_MAX_FILE_BYTES:
+        raise APIError(f"{nome}: ficheiro demasiado grande", 400, "ERR_FILE_TOO_LARGE")
+    conteudo = ficheiro.read(BATCH_MAX_FILE_BYTES + 1)
+    if len(conteudo) > BATCH_MAX_FILE_BYTES:
+        raise APIError(f"{nome}: ficheiro demasiado grande", 400, "ERR_FILE_TOO_LARGE")
+    return conteudo
 
-    with db_session_manager(current_user) as session:
-        mapeado = None
+
+def expandir_ficheiros(ficheiros):
+    """
+    Normaliza o upload em [(nome, bytes)] só de PDFs — os ZIP são abertos e
+    os PDFs lá dentro entram no lote. Outros ficheiros são ignorados.
+    """
+    pdfs = []
+    for nome, conteudo in ficheiros:
+        if nome.lower().endswith('.zip'):
+            try:
+                with zipfile.ZipFile(io.BytesIO(conteudo)) as zf:
+                    for info in zf.infolist():
+                        base = os.path.basename(info.filename)
+                        if (info.is_dir() or info.filename.startswith('__MACOSX/')
+                                or not base.lower().endswith('.pdf')):
+                            continue
+                        if info.file_size > BATCH_MAX_FILE_BYTES:
+                            raise APIError(f"{base}: ficheiro demasiado grande", 400, "ERR_FILE_TOO_LARGE")
+                        pdfs.append((base, zf.read(info)))
+                        if len(pdfs) > BATCH_MAX_FILES:
+                            break
+            except zipfile.BadZipFile:
+                raise APIError(f"{nome}: ZIP inválido", 400, "ERR_INVALID_ZIP")
+        elif nome.lower().endswith('.pdf'):
+            if len(conteudo) > BATCH_MAX_FILE_BYTES:
+                raise APIError(f"{nome}: ficheiro demasiado grande", 400, "ERR_FILE_TOO_LARGE")
+            pdfs.append((nome, conteudo))
+
+        if len(pdfs) > BATCH_MAX_FILES:
+            raise APIError(f"Máximo de {BATCH_MAX_FILES} boletins por lote", 400, "ERR_TOO_MANY_FILES")
+    return pdfs
+
+
+def extract_lab_reports(ficheiros):
+    """
+    Extrai vários boletins [(nome, bytes)] num pool de processos (o parsing
+    do pdfplumber é CPU puro). Devolve, pela ordem recebida,
+    {'ficheiro', 'boletim'} ou {'ficheiro', 'erro'}.
+    """
+    if not ficheiros:
+        return []
+    nomes = [nome for nome, _ in ficheiros]
+    conteudos = [conteudo for _, conteudo in ficheiros]
+
+    if len(ficheiros) > 1 and EXTRACTION_WORKERS > 1:
         try:
-            mapeado = session.execute(
-                text("""
-                    SELECT m.tb_instalacao, e.nome
-                    FROM vbl_pdf_local_colheita m
-                    JOIN vbf_etar e ON e.pk = m.tb_instalacao
-                    WHERE m.local_colheita = :local_colheita
-                """),
-                {'local_colheita': local_colheita}
-            ).mappings().first()
-        except Exception:
-            # View/tabela de memória ainda não criada (ver backend/sql/pdf_boletim_mapping.sql) —
-            # degradar para sugestão por fuzzy-match em vez de falhar o pedido.
-            session.rollback()
-            logger.warning('vbl_pdf_local_colheita indisponível — a usar apenas fuzzy-match', exc_info=True)
-
-        if mapeado:
-            return {
-                'sugestao': {'pk': mapeado['tb_instalacao'], 'nome': mapeado['nome']},
-                'candidatos': [],
-                'origem': 'memoria',
-            }
-
-        instalacoes = session.execute(text('SELECT pk, nome FROM vbf_etar')).mappings().all()
+            return list(_get_pool().map(_extract_one, nomes, conteudos))
+        except BrokenProcessPool:
+            logger.error('Pool de extracção de boletins avariado — a extrair sequencialmente', exc_info=True)
+            _reset_pool()
+
+    return [_extract_one(nome, conteudo) for nome, conteudo in ficheiros]
+
+
+def extract_lab_reports_batch(current_user, ficheiros):
+    """
+    Lote revisível: extracção de todos os boletins + sugestão de instalação
+    para todos (uma só query) + alertas de revisão (boletim repetido no lote,
+    instalação por identificar). Não grava nada — cada boletim continua a ser
+    confirmado e importado individualmente (importar_boletim).
+    """
+    resultados = extract_lab_reports(expandir_ficheiros(ficheiros))
+
+    locais = [r['boletim'].get('local_colheita') for r in resultados if 'boletim' in r]
+    sugestoes = sugerir_instalacoes(current_user, locais)
+
+    vistos = {}
+    for r in resultados:
+        if 'boletim' not in r:
+            continue
+        boletim = r['boletim']
+        r['instalacao'] = sugestoes.get(boletim.get('local_colheita')) or _SEM_SUGESTAO
+        avisos = []
+        numero = boletim.get('numero_boletim')
+        if numero:
+            if numero in vistos:
+                avisos.append(f"Boletim repetido no lote (igual a {vistos[numero]})")
+            else:
+                vistos[numero] = r['ficheiro']
+        if not r['instalacao']['sugestao']:
+            avisos.append('Instalação por identificar')
+        if not boletim['parametros']:
+            avisos.append('Nenhum parâmetro reconhecido')
+        r['avisos'] = avisos
+
+    extraidos = [r for r in resultados if 'boletim' in r]
+    return {
+        'boletins': resultados,
+        'resumo': {
+            'total': len(resultados),
+            'extraidos': len(extraidos),
+            'erros': len(resultados) - len(extraidos),
+            'com_nao_conformidades': sum(1 for r in extraidos if r['boletim']['nao_conformidades']),
+            'para_rever': sum(1 for r in extraidos if r['avisos']),
+        },
+    }
+
+
+# ── Sugestão de instalação ──────────────────────────────────────────────
+
+_SEM_SUGESTAO = {'sugestao': None, 'candidatos': [], 'origem': None}
+
+
+def _carregar_instalacoes(session, locais):
+    """
+    Instalações (vbf_etar) e mapeamentos já confirmados para `locais`, numa
+    só query. Devolve (instalacoes, {local: {'pk', 'nome'}}).
+    """
+    try:
+        rows = session.execute(
+            text("""
+                SELECT e.pk, e.nome, NULL AS local_colheita
+                FROM vbf_etar e
+                UNION ALL
+                SELECT m.tb_instalacao, e.nome, m.local_colheita
+                FROM vbl_pdf_local_colheita m
+                JOIN vbf_etar e ON e.pk = m.tb_instalacao
+                WHERE m.local_colheita = ANY(:locais)
+            """),
+            {'locais': list(locais)}
+        ).mappings().all()
+    except Exception:
+        # View/tabela de memória ainda não criada (ver backend/sql/pdf_boletim_mapping.sql) —
+        # degradar para sugestão por fuzzy-match em vez de falhar o pedido.
+        session.rollback()
+        logger.warning('vbl_pdf_local_colheita indisponível — a usar apenas fuzzy-match', exc_info=True)
+        rows = session.execute(
+            text('SELECT pk, nome, NULL AS local_colheita FROM vbf_etar')
+        ).mappings().all()
+
+    instalacoes = [r for r in rows if r['local_colheita'] is None]
+    mapeados = {}
+    for r in rows:
+        if r['local_colheita'] is not None:
+            mapeados.setdefault(r['local_colheita'], {'pk': r['pk'], 'nome': r['nome']})
+    return instalacoes, mapeados
+
+
+def _sugerir(local_colheita, instalacoes, mapeados):
+    if local_colheita in mapeados:
+        return {'sugestao': mapeados[local_colheita], 'candidatos': [], 'origem': 'memoria'}
 
     # 1ª tentativa: o nome da instalação aparece literalmente dentro do texto do
     # "Local de Colheita" (ex: "Currelos" em "ETAR Currelos- Subsistema Currelos -
@@ -268,7 +452,7 @@ def sugerir_instalacao(current_user, local_colheita):
     local_norm = _normalize(local_colheita)
     por_substring = [
         row for row in instalacoes
-        if len(_normalize(row['nome'])) >= 3 and _normalize(row['nome']) in local_norm
+        if len(row['nome_norm']) >= 3 and row['nome_norm'] in local_norm
     ]
     if por_substring:
         por_substring.sort(key=lambda r: len(r['nome']), reverse=True)
@@ -289,6 +473,31 @@ def sugerir_instalacao(current_user, local_colheita):
     }
 
 
+def sugerir_instalacoes(current_user, locais_colheita):
+    """Sugestões para vários 'Local de Colheita' de uma vez: {local: sugestão}."""
+    locais = sorted({l for l in locais_colheita if l})
+    if not locais:
+        return {}
+
+    with db_session_manager(current_user) as session:
+        instalacoes, mapeados = _carregar_instalacoes(session, locais)
+
+    # Normalizar os nomes uma vez para todo o lote
+    instalacoes = [{**row, 'nome_norm': _normalize(row['nome'])} for row in instalacoes]
+    return {local: _sugerir(local, instalacoes, mapeados) for local in locais}
+
+
+def sugerir_instalacao(current_user, local_colheita):
+    """Sugere uma instalação (ETAR) para o 'Local de Colheita' do boletim.
+
+    Prioridade: 1) mapeamento já confirmado anteriormente para este texto
+    exato; 2) correspondência aproximada (fuzzy) pelo nome da instalação.
+    """
+    if not local_colheita:
+        return dict(_SEM_SUGESTAO)
+    return sugerir_instalacoes(current_user, [local_colheita])[local_colheita]
+
+
 def confirmar_mapeamento_instalacao(current_user, local_colheita, tb_instalacao):
     """Guarda (ou atualiza) o mapeamento 'Local de Colheita' -> instalação,
     para que boletins futuros com o mesmo texto sejam sugeridos automaticamente."""
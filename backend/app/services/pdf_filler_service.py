@@ -1,7 +1,22 @@
+"""
+Preenchimento do formulário de pedido (FORMULARIO_AINTAR_V05.pdf).
+
+O template é lido uma vez por processo (FormTemplate, recarregado só se o
+ficheiro mudar) e indexado campo→anotação: para cada página fica a lista de
+widgets mapeados em CAMPO_MAPPING, com a posição em /Annots e o tipo. Cada
+preenchimento clona só o que muda — o dicionário da página, o array /Annots
+e as anotações; conteúdo, fontes e recursos são partilhados — e escreve os
+valores directamente nas posições indexadas, sem percorrer nem comparar
+nomes de campos.
+
+fill_documents() junta vários pedidos num só PDF (p.ex. imprimir os pedidos
+do dia) e fetch_documents_data() traz os dados de todos numa só query.
+"""
 import os
+import threading
 from io import BytesIO
-from flask import current_app
-from pdfrw import PdfReader, PdfWriter, PdfDict, PdfName
+from typing import Dict, List, NamedTuple, Optional, Sequence
+from pdfrw import PdfReader, PdfWriter, PdfDict, PdfName, PdfArray, PdfObject, PdfString
 from sqlalchemy.sql import text
 from ..utils.utils import db_session_manager
 from app.utils.error_handler import api_error_handler, ResourceNotFoundError
@@ -55,37 +70,190 @@ def generate_filled_pdf(document_pk: int, current_user: str) -> BytesIO:
     return pdf_buffer
 
 
+@api_error_handler
+def generate_filled_pdfs(document_pks: Sequence[int], current_user: str) -> BytesIO:
+    """Um só PDF com o formulário preenchido de cada pedido, pela ordem dada."""
+    return fill_documents(fetch_documents_data(document_pks, current_user))
+
+
+# ── Dados ───────────────────────────────────────────────────────────────
+
+_SOURCE_ALIAS = {'pedido': 'd', 'entidade': 'e', 'requerente': 'r'}
+
+# Só as colunas que o formulário usa, com alias "grupo.coluna"
+_SELECT_COLUMNS = ',\n               '.join(
+    f'{_SOURCE_ALIAS[group]}.{column} AS "{group}.{column}"'
+    for group, column in sorted({tuple(v.split('.')) for v in CAMPO_MAPPING.values()})
+)
+
+
+def fetch_documents_data(pks: Sequence[int], current_user: str) -> List[dict]:
+    """
+    Dados de vários pedidos (pedido, entidade, requerente) numa só query,
+    pela ordem de `pks`. Pedidos inexistentes ficam de fora; entidade ou
+    requerente em falta dão um dicionário vazio.
+    """
+    with db_session_manager(current_user) as session:
+        rows = session.execute(text(f"""
+            SELECT d.pk AS document_pk, d.nipc AS document_nipc, e.pk AS entity_pk,
+               {_SELECT_COLUMNS}
+            FROM vbl_document d
+            LEFT JOIN vbf_entity e ON e.nipc = d.nipc
+            LEFT JOIN vbf_entity r ON r.pk = d.tb_representative
+            WHERE d.pk = ANY(:pks)
+        """), {'pks': list(pks)}).mappings().all()
+
+    by_pk = {}
+    for row in rows:
+        dados = {'pk': row['document_pk'], 'nipc': row['document_nipc'],
+                 'has_entity': row['entity_pk'] is not None,
+                 'pedido': {}, 'entidade': {}, 'requerente': {}}
+        for key, value in row.items():
+            if '.' in key:
+                group, column = key.split('.')
+                dados[group][column] = value
+        if not any(v is not None for v in dados['requerente'].values()):
+            dados['requerente'] = {}
+        # vbl_document pode devolver várias linhas se houver NIPC repetido em vbf_entity
+        by_pk.setdefault(row['document_pk'], dados)
+    return [by_pk[pk] for pk in pks if pk in by_pk]
+
+
 def _fetch_document_data(pk: int, current_user: str) -> dict:
     """
     Busca todos os dados necessários (pedido, entidade, requerente) para preencher o PDF.
     (Função anteriormente chamada 'buscar_dados_pedido')
     """
-    with db_session_manager(current_user) as session:
-        query_pedido = text("SELECT * FROM vbl_document WHERE pk = :pk")
-        result_pedido = session.execute(query_pedido, {'pk': pk}).fetchone()
-        if not result_pedido:
-            raise ResourceNotFoundError("Pedido", pk)
+    found = fetch_documents_data([pk], current_user)
+    if not found:
+        raise ResourceNotFoundError("Pedido", pk)
+    if not found[0]['has_entity']:
+        raise ResourceNotFoundError("Entidade", found[0]['nipc'])
+    return found[0]
+
+
+# ── Template indexado ───────────────────────────────────────────────────
+
+class FieldRef(NamedTuple):
+    annot_index: int      # posição em /Annots da página
+    name: str
+    group: str            # 'pedido' | 'entidade' | 'requerente'
+    column: str
+    field_type: Optional[str]
+
 
-        query_entidade = text("SELECT * FROM vbf_entity WHERE nipc = :nipc")
-        result_entidade = session.execute(
-            query_entidade, {'nipc': result_pedido.nipc}).fetchone()
-        if not result_entidade:
-            raise ResourceNotFoundError("Entidade", result_pedido.nipc)
+class FormTemplate:
+    """Template AcroForm lido uma vez, com o índice página→campos mapeados."""
 
-        result_requerente = None
-        if result_pedido.tb_representative:
-            query_requerente = text("SELECT * FROM vbf_entity WHERE pk = :pk")
-            result_requerente = session.execute(
-                query_requerente, {'pk': result_pedido.tb_representative}).fetchone()
+    def __init__(self, path: str, mapping: Dict[str, str] = CAMPO_MAPPING):
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        self.reader = PdfReader(path)
+        self.index: List[List[FieldRef]] = []
+        for page in self.reader.pages:
+            refs = []
+            for i, annotation in enumerate(page.Annots or ()):
+                if annotation.get('/Subtype') not in (None, '/Widget') or not annotation.get('/T'):
+                    continue
+                name = annotation['/T'][1:-1]  # Remover parênteses
+                if name in mapping:
+                    group, column = mapping[name].split('.')
+                    refs.append(FieldRef(i, name, group, column, annotation.get('/FT')))
+            self.index.append(refs)
+        logger.info(f"Template de formulário indexado: {path} "
+                    f"({sum(len(r) for r in self.index)} campos mapeados)")
 
-        def result_to_dict(result):
-            return {key: getattr(result, key) for key in result._fields} if result else {}
+    @staticmethod
+    def _clone_page(page, suffix=None):
+        clone = page.copy()
+        clone.indirect = True
+        if page.Annots:
+            annots = []
+            for annotation in page.Annots:
+                copy = annotation.copy()
+                copy.indirect = True
+                if copy.P is not None:
+                    copy.P = clone
+                # Campos com o mesmo nome partilham o valor no leitor de PDF
+                if suffix and copy.T is not None:
+                    copy.T = PdfString.encode(copy.T.decode() + suffix)
+                annots.append(copy)
+            clone.Annots = PdfArray(annots)
+        return clone
 
-        return {
-            'pedido': result_to_dict(result_pedido),
-            'entidade': result_to_dict(result_entidade),
-            'requerente': result_to_dict(result_requerente)
-        }
+    def acroform(self, fields: list) -> PdfDict:
+        """/AcroForm do PDF final: recursos do template e os campos clonados."""
+        form = PdfDict()
+        source = self.reader.Root.AcroForm
+        if source is not None:
+            for key in ('DA', 'DR', 'Q'):
+                if source[PdfName(key)] is not None:
+                    form[PdfName(key)] = source[PdfName(key)]
+        form.Fields = PdfArray(fields)
+        # Os valores são escritos sem aparência (AP): o leitor gera-a
+        form.NeedAppearances = PdfObject('true')
+        return form
+
+    def fill(self, dados_estruturados: dict, suffix: Optional[str] = None) -> list:
+        """Páginas clonadas do template com os valores de um pedido (suffix: nome por cópia)."""
+        pages = []
+        for page, refs in zip(self.reader.pages, self.index):
+            # Sempre clonada: o PdfWriter altera /Parent da página ao escrever
+            clone = self._clone_page(page, suffix)
+            for ref in refs:
+                valor = (dados_estruturados.get(ref.group) or {}).get(ref.column)
+                if valor is None:
+                    continue
+                _set_field_value(clone.Annots[ref.annot_index], ref.field_type, str(valor))
+            pages.append(clone)
+        return pages
+
+
+def _set_field_value(annotation, field_type, valor):
+    if field_type == '/Btn':  # Botão/Checkbox
+        state = PdfName('Yes') if valor.lower() in ['true', '1', 'yes', 'on'] else PdfName('Off')
+        annotation.update(PdfDict(AS=state, V=state))
+    else:
+        # Força a aparência a ser regenerada pelo leitor de PDF
+        annotation.update(PdfDict(V=valor, AP=''))
+
+
+_templates: Dict[str, FormTemplate] = {}
+_templates_lock = threading.Lock()
+
+
+def get_form_template(path: str = FORMULARIO_PATH) -> FormTemplate:
+    """FormTemplate do ficheiro (um por processo; relido se o ficheiro mudar)."""
+    if not os.path.exists(path):
+        logger.error(f"Ficheiro de template PDF não encontrado: {path}")
+        raise FileNotFoundError(f"Ficheiro de template PDF não encontrado: {path}")
+    path = os.path.abspath(path)
+    template = _templates.get(path)
+    if template is None or template.mtime != os.path.getmtime(path):
+        with _templates_lock:
+            template = _templates.get(path)
+            if template is None or template.mtime != os.path.getmtime(path):
+                template = _templates[path] = FormTemplate(path)
+    return template
+
+
+def fill_documents(dados_list: Sequence[dict], path: str = FORMULARIO_PATH) -> BytesIO:
+    """Preenche o formulário para cada pedido e junta tudo num só PDF."""
+    template = get_form_template(path)
+    writer = PdfWriter()
+    fields = []
+    multiple = len(dados_list) > 1
+    for i, dados_estruturados in enumerate(dados_list):
+        for page in template.fill(dados_estruturados, suffix=f'_{i + 1}' if multiple else None):
+            writer.addpage(page)
+            fields.extend(a for a in (page.Annots or ()) if a.T is not None)
+    writer.trailer.Root.AcroForm = template.acroform(fields)
+
+    buffer = BytesIO()
+    writer.write(buffer)
+    buffer.seek(0)
+    logger.info(f"PDF preenchido com sucesso ({len(dados_list)} pedido(s)).")
+    return buffer
 
 
 def _fill_pdf_template(dados_estruturados: dict) -> BytesIO:
@@ -93,39 +261,7 @@ def _fill_pdf_template(dados_estruturados: dict) -> BytesIO:
     Preenche o template PDF com os dados fornecidos.
     (Função anteriormente chamada 'preencher_pdf')
     """
-    if not os.path.exists(FORMULARIO_PATH):
-        logger.error(f"Ficheiro de template PDF não encontrado: {FORMULARIO_PATH}")
-        raise FileNotFoundError(f"Ficheiro de template PDF não encontrado: {FORMULARIO_PATH}")
-
-    template_pdf = PdfReader(FORMULARIO_PATH)
-    
-    # Preencher os campos
-    for page in template_pdf.pages:
-        if page.get('/Annots'):
-            for annotation in page['/Annots']:
-                field = annotation.get('/T')
-                if field:
-                    pdf_field_name = field[1:-1] # Remover parênteses
-                    
-                    if pdf_field_name in CAMPO_MAPPING:
-                        map_key = CAMPO_MAPPING[pdf_field_name]
-                        main_key, sub_key = map_key.split('.')
-                        
-                        valor = dados_estruturados.get(main_key, {}).get(sub_key)
-
-                        if valor is not None:
-                            # Atualiza o valor do campo no PDF
-                            annotation.update(PdfDict(V=str(valor)))
-                            # Força a aparência a ser regenerada pelo leitor de PDF
-                            annotation.update(PdfDict(AP=''))
-
-    # Gerar o PDF de saída
-    buffer = BytesIO()
-    PdfWriter().write(buffer, template_pdf)
-    buffer.seek(0)
-    
-    logger.info("PDF preenchido com sucesso e retornado como buffer.")
-    return buffer
+    return fill_documents([dados_estruturados])
 
 
 def debug_pdf_fields(pdf_path: str):
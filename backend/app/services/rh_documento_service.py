@@ -7,6 +7,7 @@ from flask_jwt_extended import get_jwt
 from ..utils.utils import db_session_manager
 from app.utils.error_handler import api_error_handler, APIError
 from app.utils.file_processing import process_uploaded_file
+from app.services.storage_accounting_service import remove_file
 from app.utils.logger import get_logger
 from app.utils.serializers import serialize_rows
 from .rh_gestao_service import _is_full_rh_admin
@@ -213,7 +214,7 @@ def delete_documento(pk: int, current_user: str):
 
         file_path = _resolver_path_seguro(row.filename)
         if os.path.isfile(file_path):
-            os.remove(file_path)
+            remove_file(file_path)
 
         session.execute(text('DELETE FROM tb_rh_documento WHERE pk = :pk'), {'pk': pk})
 
@@ -8,6 +8,7 @@ from app import cache
 from app.utils.error_handler import api_error_handler
 from ..utils.utils import db_session_manager
 from app.utils.logger import get_logger
+from app.utils.http_client import get_client
 from . import audit_service
 
 logger = get_logger(__name__)
@@ -46,8 +47,10 @@ def _invalidate_templates_cache(user_fk: int):
     cache.delete(_templates_cache_key(user_fk))
 
 
-def _euclidean(a: list, b: list) -> float:
-    return float(np.linalg.norm(np.array(a, dtype=np.float64) - np.array(b, dtype=np.float64)))
+def _min_distance(descriptor: list, templates: list) -> float:
+    """Menor distância euclidiana do descritor aos templates, numa só operação."""
+    diffs = np.asarray(templates, dtype=np.float64) - np.asarray(descriptor, dtype=np.float64)
+    return float(np.linalg.norm(diffs, axis=1).min())
 
 
 # ---------------------------------------------------------------------------
@@ -214,11 +217,10 @@ def compute_descriptor_from_photo(data: dict, user_fk: int):
         payload['minConfidence'] = data['minConfidence']
 
     try:
-        resp = requests.post(
-            f'{FACE_SERVICE_URL}/descriptor',
-            json=payload,
-            timeout=FACE_SERVICE_TIMEOUT,
-        )
+        resp = get_client(
+            'face-service', pool_size=4, max_concurrency=4,
+            timeout=(3, FACE_SERVICE_TIMEOUT),
+        ).post(f'{FACE_SERVICE_URL}/descriptor', json=payload)
     except requests.exceptions.RequestException as exc:
         logger.error(f'face-service inacessível ({FACE_SERVICE_URL}): {exc}')
         return jsonify({
@@ -279,7 +281,7 @@ def verify_face(data: dict, user_fk: int, current_user: str):
             'error': 'Sem rosto registado. Efectue o registo facial primeiro.',
         }), 200
 
-    min_dist = min(_euclidean(descriptor, template) for template in templates)
+    min_dist = _min_distance(descriptor, templates)
     verified = min_dist <= FACE_THRESHOLD
 
     logger.info(f'Face verify: user={user_fk}, score={min_dist:.4f}, verified={verified}')
@@ -10,6 +10,7 @@ from flask_jwt_extended import get_jwt
 from ..utils.utils import format_message, db_session_manager
 from app.utils.error_handler import api_error_handler, APIError
 from app.utils.file_processing import process_uploaded_file
+from app.services.storage_accounting_service import remove_file
 from app.utils.logger import get_logger
 from app.utils.serializers import serialize_rows
 from .rh_gestao_service import _is_full_rh_admin, _is_direct_superior, _assert_pode_validar
@@ -446,7 +447,7 @@ def delete_anexo(pk: int, filename: str, current_user: str):
 
         file_path = os.path.join(_upload_dir(pk), filename)
         if os.path.isfile(file_path):
-            os.remove(file_path)
+            remove_file(file_path)
 
         session.execute(
             text("UPDATE tb_rh_participacao SET documentos = CAST(:docs AS JSONB) WHERE pk = :pk"),
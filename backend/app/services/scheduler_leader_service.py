@@ -0,0 +1,259 @@
+"""
+Eleição do líder do scheduler entre workers e servidores.
+
+Cada processo web arranca o seu APScheduler; sem coordenação todos corriam
+todos os jobs (geração mensal, purgas, alertas) — N vezes com N workers.
+Só o líder corre os jobs agendados de âmbito 'leader'; os de âmbito
+'process' (buffers e caches em memória do próprio processo) correm em todos.
+
+Backends (SCHEDULER_LEADER_BACKEND):
+- postgres (default): pg_try_advisory_lock numa ligação dedicada mantida pelo
+  líder. Se o processo morre ou a ligação cai, o Postgres liberta o lock e
+  outro processo assume no heartbeat seguinte — sem TTLs a afinar.
+- redis: SET NX PX com renovação no heartbeat (token por processo). Se o
+  Redis não responder, recorre ao advisory lock do Postgres.
+- local: todos os processos são líderes (desenvolvimento / um só worker).
+
+job_lock serializa cada job no cluster (advisory lock por job_id) — protege
+execuções manuais e a janela de transição de liderança.
+"""
+import os
+import socket
+import threading
+import uuid
+import zlib
+from contextlib import contextmanager
+
+from sqlalchemy import text
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+LOCK_NAMESPACE = 0x41494E54          # 'AINT' — 1ª chave do par (int4, int4)
+LEADER_KEY = 0
+REDIS_KEY = 'aintar:scheduler:leader'
+REDIS_TTL_MS = 60_000                # > 3 heartbeats (HEARTBEAT_SECONDS)
+HEARTBEAT_SECONDS = 15
+
+HOST_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Renova só se o lock ainda for deste processo
+_REDIS_RENEW = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_REDIS_RELEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def job_lock_key(job_id: str) -> int:
+    """2ª chave (int4 positivo, != LEADER_KEY) do advisory lock de um job."""
+    return (zlib.crc32(job_id.encode()) & 0x7FFFFFFF) or 1
+
+
+class _PostgresLeader:
+    backend = 'postgres'
+
+    def __init__(self, engine):
+        self._engine = engine
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _discard(self):
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+    def refresh(self) -> bool:
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.execute(text("SELECT 1"))
+                    return True
+                except Exception as e:
+                    # Ligação perdida: o servidor já libertou o lock
+                    logger.warning(f"[Scheduler] Ligação do líder perdida ({e}) — a recandidatar")
+                    self._discard()
+
+            try:
+                conn = self._engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+            except Exception as e:
+                logger.warning(f"[Scheduler] Sem ligação à BD para a eleição de líder: {e}")
+                return False
+            try:
+                acquired = conn.execute(
+                    text("SELECT pg_try_advisory_lock(:ns, :key)"),
+                    {'ns': LOCK_NAMESPACE, 'key': LEADER_KEY},
+                ).scalar()
+            except Exception as e:
+                logger.warning(f"[Scheduler] Falha no advisory lock de líder: {e}")
+                acquired = False
+            if acquired:
+                self._conn = conn
+            else:
+                conn.close()
+            return bool(acquired)
+
+    def release(self):
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    text("SELECT pg_advisory_unlock(:ns, :key)"),
+                    {'ns': LOCK_NAMESPACE, 'key': LEADER_KEY},
+                )
+            except Exception:
+                pass
+            self._discard()
+
+
+class _RedisLeader:
+    backend = 'redis'
+
+    def __init__(self, url, fallback):
+        import redis
+        self._errors = redis.RedisError
+        self._client = redis.Redis.from_url(url, socket_connect_timeout=2, socket_timeout=2)
+        self._token = f"{HOST_ID}:{uuid.uuid4().hex[:8]}"
+        self._fallback = fallback
+        self._degraded = False
+
+    def refresh(self) -> bool:
+        try:
+            leader = bool(
+                self._client.eval(_REDIS_RENEW, 1, REDIS_KEY, self._token, REDIS_TTL_MS)
+                or self._client.set(REDIS_KEY, self._token, nx=True, px=REDIS_TTL_MS)
+            )
+        except self._errors as e:
+            if not self._degraded:
+                logger.warning(f"[Scheduler] Redis indisponível ({e}) — eleição pelo advisory lock do Postgres")
+                self._degraded = True
+            return self._fallback.refresh()
+
+        if self._degraded:
+            logger.info("[Scheduler] Redis disponível — eleição de líder volta ao Redis")
+            self._degraded = False
+        self._fallback.release()
+        return leader
+
+    def release(self):
+        try:
+            self._client.eval(_REDIS_RELEASE, 1, REDIS_KEY, self._token)
+        except self._errors:
+            pass
+        self._fallback.release()
+
+
+class _LocalLeader:
+    backend = 'local'
+
+    def refresh(self) -> bool:
+        return True
+
+    def release(self):
+        pass
+
+
+_election = None
+_is_leader = False
+_state_lock = threading.Lock()
+_local_job_locks = {}
+
+
+def init_leader_election(app):
+    """Cria o backend de eleição configurado (SCHEDULER_LEADER_BACKEND)."""
+    global _election
+    from app import db
+
+    backend = (app.config.get('SCHEDULER_LEADER_BACKEND') or 'postgres').lower()
+    if backend == 'local':
+        _election = _LocalLeader()
+    elif backend == 'redis':
+        postgres = _PostgresLeader(db.engine)
+        try:
+            _election = _RedisLeader(app.config.get('REDIS_URL'), postgres)
+        except ImportError:
+            logger.warning("[Scheduler] Pacote redis indisponível — eleição pelo advisory lock do Postgres")
+            _election = postgres
+    else:
+        if backend != 'postgres':
+            logger.warning(f"[Scheduler] SCHEDULER_LEADER_BACKEND desconhecido '{backend}' — a usar postgres")
+        _election = _PostgresLeader(db.engine)
+    return _election
+
+
+def refresh_leadership() -> bool:
+    """Heartbeat: confirma (ou tenta obter) a liderança. Regista as transições."""
+    global _is_leader
+    if _election is None:
+        return False
+    leader = _election.refresh()
+    with _state_lock:
+        changed, _is_leader = leader != _is_leader, leader
+    if changed:
+        if leader:
+            logger.info(f"[Scheduler] 👑 {HOST_ID} é agora o líder ({_election.backend})")
+        else:
+            logger.warning(f"[Scheduler] {HOST_ID} deixou de ser o líder")
+    return leader
+
+
+def is_leader() -> bool:
+    return _is_leader
+
+
+def release_leadership():
+    global _is_leader
+    if _election is not None:
+        _election.release()
+    _is_leader = False
+
+
+def leader_info() -> dict:
+    return {
+        'backend': _election.backend if _election else None,
+        'host': HOST_ID,
+        'is_leader': _is_leader,
+    }
+
+
+@contextmanager
+def job_lock(job_id: str):
+    """
+    Exclusão mútua de um job no cluster. Cede True se o lock foi obtido,
+    False se outra instância já o está a correr (não espera).
+    """
+    if _election is None or _election.backend == 'local':
+        lock = _local_job_locks.setdefault(job_id, threading.Lock())
+        acquired = lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+        return
+
+    from app import db
+    params = {'ns': LOCK_NAMESPACE, 'key': job_lock_key(job_id)}
+    with db.engine.connect() as conn:
+        conn = conn.execution_options(isolation_level='AUTOCOMMIT')
+        acquired = bool(conn.execute(text("SELECT pg_try_advisory_lock(:ns, :key)"), params).scalar())
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                try:
+                    conn.execute(text("SELECT pg_advisory_unlock(:ns, :key)"), params)
+                except Exception:
+                    # Não devolver ao pool uma ligação que ainda pode ter o lock
+                    conn.invalidate()
@@ -0,0 +1,312 @@
+"""
+Contabilidade de armazenamento por diretório.
+
+As estatísticas de armazenamento eram calculadas com os.walk + getsize sobre
+as árvores inteiras em cada pedido — minutos no servidor de ficheiros, com um
+worker bloqueado. Agora:
+
+1. uploads (process_uploaded_file) e remoções (remove_file) registam deltas
+   (nº de ficheiros, bytes) por (área, diretório) num buffer em memória —
+   sem I/O de BD no pedido, que partilha a sessão SQLAlchemy do chamador;
+2. o job flush_pending (cada minuto) aplica os deltas acumulados em
+   tb_storage_usage num só upsert (DDL em app/sql/storage_usage.sql);
+3. o job reconcile_storage (nocturno, ou a pedido do admin — run_job_now
+   em app/scheduler.py) varre cada área com os.scandir — o stat de cada
+   DirEntry é reutilizado, sem isfile/getsize extra — e reescreve as linhas
+   da área, corrigindo qualquer desvio;
+4. get_storage_summary lê os totais pré-calculados (+ deltas locais ainda
+   por aplicar) — resposta imediata para o dashboard.
+
+Áreas: 'temp' (TEMP_DIR) e 'files' (FILES_DIR; os ofícios são o subdiretório
+'letters'). Ficheiros fora das áreas são ignorados.
+"""
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import text
+
+from app.utils.utils import db_session_manager, db_system_session
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+LETTERS_DIR = 'letters'
+TOP_DIRECTORIES = 20        # maiores diretórios de topo devolvidos por área
+
+_pending = defaultdict(lambda: [0, 0])     # (area, directory) -> [ficheiros, bytes]
+_pending_lock = threading.Lock()
+_reconcile_lock = threading.Lock()
+
+
+# ── Áreas ─────────────────────────────────────────────────────────────────────
+
+def get_storage_areas():
+    """{área: raiz absoluta} das árvores monitorizadas."""
+    areas = {'temp': os.path.abspath(current_app.config.get('TEMP_DIR', 'temp'))}
+    files_dir = current_app.config.get('FILES_DIR')
+    if files_dir:
+        areas['files'] = os.path.abspath(files_dir)
+    return areas
+
+
+def _locate(path, areas):
+    """(área, diretório relativo) do ficheiro, ou None se estiver fora das áreas."""
+    path = os.path.abspath(path)
+    # A raiz mais específica ganha (TEMP_DIR pode estar dentro de FILES_DIR)
+    for area, root in sorted(areas.items(), key=lambda a: len(a[1]), reverse=True):
+        if path.startswith(root + os.sep):
+            directory = os.path.relpath(os.path.dirname(path), root)
+            return area, '' if directory == '.' else directory.replace(os.sep, '/')
+    return None
+
+
+# ── Registo de deltas (uploads / remoções) ────────────────────────────────────
+
+def _record(path, files, size):
+    try:
+        located = _locate(path, get_storage_areas())
+    except Exception as e:                  # sem app context, config em falta, ...
+        logger.debug(f"Contabilidade de armazenamento ignorada para {path}: {e}")
+        return
+    if not located:
+        return
+    with _pending_lock:
+        delta = _pending[located]
+        delta[0] += files
+        delta[1] += size
+
+
+def record_file_added(path, size=None):
+    """Regista um ficheiro novo (size por omissão: stat do ficheiro)."""
+    if size is None:
+        try:
+            size = os.stat(path).st_size
+        except OSError:
+            return
+    _record(path, 1, size)
+
+
+def record_file_removed(path, size):
+    _record(path, -1, -size)
+
+
+def record_file_moved(src, dest, size):
+    _record(src, -1, -size)
+    _record(dest, 1, size)
+
+
+def remove_file(path, size=None):
+    """
+    os.remove + registo do delta. Devolve os bytes libertados.
+    Aceita o size já conhecido (ex.: DirEntry.stat()) para evitar outro stat.
+    """
+    if size is None:
+        size = os.stat(path).st_size
+    os.remove(path)
+    record_file_removed(path, size)
+    return size
+
+
+def _take_pending():
+    global _pending
+    with _pending_lock:
+        taken, _pending = _pending, defaultdict(lambda: [0, 0])
+    return {k: v for k, v in taken.items() if v[0] or v[1]}
+
+
+def _restore_pending(deltas):
+    with _pending_lock:
+        for key, (files, size) in deltas.items():
+            _pending[key][0] += files
+            _pending[key][1] += size
+
+
+def flush_pending(app=None):
+    """Job: aplica os deltas acumulados neste processo num só upsert."""
+    if app is not None:
+        with app.app_context():
+            return flush_pending()
+
+    deltas = _take_pending()
+    if not deltas:
+        return 0
+    keys = list(deltas)
+    try:
+        with db_system_session() as session:
+            session.execute(text("""
+                INSERT INTO tb_storage_usage (area, directory, file_count, total_bytes)
+                SELECT * FROM unnest(CAST(:areas AS text[]), CAST(:dirs AS text[]),
+                                     CAST(:counts AS bigint[]), CAST(:sizes AS bigint[]))
+                ON CONFLICT (area, directory) DO UPDATE SET
+                    file_count  = GREATEST(tb_storage_usage.file_count + EXCLUDED.file_count, 0),
+                    total_bytes = GREATEST(tb_storage_usage.total_bytes + EXCLUDED.total_bytes, 0),
+                    updated_at  = current_timestamp
+            """), {
+                'areas': [k[0] for k in keys],
+                'dirs': [k[1] for k in keys],
+                'counts': [deltas[k][0] for k in keys],
+                'sizes': [deltas[k][1] for k in keys],
+            })
+    except Exception:
+        _restore_pending(deltas)
+        raise
+    return len(keys)
+
+
+# ── Reconciliação (os.scandir) ────────────────────────────────────────────────
+
+def scan_tree(root, skip=()):
+    """
+    {diretório relativo: [ficheiros, bytes]} de uma árvore, numa só passagem
+    os.scandir. Não segue symlinks; diretórios em skip (absolutos) são ignorados.
+    """
+    stats = {}
+    skip = {os.path.abspath(s) for s in skip}
+    stack = [(root, '')]
+    while stack:
+        path, rel = stack.pop()
+        files = size = 0
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.path not in skip:
+                                stack.append((entry.path, f"{rel}/{entry.name}" if rel else entry.name))
+                        elif entry.is_file(follow_symlinks=False):
+                            files += 1
+                            size += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue            # removido entretanto
+        except OSError as e:
+            logger.warning(f"Diretório ilegível na reconciliação: {path}: {e}")
+            continue
+        stats[rel] = [files, size]
+    return stats
+
+
+def reconcile_storage(app=None):
+    """
+    Job: reescreve tb_storage_usage a partir de um varrimento de cada área.
+    Os deltas pendentes são aplicados antes; os registados durante o
+    varrimento podem contar a dobrar até à reconciliação seguinte.
+    """
+    if app is not None:
+        with app.app_context():
+            return reconcile_storage()
+
+    if not _reconcile_lock.acquire(blocking=False):
+        logger.info("[Armazenamento] Reconciliação já em curso — ignorado")
+        return None
+    try:
+        flush_pending()
+        areas = get_storage_areas()
+        result = {}
+        for area, root in areas.items():
+            if not os.path.isdir(root):
+                stats = {}
+            else:
+                others = [r for a, r in areas.items() if a != area and r.startswith(root + os.sep)]
+                started = datetime.now()
+                stats = scan_tree(root, skip=others)
+                logger.info(
+                    f"[Armazenamento] {area}: {len(stats)} diretórios varridos em "
+                    f"{(datetime.now() - started).total_seconds():.1f}s"
+                )
+            dirs = list(stats)
+            with db_system_session() as session:
+                session.execute(text("DELETE FROM tb_storage_usage WHERE area = :area"), {'area': area})
+                if dirs:
+                    session.execute(text("""
+                        INSERT INTO tb_storage_usage
+                            (area, directory, file_count, total_bytes, updated_at, reconciled_at)
+                        SELECT :area, u.directory, u.files, u.bytes, current_timestamp, current_timestamp
+                        FROM unnest(CAST(:dirs AS text[]), CAST(:counts AS bigint[]),
+                                    CAST(:sizes AS bigint[])) AS u(directory, files, bytes)
+                    """), {
+                        'area': area,
+                        'dirs': dirs,
+                        'counts': [stats[d][0] for d in dirs],
+                        'sizes': [stats[d][1] for d in dirs],
+                    })
+            result[area] = {
+                'directories': len(dirs),
+                'files': sum(s[0] for s in stats.values()),
+                'bytes': sum(s[1] for s in stats.values()),
+            }
+        return result
+    finally:
+        _reconcile_lock.release()
+
+
+# ── Leitura (dashboard) ───────────────────────────────────────────────────────
+
+def _mb(size):
+    return round(size / (1024 * 1024), 2)
+
+
+def summarize(rows, pending=None):
+    """
+    Agrega as linhas (area, directory, file_count, total_bytes, reconciled_at)
+    e os deltas locais pendentes no formato do dashboard.
+    """
+    usage = defaultdict(lambda: [0, 0])
+    reconciled = {}
+    for area, directory, count, size, reconciled_at in rows:
+        usage[(area, directory)][0] += count
+        usage[(area, directory)][1] += size
+        if reconciled_at and (area not in reconciled or reconciled_at < reconciled[area]):
+            reconciled[area] = reconciled_at
+    for key, (count, size) in (pending or {}).items():
+        usage[key][0] += count
+        usage[key][1] += size
+
+    areas = defaultdict(lambda: {'count': 0, 'bytes': 0, 'top': defaultdict(lambda: [0, 0])})
+    for (area, directory), (count, size) in usage.items():
+        a = areas[area]
+        a['count'] += count
+        a['bytes'] += size
+        top = a['top'][directory.split('/', 1)[0]]
+        top[0] += count
+        top[1] += size
+
+    def area_summary(area):
+        a = areas.get(area) or {'count': 0, 'bytes': 0, 'top': {}}
+        top = sorted(a['top'].items(), key=lambda t: t[1][1], reverse=True)[:TOP_DIRECTORIES]
+        at = reconciled.get(area)
+        return {
+            'count': max(a['count'], 0),
+            'size_mb': _mb(max(a['bytes'], 0)),
+            'reconciled_at': at.isoformat() if at else None,
+            'directories': [
+                {'directory': d or '.', 'count': c, 'size_mb': _mb(s)} for d, (c, s) in top
+            ],
+        }
+
+    temp, files = area_summary('temp'), area_summary('files')
+    letters = areas.get('files', {}).get('top', {}).get(LETTERS_DIR, [0, 0])
+    return {
+        'temp_files': temp['count'],
+        'temp_size_mb': temp['size_mb'],
+        'letters_count': max(letters[0], 0),
+        'letters_size_mb': _mb(max(letters[1], 0)),
+        'files_count': files['count'],
+        'files_size_mb': files['size_mb'],
+        'total_size_mb': round(temp['size_mb'] + files['size_mb'], 2),
+        'areas': {'temp': temp, 'files': files},
+    }
+
+
+def get_storage_summary(current_user=None):
+    """Estatísticas pré-calculadas (sem tocar no disco)."""
+    with db_session_manager(current_user) as session:
+        rows = session.execute(text("""
+            SELECT area, directory, file_count, total_bytes, reconciled_at
+            FROM tb_storage_usage
+        """)).fetchall()
+    with _pending_lock:
+        pending = {k: list(v) for k, v in _pending.items()}
+    return summarize(rows, pending)
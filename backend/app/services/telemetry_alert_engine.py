@@ -0,0 +1,414 @@
+"""
+Motor de alertas de telemetria em tempo real.
+
+As leituras são avaliadas à entrada (insert_sensor_data), contra as regras
+de tb_telemetry_alert_rule (DDL em app/sql/telemetry_alert_rules.sql):
+limites por teleparam, taxa de variação e falta de dados. O estado por
+(regra, sensor) é o da própria tabela de episódios (tb_telemetry_alert):
+cada leitura lê os episódios abertos do seu sensor e só as transições
+normal→alerta / alerta→normal geram eventos: Socket.IO
+(broadcast 'telemetry_alert' + sino para quem tem telemetry.alerts) e
+WhatsApp para o grupo padrão, este num worker em background para não
+atrasar a resposta ao sensor.
+
+Histerese: um alerta aberto só fecha quando o valor recua pelo menos
+`hysteresis` para dentro do limite, evitando rajadas de alertas quando a
+leitura oscila à volta do limiar.
+
+Como o estado vem da BD, um fecho chegado a outro processo ou depois de um
+restart fecha o episódio aberto; o índice único parcial de episódios
+abertos garante que cada episódio só é aberto e notificado uma vez (quem não
+consegue inserir/fechar a linha não notifica).
+"""
+import math
+import queue
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import text
+
+from app import db
+from app.utils.error_handler import api_error_handler
+from app.utils.utils import db_system_session
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+KIND_THRESHOLD = 'threshold'
+KIND_RATE = 'rate'
+KIND_MISSING = 'missing'
+
+STATE_RAISED = 'raised'
+STATE_CLEARED = 'cleared'
+
+# Regras relidas da BD no máximo a cada RULES_TTL segundos (ou já, via reload)
+RULES_TTL = 60
+
+# Janela mínima da consulta "última leitura por sensor" do job de falta de
+# dados (alargada se alguma regra pedir mais silêncio do que isto)
+LAST_SEEN_WINDOW_HOURS = 24
+
+
+def threshold_active(rule, value, active):
+    """Novo estado de uma regra de limites para `value`, com histerese."""
+    min_value, max_value = rule.get('min_value'), rule.get('max_value')
+    hysteresis = rule.get('hysteresis') or 0
+    if not active:
+        return ((max_value is not None and value > max_value)
+                or (min_value is not None and value < min_value))
+    back_below = max_value is None or value <= max_value - hysteresis
+    back_above = min_value is None or value >= min_value + hysteresis
+    return not (back_below and back_above)
+
+
+def rate_active(rule, rate_per_minute, active):
+    """Novo estado de uma regra de taxa de variação (|Δ| por minuto), com histerese."""
+    rate = abs(rate_per_minute)
+    if not active:
+        return rate > rule['max_rate']
+    return rate > rule['max_rate'] - (rule.get('hysteresis') or 0)
+
+
+def missing_active(rule, silence_minutes):
+    """Falta de dados: activa enquanto o silêncio exceder missing_minutes."""
+    return silence_minutes > rule['missing_minutes']
+
+
+def extract_value(payload, jsontag):
+    """Valor numérico de `jsontag` no payload (None se ausente ou não numérico)."""
+    value = payload.get(jsontag) if jsontag else None
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _describe(rule, value, rate=None, silence=None):
+    if rule['kind'] == KIND_MISSING:
+        return f"{rule['name']}: sem dados há {int(silence)} min (limite {rule['missing_minutes']} min)"
+    if rule['kind'] == KIND_RATE:
+        return f"{rule['name']}: variação de {rate:.2f}/min (limite {rule['max_rate']}/min)"
+    limites = []
+    if rule.get('min_value') is not None:
+        limites.append(f"mín {rule['min_value']}")
+    if rule.get('max_value') is not None:
+        limites.append(f"máx {rule['max_value']}")
+    return f"{rule['name']}: valor {value} fora dos limites ({', '.join(limites)})"
+
+
+class TelemetryAlertEngine:
+    """Regras em cache e avaliação; o estado dos episódios vem de tb_telemetry_alert."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rules = []
+        self._rules_loaded_at = 0
+        self._last_value = {}      # {(sensor_id, jsontag): (instante, valor)}
+        self._seeded = False
+        self._outbox = queue.Queue()
+        self._worker = None
+
+    # ── Regras e estado ────────────────────────────────────────────────
+
+    def reload_rules(self, session):
+        """Relê as regras activas."""
+        rules = [dict(r) for r in session.execute(text("""
+            SELECT r.pk, r.name, r.kind, r.tt_teleparam, r.sensor_id,
+                   r.min_value, r.max_value, r.max_rate, r.missing_minutes,
+                   r.hysteresis, r.severity, r.whatsapp, tp.jsontag
+            FROM tb_telemetry_alert_rule r
+            LEFT JOIN tt_teleparam tp ON tp.pk = r.tt_teleparam
+            WHERE r.ativo
+            ORDER BY r.pk
+        """)).mappings().all()]
+
+        with self._lock:
+            self._rules = rules
+            self._rules_loaded_at = time.monotonic()
+            self._seeded = True
+        logger.info(f"[TelemetriaAlertas] {len(rules)} regras activas carregadas")
+        return len(rules)
+
+    def _ensure_rules(self, session):
+        if not self._seeded or time.monotonic() - self._rules_loaded_at > RULES_TTL:
+            self.reload_rules(session)
+
+    @staticmethod
+    def _applies(rule, sensor_id):
+        return rule['sensor_id'] is None or rule['sensor_id'] == sensor_id
+
+    @staticmethod
+    def _open_rules(session, sensor_id):
+        """Regras com episódio aberto para o sensor (índice parcial de abertos)."""
+        return {
+            r[0] for r in session.execute(text("""
+                SELECT tb_telemetry_alert_rule
+                FROM tb_telemetry_alert
+                WHERE sensor_id = :sensor_id AND cleared_at IS NULL
+            """), {'sensor_id': sensor_id}).fetchall()
+        }
+
+    @staticmethod
+    def _open_keys(session):
+        return {
+            (r[0], r[1]) for r in session.execute(text("""
+                SELECT tb_telemetry_alert_rule, sensor_id
+                FROM tb_telemetry_alert
+                WHERE cleared_at IS NULL
+            """)).fetchall()
+        }
+
+    @staticmethod
+    def _last_seen(session, hours):
+        """Última leitura por sensor, da BD (o job corre só no líder)."""
+        return {
+            r.sensor_id: r.last_seen
+            for r in session.execute(text("""
+                SELECT value ->> 'sensor_id' AS sensor_id, MAX(data) AS last_seen
+                FROM tb_sensordataraw
+                WHERE data > current_timestamp - make_interval(hours => :hours)
+                  AND value ->> 'sensor_id' IS NOT NULL
+                GROUP BY 1
+            """), {'hours': hours}).fetchall()
+        }
+
+    def evaluate(self, payload, now, open_rules=frozenset()):
+        """
+        Avalia um payload contra as regras e devolve as transições face aos
+        episódios abertos (open_rules: pks das regras abertas para o sensor).
+        Pura quanto à BD — só actualiza o último valor por sensor (taxa).
+        """
+        sensor_id = payload.get('sensor_id')
+        if sensor_id is None:
+            return []
+        sensor_id = str(sensor_id)
+        events = []
+
+        with self._lock:
+            seen_tags = {}
+
+            for rule in self._rules:
+                if not self._applies(rule, sensor_id):
+                    continue
+                was_active = rule['pk'] in open_rules
+
+                if rule['kind'] == KIND_MISSING:
+                    # Chegou uma leitura: fecha o alerta de falta de dados
+                    if was_active:
+                        events.append(self._event(rule, sensor_id, STATE_CLEARED, None,
+                                                  f"{rule['name']}: dados retomados", now))
+                    continue
+
+                value = extract_value(payload, rule['jsontag'])
+                if value is None:
+                    continue
+
+                if rule['kind'] == KIND_THRESHOLD:
+                    is_active = threshold_active(rule, value, was_active)
+                    message = _describe(rule, value)
+                else:
+                    previous = self._last_value.get((sensor_id, rule['jsontag']))
+                    if not previous or now <= previous[0]:
+                        seen_tags[rule['jsontag']] = value
+                        continue
+                    minutes = (now - previous[0]).total_seconds() / 60
+                    rate = (value - previous[1]) / minutes
+                    is_active = rate_active(rule, rate, was_active)
+                    message = _describe(rule, value, rate=rate)
+                seen_tags[rule['jsontag']] = value
+
+                if is_active and not was_active:
+                    events.append(self._event(rule, sensor_id, STATE_RAISED, value, message, now))
+                elif was_active and not is_active:
+                    events.append(self._event(rule, sensor_id, STATE_CLEARED, value,
+                                              f"{rule['name']}: valor normalizado ({value})", now))
+
+            for jsontag, value in seen_tags.items():
+                self._last_value[(sensor_id, jsontag)] = (now, value)
+
+        return events
+
+    def evaluate_missing(self, now, last_seen, open_keys=frozenset()):
+        """
+        Transições das regras de falta de dados (chamado pelo job periódico);
+        last_seen: {sensor: última leitura}; open_keys: (regra, sensor) com
+        episódio aberto.
+        """
+        events = []
+        with self._lock:
+            for rule in self._rules:
+                if rule['kind'] != KIND_MISSING:
+                    continue
+                sensors = [rule['sensor_id']] if rule['sensor_id'] else list(last_seen)
+                for sensor_id in sensors:
+                    seen = last_seen.get(sensor_id)
+                    if seen is None:
+                        continue
+                    silence = (now - seen).total_seconds() / 60
+                    if missing_active(rule, silence) and (rule['pk'], sensor_id) not in open_keys:
+                        events.append(self._event(rule, sensor_id, STATE_RAISED, None,
+                                                  _describe(rule, None, silence=silence), now))
+        return events
+
+    @staticmethod
+    def _event(rule, sensor_id, state, value, message, now):
+        return {
+            'rule_pk': rule['pk'],
+            'rule_name': rule['name'],
+            'kind': rule['kind'],
+            'sensor_id': sensor_id,
+            'severity': rule['severity'],
+            'state': state,
+            'value': value,
+            'message': message,
+            'whatsapp': rule['whatsapp'],
+            'at': now.isoformat(),
+        }
+
+    # ── Persistência e notificação ─────────────────────────────────────
+
+    def _persist(self, session, event, raw_pk=None):
+        """
+        Abre/fecha o episódio. Devolve False se outro processo já o fez —
+        nesse caso o evento não é notificado (deduplicação entre workers).
+        """
+        if event['state'] == STATE_RAISED:
+            pk = session.execute(text("""
+                INSERT INTO tb_telemetry_alert
+                    (tb_telemetry_alert_rule, sensor_id, severity, message, value, raw_pk)
+                VALUES (:rule_pk, :sensor_id, :severity, :message, :value, :raw_pk)
+                ON CONFLICT (tb_telemetry_alert_rule, sensor_id) WHERE cleared_at IS NULL
+                DO NOTHING
+                RETURNING pk
+            """), {**event, 'raw_pk': raw_pk}).scalar()
+            event['alert_pk'] = pk
+            return pk is not None
+
+        pk = session.execute(text("""
+            UPDATE tb_telemetry_alert
+            SET cleared_at = current_timestamp
+            WHERE tb_telemetry_alert_rule = :rule_pk
+              AND sensor_id = :sensor_id
+              AND cleared_at IS NULL
+            RETURNING pk
+        """), event).scalar()
+        event['alert_pk'] = pk
+        return pk is not None
+
+    def _dispatch(self, session, events, raw_pk=None):
+        if not events:
+            return []
+        published = [e for e in events if self._persist(session, e, raw_pk)]
+        session.commit()
+        if not published:
+            return []
+
+        socketio_events = current_app.extensions.get('socketio_events')
+        if socketio_events:
+            from app.services.notification_service import get_alert_recipients
+            recipients = get_alert_recipients(session, 'telemetry.alerts')
+            for event in published:
+                socketio_events.emit_telemetry_alert(event, recipients)
+        else:
+            logger.warning("[TelemetriaAlertas] socketio_events indisponível — alertas só por WhatsApp")
+
+        for event in published:
+            logger.info(
+                f"[TelemetriaAlertas] {event['state']} regra={event['rule_pk']} "
+                f"sensor={event['sensor_id']}: {event['message']}"
+            )
+            if event['whatsapp']:
+                self._enqueue_whatsapp(event)
+        return published
+
+    def process(self, session, payload, raw_pk=None, now=None):
+        """Avalia uma leitura acabada de inserir e publica as transições."""
+        self._ensure_rules(session)
+        sensor_id = payload.get('sensor_id')
+        open_rules = self._open_rules(session, str(sensor_id)) if sensor_id is not None else frozenset()
+        events = self.evaluate(payload, now or datetime.now(), open_rules)
+        return self._dispatch(session, events, raw_pk)
+
+    def check_missing(self, session, now=None):
+        self._ensure_rules(session)
+        missing = [r['missing_minutes'] or 0 for r in self._rules if r['kind'] == KIND_MISSING]
+        if not missing:
+            return []
+        hours = max(LAST_SEEN_WINDOW_HOURS, math.ceil(max(missing) / 60) + 1)
+        events = self.evaluate_missing(now or datetime.now(), self._last_seen(session, hours),
+                                       self._open_keys(session))
+        return self._dispatch(session, events)
+
+    # ── WhatsApp em background ─────────────────────────────────────────
+
+    def _enqueue_whatsapp(self, event):
+        if self._worker is None or not self._worker.is_alive():
+            app = current_app._get_current_object()
+            self._worker = threading.Thread(
+                target=self._whatsapp_worker, args=(app,),
+                name='telemetry-alert-whatsapp', daemon=True,
+            )
+            self._worker.start()
+        self._outbox.put(event)
+
+    def _whatsapp_worker(self, app):
+        from app.services.whatsapp_web_service import format_sensor_alert_message, send_to_default_group
+        while True:
+            event = self._outbox.get()
+            title = 'ALERTA DE SENSOR' if event['state'] == STATE_RAISED else 'ALERTA RESOLVIDO'
+            try:
+                with app.app_context():
+                    _, status = send_to_default_group(format_sensor_alert_message(
+                        event['sensor_id'], event['severity'], event['message'], title=title,
+                    ))
+                if status != 200:
+                    logger.warning(f"[TelemetriaAlertas] WhatsApp devolveu {status} para alerta {event.get('alert_pk')}")
+            except Exception as e:
+                logger.error(f"[TelemetriaAlertas] Falha ao enviar alerta por WhatsApp: {e}")
+            finally:
+                self._outbox.task_done()
+
+
+_engine = TelemetryAlertEngine()
+
+
+def get_alert_engine():
+    return _engine
+
+
+@api_error_handler
+def list_alerts(active_only=False, limit=100):
+    """Episódios de alerta mais recentes (ou só os abertos)."""
+    where = "WHERE a.cleared_at IS NULL" if active_only else ""
+    rows = db.session.execute(text(f"""
+        SELECT a.pk, a.tb_telemetry_alert_rule AS rule_pk, r.name AS rule_name, r.kind,
+               a.sensor_id, a.severity, a.message, a.value, a.raised_at, a.cleared_at
+        FROM tb_telemetry_alert a
+        JOIN tb_telemetry_alert_rule r ON r.pk = a.tb_telemetry_alert_rule
+        {where}
+        ORDER BY a.raised_at DESC
+        LIMIT :limit
+    """), {'limit': limit}).mappings().all()
+    data = [
+        {k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in row.items()}
+        for row in rows
+    ]
+    return {'status': 'ok', 'count': len(data), 'data': data}, 200
+
+
+@api_error_handler
+def reload_alert_rules():
+    """Recarrega já as regras deste processo (os restantes apanham-nas em RULES_TTL)."""
+    count = _engine.reload_rules(db.session)
+    return {'status': 'ok', 'rules': count}, 200
+
+
+def check_telemetry_missing_data(app):
+    """Job por minuto: abre alertas de falta de dados para sensores em silêncio."""
+    with app.app_context():
+        with db_system_session() as session:
+            return len(_engine.check_missing(session))
@@ -0,0 +1,279 @@
+"""
+Rollups de telemetria (hora / dia), retenção das leituras raw e escolha do
+nível (tier) a ler em cada pedido de série. DDL em app/sql/telemetry_rollup.sql.
+
+Manutenção incremental: cada execução só reagrega os dias tocados por
+leituras raw com pk acima da marca d'água (tb_sensordata_rollup_state),
+recalculando esses dias por inteiro — idempotente, pode repetir sem duplicar.
+Os valores vêm de fbo_telemetry$querydata, a mesma função que alimenta os
+gráficos, para que raw e rollup nunca divirjam na interpretação do JSON.
+"""
+import math
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import text
+
+from app.utils.utils import db_system_session
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+TIER_RAW = 'raw'
+TIER_HOURLY = 'hourly'
+TIER_DAILY = 'daily'
+
+# Granularidade (segundos) e tabela de cada tier agregado, do mais grosso
+# para o mais fino — o router escolhe o primeiro que cumpre o pedido.
+ROLLUP_TIERS = (
+    (TIER_DAILY, 86400, 'tb_sensordata_daily'),
+    (TIER_HOURLY, 3600, 'tb_sensordata_hourly'),
+)
+
+DEFAULT_RAW_RETENTION_DAYS = 400
+DEFAULT_HOURLY_RETENTION_DAYS = 1100
+RETENTION_BATCH_SIZE = 10000
+
+
+def get_retention_days():
+    """(dias de retenção do raw, dias de retenção do tier horário) da config."""
+    cfg = current_app.config
+    return (
+        int(cfg.get('TELEMETRY_RAW_RETENTION_DAYS') or DEFAULT_RAW_RETENTION_DAYS),
+        int(cfg.get('TELEMETRY_HOURLY_RETENTION_DAYS') or DEFAULT_HOURLY_RETENTION_DAYS),
+    )
+
+
+def choose_tier(date_from, date_to, bucket_seconds, explicit_bucket=False,
+                raw_retention_days=DEFAULT_RAW_RETENTION_DAYS,
+                hourly_retention_days=DEFAULT_HOURLY_RETENTION_DAYS, today=None):
+    """
+    Escolhe o tier mais grosso que satisfaz a resolução pedida.
+
+    Com `explicit_bucket` (o cliente fixou bucket_seconds) o bucket tem de ser
+    múltiplo exacto da granularidade do tier; quando foi derivado de
+    max_points basta ser >= e é depois arredondado para cima. Se o intervalo
+    começa antes da retenção de um tier, esse tier já não tem os dados e o
+    router sobe para o seguinte, mesmo que seja mais grosso do que o pedido.
+
+    Returns:
+        tuple: (tier, bucket_seconds ajustado ao tier)
+    """
+    if date_from is None or date_to is None or not bucket_seconds:
+        return TIER_RAW, bucket_seconds
+
+    today = today or date.today()
+    raw_cutoff = today - timedelta(days=raw_retention_days)
+    hourly_cutoff = today - timedelta(days=hourly_retention_days)
+
+    tier = TIER_RAW
+    for name, granularity, _ in ROLLUP_TIERS:
+        fits = bucket_seconds % granularity == 0 if explicit_bucket else bucket_seconds >= granularity
+        if fits:
+            tier = name
+            break
+
+    if tier == TIER_RAW and date_from < raw_cutoff:
+        tier = TIER_HOURLY
+    if tier == TIER_HOURLY and date_from < hourly_cutoff:
+        tier = TIER_DAILY
+
+    if tier != TIER_RAW:
+        granularity = dict((n, g) for n, g, _ in ROLLUP_TIERS)[tier]
+        bucket_seconds = max(granularity, math.ceil(bucket_seconds / granularity) * granularity)
+    return tier, bucket_seconds
+
+
+def query_rollup_series(session, tier, sensor_pks_literal, teleparam_pk, date_from, date_to, bucket_seconds):
+    """
+    Lê um tier agregado e reagrupa-o em buckets de `bucket_seconds`
+    (múltiplo da granularidade do tier). Devolve as mesmas colunas que o
+    caminho raw de telemetry_service.query_sensor_series.
+    """
+    table = dict((n, t) for n, _, t in ROLLUP_TIERS)[tier]
+    return session.execute(text(f"""
+        SELECT tb_sensor AS pk,
+               TIMESTAMP 'epoch'
+                   + FLOOR(EXTRACT(EPOCH FROM CAST(bucket AS timestamp)) / :bucket_seconds)
+                     * :bucket_seconds * INTERVAL '1 second' AS bucket,
+               SUM(soma) / SUM(n) AS avg,
+               MIN(minimo) AS min,
+               MAX(maximo) AS max,
+               SUM(n) AS count
+        FROM {table}
+        WHERE tt_teleparam = :teleparam_pk
+          AND tb_sensor = ANY (CAST(:sensor_pks AS integer[]))
+          AND bucket >= CAST(:date_from AS date)
+          AND bucket < CAST(:date_to AS date) + 1
+        GROUP BY tb_sensor, 2
+        ORDER BY tb_sensor, 2
+    """), {
+        'bucket_seconds': bucket_seconds,
+        'teleparam_pk': teleparam_pk,
+        'sensor_pks': sensor_pks_literal,
+        'date_from': date_from,
+        'date_to': date_to,
+    }).mappings().all()
+
+
+def get_rollup_watermark(session):
+    """Instante da leitura raw mais recente já agregada (None se nunca correu)."""
+    return session.execute(text("""
+        SELECT r.data
+        FROM tb_sensordata_rollup_state s
+        JOIN tb_sensordataraw r ON r.pk = s.last_raw_pk
+        WHERE s.id = 1
+    """)).scalar()
+
+
+def refresh_rollups(session):
+    """
+    Agrega as leituras raw novas (pk > marca d'água) nos tiers hora e dia.
+
+    Recalcula por inteiro os dias tocados — DELETE + INSERT SELECT por
+    teleparam — e avança a marca d'água na mesma transacção, por isso uma
+    falha a meio não deixa dias meio agregados.
+
+    Returns:
+        int: número de buckets horários escritos
+    """
+    last_raw_pk = session.execute(text(
+        "SELECT last_raw_pk FROM tb_sensordata_rollup_state WHERE id = 1 FOR UPDATE"
+    )).scalar() or 0
+
+    pending = session.execute(text("""
+        SELECT MIN(data)::date AS day_from, MAX(data)::date AS day_to, MAX(pk) AS max_pk
+        FROM tb_sensordataraw
+        WHERE pk > :last_raw_pk
+    """), {'last_raw_pk': last_raw_pk}).mappings().first()
+
+    if not pending or pending['max_pk'] is None:
+        return 0
+
+    day_from, day_to = pending['day_from'], pending['day_to']
+    sensors = "{" + ",".join(
+        str(r[0]) for r in session.execute(text("SELECT pk FROM vbl_sensor")).fetchall()
+    ) + "}"
+    teleparams = [r[0] for r in session.execute(text("SELECT pk FROM vbl_teleparam")).fetchall()]
+
+    range_params = {'day_from': day_from, 'day_to': day_to}
+    session.execute(text("""
+        DELETE FROM tb_sensordata_hourly
+        WHERE bucket >= :day_from AND bucket < CAST(:day_to AS date) + 1
+    """), range_params)
+
+    insert_hourly = text("""
+        INSERT INTO tb_sensordata_hourly (tb_sensor, tt_teleparam, bucket, n, soma, minimo, maximo)
+        SELECT q.pk, :teleparam_pk, date_trunc('hour', q.data),
+               COUNT(*), SUM(q.valuenumb), MIN(q.valuenumb), MAX(q.valuenumb)
+        FROM "fbo_telemetry$querydata"(
+            CAST(:sensors AS integer[]), :teleparam_pk,
+            CAST(:day_from AS date), CAST(:day_to AS date)
+        ) q
+        WHERE q.valuenumb IS NOT NULL
+        GROUP BY q.pk, date_trunc('hour', q.data)
+    """)
+    hourly_rows = 0
+    for teleparam_pk in teleparams:
+        params = {**range_params, 'sensors': sensors, 'teleparam_pk': teleparam_pk}
+        written = session.execute(insert_hourly, params).rowcount
+        if not written:
+            # Mesmo comportamento de 1.ª chamada vazia que telemetry_service
+            # contorna em _execute_with_init_retry.
+            written = session.execute(insert_hourly, params).rowcount
+        hourly_rows += written or 0
+
+    session.execute(text("""
+        DELETE FROM tb_sensordata_daily
+        WHERE bucket BETWEEN :day_from AND :day_to
+    """), range_params)
+    session.execute(text("""
+        INSERT INTO tb_sensordata_daily (tb_sensor, tt_teleparam, bucket, n, soma, minimo, maximo)
+        SELECT tb_sensor, tt_teleparam, bucket::date, SUM(n), SUM(soma), MIN(minimo), MAX(maximo)
+        FROM tb_sensordata_hourly
+        WHERE bucket >= :day_from AND bucket < CAST(:day_to AS date) + 1
+        GROUP BY tb_sensor, tt_teleparam, bucket::date
+    """), range_params)
+
+    session.execute(text("""
+        UPDATE tb_sensordata_rollup_state
+        SET last_raw_pk = :max_pk, updated_at = current_timestamp
+        WHERE id = 1
+    """), {'max_pk': pending['max_pk']})
+
+    logger.info(
+        f"[Telemetria] Rollup {day_from}→{day_to}: {hourly_rows} buckets horários "
+        f"(marca d'água {last_raw_pk}→{pending['max_pk']})"
+    )
+    return hourly_rows
+
+
+def apply_retention(session, raw_retention_days, hourly_retention_days, archive=True,
+                    batch_size=RETENTION_BATCH_SIZE):
+    """
+    Move (ou apaga, sem `archive`) as leituras raw mais antigas que a
+    retenção — só as já agregadas (pk <= marca d'água), em lotes com commit
+    para não segurar um lock longo sobre tb_sensordataraw. Os buckets horários
+    fora da sua retenção são apagados; o tier diário é mantido para sempre.
+
+    Returns:
+        dict: {'raw': n, 'hourly': n}
+    """
+    raw_cutoff = datetime.combine(date.today() - timedelta(days=raw_retention_days), datetime.min.time())
+    hourly_cutoff = datetime.combine(date.today() - timedelta(days=hourly_retention_days), datetime.min.time())
+
+    batch = """
+        SELECT pk FROM tb_sensordataraw
+        WHERE data < :cutoff
+          AND pk <= (SELECT last_raw_pk FROM tb_sensordata_rollup_state WHERE id = 1)
+        ORDER BY pk
+        LIMIT :batch_size
+    """
+    if archive:
+        statement = text(f"""
+            WITH moved AS (
+                DELETE FROM tb_sensordataraw WHERE pk IN ({batch})
+                RETURNING pk, data, processed, value
+            )
+            INSERT INTO tb_sensordataraw_archive (pk, data, processed, value)
+            SELECT pk, data, processed, value FROM moved
+        """)
+    else:
+        statement = text(f"DELETE FROM tb_sensordataraw WHERE pk IN ({batch})")
+
+    raw_total = 0
+    while True:
+        moved = session.execute(statement, {'cutoff': raw_cutoff, 'batch_size': batch_size}).rowcount or 0
+        session.commit()
+        raw_total += moved
+        if moved < batch_size:
+            break
+
+    hourly_total = session.execute(text(
+        "DELETE FROM tb_sensordata_hourly WHERE bucket < :cutoff"
+    ), {'cutoff': hourly_cutoff}).rowcount or 0
+
+    logger.info(
+        f"[Telemetria] Retenção: {raw_total} leituras raw {'arquivadas' if archive else 'apagadas'} "
+        f"(< {raw_cutoff.date()}), {hourly_total} buckets horários apagados (< {hourly_cutoff.date()})"
+    )
+    return {'raw': raw_total, 'hourly': hourly_total}
+
+
+def refresh_telemetry_rollups(app):
+    """Job horário: agrega as leituras raw recebidas desde a última execução."""
+    with app.app_context():
+        with db_system_session() as session:
+            return refresh_rollups(session)
+
+
+def apply_telemetry_retention(app):
+    """Job diário: arquiva raw antigo já agregado e compacta o tier horário."""
+    with app.app_context():
+        raw_days, hourly_days = get_retention_days()
+        archive = bool(app.config.get('TELEMETRY_ARCHIVE_RAW', True))
+        with db_system_session() as session:
+            # Garantir que nada por agregar fica elegível para arquivo
+            refresh_rollups(session)
+            session.commit()
+            return apply_retention(session, raw_days, hourly_days, archive=archive)
@@ -9,7 +9,17 @@ from sqlalchemy.exc import SQLAlchemyError
 from app import db
 from app.utils.error_handler import api_error_handler, APIError
 from app.utils.logger import get_logger
+from app.services.telemetry_rollup_service import (
+    TIER_RAW,
+    choose_tier,
+    query_rollup_series,
+    get_rollup_watermark,
+    get_retention_days,
+)
+from app.services.telemetry_alert_engine import get_alert_engine
+from datetime import date
 import json
+import math
 
 logger = get_logger(__name__)
 
@@ -46,6 +56,14 @@ def insert_sensor_data(payload: dict):
 
         logger.info(f"Dados de sensor inseridos com sucesso. PK: {inserted_pk}")
 
+        # Avaliação das regras de alerta à entrada — uma falha aqui nunca
+        # pode fazer o sensor reenviar uma leitura que já ficou guardada.
+        try:
+            get_alert_engine().process(db.session, payload, raw_pk=inserted_pk)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Erro ao avaliar alertas de telemetria (pk={inserted_pk}): {str(e)}")
+
         return {
             "status": "ok",
             "message": "Dados recebidos com sucesso",
@@ -218,14 +236,7 @@ def query_stations(sensortype_pk, teleparam_pk, date_from, date_to):
             "date_from": date_from,
             "date_to": date_to,
         }
-        result = db.session.execute(query, params).mappings().all()
-        # A função PostgreSQL inicializa estado interno na 1ª chamada — retry sem rollback,
-        # depois com rollback se necessário (rollback desfaz a inicialização, por isso tenta sem primeiro)
-        if not result:
-            result = db.session.execute(query, params).mappings().all()
-        if not result:
-            db.session.rollback()
-            result = db.session.execute(query, params).mappings().all()
+        result = _execute_with_init_retry(query, params)
 
         data = []
         for row in result:
@@ -313,14 +324,7 @@ def query_sensor_data(sensor_pks: list, teleparam_pk: int, date_from: str, date_
             "date_from": date_from or None,
             "date_to": date_to or None,
         }
-        result = db.session.execute(query, params).mappings().all()
-        # A função PostgreSQL inicializa estado interno na 1ª chamada — retry sem rollback,
-        # depois com rollback se necessário (rollback desfaz a inicialização, por isso tenta sem primeiro)
-        if not result:
-            result = db.session.execute(query, params).mappings().all()
-        if not result:
-            db.session.rollback()
-            result = db.session.execute(query, params).mappings().all()
+        result = _execute_with_init_retry(query, params)
 
         data = []
         for row in result:
@@ -346,6 +350,237 @@ def query_sensor_data(sensor_pks: list, teleparam_pk: int, date_from: str, date_
         raise APIError(f"Erro interno: {str(e)}", 500, "ERR_INTERNAL")
 
 
+# ============================================
+# SÉRIES TEMPORAIS AGREGADAS (gráficos)
+# ============================================
+
+SERIES_METHODS = ('avg', 'lttb')
+SERIES_DEFAULT_MAX_POINTS = 1000
+SERIES_MAX_POINTS_LIMIT = 10000
+SERIES_MIN_BUCKET_SECONDS = 60
+
+
+def _execute_with_init_retry(query, params):
+    """
+    Executa uma função fbo_telemetry$*. A função PostgreSQL inicializa estado
+    interno na 1ª chamada e pode devolver vazio — retry sem rollback, depois
+    com rollback se necessário (rollback desfaz a inicialização, por isso
+    tenta sem primeiro).
+    """
+    result = db.session.execute(query, params).mappings().all()
+    if not result:
+        result = db.session.execute(query, params).mappings().all()
+    if not result:
+        db.session.rollback()
+        result = db.session.execute(query, params).mappings().all()
+    return result
+
+
+def _lttb(points, threshold):
+    """
+    Largest-Triangle-Three-Buckets: reduz uma série ordenada [(x, y, ...), ...]
+    a `threshold` pontos preservando a forma visual (picos e vales), ao
+    contrário da média por bucket que os achata. x tem de ser numérico (epoch);
+    elementos extra de cada tuplo são preservados tal como estão.
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # Média do bucket seguinte — o 3.º vértice do triângulo
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_len = avg_end - avg_start
+        avg_x = sum(p[0] for p in points[avg_start:avg_end]) / avg_len
+        avg_y = sum(p[1] for p in points[avg_start:avg_end]) / avg_len
+
+        # Ponto do bucket actual que forma o maior triângulo com a e a média
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        ax, ay = points[a][0], points[a][1]
+        max_area = -1.0
+        next_a = range_start
+        for j in range(range_start, range_end):
+            area = abs((ax - avg_x) * (points[j][1] - ay) - (ax - points[j][0]) * (avg_y - ay))
+            if area > max_area:
+                max_area = area
+                next_a = j
+        sampled.append(points[next_a])
+        a = next_a
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def _validate_series_params(sensor_pks, teleparam_pk, bucket_seconds, max_points, method):
+    if not sensor_pks:
+        raise APIError("Lista de sensores vazia", 400, "ERR_MISSING_PARAMS")
+    if teleparam_pk is None:
+        raise APIError("Parâmetro de telemetria obrigatório", 400, "ERR_MISSING_PARAMS")
+    if method not in SERIES_METHODS:
+        raise APIError(f"Método inválido (use {', '.join(SERIES_METHODS)})", 400, "ERR_INVALID_PARAMS")
+    if method == 'lttb' and bucket_seconds:
+        raise APIError("O método 'lttb' usa max_points, não bucket_seconds", 400, "ERR_INVALID_PARAMS")
+    if bucket_seconds is not None and bucket_seconds < SERIES_MIN_BUCKET_SECONDS:
+        raise APIError(f"bucket_seconds mínimo é {SERIES_MIN_BUCKET_SECONDS}", 400, "ERR_INVALID_PARAMS")
+    if max_points is not None and not (3 <= max_points <= SERIES_MAX_POINTS_LIMIT):
+        raise APIError(f"max_points deve estar entre 3 e {SERIES_MAX_POINTS_LIMIT}", 400, "ERR_INVALID_PARAMS")
+
+
+def _parse_series_date(value, name):
+    """'YYYY-MM-DD' do body JSON (date_from/date_to) → date (None se vazio); 400 se mal formada."""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise APIError(f"Data inválida em '{name}' (use AAAA-MM-DD)", 400, "ERR_INVALID_PARAMS")
+
+
+@api_error_handler
+def query_sensor_series(sensor_pks: list, teleparam_pk: int, date_from: str, date_to: str,
+                        bucket_seconds: int = None, max_points: int = None, method: str = 'avg'):
+    """
+    Série temporal por sensor com resolução controlada, em formato colunar.
+
+    - method='avg': agregação no PostgreSQL por bucket de `bucket_seconds`
+      (ou, se omitido, largura calculada para ~`max_points` buckets no
+      intervalo real dos dados) — devolve avg/min/max/count por bucket.
+    - method='lttb': lê só (pk, data, valuenumb) e reduz cada sensor a
+      `max_points` pontos com LTTB, preservando picos.
+
+    Com intervalo de datas e buckets de 1h ou mais, o método 'avg' lê os
+    rollups (ver telemetry_rollup_service.choose_tier) em vez do raw.
+
+    Returns:
+        tuple: ({"status", "method", "tier", "bucket_seconds", "count",
+                 "series": [{"pk", "timestamps": [...], "values": [...], ...}]}, 200)
+    """
+    try:
+        _validate_series_params(sensor_pks, teleparam_pk, bucket_seconds, max_points, method)
+        d_from, d_to = _parse_series_date(date_from, 'date_from'), _parse_series_date(date_to, 'date_to')
+        if d_from and d_to and d_from > d_to:
+            raise APIError("'date_from' posterior a 'date_to'", 400, "ERR_INVALID_PARAMS")
+        if bucket_seconds is None and max_points is None:
+            max_points = SERIES_DEFAULT_MAX_POINTS
+
+        params = {
+            "sensor_pks": "{" + ",".join(str(int(pk)) for pk in sensor_pks) + "}",
+            "teleparam_pk": int(teleparam_pk),
+            "date_from": date_from or None,
+            "date_to": date_to or None,
+        }
+        source = """
+            SELECT pk, data, valuenumb FROM "fbo_telemetry$querydata"(
+                CAST(:sensor_pks AS integer[]),
+                :teleparam_pk,
+                CAST(:date_from AS date),
+                CAST(:date_to AS date)
+            ) WHERE valuenumb IS NOT NULL
+        """
+
+        series = {}
+        tier = TIER_RAW
+        if method == 'avg' and date_from and date_to:
+            # Router de tiers: intervalos longos lêem os rollups hora/dia em vez do raw
+            width = bucket_seconds or max(
+                math.ceil(((d_to - d_from).days + 1) * 86400 / max_points), SERIES_MIN_BUCKET_SECONDS
+            )
+            raw_days, hourly_days = get_retention_days()
+            tier, width = choose_tier(d_from, d_to, width, explicit_bucket=bucket_seconds is not None,
+                                      raw_retention_days=raw_days, hourly_retention_days=hourly_days)
+
+        if tier != TIER_RAW:
+            rows = query_rollup_series(db.session, tier, params["sensor_pks"], params["teleparam_pk"],
+                                       date_from, date_to, width)
+            resolved_bucket = width
+        elif method == 'avg':
+            params["bucket_seconds"] = bucket_seconds
+            params["max_points"] = max_points or SERIES_DEFAULT_MAX_POINTS
+            query = text(f"""
+                WITH q AS ({source}),
+                width AS (
+                    SELECT COALESCE(
+                        CAST(:bucket_seconds AS integer),
+                        GREATEST(CEIL(EXTRACT(EPOCH FROM MAX(data) - MIN(data)) / :max_points)::integer,
+                                 {SERIES_MIN_BUCKET_SECONDS})
+                    ) AS s
+                    FROM q
+                )
+                SELECT q.pk,
+                       width.s AS bucket_seconds,
+                       TIMESTAMP 'epoch'
+                           + FLOOR(EXTRACT(EPOCH FROM q.data) / width.s) * width.s * INTERVAL '1 second' AS bucket,
+                       AVG(q.valuenumb)::float AS avg,
+                       MIN(q.valuenumb)::float AS min,
+                       MAX(q.valuenumb)::float AS max,
+                       COUNT(*) AS count
+                FROM q CROSS JOIN width
+                GROUP BY q.pk, width.s, bucket
+                ORDER BY q.pk, bucket
+            """)
+            rows = _execute_with_init_retry(query, params)
+            resolved_bucket = rows[0]['bucket_seconds'] if rows else bucket_seconds
+
+        if method == 'avg':
+            for row in rows:
+                s = series.setdefault(row['pk'], {
+                    "pk": row['pk'], "timestamps": [], "values": [], "min": [], "max": [], "count": [],
+                })
+                s["timestamps"].append(row['bucket'].isoformat())
+                s["values"].append(row['avg'])
+                s["min"].append(row['min'])
+                s["max"].append(row['max'])
+                s["count"].append(int(row['count']))
+        else:
+            resolved_bucket = None
+            rows = _execute_with_init_retry(text(source + " ORDER BY pk, data"), params)
+            raw = {}
+            for row in rows:
+                data = row['data']
+                raw.setdefault(row['pk'], []).append((data.timestamp(), float(row['valuenumb']), data))
+            for pk, points in raw.items():
+                sampled = _lttb(points, max_points)
+                series[pk] = {
+                    "pk": pk,
+                    "timestamps": [p[2].isoformat() for p in sampled],
+                    "values": [p[1] for p in sampled],
+                }
+
+        total = sum(len(s["timestamps"]) for s in series.values())
+        logger.info(
+            f"Série telemetria ({method}, {tier}): {len(sensor_pks)} sensor(es), param pk={teleparam_pk}, "
+            f"{len(rows)} linhas → {total} pontos"
+        )
+        response = {
+            "status": "ok",
+            "method": method,
+            "tier": tier,
+            "bucket_seconds": resolved_bucket,
+            "count": total,
+            "series": list(series.values()),
+        }
+        if tier != TIER_RAW:
+            # Os rollups são atualizados de hora a hora — indicar até onde cobrem
+            watermark = get_rollup_watermark(db.session)
+            response["rollup_until"] = watermark.isoformat() if watermark else None
+        return response, 200
+
+    except APIError:
+        raise
+    except SQLAlchemyError as e:
+        logger.error(f"Erro de BD ao consultar série de telemetria: {str(e)}")
+        raise APIError("Erro ao consultar dados de telemetria", 500, "ERR_DATABASE")
+    except Exception as e:
+        logger.error(f"Erro inesperado ao consultar série de telemetria: {str(e)}")
+        raise APIError(f"Erro interno: {str(e)}", 500, "ERR_INTERNAL")
+
+
 @api_error_handler
 def mark_as_processed(pk: int):
     """
@@ -1,16 +1,41 @@
 """
 Template Service - Gestão de templates de ofícios com Jinja2
 Permite uso de variáveis dinâmicas e lógica condicional nos templates
+
+Os templates são compilados uma vez num Environment partilhado e guardados
+numa LRU indexada pelo hash do conteúdo (editar o template na BD muda o
+hash, por isso não há invalidação explícita). Cada entrada traz já o
+conjunto de variáveis usadas e as obrigatórias — renderizar o mesmo
+template milhares de vezes (ofícios em massa, corpo/header/footer de cada
+PDF) deixa de fazer parse a cada chamada.
 """
 
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Set, Tuple
+
 from jinja2 import Template, Environment, meta, TemplateSyntaxError
-from typing import Dict, List, Set
-from flask import current_app
 from app.utils.logger import get_logger
 
 
 logger = get_logger(__name__)
 
+TEMPLATE_CACHE_SIZE = 256
+
+# Mesmas opções do jinja2.Template(...) usado até aqui (sem autoescape)
+_env = Environment()
+
+
+class CompiledTemplate(NamedTuple):
+    template: Template
+    variables: FrozenSet[str]
+    required: Tuple[Tuple[str, str], ...]   # (variável, label) obrigatórias usadas
+
+
+_cache: "OrderedDict[str, CompiledTemplate]" = OrderedDict()
+_cache_lock = threading.Lock()
+
 
 class TemplateService:
     """Serviço para renderização de templates de ofícios com Jinja2"""
@@ -45,6 +70,36 @@ class TemplateService:
         'SIGNATURE_NAME': {'label': 'Nome do Assinante', 'category': 'Assinatura', 'required': False},
     }
 
+    @staticmethod
+    def compile(template_string: str) -> CompiledTemplate:
+        """
+        Template compilado (da LRU, ou compilado agora e guardado).
+
+        Raises:
+            TemplateSyntaxError: Se o template tiver erros de sintaxe
+        """
+        key = hashlib.sha1(template_string.encode('utf-8')).hexdigest()
+        with _cache_lock:
+            compiled = _cache.get(key)
+            if compiled is not None:
+                _cache.move_to_end(key)
+                return compiled
+
+        ast = _env.parse(template_string)
+        variables = frozenset(meta.find_undeclared_variables(ast))
+        required = tuple(
+            (var, TemplateService.AVAILABLE_VARIABLES[var]['label'])
+            for var in sorted(variables)
+            if TemplateService.AVAILABLE_VARIABLES.get(var, {}).get('required')
+        )
+        compiled = CompiledTemplate(_env.from_string(ast), variables, required)
+
+        with _cache_lock:
+            _cache[key] = compiled
+            if len(_cache) > TEMPLATE_CACHE_SIZE:
+                _cache.popitem(last=False)
+        return compiled
+
     @staticmethod
     def render_template(template_string: str, context: Dict) -> str:
         """
@@ -58,18 +113,12 @@ class TemplateService:
             String renderizada
 
         Raises:
-            TemplateSyntaxError: Se o template tiver erros de sintaxe
-            KeyError: Se faltar variável obrigatória
+            ValueError: Se o template tiver erros de sintaxe ou faltar variável obrigatória
         """
         try:
-            # Criar template Jinja2
-            template = Template(template_string)
-
-            # Validar variáveis obrigatórias
-            TemplateService._validate_required_variables(template_string, context)
-
-            # Renderizar
-            rendered = template.render(**context)
+            compiled = TemplateService.compile(template_string)
+            TemplateService._validate_required_variables(compiled, context)
+            rendered = compiled.template.render(**context)
 
             logger.debug(f"Template renderizado com sucesso. Contexto: {list(context.keys())}")
             return rendered
@@ -83,29 +132,46 @@ class TemplateService:
             raise
 
     @staticmethod
-    def _validate_required_variables(template_string: str, context: Dict) -> None:
+    def render_many(template_string: str, contexts: Iterable[Dict]) -> List[str]:
+        """
+        Renderiza o mesmo template para vários contextos (ofícios em massa).
+        O template é compilado uma só vez; as variáveis obrigatórias são
+        validadas em cada contexto.
+
+        Raises:
+            ValueError: Erro de sintaxe, ou variável obrigatória em falta num
+                contexto (a mensagem indica o índice do contexto)
+        """
+        try:
+            compiled = TemplateService.compile(template_string)
+        except TemplateSyntaxError as e:
+            logger.error(f"Erro de sintaxe no template: {str(e)}")
+            raise ValueError(f"Erro de sintaxe no template na linha {e.lineno}: {e.message}")
+
+        rendered = []
+        for index, context in enumerate(contexts):
+            try:
+                TemplateService._validate_required_variables(compiled, context)
+            except ValueError as e:
+                raise ValueError(f"Contexto {index}: {e}")
+            rendered.append(compiled.template.render(**context))
+
+        logger.debug(f"{len(rendered)} renderizações do mesmo template")
+        return rendered
+
+    @staticmethod
+    def _validate_required_variables(compiled: CompiledTemplate, context: Dict) -> None:
         """
         Valida se todas as variáveis obrigatórias estão presentes no contexto
 
         Args:
-            template_string: Template em formato Jinja2
+            compiled: Template compilado (com as obrigatórias já calculadas)
             context: Dicionário com valores
 
         Raises:
             ValueError: Se faltar variável obrigatória
         """
-        # Extrair variáveis usadas no template
-        env = Environment()
-        ast = env.parse(template_string)
-        used_variables = meta.find_undeclared_variables(ast)
-
-        # Verificar variáveis obrigatórias
-        missing_required = []
-        for var in used_variables:
-            if var in TemplateService.AVAILABLE_VARIABLES:
-                var_info = TemplateService.AVAILABLE_VARIABLES[var]
-                if var_info.get('required') and var not in context:
-                    missing_required.append(var_info['label'])
+        missing_required = [label for var, label in compiled.required if var not in context]
 
         if missing_required:
             raise ValueError(
@@ -124,9 +190,7 @@ class TemplateService:
             Set com nomes das variáveis
         """
         try:
-            env = Environment()
-            ast = env.parse(template_string)
-            return meta.find_undeclared_variables(ast)
+            return set(TemplateService.compile(template_string).variables)
         except Exception as e:
             logger.error(f"Erro ao extrair variáveis do template: {str(e)}")
             return set()
@@ -153,12 +217,8 @@ class TemplateService:
         }
 
         try:
-            # Tentar fazer parse do template
-            env = Environment()
-            ast = env.parse(template_string)
-
-            # Extrair variáveis
-            variables = meta.find_undeclared_variables(ast)
+            # Compilar (fica na cache para os renders seguintes) e extrair variáveis
+            variables = TemplateService.compile(template_string).variables
             result['variables_used'] = list(variables)
 
             # Verificar variáveis desconhecidas
@@ -1,11 +1,10 @@
 import os
 import jwt
 from flask import current_app, jsonify
-from flask_mail import Message
 from sqlalchemy.sql import text
 from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta
-from .. import db, mail
+from .. import db
 from ..utils.utils import format_message, db_session_manager
 from ..services.auth_service import fs_login
 from pydantic import BaseModel, EmailStr, constr
@@ -19,11 +18,16 @@ logger = get_logger(__name__)
 
 
 
+def _enqueue_smtp(email, subject, body, source):
+    """Põe o email na outbox (SMTP) — entregue em background, o pedido não espera."""
+    from app.services.email_outbox_service import enqueue_email, TRANSPORT_SMTP
+    return enqueue_email(email, subject, body, sender_email=current_app.config.get('MAIL_DEFAULT_SENDER'),
+                         transport=TRANSPORT_SMTP, source=source)
+
+
 def send_email(email, subject, message):
     try:
-        msg = Message(subject, sender=current_app.config.get('MAIL_DEFAULT_SENDER'), recipients=[email])
-        msg.body = message
-        mail.send(msg)
+        _enqueue_smtp(email, subject, message, 'send_email')
     except Exception as e:
         logger.error(f"Erro ao enviar o e-mail para {email}: {str(e)}", exc_info=True)
         raise APIError("Falha no serviço de envio de e-mail.", 502, "ERR_EMAIL_SERVICE")
@@ -33,9 +37,7 @@ def send_activation_email(name, email, id, activation_code):
     try:
         subject = "Ativação da conta AINTAR"
         body = f"Olá {name},\n\nObrigado por se registrar em AINTAR. Para ativar sua conta, utilize o seguinte código de ativação:\n\n http://localhost:3000/activation/{id}/{activation_code}\n\n Atenciosamente,\n Equipe AINTAR"
-        msg = Message(subject, sender=current_app.config.get('MAIL_DEFAULT_SENDER'), recipients=[email])
-        msg.body = body
-        mail.send(msg)
+        _enqueue_smtp(email, subject, body, 'activation')
     except Exception as e:
         logger.error(f"Erro ao enviar o e-mail de ativação para {email}: {str(e)}", exc_info=True)
         raise APIError("Falha ao enviar o e-mail de ativação.", 502, "ERR_EMAIL_SERVICE")
@@ -45,9 +47,7 @@ def send_courtesy_email(name, email):
     try:
         subject = "Conta AINTAR ativada com sucesso"
         body = f"Olá {name},\n\nParabéns! Sua conta AINTAR foi ativada com sucesso. Agora você pode acessar todos os recursos da plataforma.\n\nAtenciosamente,\nEquipe AINTAR"
-        msg = Message(subject, sender=current_app.config.get('MAIL_DEFAULT_SENDER'), recipients=[email])
-        msg.body = body
-        mail.send(msg)
+        _enqueue_smtp(email, subject, body, 'courtesy')
     except Exception as e:
         logger.error(f"Erro ao enviar o e-mail de cortesia para {email}: {str(e)}", exc_info=True)
         # Neste caso, o processo principal já teve sucesso, então apenas registamos o erro sem parar a execução.
@@ -60,9 +60,7 @@ def send_password_recovery_email(email, temp_token):
         reset_password_url = f"http://localhost:3000/reset_password?token={temp_token}"
         body = f"""Olá,\n\nAqui está o seu link para redefinir a password:\n\n
         {reset_password_url}\n\nPor favor, acesse o link acima para redefinir sua password. O link é válido por 15 minutos.\n\nAtenciosamente,\n\nEquipe AINTAR"""
-        msg = Message(subject, sender=current_app.config.get('MAIL_DEFAULT_SENDER'), recipients=[email])
-        msg.body = body
-        mail.send(msg)
+        _enqueue_smtp(email, subject, body, 'password_recovery')
     except Exception as e:
         logger.error(f"Erro ao enviar o e-mail de recuperação para {email}: {str(e)}", exc_info=True)
         raise APIError("Falha ao enviar o e-mail de recuperação.", 502, "ERR_EMAIL_SERVICE")
@@ -11,6 +11,7 @@ from typing import Optional
 from ..utils.utils import db_session_manager, send_mail
 from app.utils.error_handler import api_error_handler, ResourceNotFoundError, APIError
 from app.utils.file_processing import process_uploaded_file
+from app.services.storage_accounting_service import remove_file
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -66,7 +67,7 @@ def _delete_website_file(tipo: str, filename: str):
     base = current_app.config['FILES_DIR']
     path = os.path.join(base, 'website', tipo, filename)
     if os.path.exists(path):
-        os.remove(path)
+        remove_file(path)
 
 
 def _file_url(tipo: str, filename: str) -> Optional[str]:
@@ -1104,7 +1105,7 @@ def cms_upload_procedimento_imagem(pk: int, file, current_user: str):
         if old:
             old_path = os.path.join(base, 'procedimento', old)
             if os.path.exists(old_path):
-                os.remove(old_path)
+                remove_file(old_path)
 
         ext      = os.path.splitext(file.filename)[1].lower() if file.filename else '.jpg'
         filename = f"imagem_{pk}{ext}"
@@ -1198,7 +1199,7 @@ def cms_delete_procedimento_doc(doc_pk: int, current_user: str):
             raise ResourceNotFoundError('Documento', doc_pk)
         path = os.path.join(current_app.config['FILES_DIR'], 'procedimento', row[0])
         if os.path.exists(path):
-            os.remove(path)
+            remove_file(path)
         session.execute(text(
             "DELETE FROM tb_site_procedimento_doc WHERE pk = :pk"
         ), {'pk': doc_pk})
@@ -5,14 +5,19 @@ Serviço Flask que comunica com o microserviço Node.js whatsapp-web.js.
 Variáveis de ambiente necessárias:
     WA_SERVICE_URL   URL base do microserviço  (default: http://localhost:3010)
     WA_API_KEY       Chave de API partilhada    (obrigatória em produção)
+    WA_HTTP_SUBPROCESS  1 = cada chamada num subprocess (default em Windows,
+                     onde o monkey-patch do eventlet quebra o DNS); 0 = cliente
+                     HTTP partilhado com keep-alive (app/utils/http_client.py)
 """
 
 import os
 import json as _json
 import subprocess
 import sys
+import requests
 from app.utils.error_handler import api_error_handler, APIError
 from app.utils.logger import get_logger
+from app.utils.http_client import get_client
 from app.services.alert_whatsapp_service import get_latest_alert
 
 logger = get_logger(__name__)
@@ -30,6 +35,8 @@ if not WA_API_KEY:
 
 WA_GROUP_INVITE = os.getenv('WA_GROUP_INVITE', '')
 
+WA_HTTP_SUBPROCESS = os.getenv('WA_HTTP_SUBPROCESS', '1' if os.name == 'nt' else '0') == '1'
+
 # Script inline executado em subprocess separado — fora do eventlet monkey-patch
 _HTTP_SCRIPT = """
 import sys, json, urllib.request, urllib.error
@@ -53,9 +60,13 @@ except Exception as e:
 
 def _call(method: str, path: str, body: dict = None):
     """
-    Chama o microserviço WhatsApp via subprocess para contornar o
-    monkey-patch do eventlet que bloqueia I/O de rede no processo principal.
+    Chama o microserviço WhatsApp. Por omissão em Windows via subprocess,
+    para contornar o monkey-patch do eventlet que bloqueia I/O de rede no
+    processo principal; nos restantes casos pelo cliente HTTP partilhado.
     """
+    if not WA_HTTP_SUBPROCESS:
+        return _call_pooled(method, path, body)
+
     payload = _json.dumps({
         'url':     f'{WA_SERVICE_URL}{path}',
         'method':  method,
@@ -81,6 +92,24 @@ def _call(method: str, path: str, body: dict = None):
         raise APIError(f'Erro ao contactar microserviço WhatsApp: {str(e)}', 502, 'ERR_WA_CONNECT')
 
 
+def _call_pooled(method: str, path: str, body: dict = None):
+    """Mesma interface de _call, com keep-alive e circuit breaker (sem subprocess por chamada)."""
+    try:
+        resp = get_client('whatsapp', pool_size=4, max_concurrency=4, timeout=(3, 15)).request(
+            method, f'{WA_SERVICE_URL}{path}', json=body,
+            headers={'x-api-key': WA_API_KEY},
+        )
+    except requests.exceptions.Timeout:
+        raise APIError('Microserviço WhatsApp não respondeu (timeout)', 504, 'ERR_WA_TIMEOUT')
+    except requests.exceptions.RequestException as e:
+        raise APIError(f'Erro ao contactar microserviço WhatsApp: {str(e)}', 502, 'ERR_WA_CONNECT')
+    try:
+        data = resp.json()
+    except ValueError:
+        data = {}
+    return data, resp.status_code
+
+
 @api_error_handler
 def get_whatsapp_status():
     data, _ = _call('GET', '/status')
@@ -267,6 +296,24 @@ def send_group_message(group_id: str, message: str):
     return data, 200
 
 
+def format_sensor_alert_message(sensor_id, severity: str, message: str, title: str = 'ALERTA DE SENSOR') -> str:
+    """Texto WhatsApp de um alerta de sensor (ícone por severidade)."""
+    severity_icon = {'critical': '🔴', 'high': '🟠', 'medium': '🟡', 'low': '🟢'}.get(
+        (severity or '').lower(), '⚠️'
+    )
+    return (
+        f"{severity_icon} *AINTAR — {title}*\n\n"
+        f"Sensor: {sensor_id}\n"
+        f"Severidade: {(severity or '').upper()}\n\n"
+        f"{message}"
+    )
+
+
+def send_to_default_group(message: str):
+    """Envia texto livre para o grupo padrão — usado pelo motor de alertas de telemetria."""
+    return send_group_message(_get_default_group_id(), message)
+
+
 @api_error_handler
 def send_sensor_alert_to_group(group_id: str, pk: int = None):
     """Obtém o alerta mais recente da BD e envia para um grupo WhatsApp."""
@@ -282,15 +329,7 @@ def send_sensor_alert_to_group(group_id: str, pk: int = None):
     if not alert_message:
         raise APIError('Sem mensagem de alerta no registo', 400, 'ERR_NO_ALERT_MESSAGE')
 
-    severity_icon = {'critical': '🔴', 'high': '🟠', 'medium': '🟡', 'low': '🟢'}.get(
-        alert_severity.lower(), '⚠️'
-    )
-    mensagem = (
-        f"{severity_icon} *AINTAR — ALERTA DE SENSOR*\n\n"
-        f"Sensor: {sensor_id}\n"
-        f"Severidade: {alert_severity.upper()}\n\n"
-        f"{alert_message}"
-    )
+    mensagem = format_sensor_alert_message(sensor_id, alert_severity, alert_message)
 
     result, status = send_group_message(group_id, mensagem)
     if status != 200:
@@ -323,16 +362,7 @@ def send_sensor_alert_whatsapp(phone: str, pk: int = None):
     if not alert_message:
         raise APIError('Sem mensagem de alerta no registo', 400, 'ERR_NO_ALERT_MESSAGE')
 
-    severity_icon = {'critical': '🔴', 'high': '🟠', 'medium': '🟡', 'low': '🟢'}.get(
-        alert_severity.lower(), '⚠️'
-    )
-
-    mensagem = (
-        f"{severity_icon} *AINTAR — ALERTA DE SENSOR*\n\n"
-        f"Sensor: {sensor_id}\n"
-        f"Severidade: {alert_severity.upper()}\n\n"
-        f"{alert_message}"
-    )
+    mensagem = format_sensor_alert_message(sensor_id, alert_severity, alert_message)
 
     send_result, send_status = send_whatsapp_message(phone, mensagem)
     if send_status != 200:
@@ -0,0 +1,198 @@
+"""
+Registo de presença dos utilizadores ligados por Socket.IO.
+
+Substitui o dict connected_users {user_id: sid} de cada processo, que só
+guardava o último separador (o segundo sid sobrepunha-se ao primeiro) e não
+via os utilizadores ligados a outros workers.
+
+- um utilizador pode ter vários sids (separadores, dispositivos);
+- com Redis o registo é partilhado por todos os processos:
+    socketio:presence:user:<uid>  ZSET sid → último sinal de vida
+    socketio:presence:users       ZSET uid → último sinal de vida
+  Cada processo renova os seus sids a cada REFRESH_SECONDS; os de um
+  processo que morreu deixam de ser renovados e expiram ao fim de TTL_SECONDS
+  (não há disconnect para os remover);
+- sem Redis (ou se falhar) o registo é local ao processo — o mesmo
+  comportamento de antes, mas com vários sids por utilizador.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+TTL_SECONDS = 120
+REFRESH_SECONDS = 30
+KEY_PREFIX = 'socketio:presence'
+USERS_KEY = f'{KEY_PREFIX}:users'
+
+
+def _user_key(user_id):
+    return f'{KEY_PREFIX}:user:{user_id}'
+
+
+class LocalPresence:
+    """Registo em memória deste processo."""
+    backend = 'local'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sids = {}                      # sid → user_id
+        self._users = defaultdict(set)       # user_id → {sid}
+
+    def add(self, user_id, sid):
+        with self._lock:
+            self._sids[sid] = user_id
+            self._users[user_id].add(sid)
+
+    def remove(self, sid):
+        """Remove o sid; devolve o user_id a que pertencia (ou None)."""
+        with self._lock:
+            user_id = self._sids.pop(sid, None)
+            if user_id is not None:
+                self._users[user_id].discard(sid)
+                if not self._users[user_id]:
+                    del self._users[user_id]
+            return user_id
+
+    def touch(self, sid):
+        pass
+
+    def local_sids(self):
+        with self._lock:
+            return dict(self._sids)
+
+    def sids(self, user_id):
+        with self._lock:
+            return sorted(self._users.get(user_id, ()))
+
+    def is_online(self, user_id):
+        return bool(self.sids(user_id))
+
+    def online(self):
+        """{user_id: [sids]} de todos os utilizadores ligados."""
+        with self._lock:
+            return {uid: sorted(sids) for uid, sids in self._users.items()}
+
+
+class RedisPresence(LocalPresence):
+    """Registo partilhado em Redis; o estado local serve de recurso e para renovar."""
+    backend = 'redis'
+
+    def __init__(self, client):
+        super().__init__()
+        import redis
+        self._client = client
+        self._errors = redis.RedisError
+        self._degraded = False
+        self._refresher = None
+
+    def _redis(self, op, fallback):
+        try:
+            result = op(self._client.pipeline())
+            if self._degraded:
+                logger.info("[Presença] Redis disponível — registo partilhado reposto")
+                self._degraded = False
+            return result
+        except self._errors as e:
+            if not self._degraded:
+                logger.warning(f"[Presença] Redis indisponível ({e}) — presença só deste processo")
+                self._degraded = True
+            return fallback()
+
+    def add(self, user_id, sid):
+        super().add(user_id, sid)
+        now = time.time()
+
+        def op(pipe):
+            pipe.zadd(_user_key(user_id), {sid: now})
+            pipe.expire(_user_key(user_id), TTL_SECONDS)
+            pipe.zadd(USERS_KEY, {str(user_id): now})
+            pipe.execute()
+        self._redis(op, lambda: None)
+        self._start_refresher()
+
+    def remove(self, sid):
+        user_id = super().remove(sid)
+        if user_id is None:
+            return None
+
+        def op(pipe):
+            pipe.zrem(_user_key(user_id), sid)
+            pipe.zcard(_user_key(user_id))
+            _, remaining = pipe.execute()
+            if not remaining:
+                self._client.zrem(USERS_KEY, str(user_id))
+        self._redis(op, lambda: None)
+        return user_id
+
+    def touch(self, sid):
+        user_id = self.local_sids().get(sid)
+        if user_id is not None:
+            self.refresh({sid: user_id})
+
+    def refresh(self, sids=None):
+        """Renova o sinal de vida dos sids deste processo e limpa os expirados."""
+        sids = self.local_sids() if sids is None else sids
+        if not sids:
+            return
+        now = time.time()
+
+        def op(pipe):
+            for sid, user_id in sids.items():
+                pipe.zadd(_user_key(user_id), {sid: now})
+                pipe.expire(_user_key(user_id), TTL_SECONDS)
+                pipe.zadd(USERS_KEY, {str(user_id): now})
+            pipe.zremrangebyscore(USERS_KEY, 0, now - TTL_SECONDS)
+            pipe.execute()
+        self._redis(op, lambda: None)
+
+    def sids(self, user_id):
+        def op(pipe):
+            pipe.zrangebyscore(_user_key(user_id), time.time() - TTL_SECONDS, '+inf')
+            return sorted(s.decode() if isinstance(s, bytes) else s for s in pipe.execute()[0])
+        return self._redis(op, lambda: LocalPresence.sids(self, user_id))
+
+    def online(self):
+        def op(pipe):
+            cutoff = time.time() - TTL_SECONDS
+            users = self._client.zrangebyscore(USERS_KEY, cutoff, '+inf')
+            users = [u.decode() if isinstance(u, bytes) else u for u in users]
+            for uid in users:
+                pipe.zrangebyscore(_user_key(uid), cutoff, '+inf')
+            result = {}
+            for uid, sids in zip(users, pipe.execute()):
+                if sids:
+                    key = int(uid) if uid.isdigit() else uid
+                    result[key] = sorted(s.decode() if isinstance(s, bytes) else s for s in sids)
+            return result
+        return self._redis(op, lambda: LocalPresence.online(self))
+
+    def _start_refresher(self):
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        self._refresher = threading.Thread(target=self._refresh_loop, name='socketio-presence', daemon=True)
+        self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(REFRESH_SECONDS)
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"[Presença] Erro ao renovar presença: {e}", exc_info=True)
+
+
+def create_presence(redis_url=None):
+    """RedisPresence quando há URL e o Redis responde; senão LocalPresence."""
+    if redis_url:
+        try:
+            import redis
+            client = redis.Redis.from_url(redis_url, socket_connect_timeout=2, socket_timeout=2)
+            client.ping()
+            return RedisPresence(client)
+        except Exception as e:
+            logger.warning(f"[Presença] Redis indisponível ({e}) — presença local a este processo")
+    return LocalPresence()
@@ -0,0 +1,123 @@
+"""
+Socket.IO com vários processos: fila de mensagens partilhada e emissões em lote.
+
+Sem message_queue cada processo só entrega eventos aos clientes ligados a
+si — um emit feito num job do scheduler (ou noutro worker, ou no processo
+do pool) não chegava a quem estava ligado noutro lado. Com
+SOCKETIO_MESSAGE_QUEUE (Redis pub/sub) todos os emits passam pela fila e
+cada processo entrega-os aos seus clientes; os processos que não servem
+sockets (pool do scheduler) emitem só para a fila.
+
+SOCKETIO_MESSAGE_QUEUE:
+  ''      → sem fila (um processo; o comportamento antigo)
+  'redis' → REDIS_URL
+  URL     → essa URL (redis://, rediss://)
+Se o Redis não responder no arranque, fica sem fila e avisa no log.
+
+EmitBatcher: os emits do servidor (notificações, contadores) entram num
+buffer que é despachado em background a cada SOCKETIO_EMIT_BATCH_MS —
+o pedido HTTP não espera pelo publish no Redis; contadores repetidos para
+a mesma room só enviam o último valor; o mesmo evento com o mesmo conteúdo
+para várias rooms sai num único emit com a lista de rooms.
+"""
+import json
+import threading
+import time
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Eventos cujo último valor substitui os anteriores ainda por enviar
+COALESCE_EVENTS = frozenset({'task_notification_count', 'notification_update'})
+
+
+def resolve_message_queue(config):
+    """URL da fila de mensagens a usar (ou None), já verificada com ping."""
+    setting = (config.get('SOCKETIO_MESSAGE_QUEUE') or '').strip()
+    if not setting or setting.lower() in ('local', 'none'):
+        return None
+    url = config.get('REDIS_URL') if setting.lower() == 'redis' else setting
+    try:
+        import redis
+        redis.Redis.from_url(url, socket_connect_timeout=2).ping()
+        return url
+    except Exception as e:
+        logger.warning(f"[Socket.IO] Fila de mensagens indisponível ({e}) — "
+                       f"emits só chegam aos clientes deste processo")
+        return None
+
+
+def _payload_key(data):
+    try:
+        return json.dumps(data, sort_keys=True, default=str)
+    except (TypeError, ValueError):
+        return None
+
+
+class EmitBatcher:
+    def __init__(self, socketio, window_ms=25):
+        self._socketio = socketio
+        self._window = max(window_ms, 0) / 1000
+        self._lock = threading.Lock()
+        self._pending = []                  # [event, data, room, namespace]
+        self._coalesced = {}                # (event, room, namespace) → índice em _pending
+        self._wake = threading.Event()
+        self._thread = None
+
+    def emit(self, event, data, room=None, namespace='/'):
+        if self._window <= 0:
+            self._send(event, data, room, namespace)
+            return
+        with self._lock:
+            key = (event, room, namespace)
+            if event in COALESCE_EVENTS and room is not None and key in self._coalesced:
+                self._pending[self._coalesced[key]][1] = data
+            else:
+                if event in COALESCE_EVENTS and room is not None:
+                    self._coalesced[key] = len(self._pending)
+                self._pending.append([event, data, room, namespace])
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='socketio-emits', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def flush(self):
+        """Envia já tudo o que está pendente. Devolve o número de emits feitos."""
+        with self._lock:
+            pending, self._pending, self._coalesced = self._pending, [], {}
+        batches = self._group(pending)
+        for event, data, rooms, namespace in batches:
+            self._send(event, data, rooms, namespace)
+        return len(batches)
+
+    @staticmethod
+    def _group(pending):
+        """Junta o mesmo evento+conteúdo dirigido a rooms diferentes num só emit."""
+        batches = []
+        merged = {}
+        for event, data, room, namespace in pending:
+            payload = _payload_key(data) if room is not None else None
+            key = (event, namespace, payload)
+            if payload is not None and key in merged:
+                rooms = batches[merged[key]][2]
+                if room not in rooms:
+                    rooms.append(room)
+                continue
+            if payload is not None:
+                merged[key] = len(batches)
+            batches.append([event, data, [room] if room is not None else None, namespace])
+        return [(e, d, r[0] if r and len(r) == 1 else r, n) for e, d, r, n in batches]
+
+    def _send(self, event, data, room, namespace):
+        try:
+            self._socketio.emit(event, data, room=room, namespace=namespace)
+        except Exception as e:
+            logger.error(f"[Socket.IO] Erro ao emitir {event} para {room}: {e}", exc_info=True)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            time.sleep(self._window)
+            self.flush()
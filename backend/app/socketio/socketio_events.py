@@ -1,7 +1,8 @@
 from flask import request, current_app
 import jwt
 from flask_socketio import emit, join_room, leave_room, Namespace
-from threading import Lock
+from .presence import LocalPresence, create_presence
+from .scaling import EmitBatcher
 from ..services.notification_service import notification_service, task_notification_service, central_notification_service
 from ..services.auth_service import update_last_activity
 from app.utils.logger import get_logger
@@ -11,10 +12,22 @@ logger = get_logger(__name__)
 class SocketIOEvents(Namespace):
     def __init__(self, namespace=None):
         super().__init__(namespace)
-        self.connected_users = {}
-        self.user_lock = Lock()
+        self.presence = LocalPresence()  # substituído em register_socket_events
+        self.emitter = None
         self.socketio = None  # Será definido no register_socket_events
 
+    @property
+    def connected_users(self):
+        """{user_id: [sids]} — todos os processos quando a presença está em Redis."""
+        return self.presence.online()
+
+    def _emit(self, event, data, room=None):
+        """Emit do servidor (fora do handler do socket), via o batcher quando existe."""
+        if self.emitter is not None:
+            self.emitter.emit(event, data, room=room, namespace='/')
+        else:
+            self.socketio.emit(event, data, room=room, namespace='/')
+
     def on_connect(self):
         token = request.args.get('token')
         user_id_param = request.args.get('userId')
@@ -35,8 +48,7 @@ class SocketIOEvents(Namespace):
 
             room = f'user_{user_id}'
             join_room(room)
-            with self.user_lock:
-                self.connected_users[user_id] = request.sid
+            self.presence.add(user_id, request.sid)
 
             emit('connection_response', {
                 'status': 'connected',
@@ -51,14 +63,8 @@ class SocketIOEvents(Namespace):
             return False
 
     def on_disconnect(self):
-        """Remove o utilizador de connected_users para não emitir para sockets mortos."""
-        sid = request.sid
-        with self.user_lock:
-            stale_user_id = next(
-                (uid for uid, s in self.connected_users.items() if s == sid), None
-            )
-            if stale_user_id is not None:
-                del self.connected_users[stale_user_id]
+        """Remove este sid da presença; os outros separadores do utilizador ficam."""
+        self.presence.remove(request.sid)
 
     def on_heartbeat(self, data):
         """Heartbeat via socket — substitui o pedido HTTP POST /auth/heartbeat
@@ -69,6 +75,7 @@ class SocketIOEvents(Namespace):
         session_id = data.get('sessionId')
         if not session_id:
             return
+        self.presence.touch(request.sid)
         try:
             update_last_activity(session_id)
         except Exception as e:
@@ -122,7 +129,7 @@ class SocketIOEvents(Namespace):
             # Emitir sempre para a room: socketio.emit é inofensivo se vazia,
             # e o gate por connected_users tem janelas de falso-negativo
             # (reconexão, múltiplos separadores) que perdiam a notificação.
-            self.socketio.emit('task_notification_count', {'count': count}, room=room_id, namespace='/')
+            self._emit('task_notification_count', {'count': count}, room=room_id)
         except Exception as e:
             logger.error(
                 f"Erro ao emitir contagem de tarefas: {str(e)}")
@@ -164,7 +171,7 @@ class SocketIOEvents(Namespace):
             # frontend-v2 (fase D da unificação) — os eventos de contagem/lista
             # legados ('task_notification_count', 'task_notifications') já não
             # têm listener e deixaram de ser emitidos aqui.
-            self.socketio.emit('task_notification', notification_data, room=room_id, namespace='/')
+            self._emit('task_notification', notification_data, room=room_id)
         except Exception as e:
             logger.error(f"Erro ao emitir notificação de tarefa: {str(e)}", exc_info=True)
 
@@ -185,7 +192,7 @@ class SocketIOEvents(Namespace):
                 self.emit_task_notification_count(user_id, session_id)
                 logger.info(f"🔢 Contador atualizado")
 
-                self.socketio.emit('task_notifications_updated', {'taskId': task_id, 'read': True}, room=f'user_{user_id}', namespace='/')
+                self._emit('task_notifications_updated', {'taskId': task_id, 'read': True}, room=f'user_{user_id}')
                 logger.info(f"📤 Evento task_notifications_updated emitido")
             except Exception as e:
                 logger.error(f"❌ Erro ao marcar notificação: {str(e)}", exc_info=True)
@@ -198,11 +205,11 @@ class SocketIOEvents(Namespace):
         if user_id and session_id:
             try:
                 notifications = task_notification_service.get_all_task_notifications(user_id, session_id)
-                # Usar self.socketio.emit para funcionar tanto em contexto Socket.IO quanto HTTP
-                self.socketio.emit('task_notifications', {
+                # Usar self._emit para funcionar tanto em contexto Socket.IO quanto HTTP
+                self._emit('task_notifications', {
                     'notifications': notifications,
                     'count': len(notifications)
-                }, room=f'user_{user_id}', namespace='/')
+                }, room=f'user_{user_id}')
             except Exception as e:
                 logger.error(
                     f"Erro ao obter notificações: {str(e)}")
@@ -234,11 +241,7 @@ class SocketIOEvents(Namespace):
             )
 
             # Broadcast para todos os utilizadores conectados
-            self.socketio.emit(
-                'payment_status_update',
-                notification_data,
-                namespace='/'
-            )
+            self._emit('payment_status_update', notification_data)
 
             logger.info(f"payment_status_update emitido com sucesso (broadcast)")
 
@@ -274,7 +277,7 @@ class SocketIOEvents(Namespace):
                     ts_client=user_id, type_=type_, notification_type=notification_type,
                     title=title, message=message, route=route, metadata=metadata,
                 )
-                self.socketio.emit('central_notification', {
+                self._emit('central_notification', {
                     'notification_id': pk,
                     'type': type_,
                     'notification_type': notification_type,
@@ -283,7 +286,7 @@ class SocketIOEvents(Namespace):
                     'timestamp': datetime.datetime.now().isoformat(),
                     'route': route,
                     'metadata': metadata or {},
-                }, room=f'user_{user_id}', namespace='/')
+                }, room=f'user_{user_id}')
                 logger.info(f"[CentralNotif] {type_}/{notification_type} → user {user_id}")
             except Exception as e:
                 logger.error(f"[CentralNotif] Erro ao emitir {type_} para user {user_id}: {e}")
@@ -367,10 +370,37 @@ class SocketIOEvents(Namespace):
         )
 
 
+    def emit_telemetry_alert(self, alert: dict, user_ids: list = None):
+        """
+        Alerta de telemetria do motor de regras (app/services/telemetry_alert_engine.py).
+
+        Broadcast 'telemetry_alert' (abertura e fecho) para os ecrãs de
+        telemetria abertos; a abertura entra também no sino de quem tem
+        telemetry.alerts.
+        """
+        try:
+            self._emit('telemetry_alert', alert)
+        except Exception as e:
+            logger.error(f"Erro ao emitir telemetry_alert: {str(e)}", exc_info=True)
+
+        if user_ids and alert.get('state') == 'raised':
+            self.emit_central_notification(
+                user_ids, 'telemetry', alert.get('kind'),
+                f"Alerta de sensor {alert.get('sensor_id')}", alert.get('message'), '/telemetry',
+                metadata={
+                    'alert_pk': alert.get('alert_pk'), 'rule_pk': alert.get('rule_pk'),
+                    'sensor_id': alert.get('sensor_id'), 'severity': alert.get('severity'),
+                },
+            )
+
+
 def register_socket_events(socketio):
     # Criamos uma instância da classe e a registramos no socketio
     socket_events = SocketIOEvents('/')
     socket_events.socketio = socketio  # Armazenar referência ao socketio
+    # Presença em Redis só faz sentido com a fila partilhada (vários processos)
+    socket_events.presence = create_presence(current_app.config.get('SOCKETIO_MESSAGE_QUEUE_URL'))
+    socket_events.emitter = EmitBatcher(socketio, current_app.config.get('SOCKETIO_EMIT_BATCH_MS', 25))
     socketio.on_namespace(socket_events)
 
     # Armazenamos a instância para que outros módulos possam acedê-la
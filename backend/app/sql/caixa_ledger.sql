@@ -0,0 +1,105 @@
+-- Caixa — saldos diários consolidados (checkpoints) e índices da listagem.
+-- app/services/caixa_ledger.py.
+--
+-- A listagem da caixa somava tb_caixa inteira para o saldo e devolvia todos
+-- os movimentos do período num só pedido — ficava mais lenta todos os anos.
+--
+-- tb_caixa_checkpoint: uma linha por dia com movimentos, com o saldo no fim
+-- do dia e as entradas/saídas/nº de movimentos desse dia. É gravada quando
+-- um fecho de caixa é validado (validate_fecho), até à véspera do fecho.
+-- O saldo em qualquer data = último checkpoint até essa data + movimentos
+-- posteriores (poucos: só os desde o último fecho).
+--
+-- Um movimento inserido, alterado ou apagado num dia já consolidado invalida
+-- os checkpoints desse dia em diante (trigger abaixo, qualquer que seja o
+-- caminho — vbf_caixa, pagamentos, procedures); o saldo passa a ser
+-- calculado a partir do checkpoint anterior e o próximo fecho validado volta
+-- a consolidar.
+--
+-- Idempotente — seguro correr mais do que uma vez.
+
+CREATE TABLE IF NOT EXISTS tb_caixa_checkpoint (
+    dia             date          PRIMARY KEY,
+    saldo           numeric(14,2) NOT NULL,     -- saldo no fim do dia
+    entradas        numeric(14,2) NOT NULL,
+    saidas          numeric(14,2) NOT NULL,     -- valor absoluto
+    movimentos      integer       NOT NULL,
+    tb_caixa_fecho  integer,                    -- fecho cuja validação consolidou o dia
+    finalized_by    integer,
+    finalized_at    timestamp     NOT NULL DEFAULT current_timestamp
+);
+
+CREATE OR REPLACE FUNCTION fn_caixa_checkpoint_invalidate_new() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    DELETE FROM tb_caixa_checkpoint
+    WHERE dia >= (SELECT min(data)::date FROM new_rows);
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION fn_caixa_checkpoint_invalidate_old() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    DELETE FROM tb_caixa_checkpoint
+    WHERE dia >= (SELECT min(data)::date FROM old_rows);
+    RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS tr_caixa_checkpoint_insert ON tb_caixa;
+CREATE TRIGGER tr_caixa_checkpoint_insert
+    AFTER INSERT ON tb_caixa
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_caixa_checkpoint_invalidate_new();
+
+-- Uma alteração pode mudar a data: conta a antiga e a nova
+DROP TRIGGER IF EXISTS tr_caixa_checkpoint_update_new ON tb_caixa;
+CREATE TRIGGER tr_caixa_checkpoint_update_new
+    AFTER UPDATE ON tb_caixa
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_caixa_checkpoint_invalidate_new();
+
+DROP TRIGGER IF EXISTS tr_caixa_checkpoint_update_old ON tb_caixa;
+CREATE TRIGGER tr_caixa_checkpoint_update_old
+    AFTER UPDATE ON tb_caixa
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_caixa_checkpoint_invalidate_old();
+
+DROP TRIGGER IF EXISTS tr_caixa_checkpoint_delete ON tb_caixa;
+CREATE TRIGGER tr_caixa_checkpoint_delete
+    AFTER DELETE ON tb_caixa
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_caixa_checkpoint_invalidate_old();
+
+-- Deltas desde o último checkpoint e somas por período
+CREATE INDEX IF NOT EXISTS ix_tb_caixa_data
+    ON tb_caixa (data, pk);
+
+-- Listagem paginada por keyset; movimentos sem hist_time ordenam pela data
+-- (mesma expressão que caixa_ledger.SORT_TIME_SQL)
+DROP INDEX IF EXISTS ix_tb_caixa_hist_time;
+CREATE INDEX IF NOT EXISTS ix_tb_caixa_sort
+    ON tb_caixa ((COALESCE(hist_time, data, TIMESTAMP '-infinity')) DESC, pk DESC);
+
+-- Histórico: consolida até à véspera do último fecho já validado (o que
+-- validate_fecho teria feito); só na primeira execução
+WITH ate AS (
+    SELECT MAX(data)::date - 1 AS dia
+    FROM tb_caixa
+    WHERE tt_caixamovimento = 4 AND ts_client2 IS NOT NULL
+),
+dias AS (
+    SELECT b.data::date                                          AS dia,
+           COALESCE(SUM(b.valor), 0)                             AS liquido,
+           COALESCE(SUM(b.valor) FILTER (WHERE b.valor > 0), 0)  AS entradas,
+           COALESCE(-SUM(b.valor) FILTER (WHERE b.valor < 0), 0) AS saidas,
+           COUNT(*)                                              AS movimentos
+    FROM tb_caixa b, ate
+    WHERE b.data IS NOT NULL
+      AND b.data < ate.dia + 1
+    GROUP BY 1
+)
+INSERT INTO tb_caixa_checkpoint (dia, saldo, entradas, saidas, movimentos)
+SELECT dia, SUM(liquido) OVER (ORDER BY dia), entradas, saidas, movimentos
+FROM dias
+WHERE NOT EXISTS (SELECT 1 FROM tb_caixa_checkpoint)
+ON CONFLICT (dia) DO NOTHING;
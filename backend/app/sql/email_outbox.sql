@@ -0,0 +1,36 @@
+-- Outbox de emails transaccionais (app/services/email_outbox_service.py).
+--
+-- Os pedidos HTTP só inserem aqui e respondem; um worker em background
+-- (mais o job de recurso no scheduler) entrega em lotes — Graph via JSON
+-- batching ($batch, até 20 por pedido) e SMTP numa só ligação por lote —
+-- com novas tentativas e backoff exponencial.
+--
+-- Idempotente — seguro correr mais do que uma vez.
+
+CREATE TABLE IF NOT EXISTS tb_email_outbox (
+    pk              serial PRIMARY KEY,
+    transport       text      NOT NULL DEFAULT 'graph' CHECK (transport IN ('graph', 'smtp')),
+    recipient       text      NOT NULL,
+    sender_email    text,
+    subject         text      NOT NULL,
+    body            text      NOT NULL,
+    content_type    text      NOT NULL DEFAULT 'Text' CHECK (content_type IN ('Text', 'HTML')),
+    source          text,
+    -- pending → sending → sent | failed (pending outra vez entre tentativas)
+    status          text      NOT NULL DEFAULT 'pending'
+                    CHECK (status IN ('pending', 'sending', 'sent', 'failed')),
+    attempts        integer   NOT NULL DEFAULT 0,
+    next_attempt_at timestamp NOT NULL DEFAULT current_timestamp,
+    claimed_at      timestamp,
+    last_error      text,
+    created_at      timestamp NOT NULL DEFAULT current_timestamp,
+    sent_at         timestamp
+);
+
+-- Fila: só as linhas por entregar entram no índice
+CREATE INDEX IF NOT EXISTS ix_tb_email_outbox_queue
+    ON tb_email_outbox (next_attempt_at, pk)
+    WHERE status IN ('pending', 'sending');
+
+CREATE INDEX IF NOT EXISTS ix_tb_email_outbox_created
+    ON tb_email_outbox (created_at DESC);
@@ -0,0 +1,92 @@
+-- Analytics das operações — rollups diários de tb_operacao.
+-- app/services/operations/analytics.py (leitura) e o job operacao_analytics_rollup.
+--
+-- Antes, get_analytics_data ignorava os filtros e refazia COUNT(DISTINCT ...)
+-- e um GROUP BY por operador sobre toda a vbl_operacaometa em cada pedido.
+--
+-- tb_operacao_rollup_dia: uma linha por (dia previsto, instalação, modo,
+-- operador) com total de tarefas, concluídas, concluídas no próprio dia e a
+-- soma/máximo do atraso (segundos desde o início do dia previsto até
+-- updt_time). Qualquer bucket maior (semana, mês) e qualquer combinação de
+-- filtros somam-se daqui — por isso se guarda a soma e não a média.
+-- 0 nas chaves = sem valor (modo 0 = tarefa pontual).
+--
+-- tb_operacao_rollup_dirty: dias a recalcular. Os triggers abaixo marcam o
+-- dia de cada linha inserida/alterada/apagada em tb_operacao, seja qual for
+-- o caminho (conclusão, lote offline, geração mensal, procedures); o job
+-- recalcula esses dias e a leitura agrega-os directamente de tb_operacao
+-- enquanto estão pendentes — os números nunca ficam atrás das conclusões.
+--
+-- Idempotente — seguro correr mais do que uma vez. A primeira execução
+-- marca todos os dias existentes; o job preenche o histórico em lotes.
+
+CREATE TABLE IF NOT EXISTS tb_operacao_rollup_dia (
+    dia             date    NOT NULL,
+    tb_instalacao   integer NOT NULL DEFAULT 0,
+    tt_operacaomodo integer NOT NULL DEFAULT 0,
+    ts_operador     integer NOT NULL DEFAULT 0,
+    total           integer NOT NULL,
+    concluidas      integer NOT NULL,
+    no_dia          integer NOT NULL,
+    atraso_soma     bigint  NOT NULL,
+    atraso_max      bigint,
+    PRIMARY KEY (dia, tb_instalacao, tt_operacaomodo, ts_operador)
+);
+
+CREATE TABLE IF NOT EXISTS tb_operacao_rollup_dirty (
+    dia         date      PRIMARY KEY,
+    marked_at   timestamp NOT NULL DEFAULT current_timestamp
+);
+
+CREATE OR REPLACE FUNCTION fn_operacao_rollup_mark_new() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO tb_operacao_rollup_dirty (dia)
+    SELECT DISTINCT data FROM new_rows WHERE data IS NOT NULL
+    ON CONFLICT (dia) DO NOTHING;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION fn_operacao_rollup_mark_old() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO tb_operacao_rollup_dirty (dia)
+    SELECT DISTINCT data FROM old_rows WHERE data IS NOT NULL
+    ON CONFLICT (dia) DO NOTHING;
+    RETURN NULL;
+END $$;
+
+-- Por instrução (não por linha): a geração mensal insere milhares de tarefas
+-- num só INSERT e marca cada dia uma vez
+DROP TRIGGER IF EXISTS tr_operacao_rollup_insert ON tb_operacao;
+CREATE TRIGGER tr_operacao_rollup_insert
+    AFTER INSERT ON tb_operacao
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_operacao_rollup_mark_new();
+
+-- Uma alteração pode mudar a data: marca o dia antigo e o novo
+DROP TRIGGER IF EXISTS tr_operacao_rollup_update_new ON tb_operacao;
+CREATE TRIGGER tr_operacao_rollup_update_new
+    AFTER UPDATE ON tb_operacao
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_operacao_rollup_mark_new();
+
+DROP TRIGGER IF EXISTS tr_operacao_rollup_update_old ON tb_operacao;
+CREATE TRIGGER tr_operacao_rollup_update_old
+    AFTER UPDATE ON tb_operacao
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_operacao_rollup_mark_old();
+
+DROP TRIGGER IF EXISTS tr_operacao_rollup_delete ON tb_operacao;
+CREATE TRIGGER tr_operacao_rollup_delete
+    AFTER DELETE ON tb_operacao
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION fn_operacao_rollup_mark_old();
+
+-- Histórico: todos os dias ainda sem rollup
+INSERT INTO tb_operacao_rollup_dirty (dia)
+SELECT DISTINCT o.data
+FROM tb_operacao o
+WHERE o.data IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM tb_operacao_rollup_dia r WHERE r.dia = o.data)
+ON CONFLICT (dia) DO NOTHING;
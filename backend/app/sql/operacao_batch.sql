@@ -0,0 +1,47 @@
+-- Conclusão de tarefas em lote (app Android offline) —
+-- app/services/operations/batch_completion.py e operations/photo_queue.py.
+--
+-- tb_operacao_sync: uma linha por conclusão aceite, com a chave gerada pelo
+-- cliente. Um reenvio do mesmo lote (resposta perdida, ligação caiu) devolve
+-- o resultado guardado em vez de concluir a tarefa outra vez. A linha é
+-- inserida na mesma transacção da conclusão: se a conclusão falhar, a chave
+-- não fica registada e o cliente pode tentar de novo.
+--
+-- tb_operacao_photo_queue: fotos recebidas no lote, guardadas tal como
+-- chegaram em TarefasOperação/_staging. Um worker em background (e o job
+-- de recurso do scheduler) move-as para a pasta da instalação, comprime-as
+-- e grava tb_operacao.photo_path.
+--
+-- Idempotente — seguro correr mais do que uma vez.
+
+CREATE TABLE IF NOT EXISTS tb_operacao_sync (
+    ts_client       integer     NOT NULL,   -- operador que enviou o lote
+    client_key      text        NOT NULL,
+    tb_operacao     integer     NOT NULL,
+    result          jsonb       NOT NULL DEFAULT '{}'::jsonb,
+    created_at      timestamp   NOT NULL DEFAULT current_timestamp,
+    PRIMARY KEY (ts_client, client_key)
+);
+
+CREATE INDEX IF NOT EXISTS ix_tb_operacao_sync_created
+    ON tb_operacao_sync (created_at);
+
+CREATE TABLE IF NOT EXISTS tb_operacao_photo_queue (
+    pk              serial PRIMARY KEY,
+    tb_operacao     integer     NOT NULL,
+    staged_path     text        NOT NULL,
+    instalacao_nome text        NOT NULL,
+    -- pending → processing → done | failed
+    status          text        NOT NULL DEFAULT 'pending'
+                    CHECK (status IN ('pending', 'processing', 'done', 'failed')),
+    attempts        integer     NOT NULL DEFAULT 0,
+    claimed_at      timestamp,
+    last_error      text,
+    photo_path      text,
+    created_at      timestamp   NOT NULL DEFAULT current_timestamp,
+    processed_at    timestamp
+);
+
+CREATE INDEX IF NOT EXISTS ix_tb_operacao_photo_queue_pending
+    ON tb_operacao_photo_queue (pk)
+    WHERE status IN ('pending', 'processing');
@@ -0,0 +1,35 @@
+-- Execuções dos jobs do scheduler (app/scheduler.py, app/services/job_run_service.py).
+--
+-- Só o processo líder (advisory lock, ver scheduler_leader_service.py) corre os
+-- jobs agendados; cada execução — agendada ou pedida pelo admin — fica aqui com
+-- a duração, as linhas afectadas reportadas pelo job e o erro, se falhou.
+-- 'skipped' = outra instância já estava a correr o mesmo job.
+-- O job scheduler_runs_purge apaga as execuções com mais de
+-- SCHEDULER_RUN_RETENTION_DAYS dias.
+--
+-- Idempotente — seguro correr mais do que uma vez.
+
+CREATE TABLE IF NOT EXISTS tb_scheduler_job_run (
+    pk              bigserial PRIMARY KEY,
+    job_id          text        NOT NULL,
+    trigger         text        NOT NULL DEFAULT 'cron',     -- cron | manual
+    requested_by    text,                                    -- utilizador (manual)
+    status          text        NOT NULL DEFAULT 'running',  -- running | success | error | skipped
+    host            text,                                    -- hostname:pid que executou
+    started_at      timestamp   NOT NULL DEFAULT current_timestamp,
+    finished_at     timestamp,
+    duration_ms     integer,
+    rows_affected   bigint,
+    detail          jsonb,
+    error           text,
+    CONSTRAINT ck_scheduler_job_run_status
+        CHECK (status IN ('running', 'success', 'error', 'skipped')),
+    CONSTRAINT ck_scheduler_job_run_trigger
+        CHECK (trigger IN ('cron', 'manual'))
+);
+
+CREATE INDEX IF NOT EXISTS ix_scheduler_job_run_job
+    ON tb_scheduler_job_run (job_id, started_at DESC);
+
+CREATE INDEX IF NOT EXISTS ix_scheduler_job_run_running
+    ON tb_scheduler_job_run (job_id) WHERE status = 'running';
@@ -0,0 +1,22 @@
+-- Estado de reconciliação SIBS (app/services/payment_reconciliation_service.py).
+--
+-- Uma linha por transacção MB WAY / Multibanco consultada na API SIBS, seja
+-- pelo job de reconciliação (cada 5 min, em lote) seja por uma verificação
+-- manual. O job usa checked_at para não voltar a consultar a mesma transacção
+-- antes de RECHECK_MINUTES; a página de administração lê daqui o último
+-- estado conhecido na SIBS em vez de fazer uma chamada em directo por linha.
+--
+-- Idempotente — seguro correr mais do que uma vez.
+
+CREATE TABLE IF NOT EXISTS tb_sibs_reconciliation (
+    transaction_id  varchar   PRIMARY KEY,
+    sibs_status     text,                 -- paymentStatus devolvido pela SIBS
+    applied_status  text,                 -- último estado interno aplicado por reconciliação
+    checks          integer   NOT NULL DEFAULT 1,
+    checked_at      timestamp NOT NULL DEFAULT current_timestamp,
+    changed_at      timestamp,
+    last_error      text
+);
+
+CREATE INDEX IF NOT EXISTS ix_tb_sibs_reconciliation_checked
+    ON tb_sibs_reconciliation (checked_at);
@@ -0,0 +1,20 @@
+-- Contabilidade de armazenamento (app/services/storage_accounting_service.py).
+--
+-- Uma linha por diretório de cada área monitorizada ('temp' = TEMP_DIR,
+-- 'files' = FILES_DIR), com o nº de ficheiros e bytes directamente nesse
+-- diretório (não inclui subdiretórios). Os uploads e remoções acumulam deltas
+-- em memória que o scheduler aplica a cada minuto; o reconciliador nocturno
+-- reescreve a área inteira a partir de um varrimento os.scandir e corrige
+-- qualquer desvio (ficheiros criados fora da aplicação, deltas perdidos num restart).
+--
+-- Idempotente — seguro correr mais do que uma vez.
+
+CREATE TABLE IF NOT EXISTS tb_storage_usage (
+    area            text      NOT NULL,
+    directory       text      NOT NULL,   -- relativo à raiz da área ('' = raiz)
+    file_count      bigint    NOT NULL DEFAULT 0,
+    total_bytes     bigint    NOT NULL DEFAULT 0,
+    updated_at      timestamp NOT NULL DEFAULT current_timestamp,
+    reconciled_at   timestamp,
+    PRIMARY KEY (area, directory)
+);
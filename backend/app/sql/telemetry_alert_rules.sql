@@ -0,0 +1,61 @@
+-- Regras de alerta de telemetria avaliadas em tempo real à entrada das
+-- leituras (app/services/telemetry_alert_engine.py, chamado por
+-- insert_sensor_data). Substitui o "ler o alerta mais recente" por polling
+-- de alert_whatsapp_service.get_latest_alert.
+--
+-- Idempotente — seguro correr mais do que uma vez.
+
+-- kind:
+--   'threshold' → valor fora de [min_value, max_value] (qualquer um pode ser NULL)
+--   'rate'      → |Δvalor| por minuto acima de max_rate
+--   'missing'   → sem leituras do sensor há mais de missing_minutes
+-- hysteresis: margem para fechar o alerta — só volta ao normal quando o
+-- valor (ou a taxa) recua pelo menos esta quantidade para dentro do limite.
+-- sensor_id NULL → a regra aplica-se a todos os sensores (campo sensor_id do payload).
+CREATE TABLE IF NOT EXISTS tb_telemetry_alert_rule (
+    pk              serial PRIMARY KEY,
+    name            text    NOT NULL,
+    kind            text    NOT NULL CHECK (kind IN ('threshold', 'rate', 'missing')),
+    tt_teleparam    integer,
+    sensor_id       text,
+    min_value       double precision,
+    max_value       double precision,
+    max_rate        double precision,
+    missing_minutes integer,
+    hysteresis      double precision NOT NULL DEFAULT 0,
+    severity        text    NOT NULL DEFAULT 'medium'
+                    CHECK (severity IN ('low', 'medium', 'high', 'critical')),
+    whatsapp        boolean NOT NULL DEFAULT TRUE,
+    ativo           boolean NOT NULL DEFAULT TRUE,
+    CHECK (kind = 'missing' OR tt_teleparam IS NOT NULL),
+    CHECK (kind <> 'threshold' OR min_value IS NOT NULL OR max_value IS NOT NULL),
+    CHECK (kind <> 'rate' OR max_rate IS NOT NULL),
+    CHECK (kind <> 'missing' OR missing_minutes IS NOT NULL)
+);
+
+-- Um episódio por linha: aberto quando a regra dispara, fechado (cleared_at)
+-- quando volta ao normal. Os episódios abertos repõem o estado do motor
+-- depois de um restart, para não repetir alertas já enviados.
+CREATE TABLE IF NOT EXISTS tb_telemetry_alert (
+    pk                      serial PRIMARY KEY,
+    tb_telemetry_alert_rule integer NOT NULL REFERENCES tb_telemetry_alert_rule (pk) ON DELETE CASCADE,
+    sensor_id               text      NOT NULL,
+    severity                text      NOT NULL,
+    message                 text      NOT NULL,
+    value                   double precision,
+    raised_at               timestamp NOT NULL DEFAULT current_timestamp,
+    cleared_at              timestamp,
+    raw_pk                  integer
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_tb_telemetry_alert_open
+    ON tb_telemetry_alert (tb_telemetry_alert_rule, sensor_id)
+    WHERE cleared_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS ix_tb_telemetry_alert_raised
+    ON tb_telemetry_alert (raised_at DESC);
+
+-- Quem recebe os alertas in-app (mesmo mecanismo de alert_permissions.sql)
+INSERT INTO ts_interface (pk, value, category, label, description, icon, sort_order)
+SELECT 1624, 'telemetry.alerts', 'Telemetria', 'Alertas de Telemetria', 'Receber alertas de sensores: limites, variações bruscas e falta de dados', 'notifications', 1624
+WHERE NOT EXISTS (SELECT 1 FROM ts_interface WHERE value = 'telemetry.alerts');
@@ -0,0 +1,57 @@
+-- Rollups de telemetria (hora / dia) e arquivo de leituras raw antigas.
+--
+-- Os gráficos de longo prazo liam sempre tb_sensordataraw (JSON) via
+-- fbo_telemetry$querydata — um ano de leituras de 10 em 10 minutos são
+-- ~52k linhas por estação, a crescer todos os dias. Estas tabelas guardam
+-- agregados (n, soma, mín, máx) por (sensor, teleparam, bucket) e são
+-- mantidas incrementalmente por app/services/telemetry_rollup_service.py
+-- (job horário em app/scheduler.py). A média de qualquer bucket maior é
+-- SUM(soma) / SUM(n) — por isso se guarda a soma e não a média.
+
+CREATE TABLE IF NOT EXISTS tb_sensordata_hourly (
+    tb_sensor    integer   NOT NULL,
+    tt_teleparam integer   NOT NULL,
+    bucket       timestamp NOT NULL,
+    n            integer   NOT NULL,
+    soma         double precision NOT NULL,
+    minimo       double precision NOT NULL,
+    maximo       double precision NOT NULL,
+    PRIMARY KEY (tt_teleparam, tb_sensor, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS tb_sensordata_daily (
+    tb_sensor    integer NOT NULL,
+    tt_teleparam integer NOT NULL,
+    bucket       date    NOT NULL,
+    n            integer NOT NULL,
+    soma         double precision NOT NULL,
+    minimo       double precision NOT NULL,
+    maximo       double precision NOT NULL,
+    PRIMARY KEY (tt_teleparam, tb_sensor, bucket)
+);
+
+-- Marca d'água do rollup: maior pk de tb_sensordataraw já agregado.
+-- Linha única (id = 1).
+CREATE TABLE IF NOT EXISTS tb_sensordata_rollup_state (
+    id          integer PRIMARY KEY CHECK (id = 1),
+    last_raw_pk integer   NOT NULL DEFAULT 0,
+    updated_at  timestamp NOT NULL DEFAULT current_timestamp
+);
+
+INSERT INTO tb_sensordata_rollup_state (id, last_raw_pk)
+VALUES (1, 0)
+ON CONFLICT (id) DO NOTHING;
+
+-- Arquivo das leituras raw já agregadas e fora da janela de retenção.
+-- Mesma forma que tb_sensordataraw, para poder ser reposta com INSERT SELECT.
+CREATE TABLE IF NOT EXISTS tb_sensordataraw_archive (
+    pk          integer PRIMARY KEY,
+    data        timestamp NOT NULL,
+    processed   timestamp,
+    value       json NOT NULL,
+    archived_at timestamp NOT NULL DEFAULT current_timestamp
+);
+
+-- A retenção apaga por "data < corte AND pk <= marca d'água" em lotes.
+CREATE INDEX IF NOT EXISTS ix_tb_sensordataraw_data
+    ON tb_sensordataraw (data);
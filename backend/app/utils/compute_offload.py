@@ -0,0 +1,183 @@
+"""
+Trabalho CPU fora do hub do eventlet.
+
+O run_waitress.py faz monkey_patch do eventlet: todos os pedidos e sockets de
+um worker partilham uma só thread do SO. Um resize do Pillow, uma reescrita
+do pypdf, um render do ReportLab/xhtml2pdf, uma assinatura pyhanko ou um
+parsing pdfplumber corridos directamente no hub param tudo o resto até
+acabarem — um PDF grande de um utilizador congelava os outros.
+
+    @offload
+    def _encode_image(path): ...           # corre numa thread nativa
+
+    run_offloaded(doc.build, story, _name='emissions.reportlab')
+
+- com eventlet, a função corre no eventlet.tpool (threads nativas) e a
+  green thread que a chamou fica à espera sem bloquear o hub; Pillow e
+  NumPy largam o GIL, o resto cede-o de 5 em 5 ms;
+- no máximo OFFLOAD_MAX_CONCURRENCY execuções em simultâneo por processo;
+  as restantes esperam a vez (fila). O tamanho do tpool é o mesmo, para não
+  haver uma segunda fila escondida;
+- sem eventlet (testes, flask run, processos do pool do scheduler) a função
+  corre no próprio sítio, com as mesmas métricas;
+- métricas por nome: chamadas, erros, em curso, em fila (e máximo), tempo
+  de espera e de execução — no estado do painel de administração.
+
+As funções descarregadas não podem usar o contexto Flask, a BD nem
+primitivas green (Event/Lock criados depois do monkey_patch): correm noutra
+thread do SO. O logging é seguro — init_compute_offload troca os locks do
+módulo logging e dos handlers por locks nativos (com os green, um log feito
+no tpool ao mesmo tempo que outro no hub bloqueava o processo).
+"""
+import functools
+import logging
+import os
+import threading
+import time
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = max(2, min(8, os.cpu_count() or 2))
+
+_max_concurrency = DEFAULT_MAX_CONCURRENCY
+_slots = threading.BoundedSemaphore(_max_concurrency)
+_metrics_lock = threading.Lock()
+_metrics = {}
+_logging_patched = False
+
+
+def _eventlet():
+    """(tpool, threading original) quando o eventlet está activo; senão None."""
+    try:
+        from eventlet import patcher, tpool
+    except ImportError:
+        return None
+    if not patcher.is_monkey_patched('thread'):
+        return None
+    return tpool, patcher.original('threading')
+
+
+def _in_native_worker(native_threading):
+    # As green threads vivem todas na thread principal do SO; o tpool não
+    return native_threading.current_thread() is not native_threading.main_thread()
+
+
+def _native_logging_locks(native_threading):
+    global _logging_patched
+    if _logging_patched:
+        return
+    logging._lock = native_threading.RLock()
+    loggers = [logging.getLogger()] + [
+        lg for lg in logging.Logger.manager.loggerDict.values() if isinstance(lg, logging.Logger)
+    ]
+    for lg in loggers:
+        for handler in lg.handlers:
+            handler.lock = native_threading.RLock()
+
+    # Handlers criados depois (get_logger é chamado à medida que os módulos carregam)
+    def create_lock(handler):
+        handler.lock = native_threading.RLock()
+        logging._register_at_fork_reinit_lock(handler)
+    logging.Handler.createLock = create_lock
+    _logging_patched = True
+
+
+def init_compute_offload(app):
+    """Aplica OFFLOAD_MAX_CONCURRENCY e prepara o logging para threads nativas."""
+    global _max_concurrency, _slots
+    _max_concurrency = max(1, int(app.config.get('OFFLOAD_MAX_CONCURRENCY') or DEFAULT_MAX_CONCURRENCY))
+    _slots = threading.BoundedSemaphore(_max_concurrency)
+    green = _eventlet()
+    if green:
+        tpool, native_threading = green
+        tpool.set_num_threads(_max_concurrency)
+        _native_logging_locks(native_threading)
+    logger.info(f"[Offload] {'tpool' if green else 'inline'}, até {_max_concurrency} em simultâneo")
+
+
+def _stats(name):
+    stats = _metrics.get(name)
+    if stats is None:
+        stats = _metrics[name] = {
+            'calls': 0, 'errors': 0, 'in_flight': 0, 'queued': 0, 'max_queued': 0,
+            'wait_ms_total': 0.0, 'wait_ms_max': 0.0, 'run_ms_total': 0.0, 'run_ms_max': 0.0,
+        }
+    return stats
+
+
+def run_offloaded(func, *args, _name=None, **kwargs):
+    """Executa func(*args, **kwargs) fora do hub e devolve o resultado (ou propaga a exceção)."""
+    name = _name or f"{func.__module__}.{getattr(func, '__qualname__', func)}"
+    green = _eventlet()
+    if green and _in_native_worker(green[1]):
+        # Já numa thread do tpool (offload dentro de offload): corre aqui
+        return func(*args, **kwargs)
+
+    with _metrics_lock:
+        stats = _stats(name)
+        stats['queued'] += 1
+        stats['max_queued'] = max(stats['max_queued'], stats['queued'])
+    queued_at = time.monotonic()
+    failed = False
+    with _slots:
+        started = time.monotonic()
+        with _metrics_lock:
+            stats['queued'] -= 1
+            stats['in_flight'] += 1
+        try:
+            if green:
+                return green[0].execute(func, *args, **kwargs)
+            return func(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            finished = time.monotonic()
+            wait_ms = (started - queued_at) * 1000
+            run_ms = (finished - started) * 1000
+            with _metrics_lock:
+                stats['in_flight'] -= 1
+                stats['calls'] += 1
+                stats['errors'] += failed
+                stats['wait_ms_total'] += wait_ms
+                stats['wait_ms_max'] = max(stats['wait_ms_max'], wait_ms)
+                stats['run_ms_total'] += run_ms
+                stats['run_ms_max'] = max(stats['run_ms_max'], run_ms)
+            if wait_ms > 1000:
+                logger.warning(f"[Offload] {name} esperou {wait_ms:.0f} ms por uma thread livre")
+
+
+def offload(func=None, *, name=None):
+    """Decorador: a função passa a correr sempre via run_offloaded."""
+    def decorator(f):
+        label = name or f"{f.__module__}.{f.__qualname__}"
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            return run_offloaded(f, *args, _name=label, **kwargs)
+        wrapper.__wrapped_inline__ = f
+        return wrapper
+    return decorator(func) if func is not None else decorator
+
+
+def offload_metrics():
+    """Estado e métricas por função (médias e máximos em ms)."""
+    with _metrics_lock:
+        functions = {}
+        for fname, s in sorted(_metrics.items()):
+            calls = s['calls'] or 1
+            functions[fname] = {
+                'calls': s['calls'], 'errors': s['errors'],
+                'in_flight': s['in_flight'], 'queued': s['queued'], 'max_queued': s['max_queued'],
+                'wait_ms_avg': round(s['wait_ms_total'] / calls, 1), 'wait_ms_max': round(s['wait_ms_max'], 1),
+                'run_ms_avg': round(s['run_ms_total'] / calls, 1), 'run_ms_max': round(s['run_ms_max'], 1),
+            }
+        return {
+            'mode': 'tpool' if _eventlet() else 'inline',
+            'max_concurrency': _max_concurrency,
+            'in_flight': sum(f['in_flight'] for f in functions.values()),
+            'queued': sum(f['queued'] for f in functions.values()),
+            'functions': functions,
+        }
@@ -0,0 +1,154 @@
+"""
+Encaminhamento das leituras de relatório para uma réplica de PostgreSQL.
+
+Todas as leituras — incluindo as views pesadas do dashboard (vds_*), os
+relatórios das operações (vbr_*), as análises da avaliação
+(vbl_aval_results_*) e os registos de auditoria/sessões — iam à primária
+que também serve as escritas e os fs_setsession; no fecho do mês os
+relatórios atrasavam a introdução de dados.
+
+    with db_session_manager(current_user, readonly=True) as session:
+        session.execute(text("SELECT * FROM vds_..."))
+
+- a réplica é o bind 'replica' do Flask-SQLAlchemy (DATABASE_REPLICA_URI);
+  em desenvolvimento serve uma segunda BD Postgres local como substituta;
+- antes de usar a réplica verifica-se o atraso de replicação (em cache
+  durante DATABASE_REPLICA_CHECK_SECONDS); acima de
+  DATABASE_REPLICA_MAX_LAG segundos a leitura vai à primária;
+- se a réplica não responder fica fora de serviço durante
+  DATABASE_REPLICA_RETRY_SECONDS (mesma ideia do breaker do http_client);
+- o fs_setsession corre na própria réplica (as views dependem do contexto
+  da sessão); se lá falhar, a leitura vai à primária, que decide se a
+  sessão é válida;
+- só sessões que não escrevem devem pedir readonly=True — numa réplica em
+  hot standby uma escrita falha.
+
+Sem DATABASE_REPLICA_URI tudo continua na primária, como antes.
+"""
+import threading
+import time
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import text
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+REPLICA_BIND = 'replica'
+
+# Atraso em segundos; 0 numa BD que não está em recuperação (a substituta local)
+# ou quando já aplicou tudo o que recebeu (primária parada não conta como atraso)
+_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class ReplicaRouter:
+    """Decide, por sessão, se uma leitura pode ir à réplica."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.enabled = False
+        self.max_lag = 10
+        self.check_interval = 5
+        self.retry_after = 30
+        self._lag = None
+        self._checked_at = 0.0
+        self._down_until = 0.0
+        self._counts = {'replica': 0, 'primary': 0, 'lag_exceeded': 0,
+                        'unavailable': 0, 'session_fallback': 0}
+
+    def init_app(self, app):
+        self.enabled = REPLICA_BIND in (app.config.get('SQLALCHEMY_BINDS') or {})
+        self.max_lag = app.config.get('DATABASE_REPLICA_MAX_LAG', self.max_lag)
+        self.check_interval = app.config.get('DATABASE_REPLICA_CHECK_SECONDS', self.check_interval)
+        self.retry_after = app.config.get('DATABASE_REPLICA_RETRY_SECONDS', self.retry_after)
+        if self.enabled:
+            logger.info(f"[Réplica] Leituras de relatório na réplica (atraso máximo {self.max_lag}s)")
+
+    def _engine(self):
+        from app import db
+        return db.engines[REPLICA_BIND]
+
+    def _count(self, key):
+        with self._lock:
+            self._counts[key] += 1
+
+    def mark_down(self, reason):
+        with self._lock:
+            already_down = time.monotonic() < self._down_until
+            self._down_until = time.monotonic() + self.retry_after
+            self._lag = None
+        self._count('unavailable')
+        if not already_down:
+            logger.warning(f"[Réplica] Indisponível ({reason}) — leituras na primária "
+                           f"durante {self.retry_after}s")
+
+    def lag_seconds(self):
+        """Atraso da réplica (em cache durante check_interval); None se não respondeu."""
+        now = time.monotonic()
+        with self._lock:
+            if self._lag is not None and now - self._checked_at < self.check_interval:
+                return self._lag
+        try:
+            with self._engine().connect() as conn:
+                lag = float(conn.execute(_LAG_SQL).scalar() or 0)
+        except SQLAlchemyError as e:
+            self.mark_down(e.__class__.__name__)
+            return None
+        with self._lock:
+            self._lag, self._checked_at = lag, now
+        return lag
+
+    def is_available(self):
+        """Réplica configurada, a responder e dentro do orçamento de atraso."""
+        if not self.enabled or time.monotonic() < self._down_until:
+            return False
+        lag = self.lag_seconds()
+        if lag is None:
+            return False
+        if lag > self.max_lag:
+            self._count('lag_exceeded')
+            return False
+        return True
+
+    def open_session(self, session_id, search_path):
+        """Sessão na réplica já preparada (fs_setsession, search_path), ou None → primária."""
+        if not self.is_available():
+            self._count('primary')
+            return None
+
+        from app.utils.utils import fs_setsession
+        session = Session(bind=self._engine())
+        try:
+            if session_id and not fs_setsession(session_id, session=session):
+                session.close()
+                self._count('session_fallback')
+                return None
+            session.execute(text(f"SET search_path TO {search_path}"))
+        except SQLAlchemyError as e:
+            session.close()
+            self.mark_down(e.__class__.__name__)
+            return None
+        self._count('replica')
+        return session
+
+    def metrics(self):
+        with self._lock:
+            down = time.monotonic() < self._down_until
+            return {
+                'enabled': self.enabled,
+                'available': self.enabled and not down,
+                'lag_seconds': None if self._lag is None else round(self._lag, 2),
+                'max_lag_seconds': self.max_lag,
+                'sessions': dict(self._counts),
+            }
+
+
+replica_router = ReplicaRouter()
@@ -2,12 +2,15 @@
 File Processing Utilities
 Automatic compression for images (Pillow) and PDFs (pypdf).
 Applied transparently after file upload to reduce storage.
+The compression itself runs off the eventlet hub (app.utils.compute_offload).
 """
 
 import os
 import io
 from PIL import Image
+from app.utils.compute_offload import offload
 from app.utils.logger import get_logger
+from app.services.storage_accounting_service import record_file_added
 
 logger = get_logger(__name__)
 
@@ -30,6 +33,7 @@ def is_compressible_pdf(filename):
     return ext in PDF_EXTENSIONS
 
 
+@offload(name='files.compress_image')
 def compress_image(file_path, max_dimension=IMAGE_MAX_DIMENSION, quality=IMAGE_QUALITY):
     """
     Compress an image file in place.
@@ -109,6 +113,7 @@ def compress_image(file_path, max_dimension=IMAGE_MAX_DIMENSION, quality=IMAGE_Q
         return file_path, 0, 0
 
 
+@offload(name='files.compress_pdf')
 def compress_pdf(file_path):
     """
     Compress a PDF file in place using pypdf.
@@ -176,13 +181,18 @@ def process_uploaded_file(file_path, filename=None):
         filename = os.path.basename(file_path)
 
     if is_compressible_image(filename):
-        return compress_image(file_path)
+        result = compress_image(file_path)
     elif is_compressible_pdf(filename):
-        return compress_pdf(file_path)
+        result = compress_pdf(file_path)
     else:
         # Not compressible, return as-is
         size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
-        return file_path, size, size
+        result = file_path, size, size
+
+    # Storage accounting: count the final file (compression errors report size 0 → stat it)
+    final_path, _, final_size = result
+    record_file_added(final_path, final_size or None)
+    return result
 
 
 def _format_size(size_bytes):
@@ -0,0 +1,178 @@
+"""Cliente HTTP partilhado para as integrações externas (SIBS, CMD, Graph,
+serviço facial, microserviço WhatsApp).
+
+Cada upstream tem a sua requests.Session com pool de ligações keep-alive —
+sem um handshake TCP+TLS novo por pedido — e ainda:
+
+- concorrência limitada: no máximo `max_concurrency` pedidos em curso por
+  upstream; quem não obtém vaga em `acquire_timeout` falha logo, em vez de
+  prender mais greenlets à espera de um serviço já lento;
+- circuit breaker (mesma ideia de app/utils/jwt_blacklist.py): após
+  `failure_threshold` falhas seguidas (ligação, timeout ou 5xx) o upstream
+  fica "aberto" durante `reset_timeout` segundos e os pedidos falham de
+  imediato; passado esse tempo deixa passar um pedido de teste;
+- métricas de latência por upstream (p50/p95/máx das últimas amostras).
+
+As falhas rápidas levantam UpstreamUnavailable, subclasse de
+requests.exceptions.ConnectionError — os `except RequestException` que já
+existem nos serviços continuam a apanhá-las.
+"""
+import threading
+import time
+from collections import deque
+
+import eventlet
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_TIMEOUT = (5, 30)        # (ligação, leitura) em segundos
+LATENCY_SAMPLES = 500
+
+
+class UpstreamUnavailable(requests.exceptions.ConnectionError):
+    """Pedido recusado sem sair do processo (breaker aberto ou sem vaga)."""
+
+
+class UpstreamClient:
+    """Sessão com pool, limite de concorrência, breaker e métricas para um upstream."""
+
+    def __init__(self, name, pool_size=10, max_concurrency=8, acquire_timeout=5,
+                 timeout=DEFAULT_TIMEOUT, total_timeout=None,
+                 failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.timeout = timeout
+        # Teto ao tempo total do pedido (o timeout do requests é por operação
+        # de socket — uma resposta lenta mas contínua podia prender o greenlet)
+        self.total_timeout = total_timeout or (sum(timeout) if isinstance(timeout, tuple) else timeout)
+        self.acquire_timeout = acquire_timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._open_until = 0
+        self._half_open_trial = False
+
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._counters = {'requests': 0, 'errors': 0, 'rejected': 0}
+
+    # ── Circuit breaker ────────────────────────────────────────────────
+
+    def _before_request(self):
+        with self._lock:
+            if self._open_until:
+                if time.time() < self._open_until or self._half_open_trial:
+                    self._counters['rejected'] += 1
+                    raise UpstreamUnavailable(
+                        f"{self.name}: circuito aberto após {self._consecutive_failures} falhas seguidas"
+                    )
+                # Passou o reset_timeout — deixa passar um pedido de teste
+                self._half_open_trial = True
+
+    def _record(self, elapsed, failed):
+        with self._lock:
+            self._counters['requests'] += 1
+            self._latencies.append(elapsed)
+            self._half_open_trial = False
+            if not failed:
+                self._consecutive_failures = 0
+                self._open_until = 0
+                return
+            self._counters['errors'] += 1
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= self.failure_threshold:
+                self._open_until = time.time() + self.reset_timeout
+                logger.warning(
+                    f"[HTTP] {self.name} indisponível — circuito aberto por {self.reset_timeout}s "
+                    f"({self._consecutive_failures} falhas seguidas)"
+                )
+
+    # ── Pedidos ────────────────────────────────────────────────────────
+
+    def request(self, method, url, **kwargs):
+        self._before_request()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self._counters['rejected'] += 1
+                self._half_open_trial = False
+            raise UpstreamUnavailable(f"{self.name}: sem vaga (limite de pedidos em curso)")
+
+        kwargs.setdefault('timeout', self.timeout)
+        started = time.monotonic()
+        failed = True
+        timer = eventlet.Timeout(self.total_timeout)
+        try:
+            response = self.session.request(method, url, **kwargs)
+            failed = response.status_code >= 500
+            return response
+        except eventlet.Timeout as t:
+            if t is not timer:
+                raise
+            raise requests.exceptions.Timeout(
+                f"{self.name}: sem resposta em {self.total_timeout}s"
+            ) from None
+        finally:
+            timer.cancel()
+            self._slots.release()
+            self._record(time.monotonic() - started, failed)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    # ── Métricas ───────────────────────────────────────────────────────
+
+    def metrics(self):
+        with self._lock:
+            samples = sorted(self._latencies)
+            counters = dict(self._counters)
+            open_for = max(self._open_until - time.time(), 0)
+
+        def pct(p):
+            if not samples:
+                return None
+            return round(samples[min(int(len(samples) * p), len(samples) - 1)] * 1000, 1)
+
+        return {
+            **counters,
+            'circuit': 'open' if open_for else 'closed',
+            'open_for_seconds': round(open_for, 1),
+            'p50_ms': pct(0.50),
+            'p95_ms': pct(0.95),
+            'max_ms': round(samples[-1] * 1000, 1) if samples else None,
+        }
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(name, **options):
+    """
+    Cliente do upstream `name` (criado na 1.ª chamada com `options`; as
+    chamadas seguintes reutilizam-no e ignoram `options`).
+    """
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = UpstreamClient(name, **options)
+    return client
+
+
+def integration_metrics():
+    """Métricas de todos os upstreams já usados neste processo."""
+    return {name: client.metrics() for name, client in sorted(_clients.items())}
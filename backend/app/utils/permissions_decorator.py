@@ -4,35 +4,54 @@ from functools import wraps
 from flask import jsonify
 from flask_jwt_extended import get_jwt
 from app.utils.logger import get_logger
-from app.core.permissions import permission_manager
+from app.core.permissions import permission_manager, validate_permission_ids
 
 
 logger = get_logger(__name__)
 
 
-def check_permission_by_id(permission_id, user_profile: str, user_interfaces: list) -> bool:
+def check_permission_by_id(permission_id, user_profile: str, user_interfaces: list, jti: str = None) -> bool:
     """
     Verifica se o utilizador tem uma permissão.
 
     Aceita:
       - str  → resolve via permission_manager (lookup na ts_interface carregada na startup)
               ex: check_permission_by_id('fleet.view', ...)
-      - int  → compara directamente com o array de interfaces do JWT
+      - int  → pk directo da ts_interface
               ex: check_permission_by_id(830, ...)
+
+    Com `jti`, as interfaces do token são compiladas uma vez num bitset
+    cacheado (ver PermissionManager.token_mask).
     """
     # Super admin (perfil '0') sempre tem acesso
     if user_profile == "0":
         return True
 
-    if isinstance(permission_id, str):
-        # Delegar ao permission_manager que tem o mapa value→pk da ts_interface
-        return permission_manager.check_permission(permission_id, user_profile, user_interfaces)
-    elif isinstance(permission_id, int):
-        return permission_id in (user_interfaces or [])
-    else:
+    if not isinstance(permission_id, (str, int)):
         logger.warning(f"Tipo de permissão desconhecido: {type(permission_id)} ({permission_id})")
         return False
 
+    return permission_manager.has_any(
+        permission_manager.token_mask(jti, user_interfaces), (permission_id,)
+    )
+
+
+def _jwt_user_context():
+    """(user_id, user_profile, user_interfaces, jti) a partir do JWT do pedido."""
+    jwt_data = get_jwt()
+
+    user_id = jwt_data.get('user_id')
+    if isinstance(user_id, dict):
+        user_id = user_id.get('user_id')
+
+    user_profile = (
+        jwt_data.get('profil') or
+        jwt_data.get('profile') or
+        jwt_data.get('user_profile')
+    )
+
+    return user_id, user_profile, jwt_data.get('interfaces', []), jwt_data.get('jti')
+
 
 def require_permission(permission_id):
     """
@@ -41,24 +60,16 @@ def require_permission(permission_id):
     Aceita string (value da BD) ou inteiro (pk da ts_interface):
         @require_permission('fleet.view')   # resolve via BD
         @require_permission(830)            # pk directo (legado)
+
+    Um pk inválido (negativo) levanta PermissionConfigError ao aplicar o decorator.
     """
+    validate_permission_ids((permission_id,))
+
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             try:
-                jwt_data = get_jwt()
-
-                user_id = jwt_data.get('user_id')
-                if isinstance(user_id, dict):
-                    user_id = user_id.get('user_id')
-
-                user_profile = (
-                    jwt_data.get('profil') or
-                    jwt_data.get('profile') or
-                    jwt_data.get('user_profile')
-                )
-
-                user_interfaces = jwt_data.get('interfaces', [])
+                user_id, user_profile, user_interfaces, jti = _jwt_user_context()
 
                 if not user_id:
                     logger.warning(
@@ -72,7 +83,8 @@ def require_permission(permission_id):
                 has_permission = check_permission_by_id(
                     permission_id,
                     str(user_profile),
-                    user_interfaces or []
+                    user_interfaces or [],
+                    jti=jti,
                 )
 
                 if not has_permission:
@@ -113,23 +125,13 @@ def require_any_permission(*permission_ids):
         def my_route():
             return "Success"
     """
+    permission_ids = validate_permission_ids(permission_ids)
+
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             try:
-                jwt_data = get_jwt()
-
-                user_id = jwt_data.get('user_id')
-                if isinstance(user_id, dict):
-                    user_id = user_id.get('user_id')
-
-                user_profile = (
-                    jwt_data.get('profil') or
-                    jwt_data.get('profile') or
-                    jwt_data.get('user_profile')
-                )
-
-                user_interfaces = jwt_data.get('interfaces', [])
+                user_id, user_profile, user_interfaces, jti = _jwt_user_context()
 
                 if not user_id:
                     return jsonify({
@@ -137,11 +139,9 @@ def require_any_permission(*permission_ids):
                         "error": "Dados de utilizador inválidos"
                     }), 401
 
-                # Verificar se tem pelo menos uma permissão
-                has_any_permission = any(
-                    check_permission_by_id(
-                        perm_id, str(user_profile), user_interfaces or []
-                    ) for perm_id in permission_ids
+                # Pelo menos uma permissão: intersecção das máscaras
+                has_any_permission = str(user_profile) == "0" or permission_manager.has_any(
+                    permission_manager.token_mask(jti, user_interfaces), permission_ids
                 )
 
                 if not has_any_permission:
@@ -177,23 +177,13 @@ def require_all_permissions(*permission_ids):
         def my_route():
             return "Success"
     """
+    permission_ids = validate_permission_ids(permission_ids)
+
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             try:
-                jwt_data = get_jwt()
-
-                user_id = jwt_data.get('user_id')
-                if isinstance(user_id, dict):
-                    user_id = user_id.get('user_id')
-
-                user_profile = (
-                    jwt_data.get('profil') or
-                    jwt_data.get('profile') or
-                    jwt_data.get('user_profile')
-                )
-
-                user_interfaces = jwt_data.get('interfaces', [])
+                user_id, user_profile, user_interfaces, jti = _jwt_user_context()
 
                 if not user_id:
                     return jsonify({
@@ -201,11 +191,9 @@ def require_all_permissions(*permission_ids):
                         "error": "Dados de utilizador inválidos"
                     }), 401
 
-                # Verificar se tem todas as permissões
-                has_all_permissions = all(
-                    check_permission_by_id(
-                        perm_id, str(user_profile), user_interfaces or []
-                    ) for perm_id in permission_ids
+                # Todas as permissões: a máscara exigida contida na do token
+                has_all_permissions = str(user_profile) == "0" or permission_manager.has_all(
+                    permission_manager.token_mask(jti, user_interfaces), permission_ids
                 )
 
                 if not has_all_permissions:
@@ -240,27 +228,10 @@ def get_user_permissions_from_jwt():
         tuple: (user_id, user_profile, user_interfaces, permissions_list)
     """
     try:
-        jwt_data = get_jwt()
-
-        user_id = jwt_data.get('user_id')
-        if isinstance(user_id, dict):
-            user_id = user_id.get('user_id')
-
-        user_profile = (
-            jwt_data.get('profil') or
-            jwt_data.get('profile') or
-            jwt_data.get('user_profile')
-        )
-
-        user_interfaces = jwt_data.get('interfaces', [])
+        user_id, user_profile, user_interfaces, _ = _jwt_user_context()
 
         # Obter lista de nomes de permissão a partir do mapa (opcional)
-        permissions = []
-        if permission_manager._permission_map:
-            permissions = [
-                perm_id for perm_id, interface_id in permission_manager._permission_map.items()
-                if interface_id in user_interfaces
-            ]
+        permissions = permission_manager.pks_to_permissions(user_interfaces)
 
         if user_id:
             return int(user_id), str(user_profile), user_interfaces, permissions
@@ -7,12 +7,15 @@ from flask import g, jsonify, current_app
 from flask_jwt_extended import verify_jwt_in_request
 from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
 import os
-import requests
+import threading
+import time
 from sqlalchemy.exc import SQLAlchemyError
 from contextlib import contextmanager
 from flask_caching import Cache
 from datetime import datetime, timezone
 from app.utils.logger import get_logger
+from app.utils.http_client import get_client
+from app.utils.db_routing import replica_router
 from app.utils.jwt_blacklist import (
     add_token_to_blacklist as _redis_add_token_to_blacklist,
     is_token_revoked as _redis_is_token_revoked,
@@ -24,55 +27,54 @@ logger = get_logger(__name__)
 cache = Cache(config={'CACHE_TYPE': 'simple'})
 
 
+# Token OAuth do Graph (client credentials) — reutilizado até perto de expirar
+# em vez de um POST a login.microsoftonline.com por cada email.
+_graph_token = {'value': None, 'expires_at': 0}
+_graph_token_lock = threading.Lock()
+_GRAPH_TOKEN_MARGIN = 120  # segundos antes do expires_in em que se renova
+
+
 def get_access_token():
-    tenant_id = os.getenv('TENANT_ID')
-    client_id = os.getenv('CLIENT_ID')
-    client_secret = os.getenv('CLIENT_SECRET')
-    scope = os.getenv('MS_GRAPH_SCOPE')
-
-    url = f'https://login.microsoftonline.com/{tenant_id}/oauth2/v2.0/token'
-
-    data = {
-        'client_id': client_id,
-        'client_secret': client_secret,
-        'scope': scope,
-        'grant_type': 'client_credentials'
-    }
+    with _graph_token_lock:
+        if _graph_token['value'] and time.time() < _graph_token['expires_at']:
+            return _graph_token['value']
+
+        tenant_id = os.getenv('TENANT_ID')
+        client_id = os.getenv('CLIENT_ID')
+        client_secret = os.getenv('CLIENT_SECRET')
+        scope = os.getenv('MS_GRAPH_SCOPE')
+
+        url = f'https://login.microsoftonline.com/{tenant_id}/oauth2/v2.0/token'
+
+        data = {
+            'client_id': client_id,
+            'client_secret': client_secret,
+            'scope': scope,
+            'grant_type': 'client_credentials'
+        }
 
-    response = requests.post(url, data=data)
-    response.raise_for_status()
-    token = response.json().get('access_token')
-    return token
+        response = get_client('msgraph').post(url, data=data)
+        response.raise_for_status()
+        body = response.json()
+        _graph_token['value'] = body.get('access_token')
+        _graph_token['expires_at'] = time.time() + max(int(body.get('expires_in', 3600)) - _GRAPH_TOKEN_MARGIN, 0)
+        return _graph_token['value']
 
 
-def send_mail(subject, body, recipient, sender_email):
-    token = get_access_token()
-    url = f'https://graph.microsoft.com/v1.0/users/{sender_email}/sendMail'
-
-    email_msg = {
-        "message": {
-            "subject": subject,
-            "body": {
-                "contentType": "Text",  
-                "content": body
-            },
-            "toRecipients": [
-                {
-                    "emailAddress": {
-                        "address": recipient
-                    }
-                }
-            ]
-        }
-    }
+def invalidate_access_token():
+    """Descarta o token em cache (ex.: o Graph respondeu 401)."""
+    with _graph_token_lock:
+        _graph_token['value'] = None
+        _graph_token['expires_at'] = 0
 
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json'
-    }
 
-    response = requests.post(url, json=email_msg, headers=headers)
-    response.raise_for_status()
+def send_mail(subject, body, recipient, sender_email):
+    """
+    Põe o email na outbox (app/services/email_outbox_service.py) e volta
+    logo — a entrega via Graph é feita em lotes por um worker em background.
+    """
+    from app.services.email_outbox_service import enqueue_email
+    return enqueue_email(recipient, subject, body, sender_email=sender_email, source='send_mail')
 
 
 def init_cache(app):
@@ -148,7 +150,7 @@ def parse_xml_response(response):
     return session, profil, format_message(error_message) if error_message else None
 
 
-def fs_setsession(session_id):
+def fs_setsession(session_id, session=None):
     from app import db
     try:
         # Garantir que session_id é um inteiro
@@ -156,7 +158,7 @@ def fs_setsession(session_id):
             session_id = int(session_id)
 
         query = text("SELECT fs_setsession(:session_id)")
-        result = db.session.execute(query, {"session_id": session_id})
+        result = (session or db.session).execute(query, {"session_id": session_id})
         first_row = result.fetchone()
         if first_row:
             parsed_result = str(first_row[0])
@@ -185,16 +187,22 @@ def set_session(f):
 
 
 @contextmanager
-def db_session_manager(session_id):
+def db_session_manager(session_id, readonly=False):
+    """
+    Sessão de BD autenticada com o session_id do utilizador.
+    readonly=True: leitura de relatório — vai à réplica quando está
+    configurada e actualizada, senão à primária (app/utils/db_routing.py).
+    """
     from app import db
     from flask import current_app
-    session = db.session()
+    search_path = current_app.config.get('SEARCH_PATH', 'public')
+    replica = replica_router.open_session(session_id, search_path) if readonly else None
+    session = replica if replica is not None else db.session()
     try:
-        if session_id:
+        if session_id and replica is None:
             result = fs_setsession(session_id)
             if not result:
                 raise InvalidSessionError(f"Sessão inválida ou expirada para session_id: {session_id}")
-            search_path = current_app.config.get('SEARCH_PATH', 'public')
             session.execute(text(f"SET search_path TO {search_path}"))
         yield session
         session.commit()
@@ -26,6 +26,13 @@ class Config:
     SECRET_KEY = _env('SECRET_KEY', 'dev-secret-key-not-for-production')
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URI')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Réplica para leituras de relatório (db_session_manager(..., readonly=True));
+    # sem URI tudo vai à primária. Em desenvolvimento, uma segunda BD local
+    DATABASE_REPLICA_URI = os.getenv('DATABASE_REPLICA_URI', '')
+    SQLALCHEMY_BINDS = {'replica': DATABASE_REPLICA_URI} if DATABASE_REPLICA_URI else {}
+    DATABASE_REPLICA_MAX_LAG = float(os.getenv('DATABASE_REPLICA_MAX_LAG', '10'))        # segundos
+    DATABASE_REPLICA_CHECK_SECONDS = float(os.getenv('DATABASE_REPLICA_CHECK_SECONDS', '5'))
+    DATABASE_REPLICA_RETRY_SECONDS = float(os.getenv('DATABASE_REPLICA_RETRY_SECONDS', '30'))
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
 
     # Configurações centralizadas de tempo
@@ -75,6 +82,24 @@ class Config:
     SIBS_WEBHOOK_SECRET = os.getenv('SIBS_WEBHOOK_SECRET')
     SIBS_PRODUCTION = os.getenv('SIBS_PRODUCTION', 'false').lower() == 'true'
 
+    # Telemetria — retenção das leituras raw (já agregadas nos rollups) e do tier horário
+    TELEMETRY_RAW_RETENTION_DAYS = int(os.getenv('TELEMETRY_RAW_RETENTION_DAYS', '400'))
+    TELEMETRY_HOURLY_RETENTION_DAYS = int(os.getenv('TELEMETRY_HOURLY_RETENTION_DAYS', '1100'))
+    TELEMETRY_ARCHIVE_RAW = os.getenv('TELEMETRY_ARCHIVE_RAW', 'true').lower() == 'true'
+
+    # Scheduler — um só líder entre workers/servidores corre os jobs (app/scheduler.py)
+    SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'true').lower() == 'true'
+    SCHEDULER_LEADER_BACKEND = os.getenv('SCHEDULER_LEADER_BACKEND', 'postgres')   # postgres | redis | local
+    SCHEDULER_POOL_WORKERS = int(os.getenv('SCHEDULER_POOL_WORKERS', '1'))         # 0 = jobs longos em thread
+    SCHEDULER_RUN_RETENTION_DAYS = int(os.getenv('SCHEDULER_RUN_RETENTION_DAYS', '30'))
+
+    # Socket.IO entre processos — fila pub/sub e presença partilhada (app/socketio/scaling.py)
+    SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE', '')          # '' | redis | URL
+    SOCKETIO_CHANNEL = os.getenv('SOCKETIO_CHANNEL', 'aintar-socketio')
+    SOCKETIO_EMIT_BATCH_MS = int(os.getenv('SOCKETIO_EMIT_BATCH_MS', '25'))  # 0 = emitir de imediato
+    # Trabalho CPU (PDF, imagens, assinaturas) em threads nativas; 0 = automático
+    OFFLOAD_MAX_CONCURRENCY = int(os.getenv('OFFLOAD_MAX_CONCURRENCY', '0'))
+
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -92,6 +117,7 @@ class ProductionConfig(Config):
     FILES_DIR = _env('FILES_DIR')
     CACHE_TYPE = 'redis'
     CACHE_REDIS_URL = Config.REDIS_URL
+    SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE', 'redis')
 
     # Caminhos para recursos de emissões (produção)
     LOGOS_DIR = _env('LOGOS_DIR')
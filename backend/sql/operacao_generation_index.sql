@@ -0,0 +1,14 @@
+-- ============================================================================
+-- Operação — índice para a geração mensal de tarefas
+-- ============================================================================
+-- app/services/operations/month_generation.py filtra tb_operacao por intervalo
+-- de data e modo (data >= início AND data < fim AND tt_operacaomodo = ANY(...))
+-- para substituir o mês e saltar as tarefas que já existem
+-- (data + instalação + acção + modo). Antes contava com
+-- EXTRACT(MONTH/YEAR FROM data), que não usa índice nenhum.
+--
+-- CONCURRENTLY: não bloqueia escritas — correr fora de uma transacção.
+-- Idempotente — seguro correr mais do que uma vez.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_operacao_data_modo
+    ON tb_operacao (data, tt_operacaomodo, tb_instalacao, tt_operacaoaccao);
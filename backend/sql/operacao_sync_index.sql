@@ -0,0 +1,14 @@
+-- ============================================================================
+-- Operação — índice para a lista de tarefas do dia (app Android)
+-- ============================================================================
+-- /operacao_self e /operacao_self/sync filtram as tarefas concluídas hoje com
+-- um intervalo sobre updt_time (updt_time >= CURRENT_DATE AND < CURRENT_DATE + 1)
+-- em vez de updt_time::date = CURRENT_DATE, que obrigava a ler tb_operacao
+-- inteira. Este índice torna esse filtro um range scan.
+--
+-- CONCURRENTLY: não bloqueia escritas — correr fora de uma transacção.
+-- Idempotente — seguro correr mais do que uma vez.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_operacao_updt_time
+    ON tb_operacao (updt_time)
+    WHERE updt_time IS NOT NULL;
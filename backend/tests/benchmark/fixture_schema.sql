@@ -0,0 +1,195 @@
+-- Fixture de benchmark — esquema sintético com a forma das views de produção.
+--
+-- Não é uma cópia do esquema real: só as colunas que os serviços medidos
+-- lêem, e stubs das funções armazenadas (fs_setsession, fbo_task_*,
+-- fbo_telemetry$querydata) com custo semelhante (um UPDATE/SELECT simples).
+-- Carregado pelo conftest numa BD dedicada (BENCH_DATABASE_URI) — o esquema
+-- aintar_server é recriado de raiz em cada sessão de benchmark.
+
+DROP SCHEMA IF EXISTS aintar_server CASCADE;
+CREATE SCHEMA aintar_server;
+SET search_path TO aintar_server;
+
+CREATE SEQUENCE sq_codes START 1000;
+
+-- ---------------------------------------------------------------------------
+-- Sessão / permissões
+-- ---------------------------------------------------------------------------
+CREATE TABLE ts_interface (pk integer PRIMARY KEY, value text NOT NULL);
+
+CREATE FUNCTION fs_setsession(p_session integer) RETURNS text
+LANGUAGE sql AS $$
+    SELECT '<result><sucess>' || p_session || '</sucess></result>'
+$$;
+
+-- ---------------------------------------------------------------------------
+-- Pedidos (vbl_document)
+-- ---------------------------------------------------------------------------
+CREATE TABLE tb_document (
+    pk          integer PRIMARY KEY,
+    regnumber   text NOT NULL,
+    submission  timestamp NOT NULL,
+    tt_type     integer NOT NULL,
+    ts_entity   integer,
+    ts_associate integer,
+    who         integer,
+    what        integer,
+    memo        text,
+    nipc        integer,
+    address     text,
+    postal      text,
+    door        text,
+    floor       text,
+    nut1        text,
+    nut2        text,
+    nut3        text,
+    nut4        text
+);
+
+CREATE VIEW vbl_document AS
+SELECT d.pk, d.regnumber, d.submission, d.tt_type, 'Tipo ' || d.tt_type AS tipo,
+       d.ts_entity, d.ts_associate, d.who, d.what, d.memo, d.nipc,
+       d.address, d.postal, d.door, d.floor, d.nut1, d.nut2, d.nut3, d.nut4,
+       EXTRACT(YEAR FROM d.submission)::int AS ano
+FROM tb_document d;
+
+-- ---------------------------------------------------------------------------
+-- Tarefas (vbl_task) + stubs fbo_task_*
+-- ---------------------------------------------------------------------------
+CREATE TABLE tb_task (
+    pk          integer PRIMARY KEY,
+    name        text NOT NULL,
+    ts_client   integer,
+    owner       integer,
+    memo        text,
+    ts_priority integer NOT NULL DEFAULT 1,
+    ts_notestatus integer NOT NULL DEFAULT 1,
+    when_start  timestamp NOT NULL DEFAULT now(),
+    when_stop   timestamp
+);
+
+CREATE TABLE tb_task_note (
+    pk      integer PRIMARY KEY DEFAULT nextval('sq_codes'),
+    tb_task integer NOT NULL,
+    memo    text,
+    "when"  timestamp NOT NULL DEFAULT now()
+);
+
+CREATE VIEW vbl_task AS
+SELECT t.pk, t.name, t.ts_client, t.owner, t.memo, t.ts_priority,
+       t.ts_notestatus AS status, t.when_start, t.when_stop
+FROM tb_task t;
+
+CREATE FUNCTION fbo_task_close(pnpk integer) RETURNS text LANGUAGE sql AS $$
+    UPDATE tb_task SET when_stop = now() WHERE pk = pnpk;
+    SELECT '<sucess>' || pnpk || '</sucess>'
+$$;
+
+CREATE FUNCTION fbo_task_open(pnpk integer) RETURNS text LANGUAGE sql AS $$
+    UPDATE tb_task SET when_stop = NULL WHERE pk = pnpk;
+    SELECT '<sucess>' || pnpk || '</sucess>'
+$$;
+
+CREATE FUNCTION fbo_task_status(pnpk integer, status_id integer) RETURNS text LANGUAGE sql AS $$
+    UPDATE tb_task SET ts_notestatus = status_id WHERE pk = pnpk;
+    SELECT '<sucess>' || pnpk || '</sucess>'
+$$;
+
+CREATE FUNCTION fbo_task_note_new(pnpk integer, pnmemo text) RETURNS text LANGUAGE sql AS $$
+    INSERT INTO tb_task_note (tb_task, memo) VALUES (pnpk, pnmemo);
+    SELECT '<sucess>' || pnpk || '</sucess>'
+$$;
+
+CREATE FUNCTION fbo_task_update(pnpk integer, pname text, pclient integer, ppriority integer, pmemo text)
+RETURNS text LANGUAGE sql AS $$
+    UPDATE tb_task SET name = pname, ts_client = pclient, ts_priority = ppriority, memo = pmemo
+    WHERE pk = pnpk;
+    SELECT '<sucess>' || pnpk || '</sucess>'
+$$;
+
+-- ---------------------------------------------------------------------------
+-- Telemetria (tb_sensordataraw + fbo_telemetry$querydata)
+-- ---------------------------------------------------------------------------
+CREATE TABLE tb_sensor (pk integer PRIMARY KEY, name text NOT NULL);
+CREATE TABLE tt_teleparam (pk integer PRIMARY KEY, value text NOT NULL, jsontag text NOT NULL);
+
+CREATE TABLE tb_sensordataraw (
+    pk        integer PRIMARY KEY,
+    data      timestamp NOT NULL,
+    processed timestamp,
+    value     json NOT NULL
+);
+
+CREATE FUNCTION "fbo_telemetry$querydata"(p_sensors integer[], p_teleparam integer,
+                                          p_from date, p_to date)
+RETURNS TABLE (pk integer, name text, data timestamp, valuenumb numeric)
+LANGUAGE sql STABLE AS $$
+    SELECT s.pk, s.name, r.data, (r.value ->> tp.jsontag)::numeric
+    FROM tb_sensordataraw r
+    JOIN tb_sensor s ON s.pk = (r.value ->> 'sensor')::int
+    JOIN tt_teleparam tp ON tp.pk = p_teleparam
+    WHERE s.pk = ANY (p_sensors)
+      AND (p_from IS NULL OR r.data >= p_from)
+      AND (p_to IS NULL OR r.data < p_to + 1)
+      AND r.value ->> tp.jsontag IS NOT NULL
+    ORDER BY s.pk, r.data
+$$;
+
+-- ---------------------------------------------------------------------------
+-- Emissões (tb_letter / ts_lettertype)
+-- ---------------------------------------------------------------------------
+CREATE TABLE ts_lettertype (
+    pk          integer PRIMARY KEY,
+    acron       varchar(10) NOT NULL UNIQUE,
+    name        varchar(100) NOT NULL UNIQUE,
+    description text NOT NULL
+);
+
+CREATE TABLE tb_letter (
+    pk              integer PRIMARY KEY,
+    ts_lettertype   integer NOT NULL REFERENCES ts_lettertype (pk),
+    emission_number text NOT NULL,
+    subject         text,
+    created_at      timestamp NOT NULL DEFAULT now()
+);
+
+-- ---------------------------------------------------------------------------
+-- RH — ponto e ausências (_dias_problematicos_mes)
+-- ---------------------------------------------------------------------------
+CREATE TABLE ts_rh_horario (
+    pk          integer PRIMARY KEY,
+    tb_user_fk  integer NOT NULL,
+    dias_semana integer[] NOT NULL,
+    data_inicio date NOT NULL,
+    data_fim    date
+);
+
+CREATE TABLE ts_feriados (data date PRIMARY KEY, descr text);
+
+CREATE TABLE tb_rh_ferias (
+    pk integer PRIMARY KEY, tb_user_fk integer NOT NULL, ts_estado_fk integer NOT NULL,
+    data_inicio date NOT NULL, data_fim date NOT NULL
+);
+
+CREATE TABLE tb_rh_faltas (
+    pk integer PRIMARY KEY, tb_user_fk integer NOT NULL, ts_estado_fk integer NOT NULL,
+    data date NOT NULL
+);
+
+CREATE TABLE tb_rh_participacao (
+    pk integer PRIMARY KEY, tb_user_fk integer NOT NULL, ts_estado_fk integer NOT NULL,
+    tipo text NOT NULL, ts_rh_falta_motivo_fk integer,
+    data_inicio date NOT NULL, data_fim date NOT NULL
+);
+
+CREATE TABLE tb_rh_ponto (
+    pk           integer PRIMARY KEY,
+    tb_user_fk   integer NOT NULL,
+    data         date NOT NULL,
+    tt_evento_fk integer NOT NULL,
+    hora         time NOT NULL
+);
+
+CREATE INDEX ix_tb_rh_ponto_user_data ON tb_rh_ponto (tb_user_fk, data);
+CREATE INDEX ix_tb_rh_faltas_user_data ON tb_rh_faltas (tb_user_fk, data);
+CREATE INDEX ix_tb_sensordataraw_data ON tb_sensordataraw (data);
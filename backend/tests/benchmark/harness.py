@@ -0,0 +1,164 @@
+"""
+Harness de benchmark — execução concorrente, percentis de latência,
+contagem de statements SQL e memória de pico.
+
+Independente do Flask: recebe um callable já preparado (o conftest trata do
+app context e da sessão), o engine SQLAlchemy onde contar statements, e
+devolve um BenchResult com o resumo que é comparado contra o baseline
+guardado em `baseline.json`.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+
+
+def percentile(values, p):
+    """Percentil p (0-100) por interpolação linear — igual a numpy.percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return float(ordered[0])
+    rank = (len(ordered) - 1) * (p / 100.0)
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    weight = rank - lower
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * weight
+
+
+class StatementCounter:
+    """Conta os statements enviados ao PostgreSQL por um engine.
+
+    Conta globalmente (com lock) em vez de por thread: vários serviços
+    (dashboard, landing) fazem fan-out das queries para um ThreadPoolExecutor
+    interno, e essas queries também pertencem ao pedido medido. A média por
+    pedido é então total / n_pedidos.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+        return False
+
+
+@dataclass
+class BenchResult:
+    name: str
+    concurrency: int
+    iterations: int
+    latencies: list = field(default_factory=list)   # segundos, um por pedido
+    statements: int = 0
+    peak_memory_kb: float = 0.0
+    errors: int = 0
+
+    def summary(self):
+        n = len(self.latencies) or 1
+        return {
+            'concurrency': self.concurrency,
+            'iterations': self.iterations,
+            'p50_ms': round(percentile(self.latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(self.latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(self.latencies, 99) * 1000, 2),
+            'max_ms': round(max(self.latencies, default=0) * 1000, 2),
+            'statements_per_request': round(self.statements / n, 2),
+            'peak_memory_kb': round(self.peak_memory_kb, 1),
+            'errors': self.errors,
+        }
+
+
+def run_benchmark(name, fn, *, engine, concurrency=4, iterations=40, warmup=2):
+    """
+    Executa `fn()` `iterations` vezes repartidas por `concurrency` threads.
+
+    O warmup (sequencial) não entra nas métricas — aquece o pool de ligações
+    e as caches de plano do PostgreSQL. Uma exceção numa chamada conta como
+    erro mas não aborta a corrida (a latência dessa chamada é descartada).
+    """
+    for _ in range(warmup):
+        fn()
+
+    result = BenchResult(name=name, concurrency=concurrency, iterations=iterations)
+    lock = threading.Lock()
+
+    def one_call(_):
+        started = time.perf_counter()
+        try:
+            fn()
+        except Exception:
+            with lock:
+                result.errors += 1
+            return
+        elapsed = time.perf_counter() - started
+        with lock:
+            result.latencies.append(elapsed)
+
+    tracemalloc.start()
+    try:
+        with StatementCounter(engine) as counter:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(executor.map(one_call, range(iterations)))
+        result.statements = counter.count
+        _, peak = tracemalloc.get_traced_memory()
+        result.peak_memory_kb = peak / 1024
+    finally:
+        tracemalloc.stop()
+
+    return result
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(path, summaries):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(summaries, f, indent=2, sort_keys=True, ensure_ascii=False)
+        f.write('\n')
+
+
+def compare_with_baseline(name, summary, baseline, tolerance=0.25):
+    """
+    Devolve a lista de regressões (strings legíveis) face ao baseline.
+
+    Latência: p95 acima de baseline * (1 + tolerance). Statements por pedido:
+    qualquer aumento é regressão — é determinístico, não tem ruído, e um
+    statement a mais por pedido costuma ser um N+1 novo.
+    """
+    reference = baseline.get(name)
+    if not reference:
+        return []
+
+    regressions = []
+    limit = reference['p95_ms'] * (1 + tolerance)
+    if summary['p95_ms'] > limit:
+        regressions.append(
+            f"{name}: p95 {summary['p95_ms']}ms > {limit:.2f}ms "
+            f"(baseline {reference['p95_ms']}ms + {tolerance:.0%})"
+        )
+    if summary['statements_per_request'] > reference['statements_per_request']:
+        regressions.append(
+            f"{name}: {summary['statements_per_request']} statements/pedido "
+            f"(baseline {reference['statements_per_request']})"
+        )
+    return regressions
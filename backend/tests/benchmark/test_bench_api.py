@@ -0,0 +1,113 @@
+"""
+Benchmark dos serviços mais pesados da API contra a fixture PostgreSQL.
+
+Cada cenário chama o serviço diretamente (sem HTTP/JWT — o que se mede é o
+trabalho de BD + serialização), dentro de um app context por chamada, tal
+como um pedido real. Falha se houver erros na corrida ou regressão face ao
+baseline guardado (p95 acima da tolerância, ou mais statements por pedido).
+"""
+import os
+from datetime import date, timedelta
+
+import pytest
+
+from .conftest import SESSION_ID, USER_FK
+from .harness import run_benchmark, compare_with_baseline
+
+pytestmark = pytest.mark.benchmark
+
+CONCURRENCY = int(os.environ.get('BENCH_CONCURRENCY', '4'))
+ITERATIONS = int(os.environ.get('BENCH_ITERATIONS', '40'))
+TOLERANCE = float(os.environ.get('BENCH_TOLERANCE', '0.25'))
+
+
+def _status_of(result):
+    """Código HTTP de um retorno de serviço — (body, status) ou só body (200)."""
+    if isinstance(result, tuple) and len(result) == 2 and isinstance(result[1], int):
+        return result[1]
+    return 200
+
+
+@pytest.fixture
+def bench(bench_app, bench_db_engine, bench_baseline, record_result):
+    def _run(name, call, concurrency=CONCURRENCY, iterations=ITERATIONS):
+        def fn():
+            with bench_app.app_context():
+                status = _status_of(call())
+                if status >= 400:
+                    raise AssertionError(f"{name} devolveu HTTP {status}")
+
+        result = run_benchmark(name, fn, engine=bench_db_engine,
+                               concurrency=concurrency, iterations=iterations)
+        summary = result.summary()
+        record_result(name, summary)
+
+        assert result.errors == 0, f"{name}: {result.errors} chamadas falharam"
+        regressions = compare_with_baseline(name, summary, bench_baseline, TOLERANCE)
+        assert not regressions, "\n".join(regressions)
+        return summary
+    return _run
+
+
+def test_list_documents(bench):
+    from app.services.documents.core import list_documents
+    bench('list_documents', lambda: list_documents(SESSION_ID), iterations=max(ITERATIONS // 4, 4))
+
+
+def test_get_dashboard_data(bench):
+    from app.services.dashboard_service import get_dashboard_data
+    bench('get_dashboard_data', lambda: get_dashboard_data(SESSION_ID, {'year': date.today().year}),
+          iterations=max(ITERATIONS // 4, 4))
+
+
+def test_fetch_meta_data_cold(bench):
+    """Sem a cache de 1h do serviço — mede a query combinada de metadados."""
+    from app.services.meta_data_service import fetch_meta_data, clear_meta_data_cache
+
+    def call():
+        clear_meta_data_cache()
+        return fetch_meta_data(SESSION_ID, profil='0')
+    bench('fetch_meta_data_cold', call)
+
+
+def test_query_sensor_data_year(bench):
+    """Um ano de leituras de 10 em 10 minutos para 4 estações."""
+    from app.services.telemetry_service import query_sensor_data
+    date_to = date.today()
+    date_from = date_to - timedelta(days=365)
+    bench('query_sensor_data_year',
+          lambda: query_sensor_data([1, 2, 3, 4], 1, date_from.isoformat(), date_to.isoformat()),
+          iterations=max(ITERATIONS // 4, 4))
+
+
+def test_query_sensor_series_year(bench):
+    """O mesmo ano de leituras, agregado no servidor para ~1000 pontos por estação."""
+    from app.services.telemetry_service import query_sensor_series
+    date_to = date.today()
+    date_from = date_to - timedelta(days=365)
+    bench('query_sensor_series_year',
+          lambda: query_sensor_series([1, 2, 3, 4], 1, date_from.isoformat(), date_to.isoformat(),
+                                      max_points=1000))
+
+
+def test_generate_number(bench):
+    from app.services.emissions.numbering_service import EmissionNumberingService
+    bench('generate_number',
+          lambda: EmissionNumberingService.generate_number('S.OFI', year=2025, current_user=SESSION_ID))
+
+
+def test_bulk_task_action(bench):
+    from app.services.tasks_service import bulk_task_action_service
+    payload = {'task_ids': list(range(1, 26)), 'action': 'status', 'status_id': 2}
+    bench('bulk_task_action_25', lambda: bulk_task_action_service(payload, SESSION_ID))
+
+
+def test_dias_problematicos_mes(bench):
+    from app.services.rh_service import _dias_problematicos_mes
+    from app.utils.utils import db_session_manager
+    hoje = date.today()
+
+    def call():
+        with db_session_manager(SESSION_ID) as session:
+            return _dias_problematicos_mes(session, USER_FK, hoje.year, hoje.month)
+    bench('dias_problematicos_mes', call)
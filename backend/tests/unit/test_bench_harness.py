@@ -0,0 +1,58 @@
+"""
+Testes unitários — tests/benchmark/harness.py
+
+O harness corre só contra PostgreSQL, mas os percentis e a comparação com o
+baseline são lógica pura — se estiverem errados, o benchmark passa ou
+falha pelas razões erradas sem ninguém notar.
+"""
+import pytest
+
+from tests.benchmark.harness import percentile, compare_with_baseline, BenchResult
+
+
+class TestPercentile:
+
+    def test_lista_vazia_devolve_zero(self):
+        assert percentile([], 95) == 0.0
+
+    def test_um_so_valor(self):
+        assert percentile([0.3], 99) == 0.3
+
+    def test_interpolacao_linear_como_numpy(self):
+        valores = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+        assert percentile(valores, 50) == 5.5
+        assert percentile(valores, 95) == pytest.approx(9.55)
+        assert percentile(valores, 100) == 10
+
+    def test_nao_depende_da_ordem_de_entrada(self):
+        assert percentile([5, 1, 4, 2, 3], 50) == 3
+
+
+class TestCompareWithBaseline:
+
+    BASELINE = {'list_documents': {'p95_ms': 100.0, 'statements_per_request': 3.0}}
+
+    def _summary(self, p95, stmts):
+        return {'p95_ms': p95, 'statements_per_request': stmts}
+
+    def test_sem_baseline_para_o_cenario_nao_ha_regressao(self):
+        assert compare_with_baseline('novo', self._summary(999, 99), self.BASELINE) == []
+
+    def test_p95_dentro_da_tolerancia(self):
+        assert compare_with_baseline('list_documents', self._summary(124.9, 3), self.BASELINE, 0.25) == []
+
+    def test_p95_acima_da_tolerancia(self):
+        regressoes = compare_with_baseline('list_documents', self._summary(126, 3), self.BASELINE, 0.25)
+        assert len(regressoes) == 1 and 'p95' in regressoes[0]
+
+    def test_qualquer_statement_a_mais_e_regressao(self):
+        regressoes = compare_with_baseline('list_documents', self._summary(50, 3.04), self.BASELINE)
+        assert len(regressoes) == 1 and 'statements' in regressoes[0]
+
+
+def test_summary_statements_por_pedido():
+    result = BenchResult(name='x', concurrency=2, iterations=4,
+                         latencies=[0.01, 0.02, 0.03, 0.04], statements=10)
+    s = result.summary()
+    assert s['statements_per_request'] == 2.5
+    assert s['p50_ms'] == 25.0
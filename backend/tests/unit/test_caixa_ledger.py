@@ -0,0 +1,98 @@
+"""Testes unitários do livro da caixa (cursor, paginação, consolidação no fecho e resumo)."""
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services import caixa_ledger
+from app.utils.error_handler import APIError
+
+
+def test_cursor_ida_e_volta():
+    cursor = caixa_ledger.encode_cursor('2026-03-15 10:20:30.123456', 812)
+    assert '=' not in cursor
+    assert caixa_ledger.decode_cursor(cursor) == ('2026-03-15 10:20:30.123456', 812)
+
+
+@pytest.mark.parametrize('cursor', [
+    '!!!', 'bm9wZQ', caixa_ledger.encode_cursor('x', 1)[:-3],
+    'W251bGwsIDFd',                      # [null, 1]: movimento sem chave de ordenação
+])
+def test_cursor_invalido(cursor):
+    with pytest.raises(APIError) as exc:
+        caixa_ledger.decode_cursor(cursor)
+    assert exc.value.status_code == 400
+
+
+def test_limite_da_pagina():
+    assert caixa_ledger.parse_limit(None) is None
+    assert caixa_ledger.parse_limit('50') == 50
+    assert caixa_ledger.parse_limit('100000') == caixa_ledger.MAX_PAGE_SIZE
+    for valor in ('0', 'abc'):
+        with pytest.raises(APIError):
+            caixa_ledger.parse_limit(valor)
+
+
+def test_resumo_saldo_inicial_e_final():
+    session = MagicMock()
+    session.execute.return_value.mappings.return_value.one.return_value = {
+        'total_entrada': 300, 'total_saida': 120, 'count': 7,
+    }
+    with patch.object(caixa_ledger, 'balance_at', side_effect=[1000.0, 1180.0]) as balance:
+        summary = caixa_ledger.range_summary(session, date(2026, 1, 1), date(2026, 12, 31))
+
+    # saldo = líquido do período (como antes); inicial = fim da véspera do período
+    assert balance.call_args_list[0].args[1] == date(2025, 12, 31)
+    assert balance.call_args_list[1].args[1] == date(2026, 12, 31)
+    assert summary == {
+        'saldo': 180.0, 'saldo_inicial': 1000.0, 'saldo_final': 1180.0,
+        'total_entrada': 300.0, 'total_saida': 120.0, 'count': 7,
+    }
+
+
+def test_consolidacao_devolve_ultimo_dia():
+    session = MagicMock()
+    session.execute.return_value.fetchall.return_value = [
+        (date(2026, 3, 2), 150), (date(2026, 3, 3), 90),
+    ]
+    result = caixa_ledger.finalize_checkpoints(session, date(2026, 3, 3), fecho_pk=5, user_pk=9)
+    assert result == {'dia': '2026-03-03', 'saldo': 90.0}
+    assert session.execute.call_args.args[1] == {'ate': date(2026, 3, 3), 'fecho': 5, 'utilizador': 9}
+
+
+@patch('app.services.caixa_service.caixa_ledger.finalize_checkpoints')
+@patch('app.services.caixa_service.db_session_manager')
+def test_validar_fecho_consolida_ate_vespera(mock_db, mock_finalize):
+    from app.services.caixa_service import validate_fecho
+
+    session = MagicMock()
+    mock_db.return_value.__enter__.return_value = session
+    session.execute.return_value.mappings.return_value.fetchone.return_value = {
+        'pk': 40, 'tt_caixamovimento': 4, 'data': date(2026, 3, 10), 'valor': -500,
+        'tb_document': None, 'ordempagamento': None, 'ts_client1': 1, 'ts_client2': None,
+    }
+
+    body, status = validate_fecho(40, 2, 'sess')
+
+    assert status == 200
+    mock_finalize.assert_called_once_with(session, date(2026, 3, 9), fecho_pk=40, user_pk=2)
+
+
+@patch('app.services.caixa_service.caixa_ledger.range_summary', return_value={})
+@patch('app.services.caixa_service.caixa_ledger.running_balances', return_value={})
+@patch('app.services.caixa_service.db_session_manager')
+def test_listagem_ordena_e_pagina_por_chave_nunca_nula(mock_db, _saldos, _resumo):
+    from app.services.caixa_service import list_movements
+
+    session = MagicMock()
+    mock_db.return_value.__enter__.return_value = session
+    linha = {'pk': 3, 'data': '2020-01-02 00:00:00', 'valor': 5, 'hist_time': None,
+             'sort_time': '2020-01-02 00:00:00'}
+    session.execute.return_value.mappings.return_value.all.return_value = [linha, {**linha, 'pk': 2}]
+
+    body, status = list_movements('sess', limit='1')
+
+    sql = str(session.execute.call_args.args[0])
+    assert f'ORDER BY {caixa_ledger.SORT_TIME_SQL} DESC, b.pk DESC' in sql
+    assert caixa_ledger.decode_cursor(body['next_cursor']) == ('2020-01-02 00:00:00', 3)
+    assert 'sort_time' not in body['movements'][0]
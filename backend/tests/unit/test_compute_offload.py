@@ -0,0 +1,52 @@
+"""
+Testes do compute offload (app/utils/compute_offload.py) — sem eventlet
+activo, as funções correm no próprio sítio, com as mesmas métricas.
+"""
+import pytest
+
+from app.utils import compute_offload
+from app.utils.compute_offload import offload, offload_metrics, run_offloaded
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    compute_offload._metrics.clear()
+    yield
+    compute_offload._metrics.clear()
+
+
+def test_sem_eventlet_corre_no_sitio_com_metricas():
+    @offload(name='test.soma')
+    def soma(a, b=0):
+        return a + b
+
+    assert soma(2, b=3) == 5
+    assert soma(1) == 1
+
+    metrics = offload_metrics()
+    assert metrics['mode'] == 'inline'
+    stats = metrics['functions']['test.soma']
+    assert stats['calls'] == 2
+    assert stats['errors'] == 0
+    assert stats['in_flight'] == 0 and stats['queued'] == 0
+
+
+def test_erros_propagam_e_contam():
+    def falha():
+        raise ValueError('PDF inválido')
+
+    with pytest.raises(ValueError, match='PDF inválido'):
+        run_offloaded(falha, _name='test.falha')
+
+    stats = offload_metrics()['functions']['test.falha']
+    assert stats['calls'] == 1
+    assert stats['errors'] == 1
+    assert stats['in_flight'] == 0
+
+
+def test_nome_por_omissao_modulo_e_funcao():
+    def tarefa():
+        return 'ok'
+
+    assert run_offloaded(tarefa) == 'ok'
+    assert any(name.endswith('tarefa') for name in offload_metrics()['functions'])
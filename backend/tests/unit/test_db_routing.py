@@ -0,0 +1,62 @@
+"""Testes unitários do encaminhamento de leituras para a réplica (app/utils/db_routing.py)."""
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy.exc import OperationalError
+
+from app.utils.db_routing import ReplicaRouter
+
+
+def _router(lag=0.0, max_lag=10):
+    router = ReplicaRouter()
+    router.enabled = True
+    router.max_lag = max_lag
+    engine = MagicMock()
+    engine.connect.return_value.__enter__.return_value.execute.return_value.scalar.return_value = lag
+    router._engine = lambda: engine
+    return router
+
+
+def test_sem_replica_vai_a_primaria():
+    router = ReplicaRouter()
+    assert router.open_session(7, 'public') is None
+    assert router.metrics()['sessions']['primary'] == 1
+
+
+def test_atraso_acima_do_orcamento_vai_a_primaria():
+    router = _router(lag=45.0, max_lag=10)
+    assert router.open_session(7, 'public') is None
+    metrics = router.metrics()
+    assert metrics['lag_seconds'] == 45.0
+    assert metrics['sessions']['lag_exceeded'] == 1
+
+
+def test_replica_actualizada_prepara_a_sessao():
+    router = _router(lag=1.5)
+    with patch('app.utils.db_routing.Session') as session_cls, \
+         patch('app.utils.utils.fs_setsession', return_value=True) as setsession:
+        session = router.open_session(7, 'aintar_server')
+    assert session is session_cls.return_value
+    setsession.assert_called_once_with(7, session=session)
+    assert 'aintar_server' in str(session.execute.call_args.args[0])
+    assert router.metrics()['sessions']['replica'] == 1
+
+
+def test_fs_setsession_falhado_na_replica_vai_a_primaria():
+    router = _router()
+    with patch('app.utils.db_routing.Session') as session_cls, \
+         patch('app.utils.utils.fs_setsession', return_value=False):
+        assert router.open_session(7, 'public') is None
+    session_cls.return_value.close.assert_called_once()
+    assert router.metrics()['sessions']['session_fallback'] == 1
+
+
+def test_replica_sem_resposta_fica_fora_de_servico():
+    router = _router()
+    router._engine().connect.side_effect = OperationalError('SELECT 1', {}, Exception('refused'))
+    assert router.open_session(None, 'public') is None
+    assert router.metrics()['available'] is False
+
+    # Durante o retry_after nem tenta ligar
+    router._engine().connect.reset_mock()
+    assert router.open_session(None, 'public') is None
+    router._engine().connect.assert_not_called()
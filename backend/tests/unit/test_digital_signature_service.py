@@ -0,0 +1,54 @@
+"""Testes unitários do contexto de assinatura interna (carregado uma vez) e do lote."""
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+from app.services import digital_signature_service as dss
+
+
+def _fake_pyhanko():
+    signers = MagicMock()
+    signers.SimpleSigner.load.side_effect = lambda **kw: MagicMock(name='signer')
+    sign_pkg = MagicMock(signers=signers)
+    return {
+        'pyhanko': MagicMock(sign=sign_pkg),
+        'pyhanko.sign': sign_pkg,
+        'pyhanko.sign.signers': signers,
+        'pyhanko_certvalidator': MagicMock(),
+    }, signers
+
+
+def test_signer_carregado_uma_vez_e_recarregado_na_rotacao(tmp_path):
+    key, cert = tmp_path / 'k.key', tmp_path / 'c.crt'
+    key.write_text('k')
+    cert.write_text('c')
+    modules, signers = _fake_pyhanko()
+    ctx = dss.SigningContext(str(key), str(cert))
+
+    with patch.dict(sys.modules, modules):
+        first = ctx.signer
+        for _ in range(5):
+            assert ctx.signer is first
+        assert signers.SimpleSigner.load.call_count == 1
+
+        # Certificado substituído → nova mtime → recarrega
+        st = os.stat(cert)
+        os.utime(cert, (st.st_atime, st.st_mtime + 10))
+        assert ctx.signer is not first
+        assert signers.SimpleSigner.load.call_count == 2
+
+
+def test_lote_devolve_resultado_por_ficheiro_sem_parar_nas_falhas():
+    def fake_sign(path, signer_name, reason):
+        if 'mau' in path:
+            raise RuntimeError('PDF corrompido')
+        return path.replace('.pdf', '_signed.pdf')
+
+    with patch.object(dss, 'signing_context') as ctx:
+        ctx.sign.side_effect = fake_sign
+        results = dss.sign_pdfs_internal(['a.pdf', 'mau.pdf', 'b.pdf'], 'user')
+
+    ctx.refresh.assert_called_once_with(force=False)
+    assert [r['success'] for r in results] == [True, False, True]
+    assert results[0]['signed_path'] == 'a_signed.pdf'
+    assert results[1]['error'] == 'PDF corrompido'
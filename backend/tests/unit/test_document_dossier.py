@@ -0,0 +1,60 @@
+"""Testes unitários do ZIP do dossier em streaming."""
+import io
+import os
+import zipfile
+from unittest.mock import patch
+
+from app.services.documents import dossier
+
+
+def test_zip_em_streaming_stored_para_ja_comprimidos(tmp_path):
+    folder = tmp_path / 'R-1'
+    (folder / 'Anexos').mkdir(parents=True)
+    (folder / 'Anexos' / 'foto.JPG').write_bytes(os.urandom(200_000))
+    (folder / 'notas.txt').write_text('texto ' * 5000)
+    entries = dossier._folder_entries(str(folder), 'R-1')
+    entries.append(dossier.DossierEntry('R-1/Comprovativo_R-1.pdf', data=b'%PDF-1.4 x', size=10))
+    entries.append(dossier.DossierEntry('R-1/apagado.pdf', path=str(tmp_path / 'nao_existe.pdf')))
+
+    chunks = list(dossier.iter_zip(entries, chunk_size=16 * 1024))
+
+    # Gerado por partes, nenhuma muito maior do que um bloco de leitura
+    assert len(chunks) > 10
+    assert max(len(c) for c in chunks) < 64 * 1024
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as zf:
+        assert zf.testzip() is None
+        infos = {i.filename: i for i in zf.infolist()}
+        assert set(infos) == {'R-1/Anexos/foto.JPG', 'R-1/notas.txt', 'R-1/Comprovativo_R-1.pdf'}
+        assert infos['R-1/Anexos/foto.JPG'].compress_type == zipfile.ZIP_STORED
+        assert infos['R-1/Comprovativo_R-1.pdf'].compress_type == zipfile.ZIP_STORED
+        assert infos['R-1/notas.txt'].compress_type == zipfile.ZIP_DEFLATED
+        assert infos['R-1/notas.txt'].compress_size < infos['R-1/notas.txt'].file_size
+        assert zf.read('R-1/Comprovativo_R-1.pdf') == b'%PDF-1.4 x'
+
+
+def test_oficios_incluem_versao_assinada(tmp_path, monkeypatch):
+    monkeypatch.setattr(dossier, 'GENERATED_PDFS_DIR', str(tmp_path))
+    (tmp_path / 'OF_1.pdf').write_bytes(b'a')
+    (tmp_path / 'OF_1_signed.pdf').write_bytes(b'b')
+
+    class Letter:
+        filename = 'OF_1.pdf'
+
+    class Traversal:
+        filename = '../segredo.pdf'
+
+    arcnames = [e.arcname for e in dossier._letter_entries([Letter, Traversal], 'R')]
+    assert arcnames == ['R/Emissoes/OF_1.pdf', 'R/Emissoes/OF_1_signed.pdf']
+
+
+def test_erro_no_formulario_e_registado_com_a_causa_real():
+    with patch('app.services.pdf_filler_service.fetch_documents_data', return_value=[{'pk': 5}]), \
+         patch('app.services.pdf_filler_service.fill_documents', side_effect=OSError('template em falta')), \
+         patch.object(dossier, 'logger') as logger:
+        assert dossier._form_entry(5, 'R-5', 'sess', 'R-5') is None
+    assert 'template em falta' in logger.warning.call_args.args[0]
+
+    with patch('app.services.pdf_filler_service.fetch_documents_data', return_value=[{'pk': 5}]), \
+         patch('app.services.pdf_filler_service.fill_documents', return_value=io.BytesIO(b'%PDF')):
+        entry = dossier._form_entry(5, 'R-5', 'sess', 'R-5')
+    assert (entry.arcname, entry.data) == ('R-5/Comprovativo_R-5.pdf', b'%PDF')
@@ -0,0 +1,83 @@
+"""Testes unitários da outbox de emails (entrega Graph em lote e backoff)."""
+from unittest.mock import MagicMock, patch
+
+from app.services import email_outbox_service as outbox
+
+
+def _row(pk, attempts=1):
+    return {'pk': pk, 'transport': 'graph', 'recipient': f'u{pk}@x.pt', 'sender_email': 'geral@aintar.pt',
+            'subject': 's', 'body': 'b', 'content_type': 'Text', 'attempts': attempts}
+
+
+def test_backoff_exponencial_com_teto():
+    assert [outbox.backoff_seconds(n) for n in (1, 2, 3)] == [30, 60, 120]
+    assert outbox.backoff_seconds(20) == outbox.BACKOFF_MAX_SECONDS
+
+
+def _deliver(rows, batch_responses):
+    session = MagicMock()
+    resp = MagicMock(status_code=200)
+    resp.json.return_value = {'responses': batch_responses}
+    client = MagicMock()
+    client.post.return_value = resp
+    with patch('app.utils.http_client.get_client', return_value=client), \
+         patch('app.utils.utils.get_access_token', return_value='tok'), \
+         patch.object(outbox, '_mark_failed') as failed, \
+         patch.object(outbox, '_mark_sent') as sent:
+        outbox._deliver_graph(session, rows)
+    return client, failed, sent
+
+
+def test_graph_batch_separa_enviados_temporarios_e_definitivos():
+    rows = [_row(1), _row(2), _row(3), _row(4)]
+    client, failed, sent = _deliver(rows, [
+        {'id': '1', 'status': 202},
+        {'id': '2', 'status': 429, 'body': {'error': {'message': 'throttled'}}},
+        {'id': '3', 'status': 400, 'body': {'error': {'message': 'bad address'}}},
+    ])
+    assert client.post.call_count == 1
+    assert len(client.post.call_args.kwargs['json']['requests']) == 4
+    assert sent.call_args.args[1] == [1]
+    por_pk = {c.args[1]['pk']: c.kwargs.get('permanent', False) for c in failed.call_args_list}
+    # 429 temporário, 400 definitivo, 4 sem resposta no $batch volta à fila
+    assert por_pk == {2: False, 3: True, 4: False}
+
+
+def test_graph_batch_divide_em_lotes_de_20():
+    rows = [_row(pk) for pk in range(1, 46)]
+    client, _, _ = _deliver(rows, [])
+    assert client.post.call_count == 3
+
+
+def test_token_graph_cacheado_ate_expirar():
+    from app.utils import utils
+    utils.invalidate_access_token()
+    resp = MagicMock()
+    resp.json.return_value = {'access_token': 'abc', 'expires_in': 3600}
+    client = MagicMock()
+    client.post.return_value = resp
+    with patch.object(utils, 'get_client', return_value=client):
+        assert utils.get_access_token() == 'abc'
+        assert utils.get_access_token() == 'abc'
+        assert client.post.call_count == 1
+        utils.invalidate_access_token()
+        utils.get_access_token()
+        assert client.post.call_count == 2
+    utils.invalidate_access_token()
+
+
+def test_enqueue_usa_ligacao_propria_sem_tocar_na_sessao_do_pedido():
+    from flask import Flask
+    app = Flask(__name__)
+    session = MagicMock()
+    session.execute.return_value.scalar.return_value = 42
+    with app.app_context(), \
+         patch.object(outbox, 'Session') as mock_session, \
+         patch.object(outbox, 'db') as mock_db, \
+         patch.object(outbox._worker, 'wake'):
+        mock_session.return_value.__enter__.return_value = session
+        assert outbox.enqueue_email('a@x.pt', 's', 'b') == 42
+
+    mock_session.assert_called_once_with(bind=mock_db.engine)
+    session.commit.assert_called_once()
+    mock_db.session.assert_not_called()
@@ -0,0 +1,69 @@
+"""Testes unitários do cliente HTTP partilhado (breaker, limite e métricas)."""
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+
+from app.utils.http_client import UpstreamClient, UpstreamUnavailable
+
+
+def _client(**kw):
+    client = UpstreamClient('teste', **kw)
+    client.session = MagicMock()
+    return client
+
+
+def _response(status):
+    resp = MagicMock()
+    resp.status_code = status
+    return resp
+
+
+def test_breaker_abre_apos_falhas_seguidas_e_fecha_apos_sucesso():
+    client = _client(failure_threshold=2, reset_timeout=30)
+    client.session.request.return_value = _response(503)
+    client.get('http://x')
+    client.get('http://x')
+
+    with pytest.raises(UpstreamUnavailable):
+        client.get('http://x')
+    assert client.session.request.call_count == 2
+    assert client.metrics()['circuit'] == 'open'
+
+    # Passado o reset_timeout deixa passar um pedido de teste
+    client._open_until = 1
+    client.session.request.return_value = _response(200)
+    client.get('http://x')
+    assert client.metrics()['circuit'] == 'closed'
+    assert client.metrics()['rejected'] == 1
+
+
+def test_4xx_nao_conta_como_falha():
+    client = _client(failure_threshold=1)
+    client.session.request.return_value = _response(404)
+    client.get('http://x')
+    client.get('http://x')
+    assert client.metrics()['errors'] == 0
+
+
+def test_erro_de_ligacao_conta_e_propaga():
+    client = _client(failure_threshold=3)
+    client.session.request.side_effect = requests.exceptions.ConnectionError('recusada')
+    with pytest.raises(requests.exceptions.RequestException):
+        client.post('http://x')
+    assert client.metrics()['errors'] == 1
+
+
+def test_sem_vaga_falha_rapido():
+    client = _client(max_concurrency=1, acquire_timeout=0.01)
+    client._slots.acquire()
+    with pytest.raises(UpstreamUnavailable):
+        client.get('http://x')
+    client.session.request.assert_not_called()
+
+
+def test_timeout_por_omissao_aplicado():
+    client = _client(timeout=(1, 2))
+    client.session.request.return_value = _response(200)
+    client.get('http://x')
+    assert client.session.request.call_args.kwargs['timeout'] == (1, 2)
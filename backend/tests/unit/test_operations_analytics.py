@@ -0,0 +1,75 @@
+"""Testes unitários dos analytics das operações (filtros, consulta e agregação dos GROUPING SETS)."""
+from datetime import date
+
+import pytest
+
+from app.services.operations.analytics import build_query, parse_filters, summarize
+from app.utils.error_handler import APIError
+
+
+def test_filtros_por_omissao_ultimos_doze_meses():
+    f = parse_filters({}, today=date(2026, 3, 15))
+    assert f['start'] == date(2025, 4, 1)
+    assert f['end'] == date(2026, 3, 16)            # semiaberto: inclui to_date
+    assert f['bucket'] == 'week'
+    assert f['instalacoes'] is None and f['modos'] is None and f['operadores'] is None
+
+
+def test_filtros_explicitos_e_modo_pontual():
+    f = parse_filters({'from_date': '2024-01-01', 'to_date': '2024-01-31',
+                       'instalacao': '12,15', 'modo': 'pontual,3', 'operador': '7'})
+    assert f['bucket'] == 'day'
+    assert f['instalacoes'] == [12, 15]
+    assert f['modos'] == [0, 3]
+    assert f['operadores'] == [7]
+
+    sql = str(build_query(f))
+    assert "date_trunc('day', dia)" in sql
+    assert 'tb_instalacao = ANY(:instalacoes)' in sql
+    assert 'tt_operacaomodo = ANY(:modos)' in sql
+    assert 'ts_operador = ANY(:operadores)' in sql
+
+
+@pytest.mark.parametrize('args', [
+    {'from_date': '2024-02-01', 'to_date': '2024-01-01'},
+    {'bucket': 'hour'},
+    {'operador': 'abc'},
+    {'from_date': '2010-01-01', 'to_date': '2025-01-01'},
+])
+def test_filtros_invalidos(args):
+    with pytest.raises(APIError) as exc:
+        parse_filters(args)
+    assert exc.value.status_code == 400
+
+
+def _row(dim, total, concluidas, no_dia=0, atraso=0, atraso_max=None, **keys):
+    return {'dimensao': dim, 'periodo': None, 'ts_operador': None, 'tb_instalacao': None,
+            'tt_operacaomodo': None, 'total': total, 'concluidas': concluidas, 'no_dia': no_dia,
+            'atraso_soma': atraso, 'atraso_max': atraso_max, **keys}
+
+
+def test_summarize_separa_dimensoes():
+    rows = [
+        _row('overview', 10, 8, no_dia=6, atraso=8 * 7200, atraso_max=36000),
+        _row('series', 4, 4, periodo=date(2026, 2, 1)),
+        _row('series', 6, 4, periodo=date(2026, 1, 1)),
+        _row('operator', 7, 6, ts_operador=5),
+        _row('operator', 3, 2, ts_operador=0),
+        _row('installation', 10, 8, tb_instalacao=12),
+        _row('mode', 9, 7, tt_operacaomodo=2),
+        _row('mode', 1, 1, tt_operacaomodo=0),
+    ]
+    result = summarize(rows, operator_names={5: 'Ana'}, installation_names={12: 'ETAR X'})
+
+    overview = result['overview']
+    assert overview['completion_rate'] == 80.0
+    assert overview['on_time_rate'] == 75.0
+    assert overview['avg_delay_hours'] == 2.0
+    assert overview['max_delay_hours'] == 10.0
+    assert overview['active_operators'] == 1       # o operador 0 é "sem operador"
+    assert overview['total_installations'] == 1
+
+    assert [s['period'] for s in result['series']] == ['2026-01-01', '2026-02-01']
+    assert result['by_operator'][0] == {**result['by_operator'][0], 'pk': 5, 'name': 'Ana', 'pending': 1}
+    assert result['by_installation'][0]['name'] == 'ETAR X'
+    assert [m['punctual'] for m in result['by_mode']] == [False, True]
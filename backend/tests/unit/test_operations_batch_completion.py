@@ -0,0 +1,72 @@
+"""Testes unitários da conclusão de tarefas em lote (validação, idempotência, resultados por item)."""
+import json
+from contextlib import contextmanager, nullcontext
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services.operations import batch_completion
+from app.utils.error_handler import APIError
+
+
+def _bundle(*items):
+    return json.dumps({'items': list(items)})
+
+
+def _item(key, task_id, **kwargs):
+    return {'key': key, 'task_id': task_id, **kwargs}
+
+
+def test_lote_mal_formado_ou_chaves_repetidas():
+    for raw in ('{', _bundle(), _bundle(_item('curta', 1)),
+                _bundle(_item('chave-0001', 1), _item('chave-0001', 2))):
+        with pytest.raises(APIError) as exc:
+            batch_completion.parse_bundle(raw)
+        assert exc.value.status_code == 400
+
+
+def test_resultados_por_item():
+    session = MagicMock()
+    session.begin_nested.side_effect = lambda: nullcontext()
+    tasks = {10: {'pk': 10, 'pk_instalacao': 3, 'pk_operacaoaccao': 4},
+             11: {'pk': 11, 'pk_instalacao': 3, 'pk_operacaoaccao': 4}}
+
+    @contextmanager
+    def manager(current_user):
+        yield session
+
+    def complete(session, user_id, item, task, *args):
+        if task is None:
+            raise APIError("Tarefa não encontrada ou sem permissão", 404)
+        if item.task_id == 11:
+            return {'status': 'duplicate', 'key': item.key, 'task_id': 11}
+        return {'status': 'completed', 'key': item.key, 'task_id': item.task_id, 'photo': None}
+
+    # tarefas visíveis (10, 11) e nomes das instalações
+    session.execute.return_value.mappings.return_value.all.return_value = list(tasks.values())
+    session.execute.return_value.fetchall.return_value = [(3, 'ETAR Teste')]
+
+    raw = _bundle(_item('chave-0010', 10), _item('chave-0011', 11), _item('chave-0099', 99),
+                  _item('chave-0012', 10, photo='photo_0'))
+    with patch.object(batch_completion, 'db_session_manager', manager), \
+         patch.object(batch_completion, '_complete_item', side_effect=complete) as done, \
+         patch.object(batch_completion, '_notify_supervisors') as notify:
+        body, status = batch_completion.complete_tasks_batch(1, 'sess', raw, {})
+
+    assert status == 200
+    assert [r['status'] for r in body['results']] == ['completed', 'duplicate', 'error', 'error']
+    assert "em falta" in body['results'][3]['error']
+    assert body['summary'] == {'completed': 1, 'duplicate': 1, 'error': 2}
+    assert done.call_count == 3                       # item com foto em falta nem chega à BD
+    assert notify.call_args.args[1] == [10]
+
+
+def test_chave_repetida_devolve_resultado_guardado():
+    session = MagicMock()
+    session.execute.return_value.scalar.side_effect = [None, {'status': 'completed', 'photo': 'queued'}]
+    item = batch_completion.BatchCompletion(key='chave-0001', task_id=5)
+
+    result = batch_completion._complete_item(session, 1, item, None, {}, {}, None)
+
+    assert result['status'] == 'duplicate' and result['photo'] == 'queued'
+    assert session.execute.call_count == 2           # INSERT ... ON CONFLICT + SELECT, sem fbf_operacao
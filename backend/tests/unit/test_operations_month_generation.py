@@ -0,0 +1,100 @@
+"""Testes unitários da geração mensal de tarefas operacionais (plano em memória)."""
+import inspect
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+import pytest
+from flask import Flask
+
+from app.services.operations import month_generation as gen
+from app.utils.error_handler import APIError
+
+
+def _template(modo, instalacao, accao, week, dayn, op1=7, op2=None):
+    return {
+        'tt_operacaomodo': modo, 'tb_instalacao': instalacao, 'tt_operacaoaccao': accao,
+        'week': week, 'dayn': dayn, 'ts_operador1': op1, 'ts_operador2': op2,
+        'instalacao_nome': f'ETAR {instalacao}', 'operador1_nome': f'Op {op1}', 'operador2_nome': None,
+    }
+
+
+def test_semana_e_intervalo_do_mes():
+    assert [gen.operacao_week(date(2026, 11, d)) for d in (1, 7, 8, 28, 29, 30)] == [1, 1, 2, 4, 1, 1]
+    assert gen.month_range(12, 2026) == (date(2026, 12, 1), date(2027, 1, 1))
+
+
+def test_plano_e_resumo():
+    # Novembro 2026: dia 2 é segunda (dow 1) da 1.ª semana; dia 30 é segunda e conta como semana 1
+    templates = [
+        _template(1, 10, 100, week=1, dayn=1, op1=7, op2=8),
+        _template(2, 11, 101, week=1, dayn=1, op1=7),
+        _template(1, 10, 102, week=2, dayn=3, op1=9),
+    ]
+    start, end = gen.month_range(11, 2026)
+    plan = gen.build_plan(templates, start, end)
+    assert sorted((d.day, t['tt_operacaoaccao']) for d, t in plan) == [
+        (2, 100), (2, 101), (11, 102), (30, 100), (30, 101)]
+
+    summary = gen.summarize_plan(plan)
+    assert summary['total'] == 5
+    assert summary['by_mode'] == {1: 3, 2: 2}
+    assert summary['by_operator'][0] == {'pk': 7, 'name': 'Op 7', 'tasks': 4, 'days': 2, 'max_per_day': 2}
+    assert summary['by_installation'][0]['tasks'] == 3
+    assert summary['by_day']['2026-11-02'] == 2
+
+    existing = {(date(2026, 11, 2), 10, 100, 1)}
+    assert len(gen.build_plan(templates, start, end, existing)) == 4
+
+
+def test_dry_run_nao_escreve_e_mes_passado_recusado():
+    session = MagicMock()
+    session.execute.return_value.mappings.return_value.all.return_value = [
+        _template(1, 10, 100, week=1, dayn=1)]
+
+    result = gen.generate_month(session, 11, 2026, dry_run=True, today=date(2026, 10, 19))
+    assert result['dry_run'] and result['total'] == 2 and result['modes'] == [1]
+    assert session.execute.call_count == 1           # só a leitura dos templates
+
+    with pytest.raises(APIError) as exc:
+        gen.generate_month(session, 10, 2026, today=date(2026, 10, 19))
+    assert exc.value.status_code == 409
+
+
+def test_templates_repetidos_geram_uma_tarefa():
+    session = MagicMock()
+    session.execute.return_value.mappings.return_value.all.return_value = [
+        _template(1, 10, 100, week=1, dayn=1), _template(1, 10, 100, week=1, dayn=1, op1=8)]
+    session.execute.return_value.fetchall.return_value = []
+
+    gen.generate_month(session, 11, 2026, modes=[1], today=date(2026, 10, 1))
+
+    params = next(c.args[1] for c in session.execute.call_args_list if c.args[0] is gen._INSERT_SQL)
+    keys = list(zip(params['datas'], params['instalacoes'], params['accoes'], params['modos']))
+    assert keys == [(date(2026, 11, 2), 10, 100, 1), (date(2026, 11, 30), 10, 100, 1)]
+    assert params['operadores1'] == [7, 7]
+
+
+@pytest.mark.parametrize('route, body', [
+    ('operacao_init_route', {'tt_operacaomodo': 1, 'month': 1, 'year': date.today().year + 1, 'dry_run': True}),
+    ('operacao_init_remaining_route', {'tt_operacaomodo': 1, 'dry_run': True}),
+])
+def test_rota_dry_run_nao_escreve(route, body):
+    from app.routes import operations_routes
+
+    view = inspect.unwrap(getattr(operations_routes, route))
+    session = MagicMock()
+    session.execute.return_value.mappings.return_value.all.return_value = [
+        _template(1, 10, 100, week=w, dayn=d) for w in range(1, 5) for d in range(7)]
+    session.execute.return_value.fetchall.return_value = []
+
+    with patch('app.services.operations_service.db_session_manager') as mock_db, \
+            patch.object(operations_routes, 'get_jwt_identity', return_value='sess'), \
+            Flask(__name__).test_request_context(json=body):
+        mock_db.return_value.__enter__.return_value = session
+        response, status = view()
+
+    assert status == 200
+    result = response.get_json()
+    assert result['plan']['dry_run'] is True and result['total'] > 0
+    sqls = [str(c.args[0]).upper() for c in session.execute.call_args_list]
+    assert not any('DELETE' in s or 'INSERT' in s for s in sqls)
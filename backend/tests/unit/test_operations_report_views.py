@@ -0,0 +1,74 @@
+"""Testes unitários das views de relatório das operações (cache, paginação, projecção)."""
+from unittest.mock import patch
+
+import pytest
+
+from app.services.operations import report_views
+from app.utils.error_handler import APIError
+
+COLUMNS = ['pk', 'regnumber', 'ts_entity', 'submission']
+
+
+class _Cache(dict):
+    def get(self, key):
+        return super().get(key)
+
+    def set(self, key, value, timeout=None):
+        self[key] = value
+
+
+@pytest.fixture
+def cache():
+    with patch.object(report_views, 'cache', _Cache()) as c:
+        yield c
+
+
+def test_cache_invalidada_por_mudanca_de_geracao(cache):
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {'total': len(calls)}
+
+    assert report_views._cached('full:v', loader) == {'total': 1}
+    assert report_views._cached('full:v', loader) == {'total': 1}
+    report_views.invalidate_operations_reports()
+    assert report_views._cached('full:v', loader) == {'total': 2}
+
+
+def test_parse_page_args():
+    params = report_views.parse_page_args(
+        {'page': '3', 'page_size': '5000', 'sort': 'submission', 'order': 'DESC', 'fields': 'pk, regnumber'},
+        COLUMNS,
+    )
+    assert params == {'page': 3, 'page_size': report_views.MAX_PAGE_SIZE, 'sort': 'submission',
+                      'order': 'desc', 'fields': ['pk', 'regnumber'], 'key': 'pk'}
+    assert report_views.parse_page_args({}, COLUMNS)['fields'] == COLUMNS
+
+    for args in ({'sort': 'pk; DROP TABLE x'}, {'fields': 'pk,senha'}, {'order': 'up'}, {'page': 'x'}):
+        with pytest.raises(APIError) as exc:
+            report_views.parse_page_args(args, COLUMNS)
+        assert exc.value.status_code == 400
+
+
+def test_query_da_pagina_so_com_colunas_citadas():
+    params = report_views.parse_page_args({'sort': 'ts_entity', 'fields': 'pk,ts_entity'}, COLUMNS)
+    sql = str(report_views._page_query('vbr_document_rede01', params))
+    assert sql.startswith('SELECT "pk", "ts_entity" FROM vbr_document_rede01')
+    assert 'ORDER BY "ts_entity" ASC NULLS LAST, "pk" ASC LIMIT :limit OFFSET :offset' in sql
+
+
+def test_pagina_sem_sort_tem_ordem_estavel():
+    params = report_views.parse_page_args({'order': 'desc'}, COLUMNS)
+    assert 'ORDER BY "pk" DESC LIMIT' in str(report_views._page_query('vbr_document_rede01', params))
+
+    # View sem pk: desempata pela primeira coluna
+    params = report_views.parse_page_args({'sort': 'data'}, ['regnumber', 'data'])
+    sql = str(report_views._page_query('vbr_document_rede01', params))
+    assert 'ORDER BY "data" ASC NULLS LAST, "regnumber" ASC LIMIT' in sql
+
+
+def test_view_desconhecida():
+    with pytest.raises(APIError) as exc:
+        report_views.get_report_view_page('sess', 'tb_users', {})
+    assert exc.value.status_code == 404
@@ -0,0 +1,66 @@
+"""Testes unitários da sincronização incremental das tarefas do dia (app Android)."""
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from app.services.operations import task_sync
+
+
+class _Cache(dict):
+    def get(self, key):
+        return super().get(key)
+
+    def set(self, key, value, timeout=None):
+        self[key] = value
+
+
+def _row(pk, **kwargs):
+    return {'pk': pk, 'tb_instalacao': f'ETAR {pk}', 'data': datetime(2026, 5, 4), **kwargs}
+
+
+@pytest.fixture
+def cache():
+    with patch.object(task_sync, 'cache', _Cache()) as c:
+        yield c
+
+
+def _sync(rows, since=None, if_none_match=None):
+    with patch.object(task_sync, 'load_today_rows', return_value=rows):
+        return task_sync.sync_today_tasks(1, 'sess', since=since, if_none_match=if_none_match)
+
+
+def test_token_independente_da_ordem():
+    assert task_sync.state_token({1: 'a', 2: 'b'}) == task_sync.state_token({2: 'b', 1: 'a'})
+    assert task_sync.state_token({1: 'a'}) != task_sync.state_token({1: 'b'})
+
+
+def test_full_delta_e_304(cache):
+    rows = {pk: task_sync.project(_row(pk), False) for pk in (1, 2, 3)}
+    first, token = _sync(rows)
+    assert first['full'] and len(first['upserts']) == 3
+    assert first['fields'][-1] == 'completed'
+
+    # Sem alterações: 304 (por since ou por If-None-Match)
+    assert _sync(rows, since=token)[0] is None
+    assert _sync(rows, if_none_match={token})[0] is None
+
+    # 2 concluída, 3 saiu da lista, 4 nova
+    changed = {
+        1: rows[1],
+        2: task_sync.project(_row(2, valuetext='7.2'), True),
+        4: task_sync.project(_row(4), False),
+    }
+    delta, new_token = _sync(changed, since=token)
+    assert not delta['full'] and new_token != token
+    assert sorted(v[0] for v in delta['upserts']) == [2, 4]
+    assert delta['deleted'] == [3]
+    assert delta['stats'] == {'total_assigned': 3, 'total_completed': 1}
+
+
+def test_token_desconhecido_devolve_lista_completa(cache):
+    rows = {1: task_sync.project(_row(1), False)}
+    payload, _ = _sync(rows, since='v1.desconhecido')
+    assert payload['full'] and len(payload['upserts']) == 1
+    payload, _ = _sync(rows, since='v0.antigo')
+    assert payload['full']
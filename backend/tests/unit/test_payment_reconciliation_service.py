@@ -0,0 +1,49 @@
+"""Testes unitários da reconciliação em lote de pagamentos SIBS."""
+from unittest.mock import MagicMock, patch
+
+from app.services import payment_reconciliation_service as recon
+
+
+def _row(tid, status='PENDING', method='MBWAY', doc=10):
+    return {'transaction_id': tid, 'payment_status': status, 'payment_method': method,
+            'tb_document': doc, 'regnumber': f'R{tid}', 'amount': 5}
+
+
+def test_compute_changes_so_devolve_estados_que_mudam():
+    candidates = [_row('a'), _row('b'), _row('c'), _row('d', status='PENDING_VALIDATION')]
+    results = {
+        'a': ({'paymentStatus': 'Success'}, None),
+        'b': ({'paymentStatus': 'Pending'}, None),        # sem alteração
+        'c': (None, 'timeout'),                           # erro — fica para a próxima
+        'd': ({'paymentStatus': 'Desconhecido'}, None),   # não rebaixa para PENDING
+    }
+    changes = recon.compute_changes(candidates, results)
+    assert [(c['transaction_id'], c['new_status']) for c in changes] == [('a', 'SUCCESS')]
+
+
+def test_fetch_statuses_consulta_em_paralelo_e_isola_erros():
+    def fake_fetch(tid):
+        return tid, ((None, 'falha') if tid == 'x' else ({'paymentStatus': 'Expired'}, None))
+
+    with patch.object(recon, '_fetch_status', side_effect=fake_fetch):
+        results = recon.fetch_statuses(['x', 'y', 'z'])
+    assert results['x'] == (None, 'falha')
+    assert results['z'][0]['paymentStatus'] == 'Expired'
+
+
+def test_apply_changes_um_so_fbo_sibs_status_para_o_lote():
+    session = MagicMock()
+    changes = recon.compute_changes(
+        [_row('a', method='MULTIBANCO'), _row('b')],
+        {'a': ({'paymentStatus': 'Success'}, None), 'b': ({'paymentStatus': 'Expired'}, None)},
+    )
+    recon.apply_changes(session, changes)
+
+    sqls = [str(call.args[0]) for call in session.execute.call_args_list]
+    assert sum('fbo_sibs_status' in s for s in sqls) == 1
+    batch_params = session.execute.call_args_list[0].args[1]
+    assert batch_params['statuses'] == ['SUCCESS', 'EXPIRED']
+    # Fatura e parâmetro de método só para o SUCCESS
+    assert any('fbo_document_invoice$link' in s for s in sqls)
+    param_call = session.execute.call_args_list[-1].args[1]
+    assert param_call == {'docs': [10], 'values': ['2']}
@@ -0,0 +1,104 @@
+"""Testes unitários da extracção de boletins laboratoriais (matcher único e lote)."""
+import io
+import zipfile
+from unittest.mock import patch
+
+import pytest
+
+from app.services import pdf_extraction_service as pes
+from app.utils.error_handler import APIError
+
+
+SECAO = """Resultados dos Ensaios
+pH 7,4 Escala Sorensen 5 5 - - - 6,0-9,0
+Sólidos Suspensos Totais 12 mg/L 10 10 2 1 - 35
+Sólidos Suspensos Voláteis 8 mg/L 10 10 2 1 - -
+Carência Química de Oxigénio 180 mg/L O2 10 10 5 2 - 125
+Azoto Total <2,0 mg/L N 10 10 2 1 - 15
+Cloretos 40 mg/L 10 10 2 1 - -
+Este relatório só pode ser reproduzido na íntegra
+"""
+
+
+def test_matcher_unico_extrai_todos_os_parametros():
+    with patch.object(pes, '_log_parametros_desconhecidos') as log:
+        parametros = {p['nome']: p for p in pes._extract_parametros(SECAO)}
+
+    assert set(parametros) == {
+        'pH', 'Sólidos Suspensos Totais', 'Sólidos Suspensos Voláteis',
+        'Carência Química de Oxigénio', 'Azoto Total',
+    }
+    assert parametros['Sólidos Suspensos Voláteis']['tt_analiseparam'] == 510
+    assert parametros['Carência Química de Oxigénio']['unidade'] == 'mg/L O2'
+    assert parametros['Carência Química de Oxigénio']['conforme'] is False
+    assert parametros['pH']['limitemin'] == 6.0 and parametros['pH']['conforme'] is True
+    assert parametros['Azoto Total']['conforme'] is True          # abaixo do LQ
+    log.assert_called_once_with({'Cloretos'})
+
+
+def _instalacoes(*nomes):
+    return [{'pk': i, 'nome': n, 'nome_norm': pes._normalize(n)} for i, n in enumerate(nomes, 1)]
+
+
+def test_sugestao_memoria_substring_e_fuzzy():
+    instalacoes = _instalacoes('Currelos', 'Nandufe', 'Vale de Cavalos')
+    mapeados = {'Local X': {'pk': 9, 'nome': 'Outra'}}
+
+    assert pes._sugerir('Local X', instalacoes, mapeados)['origem'] == 'memoria'
+    sub = pes._sugerir('ETAR Currelos- Subsistema Currelos - Saída', instalacoes, mapeados)
+    assert (sub['origem'], sub['sugestao']['nome']) == ('substring', 'Currelos')
+    assert pes._sugerir('Nandufi', instalacoes, mapeados)['origem'] == 'fuzzy'
+
+
+def _zip(**files):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as zf:
+        for nome, conteudo in files.items():
+            zf.writestr(nome, conteudo)
+    return buf.getvalue()
+
+
+def test_expandir_zip_e_limite_do_lote():
+    ficheiros = [
+        ('a.pdf', b'A'),
+        ('lote.zip', _zip(**{'b.pdf': b'B', 'notas.txt': b'x', '__MACOSX/._b.pdf': b'?'})),
+        ('leia.txt', b'ignorado'),
+    ]
+    assert pes.expandir_ficheiros(ficheiros) == [('a.pdf', b'A'), ('b.pdf', b'B')]
+
+    with patch.object(pes, 'BATCH_MAX_FILES', 2), pytest.raises(APIError):
+        pes.expandir_ficheiros([(f'{i}.pdf', b'') for i in range(3)])
+
+
+def test_pdf_directo_acima_do_limite_recusado_sem_ler_tudo():
+    ficheiro = io.BytesIO(b'x' * 50)
+    with patch.object(pes, 'BATCH_MAX_FILE_BYTES', 10), pytest.raises(APIError) as exc:
+        pes.ler_upload('grande.pdf', ficheiro)
+    assert exc.value.error_code == 'ERR_FILE_TOO_LARGE'
+    assert ficheiro.tell() == 11          # leu no máximo limite + 1
+
+    with patch.object(pes, 'BATCH_MAX_FILE_BYTES', 10):
+        assert pes.ler_upload('ok.pdf', io.BytesIO(b'x' * 10)) == b'x' * 10
+        with pytest.raises(APIError):
+            pes.expandir_ficheiros([('grande.pdf', b'x' * 11)])
+
+
+def test_lote_isola_erros_e_assinala_repetidos():
+    def fake_extract(stream):
+        conteudo = stream.read()
+        if conteudo == b'mau':
+            raise ValueError('sem texto')
+        return {'numero_boletim': 'B1', 'local_colheita': 'ETAR Currelos', 'parametros': [{}],
+                'nao_conformidades': []}
+
+    sugestao = {'sugestao': {'pk': 1, 'nome': 'Currelos'}, 'candidatos': [], 'origem': 'substring'}
+    with patch.object(pes, 'EXTRACTION_WORKERS', 1), \
+         patch.object(pes, 'extract_lab_report', side_effect=fake_extract), \
+         patch.object(pes, 'sugerir_instalacoes', return_value={'ETAR Currelos': sugestao}) as sug:
+        lote = pes.extract_lab_reports_batch('user', [('1.pdf', b'ok'), ('2.pdf', b'mau'), ('3.pdf', b'ok')])
+
+    sug.assert_called_once_with('user', ['ETAR Currelos', 'ETAR Currelos'])
+    assert lote['resumo'] == {'total': 3, 'extraidos': 2, 'erros': 1,
+                              'com_nao_conformidades': 0, 'para_rever': 1}
+    assert 'erro' in lote['boletins'][1]
+    assert lote['boletins'][2]['avisos'] == ['Boletim repetido no lote (igual a 1.pdf)']
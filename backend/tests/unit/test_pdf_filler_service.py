@@ -0,0 +1,80 @@
+"""Testes unitários do preenchimento do formulário de pedido (template indexado)."""
+from unittest.mock import patch
+
+import pytest
+from pdfrw import PdfReader
+from reportlab.pdfgen import canvas
+
+from app.services import pdf_filler_service as filler
+
+
+@pytest.fixture
+def form_path(tmp_path):
+    """Formulário mínimo com 2 páginas e campos do CAMPO_MAPPING."""
+    path = tmp_path / 'form.pdf'
+    c = canvas.Canvas(str(path))
+    c.acroForm.textfield(name='Registo', x=100, y=700)
+    c.acroForm.textfield(name='Outro', x=100, y=650)          # fora do mapeamento
+    c.showPage()
+    c.acroForm.textfield(name='Email', x=100, y=700)
+    c.acroForm.textfield(name='Contacto_representante', x=100, y=650)
+    c.showPage()
+    c.save()
+    return str(path)
+
+
+def _values(pdf_bytes):
+    return [a.V for page in PdfReader(fdata=pdf_bytes).pages for a in (page.Annots or [])]
+
+
+def test_indice_so_com_campos_mapeados(form_path):
+    template = filler.FormTemplate(form_path)
+    assert [[(r.name, r.group, r.column) for r in refs] for refs in template.index] == [
+        [('Registo', 'pedido', 'regnumber')],
+        [('Email', 'entidade', 'email'), ('Contacto_representante', 'requerente', 'phone')],
+    ]
+
+
+def test_varios_pedidos_num_pdf_sem_alterar_o_template(form_path):
+    dados = [
+        {'pedido': {'regnumber': 'R1'}, 'entidade': {'email': 'a@x.pt'}, 'requerente': {}},
+        {'pedido': {'regnumber': 'R2'}, 'entidade': {}, 'requerente': {'phone': '91'}},
+    ]
+    out = filler.fill_documents(dados, form_path).getvalue()
+
+    values = _values(out)
+    assert len(PdfReader(fdata=out).pages) == 4
+    assert values[0] == '(R1)' and values[2] == '(a@x.pt)'
+    assert values[4] == '(R2)' and values[7] == '(91)'
+    # O template em cache continua limpo para o pedido seguinte
+    template = filler.get_form_template(form_path)
+    assert all(a.V in (None, '()') for p in template.reader.pages for a in p.Annots)
+
+
+def test_template_lido_uma_vez_por_processo(form_path):
+    filler._templates.clear()
+    with patch.object(filler, 'PdfReader', wraps=PdfReader) as reader:
+        for _ in range(3):
+            filler.fill_documents([{'pedido': {'regnumber': 'X'}}], form_path)
+    assert reader.call_count == 1
+
+
+def test_select_usa_so_colunas_do_mapeamento():
+    assert 'd.regnumber AS "pedido.regnumber"' in filler._SELECT_COLUMNS
+    assert 'r.phone AS "requerente.phone"' in filler._SELECT_COLUMNS
+    assert '*' not in filler._SELECT_COLUMNS
+
+
+def test_acroform_presente_com_nomes_distintos_por_copia(form_path):
+    dados = [{'pedido': {'regnumber': 'R1'}}, {'pedido': {'regnumber': 'R2'}}]
+    pdf = PdfReader(fdata=filler.fill_documents(dados, form_path).getvalue())
+
+    form = pdf.Root.AcroForm
+    assert form is not None and form.NeedAppearances == 'true'
+    names = [f.T.decode() for f in form.Fields]
+    assert len(names) == 8 and len(set(names)) == 8
+    assert {'Registo_1', 'Registo_2'} <= set(names)
+
+    # Um só pedido mantém os nomes do template
+    single = PdfReader(fdata=filler.fill_documents(dados[:1], form_path).getvalue())
+    assert 'Registo' in [f.T.decode() for f in single.Root.AcroForm.Fields]
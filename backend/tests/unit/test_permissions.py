@@ -0,0 +1,87 @@
+"""Testes unitários do PermissionManager (bitsets por token)."""
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.core.permissions import PermissionConfigError, PermissionManager, interfaces_to_mask
+
+
+def _manager(mapa):
+    pm = PermissionManager()
+    pm._permission_map = dict(mapa)
+    pm._pk_map = {pk: value for value, pk in mapa.items()}
+    return pm
+
+
+MAPA = {'fleet.view': 830, 'fleet.edit': 831, 'telemetry.view': 1500}
+
+
+def test_interfaces_to_mask_ignora_valores_invalidos():
+    assert interfaces_to_mask([1, 3, None, 'x', -2]) == 0b1010
+    assert interfaces_to_mask(None) == 0
+
+
+def test_has_any_e_has_all():
+    pm = _manager(MAPA)
+    mask = interfaces_to_mask([830, 1500])
+    assert pm.has_any(mask, ('fleet.edit', 'fleet.view'))
+    assert not pm.has_any(mask, ('fleet.edit',))
+    assert pm.has_all(mask, ('fleet.view', 'telemetry.view', 830))
+    assert not pm.has_all(mask, ('fleet.view', 'fleet.edit'))
+
+
+def test_permissao_desconhecida_nunca_satisfeita():
+    pm = _manager(MAPA)
+    mask = interfaces_to_mask([830, 831, 1500])
+    assert not pm.has_any(mask, ('nao.existe',))
+    assert not pm.has_all(mask, ('fleet.view', 'nao.existe'))
+
+
+def test_check_permission_admin_e_pk_directo():
+    pm = _manager(MAPA)
+    assert pm.check_permission('fleet.edit', '0', [])
+    assert pm.check_permission('fleet.view', '1', [830])
+    assert pm.has_any(interfaces_to_mask([830]), (830,))
+
+
+def test_token_mask_cacheada_por_jti():
+    pm = _manager(MAPA)
+    assert pm.token_mask('jti-1', [830]) == 1 << 830
+    # O claim de um token não muda — a 2.ª chamada vem da cache
+    assert pm.token_mask('jti-1', [831]) == 1 << 830
+    assert pm.token_mask(None, [831]) == 1 << 831
+
+
+def test_reload_if_changed_so_recarrega_com_fingerprint_diferente():
+    pm = _manager(MAPA)
+    pm._fingerprint = 'abc'
+    app = MagicMock()
+    pm._read_fingerprint = MagicMock(return_value='abc')
+    pm._load = MagicMock()
+    assert pm.reload_if_changed(app) is False
+    pm._read_fingerprint.return_value = 'def'
+    assert pm.reload_if_changed(app) is True
+    pm._load.assert_called_once()
+
+
+@pytest.mark.parametrize('requisito', [(-1,), ('fleet.view', -830), (True,)])
+def test_pk_invalido_no_decorator_e_erro_de_configuracao_no_arranque(requisito):
+    from app.utils.permissions_decorator import require_all_permissions, require_any_permission
+
+    with pytest.raises(PermissionConfigError):
+        require_any_permission(*requisito)
+    with pytest.raises(PermissionConfigError):
+        require_all_permissions(*requisito)
+    # No pedido nunca levanta: um pk sem bit não é satisfeito
+    assert _manager(MAPA).required_mask(requisito) == (1 << 830 if 'fleet.view' in requisito else 0)
+
+
+def test_pk_invalido_no_mapa_recusado_ao_carregar():
+    pm = _manager(MAPA)
+    session = MagicMock()
+    session.execute.return_value.fetchall.return_value = [
+        SimpleNamespace(pk=830, value='fleet.view'), SimpleNamespace(pk=-3, value='x.partida')]
+    with pytest.raises(PermissionConfigError, match='x.partida'):
+        pm._load(session)
+    assert pm._permission_map == MAPA
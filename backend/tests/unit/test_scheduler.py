@@ -0,0 +1,126 @@
+"""Testes unitários do runner do scheduler (liderança, registo de execuções, locks)."""
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app import scheduler
+from app.scheduler import JobSpec, SCOPE_PROCESS
+from app.services import job_run_service, scheduler_leader_service as leader
+
+
+@contextmanager
+def _lock(acquired):
+    yield acquired
+
+
+@pytest.fixture
+def runs():
+    with patch.object(job_run_service, 'start_run', return_value=7) as start, \
+         patch.object(job_run_service, 'finish_run') as finish:
+        yield start, finish
+
+
+def _spec(func, **kwargs):
+    return JobSpec('teste', 'Job de teste', func, trigger=None, **kwargs)
+
+
+def test_job_de_lider_nao_corre_fora_do_lider(runs):
+    func = MagicMock()
+    with patch.dict(scheduler.JOBS, {'teste': _spec(func)}), \
+         patch.object(leader, 'refresh_leadership', return_value=False):
+        scheduler._run_job(MagicMock(), 'teste')
+    func.assert_not_called()
+    runs[0].assert_not_called()
+
+
+def test_execucao_registada_com_linhas_e_erro(runs):
+    start, finish = runs
+    app = MagicMock()
+    app.config = {'SCHEDULER_POOL_WORKERS': 0}
+    ok = MagicMock(return_value={'rows': 12, 'month': 'Maio 2026'})
+    falha = MagicMock(side_effect=RuntimeError('BD em baixo'))
+
+    with patch.object(leader, 'refresh_leadership', return_value=True), \
+         patch.object(leader, 'job_lock', side_effect=lambda job_id: _lock(True)):
+        with patch.dict(scheduler.JOBS, {'teste': _spec(ok)}):
+            scheduler._run_job(app, 'teste')
+        with patch.dict(scheduler.JOBS, {'teste': _spec(falha)}):
+            scheduler._run_job(app, 'teste', trigger='manual', requested_by='admin')
+
+    assert finish.call_args_list[0].args[1] == 'success'
+    assert finish.call_args_list[0].args[3] == {'rows': 12, 'month': 'Maio 2026'}
+    assert finish.call_args_list[1].args[1] == 'error'
+    assert 'BD em baixo' in finish.call_args_list[1].args[4]
+    assert start.call_args_list[1].args[2:] == ('manual', 'admin')
+
+
+def test_job_ja_em_execucao_noutra_instancia(runs):
+    func = MagicMock()
+    with patch.dict(scheduler.JOBS, {'teste': _spec(func)}), \
+         patch.object(leader, 'refresh_leadership', return_value=True), \
+         patch.object(leader, 'job_lock', side_effect=lambda job_id: _lock(False)):
+        scheduler._run_job(MagicMock(), 'teste')
+    func.assert_not_called()
+    assert runs[1].call_args.args[1] == 'skipped'
+
+
+def test_job_de_processo_corre_sempre_sem_registo(runs):
+    func = MagicMock(return_value=3)
+    with patch.dict(scheduler.JOBS, {'teste': _spec(func, scope=SCOPE_PROCESS)}), \
+         patch.object(leader, 'refresh_leadership', return_value=False):
+        assert scheduler._run_job(MagicMock(), 'teste') == 3
+    runs[0].assert_not_called()
+
+
+def test_rows_from_result():
+    assert job_run_service.rows_from_result(5) == 5
+    assert job_run_service.rows_from_result({'rows': 2, 'raw': 9}) == 2
+    assert job_run_service.rows_from_result({'checked': 1}) is None
+    assert job_run_service.rows_from_result(True) is None
+    assert job_run_service.rows_from_result(None) is None
+
+
+def test_job_lock_local_exclusivo():
+    with patch.object(leader, '_election', leader._LocalLeader()):
+        with leader.job_lock('x') as first:
+            with leader.job_lock('x') as second:
+                assert (first, second) == (True, False)
+        with leader.job_lock('x') as again:
+            assert again
+
+
+def test_chaves_dos_locks_de_job():
+    assert leader.job_lock_key('storage_reconcile') == leader.job_lock_key('storage_reconcile')
+    assert all(0 < leader.job_lock_key(j) < 2 ** 31 for j in scheduler.JOBS)
+    assert leader.LEADER_KEY not in {leader.job_lock_key(j) for j in scheduler.JOBS}
+
+
+def test_app_do_worker_do_pool_nao_arranca_scheduler():
+    from flask import Flask
+
+    from config import get_config
+
+    def create_app(config_class):
+        # Como app.create_app: aplica a classe recebida e volta a aplicar get_config()
+        app = Flask(__name__)
+        app.config.from_object(config_class)
+        app.config.from_object(get_config())
+        scheduler.init_scheduler(app)
+        return app
+
+    config = get_config()
+    job = MagicMock(return_value='ok')
+    with patch.object(config, 'SCHEDULER_ENABLED', True), \
+         patch.object(scheduler, '_worker_app', None), \
+         patch.dict(scheduler.JOBS, {'teste': _spec(job, pooled=True)}), \
+         patch('app.create_app', side_effect=create_app), \
+         patch.object(leader, 'init_leader_election') as eleicao, \
+         patch.object(scheduler, '_scheduler') as apscheduler:
+        assert scheduler._run_in_worker('teste') == 'ok'
+        worker_app = scheduler._worker_app
+
+    assert worker_app.config['SCHEDULER_ENABLED'] is False
+    eleicao.assert_not_called()
+    apscheduler.add_job.assert_not_called()
+    apscheduler.start.assert_not_called()
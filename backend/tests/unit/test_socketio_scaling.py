@@ -0,0 +1,46 @@
+"""Testes unitários da presença multi-sid e do batcher de emits do Socket.IO."""
+from unittest.mock import MagicMock
+
+from app.socketio.presence import LocalPresence
+from app.socketio.scaling import EmitBatcher, resolve_message_queue
+
+
+def test_presenca_com_varios_separadores():
+    presence = LocalPresence()
+    presence.add(7, 'sid-a')
+    presence.add(7, 'sid-b')
+    presence.add(9, 'sid-c')
+    assert presence.sids(7) == ['sid-a', 'sid-b']
+
+    assert presence.remove('sid-a') == 7
+    assert presence.is_online(7)                     # o segundo separador continua ligado
+    presence.remove('sid-b')
+    assert presence.online() == {9: ['sid-c']}
+    assert presence.remove('desconhecido') is None
+
+
+def test_batcher_junta_rooms_e_coalesce_contadores():
+    socketio = MagicMock()
+    batcher = EmitBatcher(socketio, window_ms=10_000)  # o thread não chega a despachar
+    batcher.emit('task_notification_count', {'count': 1}, room='user_7')
+    batcher.emit('central_notification', {'title': 'X'}, room='user_7')
+    batcher.emit('task_notification_count', {'count': 3}, room='user_7')
+    batcher.emit('central_notification', {'title': 'X'}, room='user_8')
+    batcher.emit('telemetry_alert', {'id': 1})
+
+    assert batcher.flush() == 3
+    calls = [(c.args[0], c.args[1], c.kwargs['room']) for c in socketio.emit.call_args_list]
+    assert calls == [
+        ('task_notification_count', {'count': 3}, 'user_7'),
+        ('central_notification', {'title': 'X'}, ['user_7', 'user_8']),
+        ('telemetry_alert', {'id': 1}, None),
+    ]
+    assert batcher.flush() == 0
+
+
+def test_sem_janela_emite_de_imediato_e_fila_desligada():
+    socketio = MagicMock()
+    EmitBatcher(socketio, window_ms=0).emit('x', {}, room='user_1')
+    socketio.emit.assert_called_once_with('x', {}, room='user_1', namespace='/')
+    assert resolve_message_queue({'SOCKETIO_MESSAGE_QUEUE': ''}) is None
+    assert resolve_message_queue({'SOCKETIO_MESSAGE_QUEUE': 'local'}) is None
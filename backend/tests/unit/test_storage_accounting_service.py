@@ -0,0 +1,67 @@
+"""Testes unitários da contabilidade de armazenamento (deltas + reconciliação)."""
+import os
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services import storage_accounting_service as sas
+
+
+@pytest.fixture(autouse=True)
+def areas(tmp_path):
+    files, temp = tmp_path / 'files', tmp_path / 'temp'
+    (files / 'letters' / '2025').mkdir(parents=True)
+    (files / 'Operação_1').mkdir()
+    temp.mkdir()
+    sas._take_pending()
+    with patch.object(sas, 'get_storage_areas', return_value={'files': str(files), 'temp': str(temp)}):
+        yield {'files': files, 'temp': temp}
+    sas._take_pending()
+
+
+def test_deltas_por_diretorio_e_remocao(areas):
+    a = areas['files'] / 'letters' / '2025' / 'OF-1.pdf'
+    a.write_bytes(b'x' * 100)
+    sas.record_file_added(str(a))
+    sas.record_file_added('/fora/das/areas.pdf', 5)          # ignorado
+    assert sas.remove_file(str(a)) == 100
+    sas.record_file_added(str(areas['temp'] / 'p.pdf'), 7)
+
+    pending = sas._take_pending()
+    assert pending == {('temp', ''): [1, 7]}                  # o ficheiro removido anula-se
+
+
+def test_flush_repoe_deltas_se_a_bd_falhar(areas):
+    sas.record_file_added(str(areas['temp'] / 'p.pdf'), 7)
+    with patch.object(sas, 'db_system_session', side_effect=RuntimeError('BD em baixo')), \
+         pytest.raises(RuntimeError):
+        sas.flush_pending()
+    assert sas._take_pending() == {('temp', ''): [1, 7]}
+
+
+def test_scan_tree_uma_linha_por_diretorio(areas):
+    (areas['files'] / 'letters' / '2025' / 'a.pdf').write_bytes(b'1234')
+    (areas['files'] / 'letters' / '2025' / 'b.pdf').write_bytes(b'12')
+    (areas['files'] / 'Operação_1' / 'foto.jpg').write_bytes(b'1')
+    os.symlink(areas['temp'], areas['files'] / 'link')      # symlinks não são seguidos
+
+    stats = sas.scan_tree(str(areas['files']))
+    assert stats['letters/2025'] == [2, 6]
+    assert stats['Operação_1'] == [1, 1]
+    assert stats['letters'] == [0, 0] and stats[''] == [0, 0]
+
+
+def test_resumo_com_letters_e_deltas_pendentes():
+    rows = [
+        ('files', 'letters/2025', 2, 3 * 1024 * 1024, datetime(2026, 1, 1)),
+        ('files', 'Operação_1', 1, 1024 * 1024, datetime(2026, 1, 2)),
+        ('temp', '', 4, 1024 * 1024, None),
+    ]
+    summary = sas.summarize(rows, {('files', 'letters'): [1, 1024 * 1024]})
+
+    assert (summary['letters_count'], summary['letters_size_mb']) == (3, 4.0)
+    assert (summary['files_count'], summary['files_size_mb']) == (4, 5.0)
+    assert summary['total_size_mb'] == 6.0
+    assert summary['areas']['files']['reconciled_at'] == '2026-01-01T00:00:00'
+    assert summary['areas']['files']['directories'][0] == {'directory': 'letters', 'count': 3, 'size_mb': 4.0}
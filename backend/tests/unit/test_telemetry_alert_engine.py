@@ -0,0 +1,143 @@
+"""Testes unitários do motor de alertas de telemetria (avaliação pura, sem BD)."""
+import inspect
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+from flask import Flask
+
+from app.services.telemetry_alert_engine import (
+    TelemetryAlertEngine,
+    STATE_RAISED,
+    STATE_CLEARED,
+)
+
+T0 = datetime(2026, 6, 1, 12, 0)
+
+
+def _rule(pk, kind, **kw):
+    base = {
+        'pk': pk, 'name': f'regra {pk}', 'kind': kind, 'tt_teleparam': 1, 'sensor_id': None,
+        'min_value': None, 'max_value': None, 'max_rate': None, 'missing_minutes': None,
+        'hysteresis': 0, 'severity': 'high', 'whatsapp': True, 'jsontag': 'nivel',
+    }
+    base.update(kw)
+    return base
+
+
+def _engine(*rules):
+    engine = TelemetryAlertEngine()
+    engine._rules = list(rules)
+    engine._seeded = True
+    return _Episodes(engine)
+
+
+def _states(events):
+    return [(e['rule_pk'], e['state']) for e in events]
+
+
+class _Episodes:
+    """Episódios abertos como em tb_telemetry_alert (o que _persist grava)."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.open = set()
+        self.last_seen = {}      # MAX(data) por sensor em tb_sensordataraw
+
+    def _apply(self, events):
+        for e in events:
+            key = (e['rule_pk'], e['sensor_id'])
+            (self.open.add if e['state'] == STATE_RAISED else self.open.discard)(key)
+        return events
+
+    def evaluate(self, payload, now):
+        sensor = str(payload.get('sensor_id'))
+        self.last_seen[sensor] = now
+        rules = {rule for rule, s in self.open if s == sensor}
+        return self._apply(self.engine.evaluate(payload, now, rules))
+
+    def evaluate_missing(self, now):
+        return self._apply(self.engine.evaluate_missing(now, self.last_seen, frozenset(self.open)))
+
+
+class TestThreshold:
+
+    def test_dispara_uma_vez_e_fecha_com_histerese(self):
+        engine = _engine(_rule(1, 'threshold', max_value=5.0, hysteresis=0.5))
+        leituras = [4.0, 5.5, 6.0, 4.8, 4.4, 4.0]
+        eventos = [engine.evaluate({'sensor_id': 'S1', 'nivel': v}, T0 + timedelta(minutes=i))
+                   for i, v in enumerate(leituras)]
+        assert [_states(e) for e in eventos] == [
+            [], [(1, STATE_RAISED)], [], [], [(1, STATE_CLEARED)], [],
+        ]
+
+    def test_estado_por_sensor(self):
+        engine = _engine(_rule(1, 'threshold', min_value=1.0))
+        assert _states(engine.evaluate({'sensor_id': 'S1', 'nivel': 0.5}, T0)) == [(1, STATE_RAISED)]
+        assert _states(engine.evaluate({'sensor_id': 'S2', 'nivel': 0.5}, T0)) == [(1, STATE_RAISED)]
+
+    def test_regra_de_outro_sensor_ou_valor_ausente_ignorados(self):
+        engine = _engine(_rule(1, 'threshold', max_value=1.0, sensor_id='S9'))
+        assert engine.evaluate({'sensor_id': 'S1', 'nivel': 5}, T0) == []
+        assert engine.evaluate({'sensor_id': 'S9', 'outro': 5}, T0) == []
+        assert engine.evaluate({'nivel': 5}, T0) == []
+
+
+class TestRate:
+
+    def test_variacao_brusca(self):
+        engine = _engine(_rule(2, 'rate', max_rate=1.0, hysteresis=0.2))
+        assert engine.evaluate({'sensor_id': 'S1', 'nivel': 10}, T0) == []
+        ev = engine.evaluate({'sensor_id': 'S1', 'nivel': 25}, T0 + timedelta(minutes=10))
+        assert _states(ev) == [(2, STATE_RAISED)]
+        # 0.9/min ainda dentro da histerese (> 0.8) — mantém-se aberto
+        assert engine.evaluate({'sensor_id': 'S1', 'nivel': 34}, T0 + timedelta(minutes=20)) == []
+        ev = engine.evaluate({'sensor_id': 'S1', 'nivel': 35}, T0 + timedelta(minutes=30))
+        assert _states(ev) == [(2, STATE_CLEARED)]
+
+
+class TestMissing:
+
+    def test_silencio_abre_e_leitura_fecha(self):
+        engine = _engine(_rule(3, 'missing', missing_minutes=30, tt_teleparam=None, jsontag=None))
+        engine.evaluate({'sensor_id': 'S1', 'nivel': 1}, T0)
+        assert engine.evaluate_missing(T0 + timedelta(minutes=20)) == []
+        assert _states(engine.evaluate_missing(T0 + timedelta(minutes=31))) == [(3, STATE_RAISED)]
+        assert engine.evaluate_missing(T0 + timedelta(minutes=40)) == []
+        ev = engine.evaluate({'sensor_id': 'S1', 'nivel': 1}, T0 + timedelta(minutes=45))
+        assert _states(ev) == [(3, STATE_CLEARED)]
+
+
+def test_fecho_noutro_processo_ou_apos_restart_vem_da_bd():
+    # Processo novo (sem memória do disparo): o episódio aberto vem da BD
+    engine = TelemetryAlertEngine()
+    engine._rules = [_rule(1, 'threshold', max_value=5.0)]
+    engine._seeded = True
+    assert _states(engine.evaluate({'sensor_id': 'S1', 'nivel': 3}, T0, {1})) == [(1, STATE_CLEARED)]
+    # Já aberto na BD: não volta a abrir
+    assert engine.evaluate({'sensor_id': 'S1', 'nivel': 9}, T0, {1}) == []
+
+
+def test_job_de_falta_de_dados_le_ultima_leitura_da_bd():
+    # Leitura recebida por outro worker: este processo nunca a viu em memória
+    engine = TelemetryAlertEngine()
+    engine._rules = [_rule(3, 'missing', missing_minutes=30, tt_teleparam=None, jsontag=None)]
+    engine._seeded = True
+    engine._rules_loaded_at = float('inf')
+    session = MagicMock()
+    with patch.object(engine, '_last_seen', return_value={'S1': T0, 'S2': T0 + timedelta(minutes=50)}) as seen, \
+         patch.object(engine, '_open_keys', return_value=set()), \
+         patch.object(engine, '_dispatch', side_effect=lambda s, events: events):
+        events = engine.check_missing(session, now=T0 + timedelta(minutes=60))
+    seen.assert_called_once_with(session, 24)
+    assert [(e['rule_pk'], e['sensor_id']) for e in events] == [(3, 'S1')]
+
+
+def test_limite_do_historico_de_alertas_entre_1_e_500():
+    from app.routes import telemetry_routes
+
+    view = inspect.unwrap(telemetry_routes.get_alerts)
+    for pedido, esperado in (('-5', 1), ('0', 1), ('9999', 500), ('abc', 100), ('20', 20)):
+        with patch.object(telemetry_routes, 'list_alerts') as list_alerts, \
+             Flask(__name__).test_request_context(query_string={'limit': pedido}):
+            view()
+        assert list_alerts.call_args.kwargs['limit'] == esperado
@@ -0,0 +1,129 @@
+"""
+Testes unitários — telemetry_service.py::_lttb / _validate_series_params
+
+O downsampling LTTB decide que pontos de um ano de leituras chegam ao
+gráfico: tem de manter sempre o primeiro e o último ponto, devolver
+exactamente o número pedido e nunca perder um pico isolado (é para isso que
+existe, em vez da média por bucket que o achataria).
+"""
+from datetime import date, timedelta
+from unittest.mock import patch
+
+import pytest
+from flask import Flask
+
+from app.utils.error_handler import APIError
+
+
+def _serie(n, pico_em=None):
+    return [(float(i * 600), 100.0 if i == pico_em else 1.0) for i in range(n)]
+
+
+class TestLttb:
+
+    def test_serie_menor_que_o_alvo_fica_intacta(self):
+        from app.services.telemetry_service import _lttb
+        pontos = _serie(10)
+        assert _lttb(pontos, 50) == pontos
+
+    def test_devolve_exactamente_threshold_pontos(self):
+        from app.services.telemetry_service import _lttb
+        assert len(_lttb(_serie(5000), 300)) == 300
+
+    def test_mantem_primeiro_e_ultimo(self):
+        from app.services.telemetry_service import _lttb
+        pontos = _serie(1000)
+        reduzida = _lttb(pontos, 50)
+        assert reduzida[0] == pontos[0]
+        assert reduzida[-1] == pontos[-1]
+
+    def test_preserva_pico_isolado(self):
+        from app.services.telemetry_service import _lttb
+        reduzida = _lttb(_serie(10000, pico_em=4321), 100)
+        assert max(y for _, y, *_ in reduzida) == 100.0
+
+    def test_preserva_elementos_extra_do_tuplo(self):
+        from app.services.telemetry_service import _lttb
+        pontos = [(float(i), float(i % 7), f"ts{i}") for i in range(500)]
+        reduzida = _lttb(pontos, 20)
+        assert all(p in pontos for p in reduzida)
+
+
+class TestValidateSeriesParams:
+
+    def _call(self, **overrides):
+        from app.services.telemetry_service import _validate_series_params
+        params = dict(sensor_pks=[1], teleparam_pk=1, bucket_seconds=None, max_points=None, method='avg')
+        params.update(overrides)
+        _validate_series_params(**params)
+
+    def test_parametros_validos(self):
+        self._call(bucket_seconds=3600)
+        self._call(method='lttb', max_points=500)
+
+    @pytest.mark.parametrize('overrides', [
+        {'sensor_pks': []},
+        {'teleparam_pk': None},
+        {'method': 'median'},
+        {'method': 'lttb', 'bucket_seconds': 3600},
+        {'bucket_seconds': 10},
+        {'max_points': 2},
+        {'max_points': 50000},
+    ])
+    def test_parametros_invalidos_dao_400(self, overrides):
+        with pytest.raises(APIError) as exc:
+            self._call(**overrides)
+        assert exc.value.status_code == 400
+
+    @pytest.mark.parametrize('date_from, date_to', [
+        ('2026-13-01', '2026-06-01'),
+        ('ontem', None),
+        ('2026-06-01', '2026-05-01'),
+    ])
+    def test_datas_invalidas_dao_400_e_nao_500(self, date_from, date_to):
+        from app.services.telemetry_service import query_sensor_series
+
+        with Flask(__name__).app_context(), \
+             patch('app.services.telemetry_service._execute_with_init_retry') as execute:
+            response, status = query_sensor_series([1], 1, date_from, date_to)
+        assert status == 400
+        assert response.get_json()['code'] == 'ERR_INVALID_PARAMS'
+        assert "'date_from'" in response.get_json()['error']
+        execute.assert_not_called()
+
+
+class TestChooseTier:
+    """telemetry_rollup_service.choose_tier — que tier serve cada pedido de série."""
+
+    HOJE = date(2026, 6, 1)
+
+    def _call(self, dias, bucket_seconds, explicit=False, raw_days=400, hourly_days=1100):
+        from app.services.telemetry_rollup_service import choose_tier
+        return choose_tier(self.HOJE - timedelta(days=dias), self.HOJE, bucket_seconds,
+                           explicit_bucket=explicit, raw_retention_days=raw_days,
+                           hourly_retention_days=hourly_days, today=self.HOJE)
+
+    def test_sem_datas_le_sempre_raw(self):
+        from app.services.telemetry_rollup_service import choose_tier
+        assert choose_tier(None, None, 86400) == ('raw', 86400)
+
+    def test_bucket_fino_recente_le_raw(self):
+        assert self._call(dias=2, bucket_seconds=600) == ('raw', 600)
+
+    def test_bucket_derivado_de_horas_arredonda_para_cima(self):
+        assert self._call(dias=30, bucket_seconds=5000) == ('hourly', 7200)
+
+    def test_bucket_de_dias_le_tier_diario(self):
+        assert self._call(dias=365, bucket_seconds=86400 * 2) == ('daily', 172800)
+
+    def test_bucket_explicito_nao_multiplo_fica_no_raw(self):
+        assert self._call(dias=30, bucket_seconds=5400, explicit=True) == ('raw', 5400)
+
+    def test_bucket_explicito_multiplo_de_hora(self):
+        assert self._call(dias=30, bucket_seconds=10800, explicit=True) == ('hourly', 10800)
+
+    def test_intervalo_anterior_a_retencao_raw_sobe_para_horario(self):
+        assert self._call(dias=500, bucket_seconds=600) == ('hourly', 3600)
+
+    def test_intervalo_anterior_a_retencao_horaria_sobe_para_diario(self):
+        assert self._call(dias=1500, bucket_seconds=3600) == ('daily', 86400)
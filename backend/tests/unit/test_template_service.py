@@ -0,0 +1,51 @@
+"""Testes unitários do TemplateService (cache de templates compilados)."""
+from unittest.mock import patch
+
+import pytest
+
+from app.services import template_service as ts
+from app.services.template_service import TemplateService
+
+
+TEMPLATE = "Exmo. Sr. {{ NOME }}, {{ MORADA }}{% if NIF %} ({{ NIF }}){% endif %}"
+
+
+def test_compila_uma_vez_por_conteudo():
+    source = TEMPLATE + " #cache"
+    with patch.object(ts._env, 'parse', wraps=ts._env.parse) as parse:
+        for _ in range(3):
+            TemplateService.render_template(source, {'NOME': 'A', 'MORADA': 'B'})
+    assert parse.call_count == 1
+
+
+def test_obrigatorias_pre_calculadas():
+    compiled = TemplateService.compile(TEMPLATE)
+    assert compiled.variables == {'NOME', 'MORADA', 'NIF'}
+    assert [var for var, _ in compiled.required] == ['MORADA', 'NOME']
+
+    with pytest.raises(ValueError, match='Morada'):
+        TemplateService.render_template(TEMPLATE, {'NOME': 'A'})
+
+
+def test_render_many_e_indice_do_contexto_em_falta():
+    out = TemplateService.render_many(TEMPLATE, [
+        {'NOME': 'A', 'MORADA': 'R1'},
+        {'NOME': 'B', 'MORADA': 'R2', 'NIF': '123'},
+    ])
+    assert out == ['Exmo. Sr. A, R1', 'Exmo. Sr. B, R2 (123)']
+
+    with pytest.raises(ValueError, match='Contexto 1'):
+        TemplateService.render_many(TEMPLATE, [{'NOME': 'A', 'MORADA': 'R'}, {'NOME': 'B'}])
+
+
+def test_erro_de_sintaxe_mantem_value_error():
+    with pytest.raises(ValueError, match='sintaxe'):
+        TemplateService.render_template("{% if %}", {})
+    assert TemplateService.validate_template("{% if %}")['is_valid'] is False
+
+
+def test_lru_limitada():
+    with patch.object(ts, 'TEMPLATE_CACHE_SIZE', 2):
+        for i in range(5):
+            TemplateService.compile(f"{{{{ NOME }}}} lru {i}")
+        assert len(ts._cache) == 2
@@ -7,6 +7,7 @@ from typing import Any
 
 VALID_FIELD_TYPES = {"id", "text", "textarea", "number", "boolean", "date", "datetime", "select", "relation"}
 VALID_RELATION_TYPES = {"hasMany", "belongsTo"}
+VALID_SEARCH_MODES = {"ilike", "trigram", "fulltext"}
 
 
 def validate_entity(cfg: dict) -> None:
@@ -29,6 +30,19 @@ def validate_entity(cfg: dict) -> None:
         if rel.get("type") not in VALID_RELATION_TYPES:
             raise ValueError(f"Entidade '{cfg['key']}': relação '{rel_key}' tipo inválido")
 
+    search = cfg.get("search")
+    if search:
+        if search.get("mode", "ilike") not in VALID_SEARCH_MODES:
+            raise ValueError(f"Entidade '{cfg['key']}': search.mode inválido '{search.get('mode')}'")
+        # language vai literal no SQL (tem de coincidir com o índice) — só identificadores
+        if not str(search.get("language", "portuguese")).isidentifier():
+            raise ValueError(f"Entidade '{cfg['key']}': search.language inválido")
+        field_keys = {f["key"] for f in cfg["fields"]}
+        for f in search.get("fields", []):
+            f_key = f if isinstance(f, str) else f.get("key")
+            if f_key not in field_keys:
+                raise ValueError(f"Entidade '{cfg['key']}': campo de pesquisa desconhecido '{f_key}'")
+
 
 def load_entities(app_config: dict) -> dict[str, Any]:
     entities = {}
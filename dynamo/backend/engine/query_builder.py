@@ -5,7 +5,7 @@ Nunca concatena valores de utilizador directamente no SQL.
 from __future__ import annotations
 from datetime import date, datetime
 from sqlalchemy import text
-from engine.loader import get_text_fields
+from engine.search import build_search_clause
 
 
 def _col(name: str) -> str:
@@ -71,22 +71,26 @@ def build_list_query(entity_cfg: dict, search: str | None, page: int, per_page:
     direction = "DESC" if direction.upper() == "DESC" else "ASC"
 
     allowed_fields = {f["key"] for f in entity_cfg["fields"]}
-    sort_field = sort if sort in allowed_fields else pk
 
     params: dict = {"limit": per_page, "offset": offset}
 
     where_clause = ""
-    if search and search.strip():
-        text_fields = get_text_fields(entity_cfg)
-        if text_fields:
-            conditions = " OR ".join(f"CAST({_col(col)} AS TEXT) ILIKE :search" for col in text_fields)
-            where_clause = f"WHERE ({conditions})"
-            params["search"] = f"%{search.strip()}%"
+    condition, rank, search_params = build_search_clause(entity_cfg, search)
+    if condition:
+        where_clause = f"WHERE {condition}"
+        params.update(search_params)
+
+    # Com pesquisa ranqueada e sem sort explícito, os mais relevantes primeiro
+    if rank and sort not in allowed_fields:
+        order_by = f"{rank} DESC, {_col(pk)} {direction}"
+    else:
+        sort_field = sort if sort in allowed_fields else pk
+        order_by = f"{_col(sort_field)} {direction}"
 
     sql = f"""
         SELECT * FROM {view}
         {where_clause}
-        ORDER BY {_col(sort_field)} {direction}
+        ORDER BY {order_by}
         LIMIT :limit OFFSET :offset
     """
     count_sql = f"SELECT COUNT(*) FROM {view} {where_clause}"
@@ -117,18 +121,17 @@ def build_relation_query(
     params: dict = {"parent_pk": parent_pk, "limit": per_page, "offset": offset}
     extra_where = ""
 
-    if search and search.strip():
-        text_fields = get_text_fields(child_cfg)
-        if text_fields:
-            conditions = " OR ".join(f"CAST({_col(col)} AS TEXT) ILIKE :search" for col in text_fields)
-            extra_where = f"AND ({conditions})"
-            params["search"] = f"%{search.strip()}%"
+    condition, rank, search_params = build_search_clause(child_cfg, search)
+    if condition:
+        extra_where = f"AND {condition}"
+        params.update(search_params)
 
     child_pk = child_cfg["db"]["pkField"]
+    order_by = f"{rank} DESC, {_col(child_pk)} DESC" if rank else f"{_col(child_pk)} DESC"
     sql = f"""
         SELECT * FROM {child_view}
         WHERE {_col(fk)} = :parent_pk {extra_where}
-        ORDER BY {_col(child_pk)} DESC
+        ORDER BY {order_by}
         LIMIT :limit OFFSET :offset
     """
     count_sql = f"SELECT COUNT(*) FROM {child_view} WHERE {_col(fk)} = :parent_pk {extra_where}"
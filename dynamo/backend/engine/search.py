@@ -0,0 +1,180 @@
+"""
+Pesquisa por entidade: filtro + ranking SQL a partir do bloco "search" do
+config, e o DDL dos índices GIN que tornam essa pesquisa indexável.
+
+    "search": {
+        "mode":     "trigram",       # ilike (default) | trigram | fulltext
+        "table":    "ts_entity",     # tabela base da readView (onde vivem os índices)
+        "fields":   ["name", "email",
+                     {"key": "ts_entity", "table": "ts_entity", "column": "name"}],
+        "language": "portuguese",    # fulltext: configuração do to_tsvector
+        "prefix":   True,            # fulltext: "contra" encontra "contrato"
+        "rank":     True,            # ordena por relevância quando não há sort explícito
+    }
+
+Os campos são colunas da readView. Quando o nome (ou a tabela) na base é
+diferente, usa-se a forma dict com "table"/"column" — só o advisor precisa disso.
+
+Sem bloco "search" mantém-se o comportamento antigo: ILIKE em todos os campos
+text/textarea, sem índice.
+
+Advisor:  python -m engine.search [entity ...]
+"""
+from __future__ import annotations
+import re
+import sys
+from engine.loader import get_text_fields
+
+
+DEFAULT_LANGUAGE = "portuguese"
+
+_TERM_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def _col(name: str) -> str:
+    if any(c in name for c in ('$', ' ', '-', '.')):
+        return f'"{name}"'
+    return name
+
+
+def _escape_like(term: str) -> str:
+    """Trata %, _ e \\ escritos pelo utilizador como literais no ILIKE."""
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def get_search_config(entity_cfg: dict) -> dict:
+    """Config de pesquisa normalizada (com defaults) de uma entidade."""
+    cfg = entity_cfg.get("search") or {}
+    db = entity_cfg["db"]
+    table = cfg.get("table") or db["readView"].replace("vbl_", "tb_", 1)
+
+    fields = []
+    for f in cfg.get("fields") or get_text_fields(entity_cfg):
+        if isinstance(f, str):
+            f = {"key": f}
+        fields.append({
+            "key":    f["key"],
+            "table":  f.get("table", table),
+            "column": f.get("column", f["key"]),
+        })
+
+    return {
+        "mode":     cfg.get("mode", "ilike"),
+        "table":    table,
+        "fields":   fields,
+        "language": cfg.get("language", DEFAULT_LANGUAGE),
+        "prefix":   cfg.get("prefix", True),
+        "rank":     cfg.get("rank", cfg.get("mode") in ("trigram", "fulltext")),
+    }
+
+
+def _tsvector(columns: list[str], language: str) -> str:
+    """
+    Expressão tsvector. Tem de ser textualmente igual à do índice para o
+    planner a reconhecer — por isso o nome da configuração vai literal (::regconfig).
+    """
+    doc = " || ' ' || ".join(f"coalesce({_col(c)}, '')" for c in columns)
+    return f"to_tsvector('{language}'::regconfig, {doc})"
+
+
+def build_tsquery(term: str, prefix: bool = True) -> str | None:
+    """'rua da pra' → 'rua:* & da:* & pra:*'. Só palavras — nada de sintaxe tsquery do utilizador."""
+    words = _TERM_RE.findall(term.lower())
+    if not words:
+        return None
+    suffix = ":*" if prefix else ""
+    return " & ".join(f"{w}{suffix}" for w in words)
+
+
+def build_search_clause(entity_cfg: dict, search: str | None) -> tuple[str | None, str | None, dict]:
+    """
+    Devolve (condição WHERE, expressão de ranking, params) para o termo dado.
+    A condição é None quando não há nada a filtrar; o ranking é None quando
+    a entidade não o pede (ou o modo não o suporta).
+    """
+    if not search or not search.strip():
+        return None, None, {}
+    term = search.strip()
+    cfg = get_search_config(entity_cfg)
+    keys = [f["key"] for f in cfg["fields"]]
+    if not keys:
+        return None, None, {}
+
+    if cfg["mode"] == "fulltext":
+        tsquery = build_tsquery(term, cfg["prefix"])
+        if not tsquery:
+            return None, None, {}
+        vector = _tsvector(keys, cfg["language"])
+        query = f"to_tsquery('{cfg['language']}'::regconfig, :search_query)"
+        rank = f"ts_rank({vector}, {query})" if cfg["rank"] else None
+        return f"{vector} @@ {query}", rank, {"search_query": tsquery}
+
+    params = {"search": f"%{_escape_like(term)}%"}
+    if cfg["mode"] == "trigram":
+        # Sem CAST: o operador ILIKE tem de ver a coluna nua para usar o gin_trgm_ops
+        condition = " OR ".join(f"{_col(k)} ILIKE :search" for k in keys)
+        rank = None
+        if cfg["rank"]:
+            rank = "GREATEST(" + ", ".join(f"word_similarity(:search_term, {_col(k)})" for k in keys) + ")"
+            params["search_term"] = term
+        return f"({condition})", rank, params
+
+    condition = " OR ".join(f"CAST({_col(k)} AS TEXT) ILIKE :search" for k in keys)
+    return f"({condition})", None, params
+
+
+# ── DDL advisor ───────────────────────────────────────────────────────────────
+
+def _index_name(*parts: str) -> str:
+    name = "ix_" + "_".join(re.sub(r"\W+", "_", p) for p in parts)
+    return name[:63]
+
+
+def build_search_ddl(entity_cfg: dict) -> list[str]:
+    """Instruções CREATE INDEX que suportam a pesquisa configurada da entidade."""
+    key = entity_cfg["key"]
+    cfg = get_search_config(entity_cfg)
+
+    if cfg["mode"] == "ilike" or not entity_cfg.get("search"):
+        return [f"-- {key}: sem bloco 'search' (ILIKE sem índice)"]
+
+    if cfg["mode"] == "trigram":
+        stmts, seen = [], set()
+        for f in cfg["fields"]:
+            target = (f["table"], f["column"])
+            if target in seen:
+                continue
+            seen.add(target)
+            stmts.append(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {_index_name(f['table'], f['column'], 'trgm')} "
+                f"ON {f['table']} USING gin ({_col(f['column'])} gin_trgm_ops);"
+            )
+        return stmts
+
+    tables = {f["table"] for f in cfg["fields"]}
+    if len(tables) > 1:
+        return [f"-- {key}: fulltext sobre várias tabelas ({', '.join(sorted(tables))}) não é indexável; "
+                f"use campos de uma só tabela ou o modo trigram"]
+    columns = [f["column"] for f in cfg["fields"]]
+    return [
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {_index_name(cfg['table'], 'fts')} "
+        f"ON {cfg['table']} USING gin ({_tsvector(columns, cfg['language'])});"
+    ]
+
+
+def build_all_search_ddl(entities: dict, only: list[str] | None = None) -> str:
+    """Script completo (extensão + índices) para as entidades pedidas (ou todas)."""
+    lines = ["CREATE EXTENSION IF NOT EXISTS pg_trgm;", ""]
+    for key, cfg in entities.items():
+        if only and key not in only:
+            continue
+        # Entidades podem partilhar índices (ex.: ts_entity.name em entity e contract)
+        lines.extend(stmt for stmt in build_search_ddl(cfg) if stmt not in lines)
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    from app_config import APP_CONFIG
+    from engine.loader import load_entities
+
+    sys.stdout.write(build_all_search_ddl(load_entities(APP_CONFIG), sys.argv[1:] or None))
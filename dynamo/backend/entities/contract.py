@@ -27,6 +27,15 @@ ENTITY = {
         {"key": "nut4",                 "label": "Freguesia",    "type": "text"},
     ],
 
+    "search": {
+        "mode":   "trigram",
+        "table":  "tb_contract",
+        "fields": [
+            {"key": "ts_entity", "table": "ts_entity", "column": "name"},
+            "address", "postal", "nut3", "nut4",
+        ],
+    },
+
     "listView": {
         "columns":     ["ts_entity", "start_date", "stop_date", "tt_contractfrequency"],
         "defaultSort": {"field": "start_date", "dir": "desc"},
@@ -36,6 +36,12 @@ ENTITY = {
         },
     },
 
+    "search": {
+        "mode":   "trigram",
+        "table":  "ts_entity",
+        "fields": ["name", "email", "phone"],
+    },
+
     "listView": {
         "columns":     ["name", "nipc", "phone", "email"],
         "defaultSort": {"field": "name", "dir": "asc"},
@@ -41,6 +41,13 @@ ENTITY = {
         },
     },
 
+    "search": {
+        "mode":   "fulltext",
+        "table":  "tb_equipamento",
+        "fields": ["marca", "modelo", "serial"],
+        "prefix": True,
+    },
+
     "listView": {
         "columns":     ["tt_equipamento$tipo", "marca", "modelo", "serial", "valor"],
         "defaultSort": {"field": "pk", "dir": "desc"},
@@ -17,6 +17,7 @@ import {
   PersonOff as LockUsersIcon,
   Notifications as NotifyIcon,
   Storage as DBIcon,
+  FolderCopy as StorageIcon,
   Warning as WarningIcon,
   Close as CloseIcon,
   CheckCircle as OkIcon,
@@ -167,6 +168,15 @@ const AdminActionsPage = () => {
       confirmTitle: 'Otimizar Base de Dados',
       confirmDesc: 'Serão executadas operações de VACUUM/ANALYZE. O sistema pode ficar lento durante o processo.',
     },
+    {
+      key: 'reconcile-storage',
+      title: 'Reconciliar Armazenamento',
+      description: 'Recalcula em segundo plano as estatísticas de ficheiros (temp e files) a partir do disco.',
+      icon: StorageIcon, color: '#607d8b', danger: false,
+      buttonLabel: 'Reconciliar',
+      confirmTitle: 'Reconciliar Armazenamento',
+      confirmDesc: 'Os diretórios de ficheiros serão percorridos em segundo plano. Pode demorar alguns minutos; as estatísticas são actualizadas no fim.',
+    },
     {
       key: 'lock-all-users',
       title: 'Bloquear Todos os Utilizadores',
@@ -284,6 +284,27 @@ export const documentsService = {
     URL.revokeObjectURL(url);
   },
 
+  /**
+   * Download the full dossier of a document (folder, emitted letters and form) as a ZIP
+   * @param {string|number} documentId - Document ID
+   * @param {string} regnumber - Document regnumber (used for the file name)
+   */
+  async downloadDossier(documentId, regnumber) {
+    const response = await api.get(`/documents/${documentId}/dossier`, {
+      responseType: 'blob',
+      headers: { Accept: 'application/zip' },
+    });
+    const blob = response instanceof Blob ? response : new Blob([response]);
+    const url = URL.createObjectURL(blob);
+    const link = window.document.createElement('a');
+    link.href = url;
+    link.setAttribute('download', `Dossier_${regnumber || documentId}.zip`);
+    window.document.body.appendChild(link);
+    link.click();
+    link.remove();
+    URL.revokeObjectURL(url);
+  },
+
   /**
    * Fetch document workflow hierarchy
    * @param {string|number} typeId - Document Type ID
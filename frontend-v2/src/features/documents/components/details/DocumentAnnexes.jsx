@@ -23,9 +23,12 @@ import {
   Videocam as VideoIcon,
   Visibility as PreviewIcon,
   Add as AddIcon,
+  FolderZip as ZipIcon,
 } from '@mui/icons-material';
 import { formatDate } from '../../utils/documentUtils';
 import { useDocumentAnnexes } from '../../hooks/useDocuments';
+import { documentsService } from '../../api/documentsService';
+import notification from '@/core/services/notification';
 import AddAnnexModal from '../modals/AddAnnexModal';
 import AnnexPreviewModal, { isPreviewable } from './AnnexPreviewModal';
 
@@ -45,6 +48,7 @@ const DocumentAnnexes = ({ documentId, regnumber }) => {
   const theme = useTheme();
   const [isAddOpen, setIsAddOpen] = useState(false);
   const [previewAnnex, setPreviewAnnex] = useState(null);
+  const [isExporting, setIsExporting] = useState(false);
 
   const { data: annexes, isLoading, error } = useDocumentAnnexes(documentId);
 
@@ -54,6 +58,17 @@ const DocumentAnnexes = ({ documentId, regnumber }) => {
     }
   };
 
+  const handleDossier = async () => {
+    setIsExporting(true);
+    try {
+      await documentsService.downloadDossier(documentId, regnumber);
+    } catch (e) {
+      notification.error('Erro ao exportar o dossier do pedido.');
+    } finally {
+      setIsExporting(false);
+    }
+  };
+
   const handlePreview = (annex) => {
     if (isPreviewable(annex.filename) && regnumber) {
       setPreviewAnnex(annex);
@@ -67,14 +82,29 @@ const DocumentAnnexes = ({ documentId, regnumber }) => {
         <Typography variant="subtitle1" fontWeight="bold">
           Anexos
         </Typography>
-        <Button
-          size="small"
-          startIcon={<AddIcon />}
-          variant="outlined"
-          onClick={() => setIsAddOpen(true)}
-        >
-          Adicionar
-        </Button>
+        <Box display="flex" gap={1}>
+          <Tooltip title="Pasta do pedido, ofícios emitidos e formulário num só ZIP">
+            <span>
+              <Button
+                size="small"
+                startIcon={isExporting ? <CircularProgress size={14} /> : <ZipIcon />}
+                variant="outlined"
+                onClick={handleDossier}
+                disabled={isExporting}
+              >
+                Dossier
+              </Button>
+            </span>
+          </Tooltip>
+          <Button
+            size="small"
+            startIcon={<AddIcon />}
+            variant="outlined"
+            onClick={() => setIsAddOpen(true)}
+          >
+            Adicionar
+          </Button>
+        </Box>
       </Box>
 
       {/* Loading */}
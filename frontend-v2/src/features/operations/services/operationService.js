@@ -214,8 +214,9 @@ export const operationService = {
   // SUPERVISOR - Analytics e Dashboards
   // ============================================================
 
-  getSupervisorAnalytics: async () => {
-    const response = await apiClient.get('/operacao_supervisor_analytics');
+  // params: { from_date, to_date, bucket: 'day'|'week'|'month', instalacao, modo, operador }
+  getSupervisorAnalytics: async (params = {}) => {
+    const response = await apiClient.get('/operacao_supervisor_analytics', { params });
     return response;
   },
 
@@ -327,4 +328,16 @@ export const operationService = {
     const response = await apiClient.get('/operations');
     return response;
   },
+
+  /** Só nome, total e colunas de cada view (sem linhas) */
+  fetchPedidosSummary: async () => {
+    const response = await apiClient.get('/operations', { params: { summary: 1 } });
+    return response;
+  },
+
+  /** Página de uma view: { page, page_size, sort, order, fields: 'col1,col2' } */
+  fetchPedidosView: async (viewName, params = {}) => {
+    const response = await apiClient.get(`/operations/views/${viewName}`, { params });
+    return response;
+  },
 };
@@ -121,11 +121,12 @@ const PaymentAdminPage = () => {
         onError: (err) => notification.apiError(err, 'Erro na devolução.'),
     });
 
-    // Verificação manual de estado SIBS (apenas para estados não-finais)
+    // Verificação manual de estado SIBS (apenas para estados não-finais).
+    // Usa o estado reconciliado pelo job (cada 5 min) se for recente.
     const handleCheckSibsStatus = async (payment) => {
         setCheckingStatusPk(payment.pk);
         try {
-            const result = await paymentService.checkStatus(payment.transaction_id);
+            const result = await paymentService.checkStatus(payment.transaction_id, { maxAge: 300 });
             if (result?.updated) {
                 notification.success(`Estado actualizado: ${getStatusLabel(result.payment_status)}`);
                 queryClient.invalidateQueries({ queryKey: ['pendingPayments'] });
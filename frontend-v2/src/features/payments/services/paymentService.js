@@ -97,8 +97,15 @@ class PaymentService {
         return response;
     }
 
-    async checkStatus(transactionId) {
-        const response = await api.get(`/payments/status/${transactionId}`);
+    /**
+     * @param {object} [options]
+     * @param {number} [options.maxAge] - aceitar o estado reconciliado pelo job se
+     *   consultado na SIBS há menos destes segundos (sem chamada em directo)
+     */
+    async checkStatus(transactionId, { maxAge } = {}) {
+        const response = await api.get(`/payments/status/${transactionId}`, {
+            params: maxAge ? { max_age: maxAge } : undefined,
+        });
         return response;
     }
 